@@ -11,6 +11,7 @@ import logging
 import subprocess
 import requests
 import threading
+import queue
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
@@ -38,6 +39,35 @@ class CommandExecutor:
         self.current_command_id = None
         self.command_thread = None
         self.running = True
+        # 推送通道 (可选): 连接时命令由服务器推送, 断开时回退到轮询
+        self.work_channel = None
+        self._pushed_commands: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._wake = threading.Event()
+
+    def attach_channel(self, channel):
+        """接入推送通道"""
+        self.work_channel = channel
+        channel.subscribe("commands", self.submit_commands)
+
+    def submit_commands(self, commands: List[Dict[str, Any]]):
+        """接收推送的命令并唤醒处理线程"""
+        for command in commands:
+            self._pushed_commands.put(command)
+        self._wake.set()
+
+    def next_commands(self) -> List[Dict[str, Any]]:
+        """待执行命令: 推送队列中的命令, 通道不可用 (或刚重连) 时再加上轮询结果"""
+        commands = []
+        while True:
+            try:
+                commands.append(self._pushed_commands.get_nowait())
+            except queue.Empty:
+                break
+        if not self.work_channel or self.work_channel.should_poll("command_executor"):
+            commands.extend(self.poll_commands())
+        if self.work_channel:
+            commands = [c for c in commands if self.work_channel.claim(c.get("id"))]
+        return commands
 
     def poll_commands(self) -> List[Dict[str, Any]]:
         """从服务器获取待执行的命令"""
@@ -254,7 +284,7 @@ class CommandExecutor:
 
     def process_commands(self):
         """处理待执行的命令"""
-        commands = self.poll_commands()
+        commands = self.next_commands()
 
         for command in commands:
             command_id = command.get("id")
@@ -266,6 +296,8 @@ class CommandExecutor:
             # 确认接收命令
             if not self.acknowledge_command(command_id):
                 logger.warning(f"Failed to acknowledge command {command_id}")
+                if self.work_channel:
+                    self.work_channel.release(command_id)
                 continue
 
             # 执行命令
@@ -284,7 +316,9 @@ class CommandExecutor:
         while self.running:
             try:
                 self.process_commands()
-                time.sleep(5)  # 每5秒检查一次命令
+                # 每5秒检查一次命令, 收到推送的命令时立即处理
+                self._wake.wait(5)
+                self._wake.clear()
             except Exception as e:
                 logger.error(f"Error in command processor: {e}")
                 time.sleep(10)
@@ -294,6 +328,7 @@ class CommandExecutor:
     def stop(self):
         """停止命令处理"""
         self.running = False
+        self._wake.set()
 
 
 # Integration helper - 在现有 agent 中添加命令处理
@@ -10,6 +10,7 @@ import socket
 import logging
 import platform
 import uuid
+import queue
 import requests
 import threading
 from datetime import datetime
@@ -35,9 +36,17 @@ class HardwareBenchmarkAgent:
     GITHUB_REPO = "RoleFit-Pro"
     CURRENT_VERSION = "1.0.2"
 
-    def __init__(self, server_url: str, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        server_url: str,
+        api_key: Optional[str] = None,
+        compact_metrics: bool = False,
+        push_channel: bool = True,
+    ):
         self.server_url = server_url.rstrip("/")
         self.api_key = api_key
+        self.compact_metrics = compact_metrics
+        self.push_channel = push_channel
         self.device_id = None
         self.running = True
         self.heartbeat_interval = 60  # seconds
@@ -90,6 +99,11 @@ class HardwareBenchmarkAgent:
         self.task_executor = None
         self.task_executor_thread = None
 
+        # Push channel (commands/tasks delivered over long-poll)
+        self.work_channel = None
+        self._pushed_commands: "queue.Queue[dict]" = queue.Queue()
+        self._wake = threading.Event()
+
     def load_device_id(self) -> Optional[str]:
         """Load device ID from file"""
         try:
@@ -320,6 +334,46 @@ class HardwareBenchmarkAgent:
 
         return None
 
+    def _on_pushed_commands(self, commands: List[dict]):
+        """Queue commands received over the push channel and wake the main loop"""
+        for command in commands:
+            self._pushed_commands.put(command)
+        self._wake.set()
+
+    def start_work_channel(self):
+        """Start the push channel and hand it to the task/command executors"""
+        try:
+            from work_channel import WorkChannel
+        except ImportError:
+            logger.warning("Work channel not available, using polling")
+            return
+
+        self.work_channel = WorkChannel(self.device_id, self.server_url, self.api_key)
+        self.work_channel.subscribe("commands", self._on_pushed_commands)
+        if self.task_executor:
+            self.task_executor.attach_channel(self.work_channel)
+        command_executor = getattr(self, "command_executor", None)
+        if command_executor:
+            command_executor.attach_channel(self.work_channel)
+        self.work_channel.start()
+
+    def next_control_command(self) -> Optional[dict]:
+        """Next control command: pushed ones first, polling while the channel is down"""
+        channel = self.work_channel
+        while True:
+            try:
+                command = self._pushed_commands.get_nowait()
+            except queue.Empty:
+                break
+            if channel.claim(command.get("id")):
+                return command
+
+        if channel is None or channel.should_poll("commands"):
+            command = self.poll_control_commands()
+            if command and (channel is None or channel.claim(command.get("id"))):
+                return command
+        return None
+
     def execute_control_command(self, command: dict):
         """Execute a control command"""
         import subprocess
@@ -468,7 +522,10 @@ class HardwareBenchmarkAgent:
             logger.info("Starting performance monitor...")
             try:
                 self.monitor = self.PerformanceMonitor(
-                    self.device_id, self.server_url, self.api_key
+                    self.device_id,
+                    self.server_url,
+                    self.api_key,
+                    compact_metrics=self.compact_metrics,
                 )
                 self.monitor_thread = threading.Thread(target=self.monitor.run)
                 self.monitor_thread.daemon = True
@@ -487,19 +544,28 @@ class HardwareBenchmarkAgent:
             except Exception as e:
                 logger.error(f"Failed to start task executor: {e}")
 
+        # Start push channel
+        if self.push_channel:
+            self.start_work_channel()
+
         # Main loop
+        last_heartbeat = 0.0
         while self.running:
             try:
-                # Send heartbeat
-                self.send_heartbeat(
-                    status="online", current_task_id=self.current_task_id
-                )
+                self._wake.clear()
+
+                # Send heartbeat (pushed commands wake the loop early)
+                if time.time() - last_heartbeat >= self.task_poll_interval:
+                    self.send_heartbeat(
+                        status="online", current_task_id=self.current_task_id
+                    )
+                    last_heartbeat = time.time()
 
-                # Poll for control commands (only if not busy with a task)
+                # Check for control commands (only if not busy with a task)
                 if not self.current_task_id and not (
                     self.task_executor and self.task_executor.current_task_id
                 ):
-                    control_cmd = self.poll_control_commands()
+                    control_cmd = self.next_control_command()
                     if control_cmd:
                         logger.info(
                             f"Received control command: {control_cmd.get('command_type')}"
@@ -508,7 +574,7 @@ class HardwareBenchmarkAgent:
 
                 # Sleep before next iteration
                 for _ in range(self.task_poll_interval):
-                    if not self.running:
+                    if not self.running or self._wake.is_set():
                         break
                     time.sleep(1)
 
@@ -519,6 +585,10 @@ class HardwareBenchmarkAgent:
                 logger.error(f"Error in main loop: {e}")
                 time.sleep(10)
 
+        # Stop push channel
+        if self.work_channel:
+            self.work_channel.stop()
+
         # Stop task executor
         if self.task_executor:
             logger.info("Stopping task executor...")
@@ -547,10 +617,25 @@ def main():
     parser.add_argument(
         "--api-key", "-k", default=None, help="API Key for authentication"
     )
+    parser.add_argument(
+        "--compact-metrics",
+        action="store_true",
+        help="Upload metrics in the compact columnar format (gzip/zstd)",
+    )
+    parser.add_argument(
+        "--no-push",
+        action="store_true",
+        help="Disable the push channel and poll for commands/tasks only",
+    )
 
     args = parser.parse_args()
 
-    agent = HardwareBenchmarkAgent(args.server, args.api_key)
+    agent = HardwareBenchmarkAgent(
+        args.server,
+        args.api_key,
+        args.compact_metrics,
+        push_channel=not args.no_push,
+    )
     agent.run()
 
 
@@ -26,6 +26,8 @@ except ImportError:
     )
     sys.exit(1)
 
+from metrics_codec import build_compact_request
+
 # Configuration
 SERVER_URL = "http://localhost:8000"
 DEVICE_ID = None  # Will be loaded from file or registered
@@ -123,12 +125,22 @@ def register_device() -> Optional[str]:
 class PerformanceMonitor:
     """Collect and report real-time performance metrics using Node.js systeminformation"""
 
-    def __init__(self, device_id: str, server_url: str = "http://localhost:8000", api_key: Optional[str] = None):
+    def __init__(
+        self,
+        device_id: str,
+        server_url: str = "http://localhost:8000",
+        api_key: Optional[str] = None,
+        compact_metrics: bool = False,
+    ):
         self.device_id = device_id
         self.server_url = server_url.rstrip("/")
         self.api_key = api_key
+        # Opt-in compact columnar + compressed upload format
+        self.compact_metrics = compact_metrics
         self.metrics_buffer = []
         self.running = True
+        # Server-requested backoff (429 Retry-After), as time.time() deadline
+        self.retry_after_until = 0
         
         # State for rate calculation
         self.last_timestamp = 0
@@ -225,14 +237,36 @@ class PerformanceMonitor:
             headers = {}
             if self.api_key:
                 headers["X-API-Key"] = self.api_key
-                
-            response = requests.post(
-                url,
-                json={"device_id": self.device_id, "metrics": metrics_list},
-                headers=headers,
-                timeout=30,
-            )
-            return response.status_code in [200, 201]
+
+            if self.compact_metrics:
+                body, compact_headers = build_compact_request(
+                    self.device_id, metrics_list
+                )
+                headers.update(compact_headers)
+                response = requests.post(url, data=body, headers=headers, timeout=30)
+                if response.status_code == 415:
+                    # Server does not accept this encoding - fall back to JSON
+                    logger.warning("Server rejected compact metrics, using JSON")
+                    self.compact_metrics = False
+                    return self.send_metrics_batch(metrics_list)
+            else:
+                response = requests.post(
+                    url,
+                    json={"device_id": self.device_id, "metrics": metrics_list},
+                    headers=headers,
+                    timeout=30,
+                )
+            if response.status_code == 429:
+                # Server ingestion queue is full - keep the buffer and back off
+                retry_after = response.headers.get("Retry-After", "5")
+                try:
+                    self.retry_after_until = time.time() + float(retry_after)
+                except ValueError:
+                    self.retry_after_until = time.time() + 5
+                logger.warning(f"Server busy, retrying batch in {retry_after}s")
+                return False
+            # 202: accepted into the server write-behind queue
+            return response.status_code in [200, 201, 202]
         except Exception as e:
             logger.error(f"Failed to send batch metrics: {e}")
             return False
@@ -249,8 +283,11 @@ class PerformanceMonitor:
                 if metrics:
                     self.metrics_buffer.append(metrics)
 
-                # Send batch when buffer is full
-                if len(self.metrics_buffer) >= BATCH_SIZE:
+                # Send batch when buffer is full (unless the server asked us to back off)
+                if (
+                    len(self.metrics_buffer) >= BATCH_SIZE
+                    and time.time() >= self.retry_after_until
+                ):
                     if self.send_metrics_batch(self.metrics_buffer):
                         logger.info(f"Sent batch of {len(self.metrics_buffer)} metrics")
                         self.metrics_buffer.clear()
@@ -0,0 +1,131 @@
+# Compact columnar encoding for metric batches
+# Mirrors backend/app/services/metrics_codec.py (encoder side only)
+#
+# Wire format (before compression):
+#   {"v": 1, "device_id": "...", "count": N,
+#    "ts_base": <epoch ms of first sample>, "ts_delta": [ms since previous sample, ...],
+#    "columns": {"cpu_percent": [...], ...},
+#    "top_processes": {"fields": [...], "rows": [[[...], ...] per sample]},
+#    "disk_io_details": {"fields": [...], "rows": [...]}}
+
+import gzip
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+COLUMNAR_CONTENT_TYPE = "application/vnd.rolefit.metrics-columnar+json"
+COLUMNAR_FORMAT_VERSION = 1
+
+NUMERIC_COLUMNS = (
+    "cpu_percent",
+    "cpu_temperature",
+    "cpu_power_watts",
+    "cpu_frequency_mhz",
+    "gpu_percent",
+    "gpu_temperature",
+    "gpu_power_watts",
+    "gpu_frequency_mhz",
+    "gpu_memory_used_mb",
+    "gpu_memory_total_mb",
+    "memory_percent",
+    "memory_used_mb",
+    "memory_available_mb",
+    "disk_read_mbps",
+    "disk_write_mbps",
+    "disk_io_percent",
+    "network_sent_mbps",
+    "network_recv_mbps",
+    "process_count",
+)
+TABLE_COLUMNS = ("top_processes", "disk_io_details")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_epoch_ms(value: Any) -> Optional[int]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return int((value - _EPOCH).total_seconds() * 1000)
+
+
+def _encode_table(rows_per_sample: List[Any]) -> Dict[str, Any]:
+    fields: List[str] = []
+    seen = set()
+    for items in rows_per_sample:
+        for item in items or []:
+            for key in item:
+                if key not in seen:
+                    seen.add(key)
+                    fields.append(key)
+    rows = [
+        [[item.get(key) for key in fields] for item in items] if items else None
+        for items in rows_per_sample
+    ]
+    return {"fields": fields, "rows": rows}
+
+
+def encode_metrics_batch(device_id: str, samples: List[Dict[str, Any]]) -> bytes:
+    """Encode samples as columnar JSON (uncompressed)"""
+    stamps = [_to_epoch_ms(s.get("timestamp")) for s in samples]
+    base = next((t for t in stamps if t is not None), None)
+    deltas = []
+    previous = base
+    for t in stamps:
+        if t is None:
+            deltas.append(None)
+            continue
+        deltas.append(t - previous)
+        previous = t
+
+    columns = {}
+    for name in NUMERIC_COLUMNS:
+        values = [s.get(name) for s in samples]
+        if any(v is not None for v in values):
+            columns[name] = values
+
+    payload = {
+        "v": COLUMNAR_FORMAT_VERSION,
+        "device_id": device_id,
+        "count": len(samples),
+        "ts_base": base,
+        "ts_delta": deltas,
+        "columns": columns,
+    }
+    for name in TABLE_COLUMNS:
+        values = [s.get(name) for s in samples]
+        if any(values):
+            payload[name] = _encode_table(values)
+
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def build_compact_request(
+    device_id: str, samples: List[Dict[str, Any]]
+) -> Tuple[bytes, Dict[str, str]]:
+    """Return (body, headers) for POST /api/performance/metrics/batch"""
+    body = encode_metrics_batch(device_id, samples)
+    if ZSTD_AVAILABLE:
+        encoding = "zstd"
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    else:
+        encoding = "gzip"
+        body = gzip.compress(body, compresslevel=6)
+    return body, {
+        "Content-Type": COLUMNAR_CONTENT_TYPE,
+        "Content-Encoding": encoding,
+    }
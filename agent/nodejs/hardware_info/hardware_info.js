@@ -499,6 +499,7 @@ async function getRealtimeMetrics() {
       // Process list
 
       top_processes: processes.list
+        .filter(p => p.pid !== process.pid)
         .sort((a, b) => b.cpu - a.cpu)
         .slice(0, 10)
         .map(p => ({
@@ -518,23 +519,77 @@ async function getRealtimeMetrics() {
   }
 }
 
+/**
+ * Run a single command and return its result object
+ */
+async function runCommand(command) {
+  switch (command) {
+    case 'metrics':
+      return getRealtimeMetrics();
+    case 'ping':
+      return {
+        success: true,
+        data: {
+          pid: process.pid,
+          uptime: process.uptime(),
+          rss: process.memoryUsage().rss
+        }
+      };
+    case 'info':
+      return getHardwareInfo();
+    default:
+      return { success: false, error: `Unknown command: ${command}` };
+  }
+}
+
+/**
+ * Daemon mode: line-delimited JSON over stdin/stdout
+ *   request:  {"id": 1, "command": "metrics"}
+ *   response: {"id": 1, "success": true, "data": {...}}
+ * Requests are handled one at a time, in order. Exits when stdin closes
+ * (i.e. when the parent agent goes away).
+ */
+function runDaemon() {
+  const readline = require('readline');
+  const rl = readline.createInterface({ input: process.stdin, terminal: false });
+  let queue = Promise.resolve();
+
+  rl.on('line', (line) => {
+    if (!line.trim()) return;
+    queue = queue.then(async () => {
+      let request;
+      try {
+        request = JSON.parse(line);
+      } catch (e) {
+        process.stdout.write(JSON.stringify({ id: null, success: false, error: 'Invalid JSON request' }) + '\n');
+        return;
+      }
+      let result;
+      try {
+        result = await runCommand(request.command);
+      } catch (e) {
+        result = { success: false, error: e.message };
+      }
+      process.stdout.write(JSON.stringify({ id: request.id, ...result }) + '\n');
+    });
+  });
+
+  rl.on('close', () => {
+    queue.then(() => process.exit(0));
+  });
+}
+
 // CLI handling
 const args = process.argv.slice(2);
 const command = args[0] || 'info';
 
 async function main() {
-  let result;
-  
-  switch (command) {
-    case 'metrics':
-      result = await getRealtimeMetrics();
-      break;
-    case 'info':
-    default:
-      result = await getHardwareInfo();
-      break;
+  if (command === 'daemon') {
+    runDaemon();
+    return;
   }
-  
+
+  const result = await runCommand(command === 'metrics' ? 'metrics' : 'info');
   console.log(JSON.stringify(result, null, 2));
 }
 
@@ -3,10 +3,15 @@ Node.js Hardware Info Wrapper
 使用 Node.js + systeminformation 获取准确的硬件信息
 """
 
+import atexit
+import itertools
+import queue
 import subprocess
 import json
 import os
 import logging
+import threading
+import time
 from typing import Dict, Any, Optional
 
 logger = logging.getLogger(__name__)
@@ -16,20 +21,227 @@ NODE_SCRIPT_DIR = os.path.join(os.path.dirname(__file__), "nodejs", "hardware_in
 NODE_SCRIPT = os.path.join(NODE_SCRIPT_DIR, "hardware_info.js")
 NODE_EXE = "node"  # 使用系统中的 node 命令
 
+# 常驻采集进程设置
+REQUEST_TIMEOUT = 60  # 单次请求超时 (秒), 与原一次性脚本一致
+HEALTH_CHECK_INTERVAL = 30  # 空闲超过该时间后, 下次请求前先 ping
+HEALTH_CHECK_TIMEOUT = 5
+MAX_RESTART_BACKOFF = 60
+
+_node_available: Optional[bool] = None
+
 
 def is_node_available() -> bool:
-    """检查 Node.js 是否可用"""
+    """检查 Node.js 是否可用 (结果缓存, 避免每次采集都启动 node --version)"""
+    global _node_available
+    if _node_available:
+        return True
     try:
         result = subprocess.run(
             [NODE_EXE, "--version"], capture_output=True, text=True, timeout=5
         )
-        return result.returncode == 0
+        _node_available = result.returncode == 0
     except:
-        return False
+        _node_available = False
+    return _node_available
+
+
+def _normalize_output(stdout: str) -> str:
+    """
+    修复Windows路径中的反斜杠问题
+    Windows路径如 C:\\Users 会导致JSON解析失败，因为\\U不是有效转义
+    """
+    # 将反斜杠替换为正斜杠（Windows路径标准化）
+    return stdout.replace("\\\\", "/").replace("\\", "/")
+
+
+class NodeCollector:
+    """
+    常驻的 Node.js 采集进程
+
+    通过 stdin/stdout 按行传输 JSON:
+      请求: {"id": 1, "command": "metrics"}
+      响应: {"id": 1, "success": true, "data": {...}}
+    进程退出或请求超时后自动重启 (指数退避)。
+    """
+
+    def __init__(self, request_timeout: float = REQUEST_TIMEOUT):
+        self.request_timeout = request_timeout
+        self._proc: Optional[subprocess.Popen] = None
+        self._responses: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._last_ok = 0.0
+        self._failures = 0
+        self._next_start = 0.0
+        self.restarts = 0
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _start(self):
+        """启动采集进程及其 stdout/stderr 读取线程"""
+        now = time.monotonic()
+        if now < self._next_start:
+            raise RuntimeError(
+                f"Node.js collector restarting in {self._next_start - now:.0f}s"
+            )
+
+        if self._proc is not None:
+            self.restarts += 1
+            logger.warning(f"Restarting Node.js collector (restart #{self.restarts})")
+
+        self._responses = queue.Queue()
+        self._proc = subprocess.Popen(
+            [NODE_EXE, NODE_SCRIPT, "daemon"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=NODE_SCRIPT_DIR,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+        )
+        threading.Thread(
+            target=self._read_stdout,
+            args=(self._proc, self._responses),
+            name="node-collector-stdout",
+            daemon=True,
+        ).start()
+        threading.Thread(
+            target=self._read_stderr,
+            args=(self._proc,),
+            name="node-collector-stderr",
+            daemon=True,
+        ).start()
+        self._last_ok = time.monotonic()
+
+    @staticmethod
+    def _read_stdout(proc: subprocess.Popen, responses: "queue.Queue"):
+        for line in proc.stdout:
+            line = line.strip()
+            if line:
+                responses.put(line)
+        # EOF: 进程已退出, 唤醒等待中的请求
+        responses.put(None)
+
+    @staticmethod
+    def _read_stderr(proc: subprocess.Popen):
+        for line in proc.stderr:
+            line = line.rstrip()
+            if line:
+                logger.debug(f"Node.js collector: {line}")
+
+    def _kill(self):
+        """终止当前进程并安排退避重启"""
+        try:
+            self._proc.kill()
+            self._proc.wait(timeout=5)
+        except Exception:
+            pass
+        self._failures += 1
+        backoff = min(2 ** (self._failures - 1), MAX_RESTART_BACKOFF)
+        self._next_start = time.monotonic() + backoff
+
+    def _send(self, command: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """发送一条请求并等待对应 id 的响应 (需持有锁)"""
+        if not self.alive:
+            self._start()
+
+        request_id = next(self._ids)
+        try:
+            self._proc.stdin.write(
+                json.dumps({"id": request_id, "command": command}) + "\n"
+            )
+            self._proc.stdin.flush()
+        except (OSError, ValueError) as e:
+            logger.error(f"Node.js collector pipe error: {e}")
+            self._kill()
+            return None
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self._responses.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                logger.error(f"Node.js collector timeout ({command})")
+                self._kill()
+                return None
+
+            if line is None:
+                logger.error(
+                    f"Node.js collector exited (code {self._proc.poll()})"
+                )
+                self._kill()
+                return None
+
+            try:
+                response = json.loads(_normalize_output(line))
+            except json.JSONDecodeError as e:
+                logger.error(f"Failed to parse Node.js output: {e}")
+                continue
+
+            # 丢弃之前超时请求的迟到响应
+            if response.pop("id", None) != request_id:
+                continue
+
+            self._failures = 0
+            self._last_ok = time.monotonic()
+            return response
+
+    def request(self, command: str) -> Optional[Dict[str, Any]]:
+        """执行采集命令 (info / metrics), 失败返回 None"""
+        with self._lock:
+            try:
+                # 长时间空闲后先做健康检查, 卡死的进程在此被替换
+                if (
+                    self.alive
+                    and time.monotonic() - self._last_ok > HEALTH_CHECK_INTERVAL
+                    and self._send("ping", HEALTH_CHECK_TIMEOUT) is None
+                ):
+                    logger.warning("Node.js collector failed health check")
+                return self._send(command, self.request_timeout)
+            except Exception as e:
+                logger.error(f"Failed to run Node.js collector: {e}")
+                return None
+
+    def health_check(self) -> bool:
+        """ping 采集进程, 返回是否健康"""
+        with self._lock:
+            try:
+                result = self._send("ping", HEALTH_CHECK_TIMEOUT)
+            except Exception:
+                return False
+        return bool(result and result.get("success"))
+
+    def stop(self):
+        """关闭 stdin 让采集进程自行退出"""
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=5)
+        except Exception:
+            proc.kill()
+
+
+# 全局采集进程实例
+node_collector = NodeCollector()
+atexit.register(node_collector.stop)
 
 
 def run_node_script(args: list = None) -> Optional[Dict[str, Any]]:
-    """运行 Node.js 脚本并返回结果"""
+    """通过常驻采集进程执行命令并返回结果"""
+    command = args[0] if args else "info"
+    return node_collector.request(command)
+
+
+def run_node_script_once(args: list = None) -> Optional[Dict[str, Any]]:
+    """运行一次性 Node.js 脚本并返回结果 (调试用)"""
     if args is None:
         args = []
 
@@ -60,13 +272,7 @@ def run_node_script(args: list = None) -> Optional[Dict[str, Any]]:
             logger.error("Node.js script returned empty stdout")
             return None
 
-        # 修复Windows路径中的反斜杠问题
-        # Windows路径如 C:\Users 会导致JSON解析失败，因为\U不是有效转义
-        stdout = result.stdout
-        # 将反斜杠替换为正斜杠（Windows路径标准化）
-        stdout = stdout.replace("\\\\", "/").replace("\\", "/")
-
-        return json.loads(stdout)
+        return json.loads(_normalize_output(result.stdout))
     except subprocess.TimeoutExpired:
         logger.error("Node.js script timeout")
         return None
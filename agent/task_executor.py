@@ -11,6 +11,7 @@ import logging
 import subprocess
 import requests
 import threading
+import queue
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
@@ -28,6 +29,10 @@ class TaskExecutor:
         self.task_thread = None
         self.running = True
         self._task_lock = threading.Lock()
+        # 推送通道 (可选): 连接时任务由服务器推送, 断开时回退到轮询
+        self.work_channel = None
+        self._pushed_tasks: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._wake = threading.Event()
 
     def _get_headers(self) -> Dict[str, str]:
         """获取请求头"""
@@ -57,6 +62,34 @@ class TaskExecutor:
 
         return None
 
+    def attach_channel(self, channel):
+        """接入推送通道"""
+        self.work_channel = channel
+        channel.subscribe("tasks", self.submit_tasks)
+
+    def submit_tasks(self, tasks: List[Dict[str, Any]]):
+        """接收推送的任务并唤醒处理线程"""
+        for task in tasks:
+            self._pushed_tasks.put(task)
+        self._wake.set()
+
+    def next_task(self) -> Optional[Dict[str, Any]]:
+        """取下一个待执行任务: 优先推送队列, 通道不可用 (或刚重连) 时轮询"""
+        while True:
+            try:
+                task = self._pushed_tasks.get_nowait()
+            except queue.Empty:
+                break
+            if not self.work_channel or self.work_channel.claim(task.get("id")):
+                return task
+
+        if self.work_channel and not self.work_channel.should_poll("tasks"):
+            return None
+        task = self.poll_pending_tasks()
+        if task and self.work_channel and not self.work_channel.claim(task.get("id")):
+            return None
+        return task
+
     def mark_task_running(self, task_id: str, device_ids: List[str]) -> bool:
         """通知服务器任务开始执行"""
         try:
@@ -451,7 +484,7 @@ class TaskExecutor:
                         time.sleep(1)
                         continue
 
-                    task = self.poll_pending_tasks()
+                    task = self.next_task()
                     if task:
                         logger.info(f"Received task: {task.get('task_name')}")
                         self.execute_task(task)
@@ -459,7 +492,9 @@ class TaskExecutor:
             except Exception as e:
                 logger.error(f"Error in task processor: {e}")
 
-            time.sleep(5)  # 每5秒检查一次
+            # 每5秒检查一次, 收到推送的任务时立即处理
+            self._wake.wait(5)
+            self._wake.clear()
 
     def start(self):
         """启动任务处理线程"""
@@ -470,6 +505,7 @@ class TaskExecutor:
     def stop(self):
         """停止任务处理"""
         self.running = False
+        self._wake.set()
         if self.task_thread:
             self.task_thread.join(timeout=5)
         logger.info("Task executor stopped")
@@ -0,0 +1,208 @@
+"""
+Push channel for control commands and test tasks
+
+Keeps a long-poll request open against GET /api/agent/work. The server answers
+as soon as a command or task is created for this device, so work starts without
+waiting for the next poll interval and idle agents stop issuing empty polls.
+Received items are acknowledged (POST /api/agent/work/ack) before they are handed
+to the subscribed handlers; unacknowledged items are delivered again.
+
+While the channel is down (server restart, network error, or a server without the
+endpoint) `connected` is False and the regular pollers keep running. After every
+(re)connect each poller runs one catch-up poll before the channel takes over.
+Items can arrive through both paths, so consumers call claim() before executing.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Seconds the server may hold one long-poll request
+WAIT_SECONDS = 30
+# Reconnect backoff bounds (seconds)
+MIN_BACKOFF = 1
+MAX_BACKOFF = 60
+# Retry interval when the server has no push channel (404)
+UNSUPPORTED_RETRY_SECONDS = 600
+# Item ids remembered for de-duplication
+CLAIMED_MAX = 1000
+
+Handler = Callable[[List[Dict[str, Any]]], None]
+
+
+class WorkChannel:
+    """Long-poll push channel with polling fallback"""
+
+    def __init__(
+        self,
+        device_id: str,
+        server_url: str = "http://localhost:8000",
+        api_key: Optional[str] = None,
+        wait_seconds: int = WAIT_SECONDS,
+    ):
+        self.device_id = device_id
+        self.server_url = server_url.rstrip("/")
+        self.api_key = api_key
+        self.wait_seconds = wait_seconds
+        self.connected = False
+        self.running = False
+
+        self._handlers: Dict[str, List[Handler]] = {"commands": [], "tasks": []}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Incremented on every (re)connect; pollers catch up once per generation
+        self._generation = 0
+        self._caught_up: Dict[str, int] = {}
+        self._claimed: "OrderedDict[str, None]" = OrderedDict()
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.api_key:
+            headers["X-API-Key"] = self.api_key
+        return headers
+
+    def subscribe(self, kind: str, handler: Handler):
+        """Register a handler for pushed "commands" or "tasks" """
+        self._handlers[kind].append(handler)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="work-channel", daemon=True)
+        self._thread.start()
+        logger.info("Work channel started")
+
+    def stop(self):
+        self.running = False
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            # An open long-poll only ends when the server answers
+            self._thread.join(timeout=1)
+        with self._lock:
+            self.connected = False
+        logger.info("Work channel stopped")
+
+    # ------------------------------------------------
+    # Polling fallback / de-duplication
+    # ------------------------------------------------
+
+    def should_poll(self, key: str) -> bool:
+        """
+        Whether the poller named `key` should poll now: always while the channel
+        is down, and once after each (re)connect to pick up missed work
+        """
+        with self._lock:
+            if not self.connected:
+                return True
+            if self._caught_up.get(key) != self._generation:
+                self._caught_up[key] = self._generation
+                return True
+            return False
+
+    def claim(self, item_id: Optional[str]) -> bool:
+        """Return True the first time an item id is seen (push or poll)"""
+        if not item_id:
+            return True
+        with self._lock:
+            if item_id in self._claimed:
+                return False
+            self._claimed[item_id] = None
+            while len(self._claimed) > CLAIMED_MAX:
+                self._claimed.popitem(last=False)
+            return True
+
+    def release(self, item_id: Optional[str]):
+        """Forget a claimed item so it can be picked up again (e.g. failed to start)"""
+        with self._lock:
+            self._claimed.pop(item_id, None)
+
+    # ------------------------------------------------
+    # Long-poll loop
+    # ------------------------------------------------
+
+    def _set_connected(self, connected: bool):
+        with self._lock:
+            if connected == self.connected:
+                return
+            self.connected = connected
+            if connected:
+                self._generation += 1
+        if connected:
+            logger.info("Work channel connected, switching to push delivery")
+        else:
+            logger.warning("Work channel disconnected, falling back to polling")
+
+    def _run(self):
+        url = f"{self.server_url}/api/agent/work"
+        backoff = MIN_BACKOFF
+        while not self._stop.is_set():
+            try:
+                response = requests.get(
+                    url,
+                    params={"device_id": self.device_id, "timeout": self.wait_seconds},
+                    headers=self._headers(),
+                    timeout=self.wait_seconds + 15,
+                )
+            except requests.RequestException as e:
+                logger.debug(f"Work channel request failed: {e}")
+                self._set_connected(False)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            if response.status_code == 404:
+                # Server without the push channel (or disabled): keep polling
+                self._set_connected(False)
+                logger.info("Server has no push channel, using polling")
+                self._stop.wait(UNSUPPORTED_RETRY_SECONDS)
+                continue
+            if response.status_code != 200:
+                self._set_connected(False)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+                continue
+
+            backoff = MIN_BACKOFF
+            self._set_connected(True)
+            try:
+                work = response.json()
+            except ValueError:
+                continue
+            if work.get("commands") or work.get("tasks"):
+                self._deliver(work)
+
+    def _deliver(self, work: Dict[str, List[Dict[str, Any]]]):
+        commands = work.get("commands") or []
+        tasks = work.get("tasks") or []
+        try:
+            requests.post(
+                f"{self.server_url}/api/agent/work/ack",
+                json={
+                    "device_id": self.device_id,
+                    "command_ids": [c.get("id") for c in commands],
+                    "task_ids": [t.get("id") for t in tasks],
+                },
+                headers=self._headers(),
+                timeout=10,
+            )
+        except requests.RequestException as e:
+            # Not acknowledged: the server delivers these items again
+            logger.warning(f"Failed to acknowledge pushed work: {e}")
+
+        for kind, items in (("commands", commands), ("tasks", tasks)):
+            if not items:
+                continue
+            logger.info(f"Received {len(items)} pushed {kind}")
+            for handler in self._handlers[kind]:
+                try:
+                    handler(items)
+                except Exception as e:
+                    logger.error(f"Pushed {kind} handler failed: {e}")
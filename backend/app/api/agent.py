@@ -1,16 +1,24 @@
 """
 Agent API - 用于Agent获取任务和上报结果
+
+Agent 轮询和上报接口使用异步 Session (get_db), 数据库等待不占用事件循环;
+LLM 接口内部是同步 HTTP 调用, 声明为普通函数由线程池执行。
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, and_
-from typing import Optional, List, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_, update
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Any, Set
 from datetime import datetime, timedelta
+import json
 import uuid
 
-from app.core.database import get_db_sync
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_db, get_db_sync
 from app.models.sqlite import (
+    ControlCommand,
     JobScript,
     ScriptExecution,
     TestTask,
@@ -18,16 +26,19 @@ from app.models.sqlite import (
     Device,
     SoftwareMetrics,
 )
+from app.schemas.performance import ControlCommandResponse
 from app.schemas.script import ScriptResponse
 from app.schemas.execution import ExecutionCreate, ExecutionResponse
+from app.services.agent_push_service import agent_push
 from app.services.agent_service import AgentService
+from app.services.task_assignment_service import task_assignments
 
 router = APIRouter(tags=["Agent"])
 
 # ==================== LLM Agent ====================
 
 @router.post("/llm/agent/chat")
-async def agent_chat(
+def agent_chat(
     message: str = Body(..., embed=True),
     history: Optional[List[Dict[str, str]]] = Body(None, embed=True),
     provider: Optional[str] = Body(None, embed=True),
@@ -58,7 +69,7 @@ async def agent_chat(
 
 
 @router.post("/llm/test", response_model=dict)
-async def test_llm_connection(
+def test_llm_connection(
     provider: str = Body(..., embed=True),
     api_key: Optional[str] = Body(None, embed=True),
     base_url: Optional[str] = Body(None, embed=True),
@@ -105,7 +116,7 @@ async def test_llm_connection(
 
 
 @router.get("/devices/online")
-async def get_online_devices(db: Session = Depends(get_db_sync)):
+async def get_online_devices(db: AsyncSession = Depends(get_db)):
     """获取在线设备列表"""
     # 5分钟内有心跳的设备视为在线
     cutoff = datetime.utcnow() - timedelta(minutes=5)
@@ -113,7 +124,7 @@ async def get_online_devices(db: Session = Depends(get_db_sync)):
     query = select(Device).where(
         and_(Device.status == "online", Device.last_seen_at >= cutoff)
     )
-    result = db.execute(query)
+    result = await db.execute(query)
     devices = result.scalars().all()
 
     return [
@@ -134,7 +145,7 @@ async def get_online_devices(db: Session = Depends(get_db_sync)):
 @router.get("/tasks/pending", response_model=List[dict])
 async def get_pending_tasks(
     device_id: str = Query(..., description="设备ID"),
-    db: Session = Depends(get_db_sync),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     获取设备待执行的任务
@@ -142,16 +153,10 @@ async def get_pending_tasks(
     """
     import json
 
-    # 查找分配给该设备的pending状态的任务
-    # 或者分配给该部门/岗位的pending任务
-    query = select(TestTask).where(TestTask.task_status == "pending")
-    result = db.execute(query)
+    # 查找分配给该设备 (或所有设备) 的 pending 任务: task_assignments 索引查找
+    result = await db.execute(task_assignments.pending_tasks_query(device_id))
     tasks = result.scalars().all()
 
-    # 检查设备是否在线
-    device_result = db.execute(select(Device).where(Device.id == device_id))
-    device = device_result.scalar_one_or_none()
-
     response = []
     for task in tasks:
         # 解析目标设备
@@ -163,23 +168,101 @@ async def get_pending_tasks(
         except:
             pass
 
-        # 检查任务是否分配给该设备
-        if device_id in target_devices or not target_devices:
-            # 返回任务信息
-            response.append(
-                {
-                    "task_id": task.id,
-                    "task_name": task.task_name,
-                    "task_type": task.task_type,
-                    "test_duration_seconds": task.test_duration_seconds,
-                    "sample_interval_ms": task.sample_interval_ms,
-                    "target_device_ids": target_devices,
-                }
-            )
+        response.append(
+            {
+                "task_id": task.id,
+                "task_name": task.task_name,
+                "task_type": task.task_type,
+                "test_duration_seconds": task.test_duration_seconds,
+                "sample_interval_ms": task.sample_interval_ms,
+                "target_device_ids": target_devices,
+            }
+        )
 
     return response
 
 
+# ==================== 推送通道 ====================
+
+
+class WorkAck(BaseModel):
+    device_id: str
+    command_ids: List[str] = []
+    task_ids: List[str] = []
+
+
+def _task_payload(task: TestTask) -> Dict[str, Any]:
+    """与 /api/tasks/pending 返回的任务格式一致"""
+    payload = {c.name: getattr(task, c.name) for c in task.__table__.columns}
+    for field in ("target_device_ids", "target_departments", "target_positions"):
+        try:
+            payload[field] = json.loads(payload[field]) if payload[field] else []
+        except (TypeError, ValueError):
+            payload[field] = []
+    return payload
+
+
+async def _fetch_work(device_id: str, acked: Set[str]) -> Dict[str, List[Any]]:
+    """查询设备尚未确认的 pending 命令和任务 (每次使用短会话, 等待期间不占用连接)"""
+    command_query = (
+        select(ControlCommand)
+        .where(ControlCommand.device_id == device_id)
+        .where(ControlCommand.status == "pending")
+        .order_by(ControlCommand.priority.desc(), ControlCommand.created_at.asc())
+    )
+    task_query = task_assignments.pending_tasks_query(device_id, limit=10)
+    if acked:
+        command_query = command_query.where(ControlCommand.id.notin_(acked))
+        task_query = task_query.where(TestTask.id.notin_(acked))
+
+    async with AsyncSessionLocal() as db:
+        commands = (await db.execute(command_query)).scalars().all()
+        tasks = (await db.execute(task_query)).scalars().all()
+        return {
+            "commands": [
+                ControlCommandResponse.model_validate(c).model_dump(mode="json")
+                for c in commands
+            ],
+            "tasks": [_task_payload(t) for t in tasks],
+        }
+
+
+@router.get("/work")
+async def wait_for_work(
+    device_id: str = Query(..., description="设备ID"),
+    timeout: int = Query(30, ge=0, description="最长等待秒数"),
+):
+    """
+    Agent 长轮询: 有尚未确认的控制命令或任务时立即返回, 否则等待新工作创建
+    (命令创建 / 任务分配提交后立即唤醒), 超时返回空列表
+
+    返回的条目需调用 /work/ack 确认, 未确认的会在下次请求时重新下发
+    """
+    if not settings.agent_push_enabled:
+        raise HTTPException(status_code=404, detail="Push channel disabled")
+    timeout = min(timeout, settings.agent_push_max_wait_seconds)
+    return await agent_push.wait(device_id, _fetch_work, timeout)
+
+
+@router.post("/work/ack")
+async def acknowledge_work(ack: WorkAck, db: AsyncSession = Depends(get_db)):
+    """
+    确认收到推送的命令和任务
+    命令记录 sent_at; 状态仍为 pending, 直到 Agent 调用命令的 acknowledge 接口
+    """
+    count = agent_push.ack(ack.device_id, ack.command_ids + ack.task_ids)
+    if ack.command_ids:
+        await db.execute(
+            update(ControlCommand)
+            .where(ControlCommand.id.in_(ack.command_ids))
+            .where(ControlCommand.device_id == ack.device_id)
+            .where(ControlCommand.sent_at.is_(None))
+            .values(sent_at=datetime.utcnow())
+        )
+        await db.commit()
+    return {"acknowledged": count}
+
+
 # ==================== 执行记录 ====================
 
 
@@ -188,7 +271,7 @@ async def start_execution(
     script_id: str,
     device_id: str,
     task_id: Optional[str] = None,
-    db: Session = Depends(get_db_sync),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Agent 开始执行脚本时调用
@@ -202,8 +285,7 @@ async def start_execution(
         exit_code=-1,  # 初始值，表示未完成
     )
     db.add(execution)
-    db.commit()
-    db.refresh(execution)
+    await db.commit()
 
     return {
         "execution_id": execution.id,
@@ -217,13 +299,13 @@ async def complete_execution(
     exit_code: int = Body(0),
     error_message: Optional[str] = Body(None),
     metrics_data: Optional[List[dict]] = Body(None),
-    db: Session = Depends(get_db_sync),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Agent 完成脚本执行时调用
     更新执行记录和性能指标
     """
-    result = db.execute(
+    result = await db.execute(
         select(ScriptExecution).where(ScriptExecution.id == execution_id)
     )
     execution = result.scalar_one_or_none()
@@ -240,7 +322,7 @@ async def complete_execution(
             (execution.end_time - execution.start_time).total_seconds()
         )
 
-    db.commit()
+    await db.commit()
 
     # 保存性能指标数据
     if metrics_data:
@@ -261,7 +343,7 @@ async def complete_execution(
                 status="completed" if exit_code == 0 else "failed",
             )
             db.add(metric)
-        db.commit()
+        await db.commit()
 
     return {
         "execution_id": execution.id,
@@ -272,7 +354,7 @@ async def complete_execution(
 
 @router.post("/executions/{execution_id}/metrics", response_model=dict)
 async def submit_metrics(
-    execution_id: str, metrics: List[dict], db: Session = Depends(get_db_sync)
+    execution_id: str, metrics: List[dict], db: AsyncSession = Depends(get_db)
 ):
     """
     Agent 实时上报性能指标
@@ -297,7 +379,7 @@ async def submit_metrics(
         )
         db.add(metric)
 
-    db.commit()
+    await db.commit()
 
     return {"success": True, "count": len(metrics)}
 
@@ -306,9 +388,9 @@ async def submit_metrics(
 
 
 @router.get("/scripts/{script_id}", response_model=ScriptResponse)
-async def get_script_detail(script_id: str, db: Session = Depends(get_db_sync)):
+async def get_script_detail(script_id: str, db: AsyncSession = Depends(get_db)):
     """获取脚本详情"""
-    result = db.execute(select(JobScript).where(JobScript.id == script_id))
+    result = await db.execute(select(JobScript).where(JobScript.id == script_id))
     script = result.scalar_one_or_none()
 
     if not script:
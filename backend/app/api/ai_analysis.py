@@ -16,6 +16,7 @@ from app.models.sqlite import (
 )
 from app.schemas.performance import AIAnalysisRequest, AIAnalysisResponse, AIAnalysisMetricsRequest
 from app.services.ai_analysis_service import AIAnalysisService
+from app.services.metrics_rollup_service import metrics_rollup_service
 from app.services.llm_service import LLMProvider
 
 router = APIRouter(prefix="/ai", tags=["AI Analysis"])
@@ -442,26 +443,12 @@ def analyze_performance_trend(
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
-    # 获取历史性能指标
-    since = datetime.utcnow() - timedelta(hours=hours)
-    metrics_result = db.execute(
-        select(PerformanceMetric)
-        .where(PerformanceMetric.device_id == device_id)
-        .where(PerformanceMetric.timestamp >= since)
-        .order_by(PerformanceMetric.timestamp.asc())
+    # 获取历史性能指标 (长时间范围使用小时汇总)
+    now = datetime.utcnow()
+    since = now - timedelta(hours=hours)
+    metrics_history = metrics_rollup_service.get_metric_history(
+        db, device_id, since, now
     )
-    metrics = metrics_result.scalars().all()
-
-    metrics_history = []
-    for m in metrics:
-        metrics_history.append(
-            {
-                "timestamp": m.timestamp.isoformat() if m.timestamp else None,
-                "cpu_percent": m.cpu_percent,
-                "gpu_percent": m.gpu_percent,
-                "memory_percent": m.memory_percent,
-            }
-        )
 
     # 获取历史基准测试
     benchmarks_result = db.execute(
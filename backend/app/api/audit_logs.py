@@ -3,7 +3,7 @@
 提供审计日志的查询和管理功能
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import select, desc
 from pydantic import BaseModel
@@ -14,6 +14,12 @@ import json
 
 from app.core.database import get_db_sync
 from app.models.sqlite import AuditLog, User
+from app.services.keyset_pagination import (
+    approximate_counts,
+    decode_cursor,
+    keyset_page,
+    keyset_query,
+)
 
 router = APIRouter(prefix="/audit-logs", tags=["Audit Logs"])
 
@@ -48,6 +54,7 @@ class AuditLogCreate(BaseModel):
 
 @router.get("", response_model=List[AuditLogResponse])
 def list_audit_logs(
+    response: Response,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     user_id: Optional[str] = None,
@@ -55,10 +62,19 @@ def list_audit_logs(
     resource_type: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    cursor: Optional[str] = Query(
+        None, description="游标分页: 空字符串取第一页, 之后传响应头中的游标"
+    ),
+    include_total: bool = Query(False, description="游标分页时返回近似总数"),
     db: Session = Depends(get_db_sync),
 ):
-    """获取审计日志列表"""
-    query = select(AuditLog).order_by(AuditLog.created_at.desc())
+    """
+    获取审计日志列表
+
+    传入 cursor 时使用游标分页 (忽略 page), 响应体仍为日志列表,
+    前后页游标和近似总数放在 X-Next-Cursor / X-Prev-Cursor / X-Total-Count 响应头中
+    """
+    query = select(AuditLog)
 
     if user_id:
         query = query.where(AuditLog.user_id == user_id)
@@ -71,6 +87,32 @@ def list_audit_logs(
     if end_date:
         query = query.where(AuditLog.created_at <= end_date)
 
+    if cursor is not None:
+        try:
+            page_cursor = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        rows = db.execute(
+            keyset_query(query, AuditLog.created_at, AuditLog.id, page_cursor, page_size)
+        ).scalars().all()
+        page = keyset_page(rows, page_cursor, page_size, lambda l: (l.created_at, l.id))
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+        if page.prev_cursor:
+            response.headers["X-Prev-Cursor"] = page.prev_cursor
+        if include_total:
+            filters = (user_id, action, resource_type, start_date, end_date)
+            total = approximate_counts.count(
+                db,
+                ("audit_logs",) + filters,
+                query,
+                table_name=None if any(filters) else "audit_logs",
+            )
+            response.headers["X-Total-Count"] = str(total)
+        return [_to_response(log) for log in page.items]
+
+    query = query.order_by(AuditLog.created_at.desc())
+
     # Get total count
     from sqlalchemy import func
 
@@ -93,21 +135,22 @@ def list_audit_logs(
     result = db.execute(query)
     logs = result.scalars().all()
 
-    return [
-        AuditLogResponse(
-            id=log.id,
-            user_id=log.user_id,
-            action=log.action,
-            resource_type=log.resource_type,
-            resource_id=log.resource_id,
-            old_value=log.old_value,
-            new_value=log.new_value,
-            ip_address=log.ip_address,
-            user_agent=log.user_agent,
-            created_at=log.created_at,
-        )
-        for log in logs
-    ]
+    return [_to_response(log) for log in logs]
+
+
+def _to_response(log: AuditLog) -> AuditLogResponse:
+    return AuditLogResponse(
+        id=log.id,
+        user_id=log.user_id,
+        action=log.action,
+        resource_type=log.resource_type,
+        resource_id=log.resource_id,
+        old_value=log.old_value,
+        new_value=log.new_value,
+        ip_address=log.ip_address,
+        user_agent=log.user_agent,
+        created_at=log.created_at,
+    )
 
 
 @router.get("/{log_id}", response_model=AuditLogResponse)
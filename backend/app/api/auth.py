@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app.core.database import get_db_sync
+from app.core.database import get_db, get_db_sync
 from app.core.security import (
     hash_password, verify_password, 
     create_access_token, create_refresh_token, 
@@ -19,10 +21,10 @@ router = APIRouter(tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db = Depends(get_db_sync)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     # Check if username exists
-    result = db.execute(select(User).where(User.username == user_data.username))
+    result = await db.execute(select(User).where(User.username == user_data.username))
     if result.scalar_one_or_none():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -31,36 +33,38 @@ async def register(user_data: UserCreate, db = Depends(get_db_sync)):
     
     # Check if email exists
     if user_data.email:
-        result = db.execute(select(User).where(User.email == user_data.email))
+        result = await db.execute(select(User).where(User.email == user_data.email))
         if result.scalar_one_or_none():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
     
-    # Create user
+    # Create user (bcrypt is CPU-bound, keep it off the event loop)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
         full_name=user_data.full_name,
-        password_hash=hash_password(user_data.password),
+        password_hash=await run_in_threadpool(hash_password, user_data.password),
         role="user"
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(login_data: LoginRequest, db = Depends(get_db_sync)):
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
     """User login"""
     # Find user
-    result = db.execute(select(User).where(User.username == login_data.username))
+    result = await db.execute(select(User).where(User.username == login_data.username))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    if not user or not await run_in_threadpool(
+        verify_password, login_data.password, user.password_hash
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -91,7 +95,7 @@ async def login(login_data: LoginRequest, db = Depends(get_db_sync)):
 
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_token(token_data: TokenRefreshRequest, db = Depends(get_db_sync)):
+async def refresh_token(token_data: TokenRefreshRequest, db: AsyncSession = Depends(get_db)):
     """Refresh access token"""
     try:
         payload = decode_token(token_data.refresh_token)
@@ -103,7 +107,7 @@ async def refresh_token(token_data: TokenRefreshRequest, db = Depends(get_db_syn
                 detail="Invalid refresh token"
             )
         
-        result = db.execute(select(User).where(User.id == user_id))
+        result = await db.execute(select(User).where(User.id == user_id))
         user = result.scalar_one_or_none()
         
         if not user or not user.is_active:
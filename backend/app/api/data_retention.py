@@ -9,6 +9,8 @@ from typing import Dict, Any, Optional, List
 from datetime import datetime
 
 from app.services.data_retention_service import retention_service
+from app.services.metrics_partition_service import metrics_partitions
+from app.services.metrics_compact_service import metrics_compact
 from app.core.config import settings
 
 router = APIRouter(prefix="/data-retention", tags=["Data Retention"])
@@ -20,6 +22,9 @@ class RetentionConfig(BaseModel):
     metrics_retention_days: int = 30
     results_retention_days: int = 90
     audit_logs_retention_days: int = 180
+    metrics_rollup_1m_retention_days: int = 7
+    metrics_rollup_1h_retention_days: int = 180
+    metrics_rollup_1d_retention_days: int = 730
     enable_auto_cleanup: bool = True
     cleanup_hour: int = 2
     metrics_collection_interval: int = 5
@@ -29,6 +34,7 @@ class CleanupRequest(BaseModel):
     """清理请求"""
 
     dry_run: bool = True
+    background: bool = False  # 后台执行, 通过 /progress 查看进度
 
 
 @router.get("/config", response_model=RetentionConfig)
@@ -38,6 +44,9 @@ def get_retention_config():
         "metrics_retention_days": settings.metrics_retention_days,
         "results_retention_days": settings.results_retention_days,
         "audit_logs_retention_days": settings.audit_logs_retention_days,
+        "metrics_rollup_1m_retention_days": settings.metrics_rollup_1m_retention_days,
+        "metrics_rollup_1h_retention_days": settings.metrics_rollup_1h_retention_days,
+        "metrics_rollup_1d_retention_days": settings.metrics_rollup_1d_retention_days,
         "enable_auto_cleanup": settings.enable_auto_cleanup,
         "cleanup_hour": settings.cleanup_hour,
         "metrics_collection_interval": settings.metrics_collection_interval,
@@ -56,9 +65,35 @@ def get_data_sizes():
     return retention_service.get_data_sizes()
 
 
+@router.get("/partitions")
+def get_metric_partitions():
+    """获取性能指标分区状态 (分区方式、周期及各分区行数)"""
+    return metrics_partitions.get_stats()
+
+
+@router.get("/compact")
+def get_compact_storage(include_sizes: bool = False):
+    """获取紧凑指标存储状态 (迁移进度, 可选各表占用空间)"""
+    result = metrics_compact.get_stats()
+    if include_sizes:
+        result["sizes"] = metrics_compact.size_report()
+    return result
+
+
+@router.get("/progress")
+def get_cleanup_progress():
+    """获取分批清理进度 (各表已删除行数、批次数及中断位置)"""
+    return retention_service.get_progress()
+
+
 @router.post("/cleanup")
 def run_cleanup(request: CleanupRequest):
     """执行数据清理任务"""
+    if request.background and not request.dry_run:
+        if not retention_service.start_cleanup():
+            raise HTTPException(status_code=409, detail="清理任务正在执行")
+        return retention_service.get_progress()
+
     result = retention_service.run_cleanup(dry_run=request.dry_run)
     return result
 
@@ -81,6 +116,12 @@ def cleanup_audit_logs(dry_run: bool = True):
     return retention_service.cleanup_audit_logs(dry_run=dry_run)
 
 
+@router.post("/cleanup/metric-rollups")
+def cleanup_metric_rollups(dry_run: bool = True):
+    """清理性能指标汇总数据 (按粒度)"""
+    return retention_service.cleanup_metric_rollups(dry_run=dry_run)
+
+
 @router.post("/cleanup/software-metrics")
 def cleanup_software_metrics(dry_run: bool = True):
     """清理软件运行指标数据"""
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import select, or_, func
+from sqlalchemy import select, and_, or_, func
 from sqlalchemy.orm import selectinload
 from typing import Optional, List, Any
 from datetime import datetime, timedelta
@@ -12,6 +12,14 @@ logger = logging.getLogger(__name__)
 
 from app.core.database import get_db_sync
 from app.models.sqlite import Device, User
+from app.services.device_presence_service import device_presence
+from app.services.latest_metric_cache import latest_metric_cache
+from app.services.keyset_pagination import (
+    approximate_counts,
+    decode_cursor,
+    keyset_page,
+    keyset_query,
+)
 from app.schemas.device import (
     DeviceCreate,
     DeviceUpdate,
@@ -37,9 +45,27 @@ def device_to_response(device: Device) -> dict:
                 result[column.name] = value
         else:
             result[column.name] = value
+
+    # Heartbeats are flushed periodically; prefer the in-memory presence
+    presence = device_presence.get(device.id)
+    if presence:
+        result["status"], result["last_seen_at"] = presence
     return result
 
 
+def status_filter(status: str):
+    """Filter on the displayed status: the DB column corrected by unflushed presence changes"""
+    changes = device_presence.status_changes()
+    leaving = [i for i, (stored, _) in changes.items() if stored == status]
+    joining = [i for i, (_, current) in changes.items() if current == status]
+    condition = Device.status == status
+    if leaving:
+        condition = and_(condition, Device.id.notin_(leaving))
+    if joining:
+        condition = or_(condition, Device.id.in_(joining))
+    return condition
+
+
 # Agent endpoints (no auth required)
 @router.post(
     "/agent/register",
@@ -74,6 +100,7 @@ def register_device(
         existing_device.status = "online"
         db.commit()
         db.refresh(existing_device)
+        device_presence.forget(device_id=existing_device.id)
         return device_to_response(existing_device)
 
     # Create new device with basic fields
@@ -110,59 +137,18 @@ def register_device(
 def device_heartbeat(
     heartbeat_data: AgentHeartbeatRequest, db: Session = Depends(get_db_sync)
 ):
-    """Device heartbeat endpoint"""
-    result = db.execute(
-        select(Device).where(Device.mac_address == heartbeat_data.mac_address)
+    """
+    Device heartbeat endpoint
+
+    Answered from the in-memory presence table; last_seen_at/status are
+    written in periodic bulk updates and hardware columns only when changed.
+    """
+    return device_presence.heartbeat(
+        db,
+        heartbeat_data.mac_address,
+        heartbeat_data.status,
+        heartbeat_data.system_info,
     )
-    device = result.scalar_one_or_none()
-
-    # If device not found, auto-register it
-    if not device:
-        logger.info(f"Device not found, auto-registering: {heartbeat_data.mac_address}")
-        device = Device(
-            device_name=heartbeat_data.mac_address[:8],
-            mac_address=heartbeat_data.mac_address,
-            ip_address="",
-            hostname="",
-            status=heartbeat_data.status,
-            last_seen_at=datetime.utcnow(),
-        )
-        db.add(device)
-        db.commit()
-        db.refresh(device)
-        return {"status": "registered", "device_id": str(device.id)}
-
-    # Update device status
-    device.status = heartbeat_data.status
-    device.last_seen_at = datetime.utcnow()
-
-    # Update hardware info if provided in system_info
-    if heartbeat_data.system_info:
-        sys_info = heartbeat_data.system_info
-        # CPU info
-        if "cpu_model" in sys_info:
-            device.cpu_model = sys_info.get("cpu_model")
-        if "cpu_cores" in sys_info:
-            device.cpu_cores = sys_info.get("cpu_cores")
-        if "cpu_threads" in sys_info:
-            device.cpu_threads = sys_info.get("cpu_threads")
-        # GPU info
-        if "gpu_model" in sys_info:
-            device.gpu_model = sys_info.get("gpu_model")
-        if "gpu_vram_mb" in sys_info:
-            device.gpu_vram_mb = sys_info.get("gpu_vram_mb")
-        # RAM info
-        if "ram_total_gb" in sys_info:
-            device.ram_total_gb = sys_info.get("ram_total_gb")
-        # Disk info
-        if "disk_model" in sys_info:
-            device.disk_model = sys_info.get("disk_model")
-        if "disk_type" in sys_info:
-            device.disk_type = sys_info.get("disk_type")
-
-    db.commit()
-
-    return {"status": "ok"}
 
 
 # User endpoints (auth required)
@@ -174,14 +160,18 @@ def list_devices(
     department: Optional[str] = None,
     position: Optional[str] = None,
     keyword: Optional[str] = None,
+    cursor: Optional[str] = Query(
+        None, description="游标分页: 空字符串取第一页, 之后传 next_cursor / prev_cursor"
+    ),
+    include_total: bool = Query(False, description="游标分页时返回近似总数"),
     db: Session = Depends(get_db_sync),
 ):
-    """Get device list"""
+    """Get device list (newest registered first when a cursor is given)"""
     query = select(Device)
 
     # Apply filters
     if status:
-        query = query.where(Device.status == status)
+        query = query.where(status_filter(status))
     if department:
         query = query.where(Device.department == department)
     if position:
@@ -196,6 +186,38 @@ def list_devices(
             )
         )
 
+    if cursor is not None:
+        try:
+            page_cursor = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        rows = db.execute(
+            keyset_query(query, Device.registered_at, Device.id, page_cursor, page_size)
+        ).scalars().all()
+        result_page = keyset_page(
+            rows, page_cursor, page_size, lambda d: (d.registered_at, d.id)
+        )
+        total = None
+        if include_total:
+            filters = (status, department, position, keyword)
+            total = approximate_counts.count(
+                db,
+                ("devices",) + filters,
+                query,
+                table_name=None if any(filters) else "devices",
+            )
+        return DeviceListResponse(
+            total=total,
+            page=None,
+            page_size=page_size,
+            items=[
+                DeviceResponse.model_validate(device_to_response(d))
+                for d in result_page.items
+            ],
+            next_cursor=result_page.next_cursor,
+            prev_cursor=result_page.prev_cursor,
+        )
+
     # Count total
     from sqlalchemy import func
 
@@ -216,6 +238,12 @@ def list_devices(
     )
 
 
+@router.get("/presence/stats")
+def get_presence_stats():
+    """Get heartbeat presence table statistics (pending updates, flush timings)"""
+    return device_presence.get_stats()
+
+
 @router.get("/{device_id}", response_model=DeviceResponse)
 def get_device(device_id: str, db: Session = Depends(get_db_sync)):
     """Get device details"""
@@ -249,6 +277,7 @@ def update_device(
 
     db.commit()
     db.refresh(device)
+    device_presence.forget(device_id=device.id)
 
     return device
 
@@ -266,6 +295,8 @@ def delete_device(device_id: str, db: Session = Depends(get_db_sync)):
 
     db.delete(device)
     db.commit()
+    latest_metric_cache.invalidate(device_id)
+    device_presence.forget(device_id=device_id)
 
 
 # ==================== Device Profile (设备画像) ====================
@@ -0,0 +1,113 @@
+"""
+运行诊断 API (仅管理员)
+事件循环延迟、阻塞记录、同步接口线程池饱和度、数据库连接池状态和单请求性能分析
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.database import get_pool_stats
+from app.core.security import require_role
+from app.services.loop_monitor_service import loop_monitor
+from app.services.request_profiler_service import request_profiler
+from app.services.sqlite_writer_service import sqlite_writer
+
+# 可以查看诊断信息的角色
+ADMIN_ROLES = ["admin", "super_admin", "it_admin"]
+
+router = APIRouter(
+    prefix="/admin/diagnostics",
+    tags=["Diagnostics"],
+    dependencies=[Depends(require_role(ADMIN_ROLES))],
+)
+
+
+@router.get("/event-loop")
+async def get_event_loop_stats(
+    include_stacks: bool = Query(True, description="返回阻塞时的调用栈"),
+):
+    """
+    事件循环监控结果
+
+    - lag_ms: 延迟采样直方图
+    - blocked_ms / blocked_by: 阻塞时长直方图及按处理函数汇总
+    - recent_blocks: 最近的阻塞记录 (路由、处理函数、调用栈、时长)
+    - threadpool: 同步接口线程池占用、排队数和饱和采样次数
+    """
+    return loop_monitor.get_stats(include_stacks=include_stacks)
+
+
+@router.post("/event-loop/reset")
+async def reset_event_loop_stats():
+    """清空事件循环监控统计"""
+    loop_monitor.reset()
+    return {"success": True}
+
+
+@router.get("/db-pools")
+async def get_db_pool_stats():
+    """
+    数据库连接池状态 (按负载: interactive / interactive_async / ingest / background)
+
+    - size / checked_out / checked_in / overflow: 当前连接占用
+    - checkouts / timeouts / peak_checked_out: 启动以来累计
+    - wait_ms: 取连接等待时间直方图
+
+    SQLite 生产模式下另有 read (只读连接池) 和 sqlite_writer (写线程批量统计)
+    """
+    stats = get_pool_stats()
+    if sqlite_writer.enabled:
+        stats["sqlite_writer"] = sqlite_writer.get_stats()
+    return stats
+
+
+@router.get("/profiles")
+async def list_request_profiles():
+    """
+    最近的单请求分析记录 (新的在前)
+
+    给请求加上 X-Profile: 1 头或 ?__profile=1 参数 (需管理员令牌) 即可分析该请求,
+    响应头 X-Profile-Id 为记录 ID
+    """
+    return {
+        "enabled": request_profiler.enabled,
+        "skipped_busy": request_profiler.skipped_busy,
+        "profiles": request_profiler.list_profiles(),
+    }
+
+
+def _get_profile(profile_id: str):
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile
+
+
+@router.get("/profiles/{profile_id}")
+async def get_request_profile(profile_id: str):
+    """
+    单请求分析结果
+
+    - breakdown: 按 SQL 执行 / ORM 对象构建 / SQL 构建 / Pydantic 校验 / JSON 序列化 /
+      应用代码 / 其他 划分的耗时
+    - waiting_ms: 没有线程在为该请求执行代码的时间 (等待 I/O、线程池排队)
+    - hot_functions: 最内层函数耗时排行
+    """
+    return _get_profile(profile_id).to_dict()
+
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+async def download_request_profile(profile_id: str):
+    """下载折叠栈 (flamegraph.pl / speedscope 可直接导入)"""
+    profile = _get_profile(profile_id)
+    return PlainTextResponse(
+        profile.folded(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile.id}.folded"'},
+    )
+
+
+@router.delete("/profiles")
+async def clear_request_profiles():
+    """清空分析记录"""
+    request_profiler.clear()
+    return {"success": True}
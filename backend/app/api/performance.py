@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from datetime import datetime, timedelta
 
-from app.core.database import get_db_sync
+from app.core.config import settings
+from app.core.database import get_db_read, get_db_sync
 from app.models.sqlite import (
     PerformanceMetric,
     SoftwareBenchmark,
@@ -15,6 +18,7 @@ from app.models.sqlite import (
 )
 from app.schemas.performance import (
     PerformanceMetricResponse,
+    PerformanceMetricCreateResponse,
     PerformanceMetricListResponse,
     MetricDataCreate,
     MetricsBatchCreate,
@@ -35,6 +39,35 @@ from app.schemas.performance import (
     AIAnalysisRequest,
     AIAnalysisResponse,
 )
+from app.services.metrics_ingest_service import (
+    INGEST_BATCH_SAMPLES,
+    INGESTED_SAMPLES,
+    metrics_bulk_writer,
+)
+from app.services.metrics_queue_service import metrics_queue
+from app.services.sqlite_writer_service import sqlite_writer
+from app.services.metrics_query_service import (
+    MAX_POINTS_LIMIT,
+    resolve_bucket_seconds,
+)
+from app.services.metrics_rollup_service import metrics_rollup_service
+from app.services.metrics_partition_service import metrics_partitions
+from app.services.metrics_compact_service import metrics_compact
+from app.services.latest_metric_cache import OVERVIEW_COLUMNS, latest_metric_cache
+from app.services.metric_detail_store import DETAIL_COLUMNS, metric_details
+from app.services.keyset_pagination import (
+    approximate_counts,
+    decode_cursor,
+    keyset_page,
+    keyset_query,
+)
+from app.services.metrics_codec import (
+    COLUMNAR_CONTENT_TYPE,
+    MetricsCodecError,
+    UnsupportedEncodingError,
+    decode_metrics_batch,
+    decompress,
+)
 
 # 导入WebSocket推送服务
 try:
@@ -58,17 +91,50 @@ router = APIRouter(prefix="/performance", tags=["Performance"])
 # ==================== Performance Metrics ====================
 
 
+def _store_metric_rows(rows: List[dict], response: Response) -> bool:
+    """
+    Persist metric rows through the write-behind queue when it is running,
+    otherwise write them synchronously inside the request. Either way the
+    rows go through the ingest pool (the SQLite writer thread in SQLite
+    production mode), not the request's interactive connection.
+
+    Returns True when the rows were queued (response status becomes 202).
+    Raises 429 with Retry-After when the queue is full. Accepted rows also
+    refresh the per-device latest-metric cache.
+    """
+    if settings.metrics_write_behind_enabled and metrics_queue.running:
+        if not metrics_queue.submit(rows):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Metrics ingestion queue is full, retry later",
+                headers={"Retry-After": str(metrics_queue.retry_after_seconds)},
+            )
+        latest_metric_cache.update(rows)
+        INGESTED_SAMPLES.inc("queued", amount=len(rows))
+        INGEST_BATCH_SAMPLES.observe(len(rows))
+        response.status_code = status.HTTP_202_ACCEPTED
+        return True
+
+    sqlite_writer.run(lambda conn: metrics_bulk_writer.write(conn, rows))
+    latest_metric_cache.update(rows)
+    INGESTED_SAMPLES.inc("direct", amount=len(rows))
+    INGEST_BATCH_SAMPLES.observe(len(rows))
+    return False
+
+
 @router.post(
     "/metrics",
-    response_model=PerformanceMetricResponse,
+    response_model=PerformanceMetricCreateResponse,
     status_code=status.HTTP_201_CREATED,
 )
-def create_metric(metric: MetricDataCreate, db: Session = Depends(get_db_sync)):
+def create_metric(metric: MetricDataCreate, response: Response):
     """
     Create a new performance metric entry for a device.
     
     Records detailed hardware performance data including CPU, GPU, memory, disk, and network statistics
-    for monitoring and analysis purposes.
+    for monitoring and analysis purposes. When the write-behind queue is enabled the sample is
+    acknowledged with 202 Accepted and persisted by the next queue flush. With compact metric
+    storage the database assigns the id on insert, so a queued (202) response has ``id: null``.
     
     Args:
         metric (MetricDataCreate): The performance metric data containing:
@@ -96,18 +162,16 @@ def create_metric(metric: MetricDataCreate, db: Session = Depends(get_db_sync)):
             - disk_io_details (list, optional): Detailed disk I/O information per partition
             - raw_data (dict, optional): Raw metric data for extensibility
             - timestamp (datetime, optional): Metric timestamp (defaults to current UTC time)
-        
-        db (Session): SQLAlchemy database session (injected via dependency)
     
     Returns:
-        PerformanceMetricResponse: The created performance metric with all fields including:
-            - id (int): Unique metric identifier
+        PerformanceMetricCreateResponse: The created performance metric with all fields including:
+            - id (str): Unique metric identifier; None for a 202 response in compact storage mode
             - device_id (str): Device identifier
             - timestamp (datetime): Metric timestamp
             - All performance metric fields as stored in the database
     
     Raises:
-        HTTPException: None (validation errors handled by FastAPI automatically)
+        HTTPException: 422 if device_id is missing; 429 with Retry-After if the ingestion queue is full
     
     Example:
         ```bash
@@ -121,86 +185,106 @@ def create_metric(metric: MetricDataCreate, db: Session = Depends(get_db_sync)):
           }'
         ```
     """
-    import json
-
-    data = metric
-
-    # 构建模型数据
-    db_metric = PerformanceMetric(
-        device_id=data.device_id,
-        timestamp=data.timestamp if data.timestamp else datetime.utcnow(),
-        cpu_percent=data.cpu_percent,
-        cpu_temperature=data.cpu_temperature,
-        cpu_power_watts=data.cpu_power_watts,
-        cpu_frequency_mhz=data.cpu_frequency_mhz,
-        gpu_percent=data.gpu_percent,
-        gpu_temperature=data.gpu_temperature,
-        gpu_power_watts=data.gpu_power_watts,
-        gpu_frequency_mhz=data.gpu_frequency_mhz,
-        gpu_memory_used_mb=data.gpu_memory_used_mb,
-        gpu_memory_total_mb=data.gpu_memory_total_mb,
-        memory_percent=data.memory_percent,
-        memory_used_mb=data.memory_used_mb,
-        memory_available_mb=data.memory_available_mb,
-        disk_read_mbps=data.disk_read_mbps,
-        disk_write_mbps=data.disk_write_mbps,
-        disk_io_percent=data.disk_io_percent,
-        network_sent_mbps=data.network_sent_mbps,
-        network_recv_mbps=data.network_recv_mbps,
-        process_count=data.process_count,
-        top_processes=json.dumps(data.top_processes) if data.top_processes else None,
-        raw_data=data.raw_data,
-        disk_io_details=json.dumps(data.disk_io_details)
-        if data.disk_io_details
-        else None,
-    )
+    # device_id 不是 MetricDataCreate 的声明字段 (经 extra="allow" 传入)
+    device_id = getattr(metric, "device_id", None)
+    if not device_id:
+        raise HTTPException(status_code=422, detail="device_id is required")
+
+    rows = metrics_bulk_writer.build_rows(device_id, [metric.model_dump()])
+    queued = _store_metric_rows(rows, response)
+
+    # 响应中的 JSON 字段直接使用请求中的原始列表
+    metric_dict = dict(rows[0])
+    if queued and metrics_compact.is_active(PerformanceMetric.__tablename__):
+        # 紧凑表的 id 在队列写入时才由数据库生成, 当前的 UUID 不会被保存
+        metric_dict["id"] = None
+    metric_dict["top_processes"] = metric.top_processes or None
+    metric_dict["disk_io_details"] = getattr(metric, "disk_io_details", None) or None
+    return metric_dict
 
-    db.add(db_metric)
-    db.commit()
-    db.refresh(db_metric)
 
-    # 手动构建响应字典，因为 top_processes 和 disk_io_details 在数据库中是 JSON 字符串
-    metric_dict = {
-        c.name: getattr(db_metric, c.name) for c in db_metric.__table__.columns
-    }
+async def read_metrics_batch(request: Request) -> Tuple[str, List[dict]]:
+    """
+    Parse a metrics batch body, negotiated by Content-Type.
 
-    # 解析 JSON 字段
-    if metric_dict.get("top_processes"):
-        try:
-            metric_dict["top_processes"] = json.loads(metric_dict["top_processes"])
-        except:
-            metric_dict["top_processes"] = None
+    - application/json: MetricsBatchCreate, validated with Pydantic
+    - application/vnd.rolefit.metrics-columnar+json: compact columnar batch,
+      decoded straight into sample dicts (see app.services.metrics_codec)
 
-    if metric_dict.get("disk_io_details"):
-        try:
-            metric_dict["disk_io_details"] = json.loads(metric_dict["disk_io_details"])
-        except:
-            metric_dict["disk_io_details"] = None
-
-    return metric_dict
+    Either may be sent with Content-Encoding gzip or zstd.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        body = decompress(await request.body(), request.headers.get("content-encoding"))
+        if content_type.lower() == COLUMNAR_CONTENT_TYPE:
+            return decode_metrics_batch(body)
+    except UnsupportedEncodingError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except MetricsCodecError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        batch = MetricsBatchCreate.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
+    return batch.device_id, [m.model_dump() for m in batch.metrics]
 
 
-@router.post("/metrics/batch", status_code=status.HTTP_201_CREATED)
-def create_metrics_batch(batch: MetricsBatchCreate, db: Session = Depends(get_db_sync)):
+@router.post(
+    "/metrics/batch",
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {
+                        k: v
+                        for k, v in MetricsBatchCreate.model_json_schema(
+                            ref_template="#/components/schemas/{model}"
+                        ).items()
+                        if k != "$defs"
+                    }
+                },
+                COLUMNAR_CONTENT_TYPE: {"schema": {"type": "object"}},
+            },
+        }
+    },
+)
+def create_metrics_batch(
+    response: Response,
+    batch: Tuple[str, List[dict]] = Depends(read_metrics_batch),
+):
     """
     Create multiple performance metrics in a single batch operation.
     
     Efficiently records multiple metric data points for a device in one request,
-    useful for bulk data imports or uploading cached metrics.
+    useful for bulk data imports or uploading cached metrics. Rows are written
+    through the dialect-specific bulk path in MetricsBulkWriter (COPY on
+    PostgreSQL, multi-row VALUES on SQLite/MySQL) instead of per-row ORM objects.
+    When the write-behind queue is enabled the batch is acknowledged with
+    202 Accepted and coalesced with other devices' samples into a timed flush.
+
+    Agents may opt in to the compact columnar encoding by sending
+    Content-Type: application/vnd.rolefit.metrics-columnar+json (optionally
+    with Content-Encoding: gzip or zstd); that body skips per-sample Pydantic
+    parsing and is decoded directly into bulk-insert rows.
     
     Args:
         batch (MetricsBatchCreate): Batch containing:
             - device_id (str): Target device identifier for all metrics
             - metrics (list[MetricDataCreate]): List of metric data points to create
-            
-        db (Session): SQLAlchemy database session (injected via dependency)
     
     Returns:
         dict: Batch creation result containing:
-            - created (int): Number of metrics successfully created
+            - created (int): Number of metrics accepted
+            - queued (bool): Whether the metrics were queued for a later flush
     
     Raises:
-        HTTPException: None (validation errors handled by FastAPI automatically)
+        HTTPException: 400 for a malformed columnar body, 415 for an unsupported
+            Content-Encoding, 429 with Retry-After if the ingestion queue is full
     
     Example:
         ```bash
@@ -215,50 +299,84 @@ def create_metrics_batch(batch: MetricsBatchCreate, db: Session = Depends(get_db
           }'
         ```
     """
-    import json
-    from datetime import datetime
-
-    created_count = 0
-    for metric_data in batch.metrics:
-        metric_dict = metric_data.model_dump()
-
-        # 设置 device_id
-        metric_dict["device_id"] = batch.device_id
-
-        # 处理时间戳（可能是字符串格式）
-        timestamp_val = metric_dict.get("timestamp")
-        if timestamp_val:
-            if isinstance(timestamp_val, str):
-                # 解析 ISO 格式字符串
-                try:
-                    metric_dict["timestamp"] = datetime.fromisoformat(
-                        timestamp_val.replace("Z", "+00:00")
-                    )
-                except:
-                    metric_dict["timestamp"] = datetime.utcnow()
-        else:
-            metric_dict["timestamp"] = datetime.utcnow()
+    device_id, samples = batch
+    rows = metrics_bulk_writer.build_rows(device_id, samples)
+    queued = _store_metric_rows(rows, response)
+    return {"created": len(rows), "queued": queued}
 
-        # 将 top_processes 列表转换为 JSON 字符串
-        top_processes = metric_dict.pop("top_processes", None)
-        if top_processes:
-            metric_dict["top_processes"] = json.dumps(top_processes)
 
-        # 将 disk_io_details 列表转换为 JSON 字符串
-        disk_io_details = metric_dict.pop("disk_io_details", None)
-        if disk_io_details:
-            metric_dict["disk_io_details"] = json.dumps(disk_io_details)
+@router.get("/metrics/queue")
+def get_metrics_queue_stats():
+    """Get write-behind ingestion queue statistics (backlog, flush timings, rejections)."""
+    return metrics_queue.get_stats()
 
-        # Filter out keys that are not in the model to prevent TypeError
-        valid_keys = {c.name for c in PerformanceMetric.__table__.columns}
-        metric_dict = {k: v for k, v in metric_dict.items() if k in valid_keys}
 
-        db_metric = PerformanceMetric(**metric_dict)
-        db.add(db_metric)
-        created_count += 1
+@router.get("/metrics/rollup")
+def get_metrics_rollup_stats():
+    """获取性能指标汇总任务状态"""
+    return metrics_rollup_service.get_stats()
 
-    db.commit()
-    return {"created": created_count}
+
+@router.get("/metrics/fleet")
+def get_fleet_overview(
+    online_within: Optional[int] = Query(
+        None, ge=1, description="只返回最近N秒内上报过的设备"
+    ),
+    fields: Optional[str] = Query(
+        None, description="逗号分隔的返回字段, 默认返回全部数值指标"
+    ),
+):
+    """
+    Retrieve the latest metric of every device in a single call.
+
+    Reads the whole in-memory latest-metric cache without touching the
+    database, so rendering the "all devices" wall costs one request instead
+    of one indexed lookup per device. Devices that have not reported since
+    the server started (and were not loaded by the startup warm-up) are not
+    included.
+
+    Args:
+        online_within (int, optional): Only include devices whose latest sample
+            arrived within this many seconds
+        fields (str, optional): Comma-separated metric fields to return,
+            defaults to all numeric metric fields
+
+    Returns:
+        dict: Fleet overview containing:
+            - count (int): Number of devices returned
+            - generated_at (datetime): Snapshot time (UTC)
+            - items (list[dict]): One entry per device with device_id,
+              timestamp, the requested fields and age_seconds (seconds since
+              the sample was received)
+
+    Raises:
+        HTTPException: 400 Bad Request if fields contains unknown names
+
+    Example:
+        ```bash
+        curl "http://localhost:8000/api/performance/metrics/fleet?online_within=60&fields=cpu_percent,gpu_percent"
+        ```
+    """
+    columns = None
+    if fields:
+        columns = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [c for c in columns if c not in OVERVIEW_COLUMNS]
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+        if "timestamp" not in columns:
+            columns.append("timestamp")
+
+    items = latest_metric_cache.snapshot(columns=columns)
+    if online_within:
+        items = [i for i in items if i["age_seconds"] <= online_within]
+
+    return {
+        "count": len(items),
+        "generated_at": datetime.utcnow(),
+        "items": items,
+    }
 
 
 @router.get("/metrics", response_model=PerformanceMetricListResponse)
@@ -268,7 +386,11 @@ def get_metrics(
     end_time: Optional[datetime] = Query(None, description="结束时间"),
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db_sync),
+    cursor: Optional[str] = Query(
+        None, description="游标分页: 空字符串取第一页, 之后传 next_cursor / prev_cursor"
+    ),
+    include_total: bool = Query(False, description="游标分页时返回近似总数"),
+    db: Session = Depends(get_db_read),
 ):
     """
     Retrieve a paginated list of performance metrics for a specific device.
@@ -276,21 +398,29 @@ def get_metrics(
     Queries historical performance data with optional time range filtering,
     sorted by timestamp in descending order (newest first).
 
+    Passing ``cursor`` switches to keyset pagination: pages are bounded by the
+    (timestamp, id) of the previous page instead of OFFSET, so deep pages cost
+    the same as the first one. ``total`` is then only filled when
+    ``include_total`` is set, from a cached approximate count.
+
     Args:
         device_id (str): Unique identifier of the device to fetch metrics for
         start_time (datetime, optional): Filter metrics recorded after this time (inclusive)
         end_time (datetime, optional): Filter metrics recorded before this time (inclusive)
         limit (int): Maximum number of metrics to return (default: 100, range: 1-1000)
-        offset (int): Number of metrics to skip for pagination (default: 0)
+        offset (int): Number of metrics to skip for pagination (default: 0, ignored with cursor)
+        cursor (str, optional): Opaque page cursor; empty string for the first page
+        include_total (bool): Return an approximate total in cursor mode
         db (Session): SQLAlchemy database session (injected via dependency)
 
     Returns:
         PerformanceMetricListResponse: Paginated response containing:
             - total (int): Total number of metrics matching the query
             - items (list[PerformanceMetric]): List of performance metrics
+            - next_cursor / prev_cursor (str): Cursors for older / newer pages (cursor mode)
 
     Raises:
-        HTTPException: None (returns empty list if no metrics found)
+        HTTPException: 400 if the cursor is malformed
 
     Example:
         ```bash
@@ -299,35 +429,62 @@ def get_metrics(
 
         # Get metrics within a time range
         curl "http://localhost:8000/api/performance/metrics?device_id=dev-001&start_time=2024-01-01T00:00:00&end_time=2024-01-02T00:00:00"
+
+        # Cursor pagination: first page, then follow next_cursor
+        curl "http://localhost:8000/api/performance/metrics?device_id=dev-001&cursor="
+        curl "http://localhost:8000/api/performance/metrics?device_id=dev-001&cursor=WyJuZXh0Iiwi..."
         ```
     """
-    query = select(PerformanceMetric).where(PerformanceMetric.device_id == device_id)
+    # Only scan the partitions that overlap the requested time range
+    metric = metrics_partitions.entity(db, start_time, end_time, device_id)
+    query = select(metric).where(metric.device_id == device_id)
 
     if start_time:
-        query = query.where(PerformanceMetric.timestamp >= start_time)
+        query = query.where(metric.timestamp >= start_time)
     if end_time:
-        query = query.where(PerformanceMetric.timestamp <= end_time)
+        query = query.where(metric.timestamp <= end_time)
+
+    if cursor is not None:
+        try:
+            page_cursor = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        rows = db.execute(
+            keyset_query(query, metric.timestamp, metric.id, page_cursor, limit)
+        ).scalars().all()
+        page = keyset_page(rows, page_cursor, limit, lambda m: (m.timestamp, m.id))
+        total = None
+        if include_total:
+            total = approximate_counts.count(
+                db, ("performance_metrics", device_id, start_time, end_time), query
+            )
+        return {
+            "total": total,
+            "items": page.items,
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor,
+        }
 
     # Get total count
     count_query = select(func.count()).select_from(query.subquery())
     total = db.execute(count_query).scalar()
 
     # Get paginated results
-    query = (
-        query.order_by(PerformanceMetric.timestamp.desc()).offset(offset).limit(limit)
-    )
+    query = query.order_by(metric.timestamp.desc()).offset(offset).limit(limit)
     results = db.execute(query).scalars().all()
 
     return {"total": total, "items": results}
 
 
 @router.get("/metrics/latest", response_model=PerformanceMetricResponse)
-def get_latest_metric(device_id: str, db: Session = Depends(get_db_sync)):
+def get_latest_metric(device_id: str, db: Session = Depends(get_db_read)):
     """
     Retrieve the most recent performance metric for a specific device.
 
     Returns the latest recorded metric based on timestamp, useful for
     displaying current device status in dashboards or实时 views.
+    Served from the in-memory latest-metric cache; the database is only
+    queried on a cache miss.
 
     Args:
         device_id (str): Unique identifier of the device to fetch the latest metric for
@@ -351,66 +508,10 @@ def get_latest_metric(device_id: str, db: Session = Depends(get_db_sync)):
         curl "http://localhost:8000/api/performance/metrics/latest?device_id=dev-001"
         ```
     """
-    import json
-
-    result = db.execute(
-        select(PerformanceMetric)
-        .where(PerformanceMetric.device_id == device_id)
-        .order_by(PerformanceMetric.timestamp.desc())
-        .limit(1)
-    )
-    metric = result.scalar_one_or_none()
+    metric = latest_metric_cache.get(db, device_id)
     if not metric:
         raise HTTPException(status_code=404, detail="No metrics found for this device")
-
-    # 转换为字典并解析 top_processes JSON 字符串
-    metric_dict = {
-        "id": metric.id,
-        "device_id": metric.device_id,
-        "timestamp": metric.timestamp,
-        "cpu_percent": metric.cpu_percent,
-        "cpu_temperature": metric.cpu_temperature,
-        "cpu_power_watts": metric.cpu_power_watts,
-        "cpu_frequency_mhz": metric.cpu_frequency_mhz,
-        "gpu_percent": metric.gpu_percent,
-        "gpu_temperature": metric.gpu_temperature,
-        "gpu_power_watts": metric.gpu_power_watts,
-        "gpu_frequency_mhz": metric.gpu_frequency_mhz,
-        "gpu_memory_used_mb": metric.gpu_memory_used_mb,
-        "gpu_memory_total_mb": metric.gpu_memory_total_mb,
-        "memory_percent": metric.memory_percent,
-        "memory_used_mb": metric.memory_used_mb,
-        "memory_available_mb": metric.memory_available_mb,
-        "disk_read_mbps": metric.disk_read_mbps,
-        "disk_write_mbps": metric.disk_write_mbps,
-        "disk_io_percent": metric.disk_io_percent,
-        "network_sent_mbps": metric.network_sent_mbps,
-        "network_recv_mbps": metric.network_recv_mbps,
-        "process_count": metric.process_count,
-        "top_processes": metric.top_processes,
-        "raw_data": metric.raw_data,
-        "created_at": metric.created_at,
-    }
-
-    # 解析 top_processes JSON 字符串
-    if metric_dict["top_processes"]:
-        if isinstance(metric_dict["top_processes"], str):
-            try:
-                metric_dict["top_processes"] = json.loads(metric_dict["top_processes"])
-            except:
-                metric_dict["top_processes"] = None
-
-    # 解析 disk_io_details JSON 字符串
-    if metric_dict.get("disk_io_details"):
-        if isinstance(metric_dict["disk_io_details"], str):
-            try:
-                metric_dict["disk_io_details"] = json.loads(
-                    metric_dict["disk_io_details"]
-                )
-            except:
-                metric_dict["disk_io_details"] = None
-
-    return metric_dict
+    return metric
 
 
 @router.get("/metrics/realtime/{device_id}")
@@ -419,7 +520,16 @@ def get_realtime_metrics(
     seconds: int = Query(60, ge=10, le=3600),
     start_time: Optional[datetime] = Query(None, description="开始时间 (ISO格式)"),
     end_time: Optional[datetime] = Query(None, description="结束时间 (ISO格式)"),
-    db: Session = Depends(get_db_sync),
+    bucket: Optional[int] = Query(
+        None, ge=1, description="降采样时间桶宽度 (秒)"
+    ),
+    max_points: Optional[int] = Query(
+        None, ge=10, le=MAX_POINTS_LIMIT, description="降采样最大返回点数"
+    ),
+    details: Optional[str] = Query(
+        None, description="逗号分隔的明细字段 (top_processes,disk_io_details,raw_data)"
+    ),
+    db: Session = Depends(get_db_read),
 ):
     """
     Retrieve realtime or historical performance metrics for a device with calculated averages.
@@ -427,55 +537,116 @@ def get_realtime_metrics(
     Returns metrics within a specified time window, either as recent N seconds or
     a custom time range. Includes calculated average values for key metrics.
 
+    When ``bucket`` or ``max_points`` is given, the rows are downsampled in SQL
+    instead: each returned point covers one time bucket and carries the bucket
+    average under the metric name plus ``<metric>_min`` / ``<metric>_max``, so
+    the response size depends on the number of buckets, not the time range.
+    Ranges of at least ``metrics_rollup_route_min_hours`` are served from the
+    1m/1h/1d rollups (bucket widths are rounded up to the rollup resolution),
+    which only cover the rolled-up metrics.
+
+    Raw samples carry only the numeric columns. Per-sample detail (process
+    list, per-disk I/O, raw payload) lives in the compressed sidecar store and
+    is attached only for the fields named in ``details``; use
+    ``GET /performance/metrics/{metric_id}/details`` to drill into one sample.
+
     Args:
         device_id (str): Unique identifier of the device
         seconds (int): Time window in seconds for recent metrics (default: 60, range: 10-3600)
             Ignored if start_time and end_time are both provided
         start_time (datetime, optional): Start of custom time range (ISO format)
         end_time (datetime, optional): End of custom time range (ISO format)
+        bucket (int, optional): Downsampling bucket width in seconds. Widened if it
+            would produce more than 5000 points.
+        max_points (int, optional): Maximum number of downsampled points (10-5000).
+            The bucket width is derived from the time range.
+        details (str, optional): Comma-separated detail fields to attach to each
+            raw sample (ignored in downsampling mode)
         db (Session): SQLAlchemy database session (injected via dependency)
 
     Returns:
         dict: Realtime metrics data containing:
             - device_id (str): Device identifier
-            - metrics (list[PerformanceMetric]): List of metrics in time order
+            - metrics (list): Raw metrics in time order, or one point per bucket
+              (timestamp = bucket start, count, avg/min/max per numeric metric)
+              in downsampling mode
             - averages (dict): Calculated average values:
                 - cpu_percent (float): Average CPU utilization
                 - gpu_percent (float): Average GPU utilization
                 - memory_percent (float): Average memory utilization
+            - bucket_seconds (int): Bucket width (downsampling mode only)
+            - source (str): "raw", "1m", "1h" or "1d" (downsampling mode only)
 
     Raises:
-        HTTPException: None (returns empty metrics list if no data found)
+        HTTPException: 400 Bad Request if details contains unknown fields
 
     Example:
         ```bash
         # Get last 5 minutes of metrics
         curl "http://localhost:8000/api/performance/metrics/realtime/dev-001?seconds=300"
 
+        # Include per-disk I/O detail for the disk chart
+        curl "http://localhost:8000/api/performance/metrics/realtime/dev-001?seconds=300&details=disk_io_details"
+
         # Get metrics for specific time range
         curl "http://localhost:8000/api/performance/metrics/realtime/dev-001?start_time=2024-01-15T10:00:00&end_time=2024-01-15T11:00:00"
+
+        # Chart a full day as at most 500 min/avg/max points
+        curl "http://localhost:8000/api/performance/metrics/realtime/dev-001?start_time=2024-01-15T00:00:00&end_time=2024-01-16T00:00:00&max_points=500"
         ```
     """
-    import json
+    detail_fields = []
+    if details:
+        detail_fields = [f.strip() for f in details.split(",") if f.strip()]
+        unknown = [f for f in detail_fields if f not in DETAIL_COLUMNS]
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown detail fields: {', '.join(unknown)}"
+            )
+
+    if bucket or max_points:
+        if start_time and end_time:
+            start, end = start_time, end_time
+        else:
+            end = datetime.utcnow()
+            start = end - timedelta(seconds=seconds)
+        bucket_seconds = resolve_bucket_seconds(start, end, bucket, max_points)
+        # 长时间范围改查 1m/1h/1d 汇总
+        resolution, bucket_seconds = metrics_rollup_service.plan(
+            start, end, bucket_seconds
+        )
+        return {
+            "device_id": device_id,
+            "metrics": metrics_rollup_service.get_bucketed_metrics(
+                db, device_id, start, end, bucket_seconds, resolution
+            ),
+            "averages": metrics_rollup_service.get_window_averages(
+                db, device_id, start, end, resolution
+            ),
+            "bucket_seconds": bucket_seconds,
+            "source": resolution or "raw",
+        }
 
     # 如果提供了日期范围参数，优先使用日期范围
     if start_time and end_time:
         # 日期范围查询
+        metric = metrics_partitions.entity(db, start_time, end_time, device_id)
         result = db.execute(
-            select(PerformanceMetric)
-            .where(PerformanceMetric.device_id == device_id)
-            .where(PerformanceMetric.timestamp >= start_time)
-            .where(PerformanceMetric.timestamp <= end_time)
-            .order_by(PerformanceMetric.timestamp.asc())
+            select(metric)
+            .where(metric.device_id == device_id)
+            .where(metric.timestamp >= start_time)
+            .where(metric.timestamp <= end_time)
+            .order_by(metric.timestamp.asc())
         )
     else:
         # 使用默认的最近N秒
         since = datetime.utcnow() - timedelta(seconds=seconds)
+        metric = metrics_partitions.entity(db, since, None, device_id)
         result = db.execute(
-            select(PerformanceMetric)
-            .where(PerformanceMetric.device_id == device_id)
-            .where(PerformanceMetric.timestamp >= since)
-            .order_by(PerformanceMetric.timestamp.asc())
+            select(metric)
+            .where(metric.device_id == device_id)
+            .where(metric.timestamp >= since)
+            .order_by(metric.timestamp.asc())
         )
     metrics = result.scalars().all()
 
@@ -487,28 +658,18 @@ def get_realtime_metrics(
     avg_gpu = sum(m.gpu_percent or 0 for m in metrics) / len(metrics)
     avg_memory = sum(m.memory_percent or 0 for m in metrics) / len(metrics)
 
-    # Convert to dicts and parse JSON fields
-    metrics_data = []
-    for m in metrics:
-        m_dict = {c.name: getattr(m, c.name) for c in m.__table__.columns}
-
-        # Parse disk_io_details
-        if m_dict.get("disk_io_details"):
-            if isinstance(m_dict["disk_io_details"], str):
-                try:
-                    m_dict["disk_io_details"] = json.loads(m_dict["disk_io_details"])
-                except:
-                    m_dict["disk_io_details"] = None
-
-        # Parse top_processes
-        if m_dict.get("top_processes"):
-            if isinstance(m_dict["top_processes"], str):
-                try:
-                    m_dict["top_processes"] = json.loads(m_dict["top_processes"])
-                except:
-                    m_dict["top_processes"] = None
-
-        metrics_data.append(m_dict)
+    columns = [c.name for c in PerformanceMetric.__table__.columns]
+    metrics_data = [{name: getattr(m, name) for name in columns} for m in metrics]
+
+    # Attach only the requested detail fields, in one batched sidecar lookup
+    if detail_fields:
+        found = metric_details.fetch(
+            db, [m["id"] for m in metrics_data], detail_fields
+        )
+        for m_dict in metrics_data:
+            detail = found.get(m_dict["id"], {})
+            for name in detail_fields:
+                m_dict[name] = detail.get(name)
 
     return {
         "device_id": device_id,
@@ -521,6 +682,40 @@ def get_realtime_metrics(
     }
 
 
+@router.get("/metrics/{metric_id}/details")
+def get_metric_details(metric_id: str, db: Session = Depends(get_db_read)):
+    """
+    Retrieve the detail payload of a single metric sample.
+
+    The process list, per-disk I/O breakdown and raw payload are kept out of
+    the numeric performance_metrics rows and stored compressed per sample;
+    this endpoint decompresses them for one sample when a user drills in.
+
+    Args:
+        metric_id (str): Identifier of the metric sample
+        db (Session): SQLAlchemy database session (injected via dependency)
+
+    Returns:
+        dict: Sample detail containing:
+            - metric_id (str): Metric identifier
+            - top_processes (list): Top resource-consuming processes, or None
+            - disk_io_details (list): Per-disk I/O information, or None
+            - raw_data (str): Raw payload, or None
+
+    Raises:
+        HTTPException: 404 Not Found if the sample has no detail
+
+    Example:
+        ```bash
+        curl "http://localhost:8000/api/performance/metrics/8d0c.../details"
+        ```
+    """
+    detail = metric_details.fetch(db, [metric_id]).get(metric_id)
+    if detail is None:
+        raise HTTPException(status_code=404, detail="No detail found for this metric")
+    return {"metric_id": metric_id, **detail}
+
+
 # ==================== Software Benchmarks ====================
 
 
@@ -1275,13 +1470,7 @@ def get_device_status(device_id: str, db: Session = Depends(get_db_sync)):
         ```
     """
     # Get latest metric
-    metric_result = db.execute(
-        select(PerformanceMetric)
-        .where(PerformanceMetric.device_id == device_id)
-        .order_by(PerformanceMetric.timestamp.desc())
-        .limit(1)
-    )
-    latest_metric = metric_result.scalar_one_or_none()
+    latest_metric = latest_metric_cache.get(db, device_id)
 
     # Get pending alerts
     alerts_result = db.execute(
@@ -15,6 +15,12 @@ from app.models.sqlite import (
     SoftwareMetrics,
     PerformanceMetric,
 )
+from app.services.keyset_pagination import (
+    approximate_counts,
+    decode_cursor,
+    keyset_page,
+    keyset_query,
+)
 from app.schemas.result import (
     TestResultCreate,
     TestResultUpdate,
@@ -66,6 +72,10 @@ async def list_results(
     is_standard_met: Optional[bool] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    cursor: Optional[str] = Query(
+        None, description="游标分页: 空字符串取第一页, 之后传 next_cursor / prev_cursor"
+    ),
+    include_total: bool = Query(False, description="游标分页时返回近似总数"),
     db: AsyncSession = Depends(get_db),
 ):
     """Get test result list"""
@@ -84,6 +94,37 @@ async def list_results(
     if end_date:
         query = query.where(TestResult.start_time <= end_date)
 
+    if cursor is not None:
+        try:
+            page_cursor = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        result = await db.execute(
+            keyset_query(query, TestResult.start_time, TestResult.id, page_cursor, page_size)
+        )
+        result_page = keyset_page(
+            result.scalars().all(), page_cursor, page_size, lambda r: (r.start_time, r.id)
+        )
+        total = None
+        if include_total:
+            filters = (test_status, device_id, task_id, is_standard_met, start_date, end_date)
+            total = await db.run_sync(
+                lambda session: approximate_counts.count(
+                    session,
+                    ("test_results",) + filters,
+                    query,
+                    table_name=None if any(f is not None for f in filters) else "test_results",
+                )
+            )
+        return TestResultListResponse(
+            total=total,
+            page=None,
+            page_size=page_size,
+            items=[_with_device_name(r) for r in result_page.items],
+            next_cursor=result_page.next_cursor,
+            prev_cursor=result_page.prev_cursor,
+        )
+
     # Count total - simplified query
     count_result = await db.execute(select(func.count(TestResult.id)))
     total = count_result.scalar() or 0
@@ -98,23 +139,22 @@ async def list_results(
     result = await db.execute(query)
     results = result.scalars().all()
 
-    # Build response with device_name
-    items = []
-    for r in results:
-        item = TestResultResponse.model_validate(r)
-        # Add device_name from relationship
-        item_dict = item.model_dump()
-        item_dict["device_name"] = r.device.device_name if r.device else None
-        items.append(TestResultResponse(**item_dict))
-
     return TestResultListResponse(
         total=total,
         page=page,
         page_size=page_size,
-        items=items,
+        items=[_with_device_name(r) for r in results],
     )
 
 
+def _with_device_name(r: TestResult) -> TestResultResponse:
+    """Build response with device_name from the preloaded relationship"""
+    item = TestResultResponse.model_validate(r)
+    item_dict = item.model_dump()
+    item_dict["device_name"] = r.device.device_name if r.device else None
+    return TestResultResponse(**item_dict)
+
+
 # ==================== 设备对比 (必须在 /{result_id} 前面) ====================
 
 
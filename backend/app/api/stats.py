@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, case
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 
-from app.core.database import get_db_sync
+from app.core.database import get_db_read
 from app.models.sqlite import Device, TestResult, TestTask, PositionStandard
+from app.services.dashboard_stats_service import dashboard_stats_service
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/stats", tags=["Statistics"])
@@ -25,6 +26,8 @@ class DashboardSummary(BaseModel):
     passed_tests: int
     failed_tests: int
     average_score: float
+    computed_at: Optional[datetime] = None
+    cache_age_seconds: float = 0.0
 
 
 class DeviceStatusDistribution(BaseModel):
@@ -32,6 +35,8 @@ class DeviceStatusDistribution(BaseModel):
     offline: int
     testing: int
     error: int
+    computed_at: Optional[datetime] = None
+    cache_age_seconds: float = 0.0
 
 
 class DepartmentDeviceCount(BaseModel):
@@ -55,156 +60,84 @@ class PositionCompliance(BaseModel):
 
 
 @router.get("/dashboard", response_model=DashboardSummary)
-def get_dashboard_summary(db: Session = Depends(get_db_sync)):
-    """Get dashboard summary statistics"""
-
-    # Device counts
-    device_result = db.execute(select(func.count(Device.id)))
-    total_devices = device_result.scalar() or 0
-
-    online_result = db.execute(
-        select(func.count(Device.id)).where(Device.status == "online")
-    )
-    online_devices = online_result.scalar() or 0
-
-    offline_result = db.execute(
-        select(func.count(Device.id)).where(Device.status == "offline")
-    )
-    offline_devices = offline_result.scalar() or 0
-
-    testing_result = db.execute(
-        select(func.count(Device.id)).where(Device.status == "testing")
-    )
-    testing_devices = testing_result.scalar() or 0
-
-    # Task counts
-    task_result = db.execute(select(func.count(TestTask.id)))
-    total_tasks = task_result.scalar() or 0
-
-    pending_result = db.execute(
-        select(func.count(TestTask.id)).where(TestTask.task_status == "pending")
-    )
-    pending_tasks = pending_result.scalar() or 0
-
-    running_result = db.execute(
-        select(func.count(TestTask.id)).where(TestTask.task_status == "running")
-    )
-    running_tasks = running_result.scalar() or 0
-
-    completed_result = db.execute(
-        select(func.count(TestTask.id)).where(TestTask.task_status == "completed")
-    )
-    completed_tasks = completed_result.scalar() or 0
-
-    # Test counts
-    test_result = db.execute(select(func.count(TestResult.id)))
-    total_tests = test_result.scalar() or 0
-
-    passed_result = db.execute(
-        select(func.count(TestResult.id)).where(TestResult.test_status == "passed")
-    )
-    passed_tests = passed_result.scalar() or 0
-
-    failed_result = db.execute(
-        select(func.count(TestResult.id)).where(TestResult.test_status == "failed")
-    )
-    failed_tests = failed_result.scalar() or 0
-
-    # Average score
-    score_result = db.execute(select(func.avg(TestResult.overall_score)))
-    average_score = float(score_result.scalar() or 0)
+def get_dashboard_summary(db: Session = Depends(get_db_read)):
+    """Get dashboard summary statistics (cached, see dashboard_stats_service)"""
+    stats, age = dashboard_stats_service.get(db)
+    devices, tasks, results = stats["devices"], stats["tasks"], stats["results"]
 
     return DashboardSummary(
-        total_devices=total_devices,
-        online_devices=online_devices,
-        offline_devices=offline_devices,
-        testing_devices=testing_devices,
-        total_tasks=total_tasks,
-        pending_tasks=pending_tasks,
-        running_tasks=running_tasks,
-        completed_tasks=completed_tasks,
-        total_tests=total_tests,
-        passed_tests=passed_tests,
-        failed_tests=failed_tests,
-        average_score=average_score,
+        total_devices=devices["total"],
+        online_devices=devices["online"],
+        offline_devices=devices["offline"],
+        testing_devices=devices["testing"],
+        total_tasks=tasks["total"],
+        pending_tasks=tasks["pending"],
+        running_tasks=tasks["running"],
+        completed_tasks=tasks["completed"],
+        total_tests=results["total"],
+        passed_tests=results["passed"],
+        failed_tests=results["failed"],
+        average_score=results["average_score"],
+        computed_at=dashboard_stats_service.computed_at,
+        cache_age_seconds=age,
     )
 
 
 @router.get("/devices/status-distribution", response_model=DeviceStatusDistribution)
-def get_device_status_distribution(db: Session = Depends(get_db_sync)):
-    """Get device status distribution"""
-
-    # Online count
-    result = db.execute(
-        select(func.count(Device.id)).where(Device.status == "online")
-    )
-    online = result.scalar() or 0
-
-    # Offline count
-    result = db.execute(
-        select(func.count(Device.id)).where(Device.status == "offline")
-    )
-    offline = result.scalar() or 0
-
-    # Testing count
-    result = db.execute(
-        select(func.count(Device.id)).where(Device.status == "testing")
-    )
-    testing = result.scalar() or 0
-
-    # Error count
-    result = db.execute(
-        select(func.count(Device.id)).where(Device.status == "error")
-    )
-    error = result.scalar() or 0
+def get_device_status_distribution(db: Session = Depends(get_db_read)):
+    """Get device status distribution (shares the dashboard statistics cache)"""
+    stats, age = dashboard_stats_service.get(db)
+    devices = stats["devices"]
 
     return DeviceStatusDistribution(
-        online=online, offline=offline, testing=testing, error=error
+        online=devices["online"],
+        offline=devices["offline"],
+        testing=devices["testing"],
+        error=devices["error"],
+        computed_at=dashboard_stats_service.computed_at,
+        cache_age_seconds=age,
     )
 
 
 @router.get("/devices/by-department", response_model=List[DepartmentDeviceCount])
-def get_devices_by_department(db: Session = Depends(get_db_sync)):
-    """Get device counts by department"""
+def get_devices_by_department(db: Session = Depends(get_db_read)):
+    """Get device counts by department (single grouped query)"""
+
+    # 每台设备的测试结果分数汇总, 再按部门合并 (平均分按结果加权)
+    scores = (
+        select(
+            TestResult.device_id.label("device_id"),
+            func.sum(TestResult.overall_score).label("score_sum"),
+            func.count(TestResult.overall_score).label("score_count"),
+        )
+        .group_by(TestResult.device_id)
+        .subquery()
+    )
 
-    # Get unique departments
     result = db.execute(
-        select(Device.department).where(Device.department.isnot(None)).distinct()
+        select(
+            Device.department,
+            func.count(Device.id),
+            func.sum(case((Device.status == "online", 1), else_=0)),
+            func.sum(scores.c.score_sum),
+            func.sum(scores.c.score_count),
+        )
+        .outerjoin(scores, scores.c.device_id == Device.id)
+        .where(Device.department.isnot(None))
+        .where(Device.department != "")
+        .group_by(Device.department)
+        .order_by(Device.department)
     )
-    departments = [r[0] for r in result.all() if r[0]]
 
     dept_counts = []
-    for dept in departments:
-        # Total count
-        count_result = db.execute(
-            select(func.count(Device.id)).where(Device.department == dept)
-        )
-        count = count_result.scalar() or 0
-
-        # Online count
-        online_result = db.execute(
-            select(func.count(Device.id)).where(
-                and_(Device.department == dept, Device.status == "online")
-            )
-        )
-        online_count = online_result.scalar() or 0
-
-        # Average score from latest results - fixed join
-        score_result = db.execute(
-            select(func.avg(TestResult.overall_score))
-            .select_from(TestResult)
-            .join(Device, TestResult.device_id == Device.id)
-            .where(Device.department == dept)
-        )
-        score_row = score_result.scalar()
-        avg_score = float(score_row) if score_row else None
-
+    for dept, count, online_count, score_sum, score_count in result.all():
+        avg_score = float(score_sum) / score_count if score_count else None
         dept_counts.append(
             DepartmentDeviceCount(
                 department=dept,
                 count=count,
-                online_count=online_count,
-                average_score=avg_score,
+                online_count=online_count or 0,
+                average_score=avg_score or None,
             )
         )
 
@@ -213,7 +146,7 @@ def get_devices_by_department(db: Session = Depends(get_db_sync)):
 
 @router.get("/scores/trend", response_model=List[ScoreTrend])
 def get_score_trend(
-    days: int = Query(30, ge=7, le=90), db: Session = Depends(get_db_sync)
+    days: int = Query(30, ge=7, le=90), db: Session = Depends(get_db_read)
 ):
     """Get score trend over time"""
 
@@ -254,34 +187,32 @@ def get_score_trend(
 
 
 @router.get("/positions/compliance", response_model=List[PositionCompliance])
-def get_position_compliance(db: Session = Depends(get_db_sync)):
-    """Get compliance rate by position"""
+def get_position_compliance(db: Session = Depends(get_db_read)):
+    """Get compliance rate by position (single grouped query)"""
 
-    # Get unique positions
-    result = db.execute(
-        select(Device.position).where(Device.position.isnot(None)).distinct()
+    # 至少有一条达标测试结果的设备
+    compliant_devices = (
+        select(TestResult.device_id.label("device_id"))
+        .where(TestResult.is_standard_met == True)
+        .distinct()
+        .subquery()
     )
-    positions = [r[0] for r in result.all() if r[0]]
-
-    compliance_list = []
-    for pos in positions:
-        # Total devices with this position
-        total_result = db.execute(
-            select(func.count(Device.id)).where(Device.position == pos)
-        )
-        total = total_result.scalar() or 0
-
-        if total == 0:
-            continue
 
-        # Count distinct devices that passed standards (at least one passing test result)
-        compliant_result = db.execute(
-            select(func.count(func.distinct(TestResult.device_id)))
-            .join(Device, TestResult.device_id == Device.id)
-            .where(and_(Device.position == pos, TestResult.is_standard_met == True))
+    result = db.execute(
+        select(
+            Device.position,
+            func.count(Device.id),
+            func.count(compliant_devices.c.device_id),
         )
-        compliant = compliant_result.scalar() or 0
+        .outerjoin(compliant_devices, compliant_devices.c.device_id == Device.id)
+        .where(Device.position.isnot(None))
+        .where(Device.position != "")
+        .group_by(Device.position)
+        .order_by(Device.position)
+    )
 
+    compliance_list = []
+    for pos, total, compliant in result.all():
         compliance_list.append(
             PositionCompliance(
                 position=pos,
@@ -296,7 +227,7 @@ def get_position_compliance(db: Session = Depends(get_db_sync)):
 
 @router.get("/leaderboard/devices", response_model=List[Dict[str, Any]])
 def get_device_leaderboard(
-    limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db_sync)
+    limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db_read)
 ):
     """Get top performing devices"""
 
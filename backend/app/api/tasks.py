@@ -18,6 +18,7 @@ from app.schemas.task import (
     TaskExecuteRequest,
     TaskCancelRequest,
 )
+from app.services.task_assignment_service import task_assignments
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
@@ -121,24 +122,9 @@ def get_pending_tasks_sync(
     db: Session = Depends(get_db_sync),
 ):
     """Get pending tasks for a device (polled by agent)"""
-    from sqlalchemy import select
-
-    result = db.execute(
-        select(TestTask)
-        .where(TestTask.task_status == "pending")
-        .order_by(TestTask.created_at.asc())
-        .limit(10)
-    )
-    tasks = result.scalars().all()
-
-    # Filter tasks that target this device
-    pending_tasks = []
-    for task in tasks:
-        task_data = task_to_response(task)
-        # Check if this device is in the target list
-        target_devices = task_data.get("target_device_ids", [])
-        if not target_devices or device_id in target_devices:
-            pending_tasks.append(task_data)
+    # Index lookup on task_assignments (device_id, status)
+    result = db.execute(task_assignments.pending_tasks_query(device_id, limit=10))
+    pending_tasks = [task_to_response(task) for task in result.scalars().all()]
 
     return {"items": pending_tasks, "total": len(pending_tasks)}
 
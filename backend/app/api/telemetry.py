@@ -0,0 +1,41 @@
+"""
+Prometheus 指标导出
+GET /metrics 返回 text exposition format, 供 Prometheus 抓取
+"""
+
+import secrets
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.telemetry import metrics_registry
+
+# 注册各模块的指标 (导入时注册)
+import app.services.loop_monitor_service  # noqa: F401
+import app.services.metrics_queue_service  # noqa: F401
+import app.services.device_presence_service  # noqa: F401
+import app.services.sqlite_writer_service  # noqa: F401
+import app.services.websocket_service  # noqa: F401
+import app.services.scheduler_service  # noqa: F401
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics(request: Request):
+    """导出全部指标 (设置了 prometheus_metrics_token 时需携带 Bearer 令牌)"""
+    if not settings.prometheus_metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    token = settings.prometheus_metrics_token
+    if token:
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not secrets.compare_digest(credentials, token):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid metrics token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    return PlainTextResponse(metrics_registry.render(), media_type=CONTENT_TYPE)
@@ -6,6 +6,9 @@ from typing import Dict, List
 import json
 import logging
 
+from app.core.telemetry import metrics_registry
+from app.services.websocket_service import send_json_timed
+
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
@@ -45,7 +48,7 @@ class ConnectionManager:
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """发送消息给特定客户端"""
         try:
-            await websocket.send_json(message)
+            await send_json_timed(websocket, message)
         except Exception as e:
             logger.error(f"Error sending message: {e}")
     
@@ -53,7 +56,7 @@ class ConnectionManager:
         """广播消息给所有客户端"""
         for connection in self.active_connections:
             try:
-                await connection.send_json(message)
+                await send_json_timed(connection, message)
             except Exception as e:
                 logger.error(f"Error broadcasting: {e}")
     
@@ -75,7 +78,7 @@ class ConnectionManager:
         if task_id in self.task_subscriptions:
             for connection in self.task_subscriptions[task_id]:
                 try:
-                    await connection.send_json(message)
+                    await send_json_timed(connection, message)
                 except Exception as e:
                     logger.error(f"Error sending to task subscriber: {e}")
 
@@ -83,6 +86,15 @@ class ConnectionManager:
 # 全局连接管理器
 manager = ConnectionManager()
 
+metrics_registry.gauge(
+    "websocket_connections", "Open task-progress WebSocket connections",
+    fn=lambda: len(manager.active_connections),
+)
+metrics_registry.gauge(
+    "websocket_task_subscriptions", "Task-progress subscriptions across all connections",
+    fn=lambda: sum(len(c) for c in list(manager.task_subscriptions.values())),
+)
+
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -15,6 +15,10 @@ class Settings(BaseSettings):
     app_name: str = "HardwareBenchmark"
     debug: bool = True
 
+    # 同步接口 (def 路由) 和 run_in_threadpool 共用的线程池大小
+    # 每个线程最多占用一个数据库连接, 不宜超过连接池 pool_size + max_overflow
+    sync_threadpool_workers: int = 40
+
     # ================================================
     # Database Configuration
     # ================================================
@@ -56,6 +60,52 @@ class Settings(BaseSettings):
     def postgresql_url_sync(self) -> str:
         return f"postgresql://{self.postgresql_user}:{self.postgresql_password}@{self.postgresql_host}:{self.postgresql_port}/{self.postgresql_database}"
 
+    # ================================================
+    # 数据库连接池 (按负载划分)
+    # ================================================
+    # interactive: API 请求 (同步、异步引擎各一个池, 使用相同参数)
+    # 同步池 pool_size + max_overflow 不宜小于 sync_threadpool_workers
+    db_pool_interactive_size: int = 10
+    db_pool_interactive_max_overflow: int = 30
+
+    # ingest: 指标写入队列、心跳状态刷写 (单个后台线程, 少量连接即可)
+    # 关闭 write-behind 时请求内的指标写入也使用该池, 需相应调大
+    db_pool_ingest_size: int = 3
+    db_pool_ingest_max_overflow: int = 2
+
+    # background: 数据清理、汇总、分区维护、定时任务
+    db_pool_background_size: int = 2
+    db_pool_background_max_overflow: int = 3
+
+    # 取连接最长等待秒数, 超时抛出异常并计入 timeouts
+    db_pool_timeout_seconds: int = 30
+
+    # 连接最长复用秒数 (避免被 MySQL wait_timeout 等服务端超时断开)
+    db_pool_recycle_seconds: int = 1800
+
+    # ================================================
+    # SQLite 生产模式 (database_type = sqlite 时生效)
+    # ================================================
+    # 启用后: 所有连接开启 WAL 及下列 PRAGMA; Agent 高频写入 (指标、心跳状态)
+    # 交给单一写线程合并成批量事务; 只读接口使用 query_only 连接池
+    sqlite_production_mode: bool = False
+
+    # 写锁等待毫秒数 (超时报 database is locked)
+    sqlite_busy_timeout_ms: int = 30000
+
+    # 每个连接的页缓存大小 (MB) 和内存映射大小 (MB)
+    sqlite_cache_size_mb: int = 64
+    sqlite_mmap_size_mb: int = 256
+
+    # 只读连接池大小
+    sqlite_read_pool_size: int = 8
+
+    # 写线程单个事务合并的最大写入任务数
+    sqlite_writer_batch_max: int = 200
+
+    # 写线程队列上限 (满时提交方阻塞等待)
+    sqlite_writer_queue_max: int = 10000
+
     # JWT
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
@@ -116,5 +166,157 @@ class Settings(BaseSettings):
     # 审计日志保留天数 (默认180天)
     audit_logs_retention_days: int = 180
 
+    # 清理时每批删除的行数 (控制单个事务和锁的持续时间)
+    retention_batch_size: int = 5000
+
+    # 两批之间的休眠时间 (毫秒), 给写入和查询让出数据库
+    retention_batch_sleep_ms: int = 200
+
+    # ================================================
+    # 性能指标分区 (SQLite / MySQL)
+    # ================================================
+    # 是否按时间分区存储 performance_metrics (启动时转换, 不可自动回退)
+    # MySQL 使用原生 RANGE 分区; SQLite 按周期分表并以 UNION ALL 视图合并
+    metrics_partitioning_enabled: bool = False
+
+    # 分区周期: day / week
+    metrics_partition_interval: str = "day"
+
+    # 提前创建的未来分区数
+    metrics_partition_premake: int = 3
+
+    # ================================================
+    # 紧凑指标存储 (SQLite / PostgreSQL)
+    # ================================================
+    # 是否将 performance_metrics / software_metrics 转换为紧凑布局
+    # (BIGINT 自增主键、整数设备代理键、REAL/SMALLINT 数值列), 原表名保留为兼容视图
+    # 启动时在后台在线迁移已有数据, 完成后切换; 与分区存储互斥, 不可自动回退
+    metrics_compact_storage_enabled: bool = False
+
+    # 在线迁移每批复制的行数
+    metrics_compact_batch_size: int = 5000
+
+    # 在线迁移两批之间的休眠时间 (毫秒)
+    metrics_compact_batch_sleep_ms: int = 50
+
+    # ================================================
+    # 性能指标写入队列 (write-behind)
+    # ================================================
+    # 是否启用异步写入队列 (关闭则在请求内同步提交)
+    metrics_write_behind_enabled: bool = True
+
+    # 队列最大积压行数, 超出后返回 429
+    metrics_queue_max_rows: int = 200000
+
+    # 刷写间隔 (毫秒)
+    metrics_flush_interval_ms: int = 1000
+
+    # 单次刷写最大行数
+    metrics_flush_max_rows: int = 5000
+
+    # 队列已满时建议 Agent 重试的等待秒数 (Retry-After)
+    metrics_queue_retry_after_seconds: int = 5
+
+    # ================================================
+    # 性能指标汇总 (1分钟/1小时/1天)
+    # ================================================
+    # 是否启用汇总 (PostgreSQL + TimescaleDB 使用连续聚合)
+    metrics_rollup_enabled: bool = True
+
+    # 增量汇总任务执行间隔 (秒)
+    metrics_rollup_interval_seconds: int = 60
+
+    # 等待写入中的数据落库的时间 (秒), 只汇总早于 now - 该值 写入的数据
+    metrics_rollup_settle_seconds: int = 30
+
+    # 首次启动时回填的天数
+    metrics_rollup_backfill_days: int = 7
+
+    # 时间范围不少于该小时数的查询改查汇总表
+    metrics_rollup_route_min_hours: int = 6
+
+    # 各粒度汇总的保留天数 (由数据清理任务分批删除)
+    metrics_rollup_1m_retention_days: int = 7
+    metrics_rollup_1h_retention_days: int = 180
+    metrics_rollup_1d_retention_days: int = 730
+
+    # ================================================
+    # 仪表盘统计缓存
+    # ================================================
+    # 统计结果缓存秒数 (设备/任务/结果状态变化时立即失效)
+    dashboard_stats_ttl_seconds: int = 10
+
+    # ================================================
+    # 事件循环监控
+    # ================================================
+    # 是否启用事件循环延迟采样和阻塞定位
+    loop_monitor_enabled: bool = True
+
+    # 延迟采样间隔 (毫秒)
+    loop_monitor_interval_ms: int = 100
+
+    # 事件循环超过该毫秒数未唤醒即记为一次阻塞, 并抓取调用栈
+    loop_monitor_block_threshold_ms: int = 100
+
+    # 阻塞超过该毫秒数时写 WARNING 日志
+    loop_monitor_log_threshold_ms: int = 500
+
+    # 保留的最近阻塞记录条数
+    loop_monitor_max_events: int = 100
+
+    # 每条阻塞记录保留的调用栈层数 (最内层)
+    loop_monitor_stack_depth: int = 20
+
+    # ================================================
+    # 单请求性能分析 (X-Profile: 1, 仅管理员)
+    # ================================================
+    # 是否允许按需分析单个请求
+    request_profiler_enabled: bool = True
+
+    # 调用栈采样间隔 (毫秒)
+    request_profiler_interval_ms: float = 2
+
+    # 内存中保留的分析记录数
+    request_profiler_max_profiles: int = 50
+
+    # 同时分析的请求数上限, 超出时请求照常处理但不分析
+    request_profiler_max_concurrent: int = 2
+
+    # ================================================
+    # Prometheus 指标导出 (/metrics)
+    # ================================================
+    # 是否启用 /metrics 及请求延迟统计中间件
+    prometheus_metrics_enabled: bool = True
+
+    # 抓取令牌; 设置后请求需携带 Authorization: Bearer <token>
+    prometheus_metrics_token: Optional[str] = None
+
+    # ================================================
+    # 列表分页
+    # ================================================
+    # 游标分页时近似总数的缓存秒数 (按查询条件缓存)
+    pagination_count_ttl_seconds: int = 60
+
+    # ================================================
+    # 设备在线状态 (心跳合并写入)
+    # ================================================
+    # 心跳状态写入数据库的间隔 (秒)
+    presence_flush_interval_seconds: int = 10
+
+    # 超过该秒数未收到心跳的设备标记为 offline (0 表示不自动标记)
+    presence_offline_after_seconds: int = 180
+
+    # ================================================
+    # Agent 推送通道 (命令/任务长轮询)
+    # ================================================
+    # 是否启用 GET /api/agent/work; 关闭后 Agent 回退到定时轮询
+    agent_push_enabled: bool = True
+
+    # 单次长轮询最长等待秒数
+    agent_push_max_wait_seconds: int = 60
+
+    # 每台设备记住的已确认条目数, 超出后最早的条目可能被重复推送
+    agent_push_acked_per_device: int = 256
+
 
 settings = Settings()
@@ -1,78 +1,181 @@
-from sqlalchemy import create_engine, event
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
 from app.core.config import settings
+from app.core.telemetry import (
+    POOL_STATS,
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    instrument_engine,
+    pool_stats,
+)
 
 # 根据配置选择数据库类型
 if settings.database_type == "mysql":
     # MySQL
     database_url = settings.mysql_url_sync
     database_url_async = settings.mysql_url
-
-    # Sync engine for MySQL
-    sync_engine = create_engine(
-        database_url,
-        echo=settings.debug,
-        pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20,
-    )
-
-    # Async engine for MySQL
-    async_engine = create_async_engine(
-        database_url_async,
-        echo=settings.debug,
-        pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20,
-    )
+    connect_args: Dict[str, Any] = {}
 
 elif settings.database_type == "postgresql":
     # PostgreSQL + TimescaleDB
     database_url = settings.postgresql_url_sync
     database_url_async = settings.postgresql_url
+    connect_args = {}
+
+else:
+    # SQLite (默认开发环境)
+    database_url = "sqlite:///./hardware_benchmark.db"
+    database_url_async = "sqlite+aiosqlite:///./hardware_benchmark.db"
+    connect_args = {"check_same_thread": False}
 
-    # Sync engine for PostgreSQL
-    sync_engine = create_engine(
+# 连接池按负载划分, 互不争抢:
+#   interactive - API 请求 (同步 / 异步引擎各一个池)
+#   ingest      - 指标写入 (队列刷写或请求内直接写入)、心跳状态刷写
+#   background  - 数据清理、汇总、分区维护、紧凑存储迁移、定时任务
+WORKLOADS = ("interactive", "ingest", "background")
+
+
+def _pool_options(workload: str) -> Dict[str, Any]:
+    """连接池参数 (Settings 中的 db_pool_<workload>_*)"""
+    return {
+        "pool_size": getattr(settings, f"db_pool_{workload}_size"),
+        "max_overflow": getattr(settings, f"db_pool_{workload}_max_overflow"),
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": True,
+    }
+
+
+def _create_sync_engine(workload: str) -> Engine:
+    return create_engine(
         database_url,
         echo=settings.debug,
-        pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name=workload,
+        **_pool_options(workload),
     )
 
-    # Async engine for PostgreSQL
-    async_engine = create_async_engine(
-        database_url_async,
+
+# SQLite 生产模式: WAL + PRAGMA, 单一写连接, 只读连接池
+sqlite_production = database_url.startswith("sqlite") and settings.sqlite_production_mode
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # WAL 下 NORMAL 只在检查点时 fsync, 断电最多丢失最近提交, 不会损坏数据库
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    # 负数单位为 KiB
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_mb) * 1024}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size_mb) * 1024 * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def _create_writer_engine() -> Engine:
+    """
+    SQLite 生产模式的写连接 (只有一个, 由 sqlite_writer 的写线程使用)
+
+    关闭 pysqlite 的隐式事务管理, 由 begin 事件发出 BEGIN IMMEDIATE:
+    事务开始即取得写锁, 并且可以正常使用 SAVEPOINT
+    """
+    engine = create_engine(
+        database_url,
         echo=settings.debug,
-        pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20,
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name="ingest",
+        **{**_pool_options("ingest"), "pool_size": 1, "max_overflow": 0},
     )
-else:
-    # SQLite (默认开发环境)
-    database_url = "sqlite:///./hardware_benchmark.db"
-    database_url_async = "sqlite+aiosqlite:///./hardware_benchmark.db"
 
-    # Sync engine for SQLite
-    sync_engine = create_engine(
-        database_url, echo=settings.debug, connect_args={"check_same_thread": False}
-    )
+    @event.listens_for(engine, "connect")
+    def _autocommit_driver(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
 
-    # Async engine for SQLite
-    async_engine = create_async_engine(
-        database_url_async,
+    return engine
+
+
+def _create_read_engine() -> Engine:
+    """SQLite 生产模式的只读连接池 (query_only, 误写入会直接报错)"""
+    engine = create_engine(
+        database_url,
         echo=settings.debug,
-        connect_args={"check_same_thread": False},
+        connect_args=connect_args,
+        poolclass=InstrumentedQueuePool,
+        pool_logging_name="read",
+        pool_size=settings.sqlite_read_pool_size,
+        max_overflow=0,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=True,
     )
 
-# Sync session factory
+    @event.listens_for(engine, "connect")
+    def _query_only(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA query_only=1")
+
+    return engine
+
+
+# Sync engines
+sync_engine = _create_sync_engine("interactive")
+ingest_engine = _create_writer_engine() if sqlite_production else _create_sync_engine("ingest")
+background_engine = _create_sync_engine("background")
+read_engine = _create_read_engine() if sqlite_production else sync_engine
+
+engines: Dict[str, Engine] = {
+    "interactive": sync_engine,
+    "ingest": ingest_engine,
+    "background": background_engine,
+}
+if sqlite_production:
+    engines["read"] = read_engine
+
+# Async engine (API requests)
+async_engine = create_async_engine(
+    database_url_async,
+    echo=settings.debug,
+    connect_args=connect_args,
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_logging_name="interactive_async",
+    **_pool_options("interactive"),
+)
+
+if sqlite_production:
+    # insert=True: PRAGMA 先于各引擎自己的 connect 监听器 (如 query_only) 执行
+    for _engine in list(engines.values()) + [async_engine.sync_engine]:
+        event.listen(_engine, "connect", _apply_sqlite_pragmas, insert=True)
+
+# SQL 执行时间 (/metrics)
+for _name, _engine in list(engines.items()) + [("interactive_async", async_engine.sync_engine)]:
+    instrument_engine(_engine, _name)
+
+# Sync session factories
 SyncSessionLocal = sessionmaker(
     bind=sync_engine,
     autocommit=False,
     autoflush=False,
 )
+BackgroundSessionLocal = sessionmaker(
+    bind=background_engine,
+    autocommit=False,
+    autoflush=False,
+)
+ReadSessionLocal = sessionmaker(
+    bind=read_engine,
+    autocommit=False,
+    autoflush=False,
+)
 
 # Async session factory
 AsyncSessionLocal = async_sessionmaker(
@@ -87,6 +190,21 @@ AsyncSessionLocal = async_sessionmaker(
 Base = declarative_base()
 
 
+def create_missing_indexes(conn):
+    """
+    为已存在的表补建模型中新增的索引
+
+    create_all 只会为新建的表创建索引, 已有数据库升级后需要补建;
+    已转换为视图的表 (如 SQLite 分区后的 performance_metrics) 跳过
+    """
+    views = set(inspect(conn).get_view_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name in views:
+            continue
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
 def get_db_sync():
     """Dependency for getting sync database session"""
     with SyncSessionLocal() as session:
@@ -96,6 +214,18 @@ def get_db_sync():
             session.close()
 
 
+def get_db_read():
+    """
+    Dependency for read-only endpoints: uses the query_only pool in SQLite
+    production mode, the regular sync pool otherwise
+    """
+    with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            session.close()
+
+
 # Async dependency for FastAPI
 async def get_db():
     """Dependency for getting async database session"""
@@ -106,5 +236,19 @@ async def get_db():
             await session.close()
 
 
+def get_pool_stats() -> Dict[str, Any]:
+    """各命名连接池的实时状态和累计统计 (取连接次数、等待时间、超时)"""
+    names = list(WORKLOADS) + ["interactive_async"] + (["read"] if sqlite_production else [])
+    names += sorted(set(POOL_STATS) - set(names))
+    return {name: pool_stats(name).to_dict() for name in names}
+
+
+async def dispose_engines():
+    """关闭所有连接池 (shutdown_event 调用)"""
+    for engine in engines.values():
+        engine.dispose()
+    await async_engine.dispose()
+
+
 # Keep both names working - get_db_sync returns sync session, get_db returns async session
 # This ensures backward compatibility - use get_db_sync for sync functions, get_db for async
@@ -0,0 +1,444 @@
+"""
+运行时遥测基础组件
+  - Histogram: 固定桶直方图 (事件循环监控、连接池等待时间共用)
+  - InstrumentedQueuePool / InstrumentedAsyncQueuePool: 记录取连接等待时间和超时次数的连接池,
+    按池的 logging_name (即负载名称 ingest / interactive / background) 汇总到 POOL_STATS
+  - metrics_registry: Prometheus 文本格式指标 (/metrics), 各模块在导入时注册自己的指标;
+    已有的统计 (连接池、事件循环、写入队列等) 通过回调在抓取时读取, 不增加热路径开销
+  - RequestMetricsMiddleware / instrument_engine: 请求延迟和 SQL 执行时间
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# 连接池等待时间直方图桶上界 (毫秒)
+POOL_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 30000)
+
+
+class Histogram:
+    """固定桶直方图 (非线程安全, 调用方负责串行化)"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶上界估算分位数"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, []
+        for bound, n in zip(list(self.bounds) + ["+Inf"], self.counts):
+            cumulative += n
+            buckets.append({"le": bound, "count": cumulative})
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "max": round(self.max, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class PoolStats:
+    """一个命名连接池的累计统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool: Optional[QueuePool] = None  # 最近使用的池 (dispose 后会重建)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.wait_ms = Histogram(POOL_WAIT_BUCKETS_MS)
+        self._lock = threading.Lock()
+
+    def observe(self, pool: QueuePool, wait_ms: Optional[float]):
+        with self._lock:
+            self.pool = pool
+            if wait_ms is None:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_ms.observe(wait_ms)
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+
+    def to_dict(self) -> Dict[str, Any]:
+        pool = self.pool
+        live = {}
+        if pool is not None:
+            live = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                # 负数表示还可以新建的连接数 (未用满 pool_size)
+                "overflow": pool.overflow(),
+                "max_overflow": pool._max_overflow,
+                "timeout_seconds": pool.timeout(),
+            }
+        with self._lock:
+            return {
+                **live,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "peak_checked_out": self.peak_checked_out,
+                "wait_ms": self.wait_ms.to_dict(),
+            }
+
+
+# 负载名称 -> 统计
+POOL_STATS: Dict[str, PoolStats] = {}
+
+
+def pool_stats(name: str) -> PoolStats:
+    stats = POOL_STATS.get(name)
+    if stats is None:
+        stats = POOL_STATS.setdefault(name, PoolStats(name))
+    return stats
+
+
+class _TelemetryMixin:
+    """包装 QueuePool._do_get, 记录取连接等待时间和超时"""
+
+    def _do_get(self):
+        stats = pool_stats(self._orig_logging_name or "default")
+        start = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            stats.observe(self, None)
+            raise
+        stats.observe(self, (time.perf_counter() - start) * 1000)
+        return entry
+
+
+class InstrumentedQueuePool(_TelemetryMixin, QueuePool):
+    """同步引擎使用的带统计连接池"""
+
+
+class InstrumentedAsyncQueuePool(_TelemetryMixin, AsyncAdaptedQueuePool):
+    """异步引擎使用的带统计连接池"""
+
+
+# ================================================
+# Prometheus 文本格式指标
+# ================================================
+
+# 指标名前缀
+METRIC_PREFIX = "hwbench_"
+
+# 默认延迟桶 (秒)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+LabelValues = Tuple[str, ...]
+# 回调返回单个值 (无标签) 或 {标签值元组: 值}
+MetricCallback = Callable[[], Union[float, Dict[LabelValues, Any]]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        fn: Optional[MetricCallback] = None,
+    ):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self._lock = threading.Lock()
+
+    def _collected(self) -> Dict[LabelValues, Any]:
+        value = self.fn()
+        return value if isinstance(value, dict) else {(): value}
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> Iterable[str]:
+        ...
+
+
+class CounterMetric(_Metric):
+    """只增计数器"""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def _samples(self):
+        values = self._collected() if self.fn else dict(self._values)
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class GaugeMetric(CounterMetric):
+    """可增可减的瞬时值"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class HistogramMetric(_Metric):
+    """
+    直方图 (按标签值各一个 Histogram)
+
+    fn 返回 {标签值元组: Histogram} 时用于导出已有的直方图, scale 把其单位
+    换算为秒 (如毫秒直方图传 0.001)
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        fn: Optional[Callable[[], Dict[LabelValues, Histogram]]] = None,
+        scale: float = 1.0,
+    ):
+        super().__init__(name, documentation, labelnames, fn)
+        self.buckets = tuple(buckets)
+        self.scale = scale
+        self._histograms: Dict[LabelValues, Histogram] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        with self._lock:
+            histogram = self._histograms.get(labelvalues)
+            if histogram is None:
+                histogram = self._histograms[labelvalues] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def _samples(self):
+        if self.fn:
+            histograms = self.fn()
+        else:
+            with self._lock:
+                histograms = dict(self._histograms)
+        for labels, histogram in histograms.items():
+            # 读取时不加锁: 各计数可能相差一两次观测, 对抓取结果没有影响
+            counts, cumulative = list(histogram.counts), 0
+            bounds = [b * self.scale for b in histogram.bounds] + [float("inf")]
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(histogram.sum * self.scale)}"
+            yield f"{self.name}_count{label_str} {cumulative}"
+
+
+class MetricsRegistry:
+    """指标注册表 (同名指标只注册一次, 重复注册返回已有对象)"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                fn: Optional[MetricCallback] = None) -> CounterMetric:
+        return self._register(CounterMetric(name, documentation, labelnames, fn))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              fn: Optional[MetricCallback] = None) -> GaugeMetric:
+        return self._register(GaugeMetric(name, documentation, labelnames, fn))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS, fn=None,
+                  scale: float = 1.0) -> HistogramMetric:
+        return self._register(
+            HistogramMetric(name, documentation, labelnames, buckets, fn, scale)
+        )
+
+    def render(self) -> str:
+        """导出全部指标 (Prometheus text exposition format 0.0.4)"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+metrics_registry = MetricsRegistry()
+
+
+# ================================================
+# 连接池 / SQL / HTTP 请求指标
+# ================================================
+
+metrics_registry.gauge(
+    "db_pool_checked_out", "Connections currently checked out", ("pool",),
+    fn=lambda: {
+        (name,): s.pool.checkedout() for name, s in list(POOL_STATS.items()) if s.pool is not None
+    },
+)
+metrics_registry.counter(
+    "db_pool_timeouts_total", "Connection checkouts that timed out", ("pool",),
+    fn=lambda: {(name,): s.timeouts for name, s in list(POOL_STATS.items())},
+)
+metrics_registry.histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled connection", ("pool",),
+    fn=lambda: {(name,): s.wait_ms for name, s in list(POOL_STATS.items())},
+    scale=0.001,
+)
+
+DB_QUERY_SECONDS = metrics_registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("pool", "statement"),
+)
+DB_QUERY_ERRORS = metrics_registry.counter(
+    "db_query_errors_total", "SQL statements that raised an error", ("pool",),
+)
+
+_STATEMENT_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _statement_kind(statement: str) -> str:
+    head = statement.lstrip()[:7].split(None, 1)
+    kind = head[0].upper() if head else ""
+    return kind if kind in _STATEMENT_KINDS else "OTHER"
+
+
+def instrument_engine(engine: Engine, pool_name: str):
+    """记录引擎上每条 SQL 的执行时间 (异步引擎传入 async_engine.sync_engine)"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("query_start")
+        if stack:
+            DB_QUERY_SECONDS.observe(
+                time.perf_counter() - stack.pop(), pool_name, _statement_kind(statement)
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("query_start") if context.connection else None
+        if stack:
+            stack.pop()
+        DB_QUERY_ERRORS.inc(pool_name)
+
+
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+
+
+def route_template(scope: Dict[str, Any]) -> Optional[str]:
+    """
+    请求匹配到的路由模板 (如 /api/devices/{device_id}), 未匹配时返回 None
+
+    新版 FastAPI 延迟展开 include_router, scope["route"].path 不含 include 时的
+    prefix, 需要从 scope["fastapi"]["included_router"] 补上
+    """
+    path = getattr(scope.get("route"), "path", None)
+    if path is None:
+        return None
+    included = (scope.get("fastapi") or {}).get("included_router")
+    prefix = getattr(getattr(included, "include_context", None), "prefix", "") or ""
+    return prefix + path
+
+
+class RequestMetricsMiddleware:
+    """按路由模板 (而不是实际路径) 统计 HTTP 请求延迟, 状态码按 2xx/4xx/5xx 归类"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                route_template(scope) or "(unmatched)",
+                f"{status[0] // 100}xx",
+            )
@@ -9,13 +9,14 @@ from app.schemas.device import DeviceResponse
 from app.schemas.task import TestTaskResponse as TaskResponse
 from app.schemas.result import TestResultResponse as ResultResponse
 
-def get_device_metrics(db: Session, device_name: str, limit: int = 10) -> List[Dict[str, Any]]:
+def get_device_metrics(db: Session, device_name: str, limit: int = 10, days: Optional[int] = None) -> List[Dict[str, Any]]:
     """
     查询设备最近的性能监控数据 (CPU/GPU/内存占用率)
     
     Args:
         device_name: 设备名称关键词 (必填)
         limit: 返回最近的数据点数量，默认10
+        days: 查询最近N天的性能汇总 (按小时/按天的平均值与P95)，不填则返回最近的软件监控数据
     """
     # 先找到设备
     from sqlalchemy import or_
@@ -27,6 +28,9 @@ def get_device_metrics(db: Session, device_name: str, limit: int = 10) -> List[D
     
     if not device:
         return [{"error": f"未找到名为 '{device_name}' 的设备"}]
+
+    if days:
+        return _get_device_metric_rollups(db, device, days, limit)
         
     # 查询 metrics 表，关联 execution 找到属于该设备的 metrics
     # 注意：metrics 表关联的是 execution_id，需要先找到属于该设备的 execution
@@ -56,6 +60,38 @@ def get_device_metrics(db: Session, device_name: str, limit: int = 10) -> List[D
         for m in metrics
     ]
 
+def _get_device_metric_rollups(db: Session, device: Device, days: int, limit: int) -> List[Dict[str, Any]]:
+    """长时间范围的性能监控数据 (读取 1h/1d 汇总，不扫描原始数据)"""
+    from datetime import timedelta
+    from app.services.metrics_rollup_service import metrics_rollup_service
+
+    resolution = "1h" if days <= 3 else "1d"
+    end = datetime.utcnow()
+    rollups = metrics_rollup_service.get_rollups(db, device.id, resolution, end - timedelta(days=days), end)
+
+    if not rollups:
+        return [{"message": f"设备 '{device.device_name}' 最近{days}天暂无性能汇总数据"}]
+
+    def fmt(row, name, unit="%"):
+        avg, p95 = row.get(f"{name}_avg"), row.get(f"{name}_p95")
+        if avg is None:
+            return "-"
+        return f"avg {avg:.1f}{unit} / p95 {p95:.1f}{unit}"
+
+    time_format = "%m-%d %H:00" if resolution == "1h" else "%Y-%m-%d"
+    return [
+        {
+            "time": r["bucket_start"].strftime(time_format),
+            "samples": r["sample_count"],
+            "cpu_load": fmt(r, "cpu_percent"),
+            "gpu_load": fmt(r, "gpu_percent"),
+            "ram_usage": fmt(r, "memory_percent"),
+            "cpu_temp": fmt(r, "cpu_temperature", "°C"),
+            "gpu_temp": fmt(r, "gpu_temperature", "°C"),
+        }
+        for r in rollups[-limit:]
+    ]
+
 def get_devices(db: Session, status: Optional[str] = None, gpu_model: Optional[str] = None, keyword: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
     """
     查询设备列表，支持按状态、显卡型号、名称关键词筛选
@@ -195,6 +231,10 @@ TOOLS_SCHEMA = [
                     "limit": {
                         "type": "integer",
                         "description": "返回最近的数据点数量，默认10"
+                    },
+                    "days": {
+                        "type": "integer",
+                        "description": "查看最近N天的性能趋势（按小时/按天汇总），例如：'xx电脑最近30天的负载'"
                     }
                 },
                 "required": ["device_name"]
@@ -1,8 +1,15 @@
+import anyio.to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.core.database import sync_engine, Base
+from app.core.database import (
+    sync_engine,
+    Base,
+    SyncSessionLocal,
+    create_missing_indexes,
+    dispose_engines,
+)
 
 # Import models to register them with Base.metadata
 from app.models.sqlite import (
@@ -41,10 +48,28 @@ from app.api import (
 )
 from app.api import websocket as websocket_router
 from app.api import scheduler as scheduler_router
+from app.api import diagnostics as diagnostics_router
+from app.api import telemetry as telemetry_router
 
 # Import scheduler service
 from app.services.scheduler_service import init_scheduler, stop_scheduler
 
+# Import metrics write-behind queue
+from app.services.metrics_queue_service import metrics_queue
+from app.services.metrics_rollup_service import metrics_rollup_service
+from app.services.latest_metric_cache import latest_metric_cache
+from app.services.device_presence_service import device_presence
+from app.services.metrics_partition_service import metrics_partitions
+from app.services.data_retention_service import retention_service
+from app.services.metric_detail_store import metric_details
+from app.services.metrics_compact_service import metrics_compact
+from app.services.loop_monitor_service import LoopMonitorMiddleware, loop_monitor
+from app.services.sqlite_writer_service import sqlite_writer
+from app.services.task_assignment_service import task_assignments
+from app.services.agent_push_service import agent_push
+from app.core.telemetry import RequestMetricsMiddleware
+from app.services.request_profiler_service import RequestProfilerMiddleware, request_profiler
+
 # Create FastAPI application
 app = FastAPI(
     title=settings.app_name,
@@ -61,8 +86,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 审计日志游标分页通过响应头返回游标和总数
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "X-Total-Count", "X-Profile-Id"],
 )
 
+# Map asyncio tasks to requests so event loop stalls can be attributed to a route
+app.add_middleware(LoopMonitorMiddleware)
+
+# On-demand sampling profiler for single admin requests (X-Profile: 1)
+app.add_middleware(RequestProfilerMiddleware, roles=diagnostics_router.ADMIN_ROLES)
+
+# Per-route request latency histograms exported at /metrics
+if settings.prometheus_metrics_enabled:
+    app.add_middleware(RequestMetricsMiddleware)
+
 # Register API routers
 app.include_router(auth_router.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(devices_router.router, prefix="/api", tags=["Devices"])
@@ -92,14 +129,68 @@ app.include_router(
 )
 app.include_router(websocket_router.router, tags=["WebSocket"])
 app.include_router(scheduler_router.router, prefix="/api", tags=["Scheduler"])
+app.include_router(diagnostics_router.router, prefix="/api", tags=["Diagnostics"])
+app.include_router(telemetry_router.router, tags=["Telemetry"])
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize application on startup"""
+    # Bound the worker pool used by sync endpoints and run_in_threadpool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = (
+        settings.sync_threadpool_workers
+    )
+
+    # Sample event loop lag and capture the stack of blocking handlers
+    loop_monitor.start()
+
+    # Track thread pool work done on behalf of profiled requests
+    request_profiler.install()
+
+    # Wake agent long-poll requests when commands/tasks are committed
+    agent_push.start()
+
     # Create database tables
     with sync_engine.begin() as conn:
         Base.metadata.create_all(conn)
+        create_missing_indexes(conn)
+
+    # Time-partitioned performance_metrics (SQLite/MySQL, opt-in)
+    metrics_partitions.ensure_schema()
+
+    # Compact metric storage (opt-in, migrates existing rows in the background)
+    metrics_compact.ensure_schema()
+
+    # Samples written before the detail split keep detail in legacy columns
+    # (checked after the storage conversions, which may replace the table)
+    with sync_engine.connect() as conn:
+        metric_details.detect_legacy_columns(conn)
+
+    # TimescaleDB continuous aggregates for metric rollups
+    if settings.metrics_rollup_enabled:
+        metrics_rollup_service.ensure_schema()
+
+    # Load the latest sample of recently active devices into memory
+    with SyncSessionLocal() as db:
+        latest_metric_cache.warm(db)
+        device_presence.warm(db)
+
+    # Per-device assignments for pending tasks created before the table existed
+    with SyncSessionLocal() as db:
+        task_assignments.backfill(db)
+
+    # Single writer thread for agent writes (SQLite production mode only)
+    sqlite_writer.start()
+
+    # Start metrics write-behind queue
+    if settings.metrics_write_behind_enabled:
+        metrics_queue.start()
+
+    # Start heartbeat presence flusher
+    device_presence.start()
+
+    # Continue a retention cleanup interrupted by the last shutdown
+    retention_service.resume_interrupted()
 
     # Start task scheduler
     await init_scheduler()
@@ -108,9 +199,20 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
+    # Release waiting agent long-poll requests
+    agent_push.stop()
+
     # Stop task scheduler
     await stop_scheduler()
-    sync_engine.dispose()
+
+    # Drain queued metrics before closing the engine
+    metrics_queue.stop()
+    device_presence.stop()
+    sqlite_writer.stop()
+    retention_service.stop()
+    metrics_compact.stop()
+    loop_monitor.stop()
+    await dispose_engines()
 
 
 @app.get("/")
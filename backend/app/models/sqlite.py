@@ -13,9 +13,11 @@ from sqlalchemy import (
     Float,
     Boolean,
     Text,
+    LargeBinary,
     DateTime,
     ForeignKey,
     JSON,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -74,6 +76,13 @@ class Device(Base):
     """设备模型"""
 
     __tablename__ = "devices"
+    __table_args__ = (
+        # 部门/岗位统计: GROUP BY department / position 并按状态计数
+        Index("ix_devices_department_status", "department", "status"),
+        Index("ix_devices_position_status", "position", "status"),
+        # 设备列表游标分页 (按注册时间倒序)
+        Index("ix_devices_registered_at_id", "registered_at", "id"),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     device_name = Column(String(100), nullable=False)
@@ -238,6 +247,24 @@ class TestTask(Base):
     results = relationship("TestResult", back_populates="task")
 
 
+class TaskAssignment(Base):
+    """任务分配 (任务目标设备/部门/岗位在创建时展开为每台设备一行)"""
+
+    __tablename__ = "task_assignments"
+    __table_args__ = (
+        # Agent 轮询: WHERE device_id IN (?, '*') AND status = 'pending'
+        Index("ix_task_assignments_device_status", "device_id", "status"),
+    )
+
+    task_id = Column(
+        String(36), ForeignKey("test_tasks.id", ondelete="CASCADE"), primary_key=True
+    )
+    # 未指定任何目标的任务对所有设备可见, 使用 "*"
+    device_id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False, default="pending")  # 与任务状态同步
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
 class TestScript(Base):
     """测试脚本"""
 
@@ -271,6 +298,30 @@ class TestResult(Base):
     """测试结果"""
 
     __tablename__ = "test_results"
+    __table_args__ = (
+        # 部门平均分 / 岗位达标统计按设备分组聚合
+        Index("ix_test_results_device_score", "device_id", "overall_score"),
+        Index("ix_test_results_device_standard", "device_id", "is_standard_met"),
+        # 分析报表 (AnalyticsService.generate_report_from_db) 的覆盖索引:
+        # 按时间范围的日期/瓶颈分组与分数读取、按设备分组
+        Index(
+            "ix_test_results_report",
+            "start_time",
+            "overall_score",
+            "bottleneck_type",
+            "cpu_score",
+            "gpu_score",
+            "memory_score",
+            "disk_score",
+        ),
+        Index(
+            "ix_test_results_device_report",
+            "device_id",
+            "start_time",
+            "overall_score",
+            "is_standard_met",
+        ),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     task_id = Column(String(36), ForeignKey("test_tasks.id"), nullable=True, index=True)
@@ -571,17 +622,140 @@ class PerformanceMetric(Base):
     network_sent_mbps = Column(Float, nullable=True)
     network_recv_mbps = Column(Float, nullable=True)
 
-    # 进程信息
+    # 进程信息 (进程列表等明细见 PerformanceMetricDetail)
     process_count = Column(Integer, nullable=True)
-    top_processes = Column(
-        Text, nullable=True
-    )  # JSON: [{"name": "xxx", "cpu": 10, "memory": 500}]
 
-    # 附加数据
-    raw_data = Column(Text, nullable=True)  # 原始采集数据 JSON
-    disk_io_details = Column(Text, nullable=True)  # JSON: 磁盘详细IO信息 (队列, 延迟等)
+    # 汇总任务按 created_at 增量扫描新数据
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, index=True)
 
-    created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+class PerformanceMetricDetail(Base):
+    """
+    性能指标明细 (与 performance_metrics 按 id 一一对应, 仅明细非空的样本有记录)
+
+    payload 为压缩后的 JSON 对象:
+    {"top_processes": [...], "disk_io_details": [...], "raw_data": "..."}
+    """
+
+    __tablename__ = "performance_metric_details"
+
+    metric_id = Column(String(36), primary_key=True)
+    device_id = Column(String(36), nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
+    encoding = Column(String(8), nullable=False, default="zlib")  # zlib / zstd
+    payload = Column(LargeBinary, nullable=False)
+
+
+class PerformanceMetricRollup(Base):
+    """性能指标汇总 (按设备、1分钟/1小时/1天 时间桶聚合)"""
+
+    __tablename__ = "performance_metric_rollups"
+    __table_args__ = (
+        Index(
+            "ix_metric_rollups_device_resolution_bucket",
+            "device_id",
+            "resolution",
+            "bucket_start",
+            unique=True,
+        ),
+        # 按粒度清理过期汇总
+        Index("ix_metric_rollups_resolution_bucket", "resolution", "bucket_start"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    device_id = Column(String(36), ForeignKey("devices.id"), nullable=False)
+    resolution = Column(String(4), nullable=False)  # 1m, 1h, 1d
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    sample_count = Column(Integer, nullable=False, default=0)
+
+    # CPU 指标
+    cpu_percent_min = Column(Float, nullable=True)
+    cpu_percent_max = Column(Float, nullable=True)
+    cpu_percent_avg = Column(Float, nullable=True)
+    cpu_percent_p95 = Column(Float, nullable=True)
+    cpu_temperature_min = Column(Float, nullable=True)
+    cpu_temperature_max = Column(Float, nullable=True)
+    cpu_temperature_avg = Column(Float, nullable=True)
+    cpu_temperature_p95 = Column(Float, nullable=True)
+    cpu_frequency_mhz_min = Column(Float, nullable=True)
+    cpu_frequency_mhz_max = Column(Float, nullable=True)
+    cpu_frequency_mhz_avg = Column(Float, nullable=True)
+    cpu_frequency_mhz_p95 = Column(Float, nullable=True)
+
+    # GPU 指标
+    gpu_percent_min = Column(Float, nullable=True)
+    gpu_percent_max = Column(Float, nullable=True)
+    gpu_percent_avg = Column(Float, nullable=True)
+    gpu_percent_p95 = Column(Float, nullable=True)
+    gpu_temperature_min = Column(Float, nullable=True)
+    gpu_temperature_max = Column(Float, nullable=True)
+    gpu_temperature_avg = Column(Float, nullable=True)
+    gpu_temperature_p95 = Column(Float, nullable=True)
+    gpu_memory_used_mb_min = Column(Float, nullable=True)
+    gpu_memory_used_mb_max = Column(Float, nullable=True)
+    gpu_memory_used_mb_avg = Column(Float, nullable=True)
+    gpu_memory_used_mb_p95 = Column(Float, nullable=True)
+
+    # 内存指标
+    memory_percent_min = Column(Float, nullable=True)
+    memory_percent_max = Column(Float, nullable=True)
+    memory_percent_avg = Column(Float, nullable=True)
+    memory_percent_p95 = Column(Float, nullable=True)
+    memory_used_mb_min = Column(Float, nullable=True)
+    memory_used_mb_max = Column(Float, nullable=True)
+    memory_used_mb_avg = Column(Float, nullable=True)
+    memory_used_mb_p95 = Column(Float, nullable=True)
+
+    # 磁盘指标
+    disk_read_mbps_min = Column(Float, nullable=True)
+    disk_read_mbps_max = Column(Float, nullable=True)
+    disk_read_mbps_avg = Column(Float, nullable=True)
+    disk_read_mbps_p95 = Column(Float, nullable=True)
+    disk_write_mbps_min = Column(Float, nullable=True)
+    disk_write_mbps_max = Column(Float, nullable=True)
+    disk_write_mbps_avg = Column(Float, nullable=True)
+    disk_write_mbps_p95 = Column(Float, nullable=True)
+
+    # 网络指标
+    network_sent_mbps_min = Column(Float, nullable=True)
+    network_sent_mbps_max = Column(Float, nullable=True)
+    network_sent_mbps_avg = Column(Float, nullable=True)
+    network_sent_mbps_p95 = Column(Float, nullable=True)
+    network_recv_mbps_min = Column(Float, nullable=True)
+    network_recv_mbps_max = Column(Float, nullable=True)
+    network_recv_mbps_avg = Column(Float, nullable=True)
+    network_recv_mbps_p95 = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class MetricRollupState(Base):
+    """性能指标汇总进度 (已处理的原始数据 created_at 水位)"""
+
+    __tablename__ = "metric_rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    watermark = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class RetentionJobState(Base):
+    """数据清理进度 (每张表一行, 中断后按记录的截止时间和主键位置继续)"""
+
+    __tablename__ = "retention_job_state"
+
+    name = Column(String(50), primary_key=True)
+    status = Column(String(20), nullable=False, default="pending")  # running/completed/failed
+    phase = Column(String(20), nullable=True)  # expired / orphans
+    cutoff = Column(DateTime(timezone=True), nullable=True)
+    last_id = Column(String(36), nullable=True)
+    deleted_rows = Column(Integer, default=0)
+    orphan_rows = Column(Integer, default=0)
+    chunks = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
 
 
 class SoftwareBenchmark(Base):
@@ -67,10 +67,12 @@ class DeviceResponse(DeviceBase, DeviceHardwareInfo):
 
 
 class DeviceListResponse(BaseModel):
-    total: int
-    page: int
+    total: Optional[int]  # 游标分页时为近似值, 未请求时为 None
+    page: Optional[int]
     page_size: int
     items: List[DeviceResponse]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 # Agent Schemas
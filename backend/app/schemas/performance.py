@@ -71,9 +71,17 @@ class PerformanceMetricResponse(PerformanceMetricBase):
         from_attributes = True
 
 
+class PerformanceMetricCreateResponse(PerformanceMetricResponse):
+    """创建性能指标的响应 (紧凑存储下排队写入时 id 尚未生成, 为 None)"""
+
+    id: Optional[str] = None
+
+
 class PerformanceMetricListResponse(BaseModel):
-    total: int
+    total: Optional[int]  # 游标分页时为近似值, 未请求时为 None
     items: List[PerformanceMetricResponse]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 class MetricDataCreate(BaseModel):
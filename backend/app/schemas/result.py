@@ -65,10 +65,12 @@ class TestResultResponse(TestResultBase):
 
 
 class TestResultListResponse(BaseModel):
-    total: int
-    page: int
+    total: Optional[int]  # 游标分页时为近似值, 未请求时为 None
+    page: Optional[int]
     page_size: int
     items: List[TestResultResponse]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 
 class ResultStatistics(BaseModel):
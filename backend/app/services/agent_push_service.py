@@ -0,0 +1,212 @@
+"""
+Agent 推送通道 (命令 / 任务长轮询)
+Agent 挂起一个 GET /api/agent/work 长轮询请求; 控制命令或任务分配提交后,
+Session 事件监听在 after_commit 时唤醒对应设备的等待请求, 新工作立即返回,
+不必等到下一个轮询周期, 空闲设备也不再产生定时的空轮询查询。
+
+投递语义为至少一次: Agent 收到后调用 POST /api/agent/work/ack 确认, 已确认的
+条目不再通过通道下发; 未确认的条目在下一次长轮询时重新下发。
+等待请求和确认记录都在进程内存中, 与 write-behind 队列一样假设单个 API 进程;
+Agent 重连后先用原有轮询接口补齐, 再恢复长轮询。
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.telemetry import metrics_registry
+from app.models.sqlite import ControlCommand
+
+logger = logging.getLogger(__name__)
+
+# 通知所有设备 (也是任务分配表中对所有设备可见的任务的 device_id)
+ALL_DEVICES = "*"
+
+# Session.info 中待通知的设备 ID
+_PENDING_KEY = "agent_push_devices"
+
+WorkFetcher = Callable[[str, Set[str]], Awaitable[Dict[str, List[Any]]]]
+
+
+class AgentPushService:
+    """按设备唤醒长轮询请求, 并记录 Agent 已确认的条目"""
+
+    def __init__(self, acked_per_device: int = settings.agent_push_acked_per_device):
+        self.acked_per_device = max(1, acked_per_device)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        # 设备ID -> 等待中的请求
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+        # 设备ID -> 已确认的命令/任务 ID (有界, 按确认顺序)
+        self._acked: Dict[str, "OrderedDict[str, None]"] = {}
+
+        # 统计信息
+        self.notifications = 0
+        self.delivered_items = 0
+        self.acked_items = 0
+        self.timeouts = 0
+
+    # ------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------
+
+    def start(self):
+        """在事件循环中启动 (startup_event 调用)"""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+
+    def stop(self):
+        """唤醒所有等待中的请求并使其立即返回"""
+        self._stopping = True
+        for waiters in list(self._waiters.values()):
+            for waiter in list(waiters):
+                waiter.set()
+        self._loop = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(w) for w in list(self._waiters.values()))
+
+    # ------------------------------------------------
+    # 等待 / 唤醒
+    # ------------------------------------------------
+
+    async def wait(self, device_id: str, fetch: WorkFetcher, timeout: float) -> Dict[str, List[Any]]:
+        """
+        等待设备的新工作
+
+        Args:
+            device_id: 设备ID
+            fetch: 查询函数 (device_id, 已确认 ID) -> {"commands": [...], "tasks": [...]}
+            timeout: 最长等待秒数
+
+        Returns:
+            有新工作时立即返回; 超时返回空列表
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        waiter = asyncio.Event()
+        self._waiters.setdefault(device_id, set()).add(waiter)
+        try:
+            while True:
+                # 先清除再查询: 查询期间到达的通知会让下一次等待立即返回
+                waiter.clear()
+                work = await fetch(device_id, set(self._acked.get(device_id, ())))
+                if any(work.values()):
+                    self.delivered_items += sum(len(items) for items in work.values())
+                    return work
+                remaining = deadline - loop.time()
+                if remaining <= 0 or self._stopping:
+                    return work
+                try:
+                    await asyncio.wait_for(waiter.wait(), remaining)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    return work
+        finally:
+            waiters = self._waiters.get(device_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[device_id]
+
+    def notify(self, device_ids: Iterable[str]):
+        """唤醒设备的等待请求 (可在任意线程调用)"""
+        loop = self._loop
+        if loop is None:
+            return
+        device_ids = list(device_ids)
+        try:
+            loop.call_soon_threadsafe(self._wake, device_ids)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def _wake(self, device_ids: List[str]):
+        self.notifications += 1
+        if ALL_DEVICES in device_ids:
+            targets = list(self._waiters.values())
+        else:
+            targets = [self._waiters[d] for d in device_ids if d in self._waiters]
+        for waiters in targets:
+            for waiter in list(waiters):
+                waiter.set()
+
+    # ------------------------------------------------
+    # 确认
+    # ------------------------------------------------
+
+    def ack(self, device_id: str, item_ids: Iterable[str]) -> int:
+        """记录 Agent 已收到的命令/任务, 之后不再通过通道下发"""
+        acked = self._acked.setdefault(device_id, OrderedDict())
+        count = 0
+        for item_id in item_ids:
+            acked[item_id] = None
+            acked.move_to_end(item_id)
+            count += 1
+        while len(acked) > self.acked_per_device:
+            acked.popitem(last=False)
+        self.acked_items += count
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取推送通道状态"""
+        return {
+            "enabled": settings.agent_push_enabled,
+            "waiting_requests": self.waiting,
+            "waiting_devices": len(self._waiters),
+            "notifications": self.notifications,
+            "delivered_items": self.delivered_items,
+            "acked_items": self.acked_items,
+            "timeouts": self.timeouts,
+        }
+
+
+# 全局推送服务实例
+agent_push = AgentPushService()
+
+metrics_registry.gauge(
+    "agent_push_waiting_requests", "Agent long-poll requests waiting for work",
+    fn=lambda: agent_push.waiting,
+)
+metrics_registry.counter(
+    "agent_push_items_total", "Commands and tasks pushed to agents by outcome", ("outcome",),
+    fn=lambda: {
+        ("delivered",): agent_push.delivered_items,
+        ("acked",): agent_push.acked_items,
+    },
+)
+
+
+def notify_after_commit(session: Session, device_ids: Iterable[str]):
+    """记录需要唤醒的设备, 在 Session 提交后通知 (回滚时丢弃)"""
+    session.info.setdefault(_PENDING_KEY, set()).update(device_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_new_commands(session, flush_context):
+    """新建的 pending 控制命令"""
+    device_ids = [
+        obj.device_id
+        for obj in session.new
+        if isinstance(obj, ControlCommand) and (obj.status or "pending") == "pending"
+    ]
+    if device_ids:
+        notify_after_commit(session, device_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_on_commit(session):
+    device_ids = session.info.pop(_PENDING_KEY, None)
+    if device_ids:
+        agent_push.notify(device_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
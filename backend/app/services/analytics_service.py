@@ -1,9 +1,55 @@
 """
 Data analysis and reporting services
+
+The list-based methods take plain result/device dicts and group them in a
+single pass using device lookup maps. generate_report_from_db pushes the
+same aggregations down to SQL GROUP BY queries, so full-fleet reports only
+transfer one row per group (plus the score column for percentiles/trend).
 """
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Sequence
 from collections import defaultdict
+import heapq
+
+from sqlalchemy import Date, case, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.models.sqlite import Device, PositionStandard, TestResult
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Percentiles reported in the performance summary
+SUMMARY_PERCENTILES = (50, 90, 95)
+
+
+def _index_devices(devices: Iterable[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+    """Build a device id -> device lookup map (first occurrence wins)"""
+    lookup: Dict[Any, Dict[str, Any]] = {}
+    for device in devices:
+        lookup.setdefault(device.get("id"), device)
+    return lookup
+
+
+def _group_stats() -> Dict[str, Any]:
+    return {"total": 0, "score_sum": 0.0, "score_count": 0, "passed": 0}
+
+
+def _add_to_group(group: Dict[str, Any], result: Dict[str, Any]):
+    group["total"] += 1
+    score = result.get("overall_score")
+    if score:
+        group["score_sum"] += score
+        group["score_count"] += 1
+    if result.get("is_standard_met"):
+        group["passed"] += 1
+
+
+def _group_average(group: Dict[str, Any]) -> float:
+    return group["score_sum"] / group["score_count"] if group["score_count"] else 0
 
 
 class AnalyticsService:
@@ -33,21 +79,6 @@ class AnalyticsService:
         memory_scores = [r.get("memory_score", 0) for r in results if r.get("memory_score")]
         disk_scores = [r.get("disk_score", 0) for r in results if r.get("disk_score")]
         
-        # Calculate trend
-        trend = "stable"
-        if len(scores) >= 10:
-            mid = len(scores) // 2
-            first_half = scores[:mid]
-            second_half = scores[mid:]
-            
-            first_avg = sum(first_half) / len(first_half)
-            second_avg = sum(second_half) / len(second_half)
-            
-            if second_avg > first_avg * 1.05:
-                trend = "improving"
-            elif second_avg < first_avg * 0.95:
-                trend = "declining"
-        
         return {
             "total_tests": total_tests,
             "average_score": round(average_score, 2),
@@ -55,46 +86,85 @@ class AnalyticsService:
             "average_gpu_score": round(sum(gpu_scores) / len(gpu_scores), 2) if gpu_scores else 0,
             "average_memory_score": round(sum(memory_scores) / len(memory_scores), 2) if memory_scores else 0,
             "average_disk_score": round(sum(disk_scores) / len(disk_scores), 2) if disk_scores else 0,
-            "trend": trend,
+            "trend": AnalyticsService.calculate_trend(scores),
             "max_score": max(scores) if scores else 0,
-            "min_score": min(scores) if scores else 0
+            "min_score": min(scores) if scores else 0,
+            "percentiles": AnalyticsService.score_percentiles(scores)
         }
     
+    @staticmethod
+    def calculate_trend(scores: Sequence[float]) -> str:
+        """
+        Compare the average of the second half of the scores (in time order)
+        with the first half: more than 5% higher is improving, more than 5%
+        lower is declining. Fewer than 10 scores is always stable.
+        """
+        if len(scores) < 10:
+            return "stable"
+        
+        mid = len(scores) // 2
+        if NUMPY_AVAILABLE:
+            values = np.asarray(scores, dtype=np.float64)
+            first_avg = float(values[:mid].mean())
+            second_avg = float(values[mid:].mean())
+        else:
+            first_avg = sum(scores[:mid]) / mid
+            second_avg = sum(scores[mid:]) / (len(scores) - mid)
+        
+        if second_avg > first_avg * 1.05:
+            return "improving"
+        if second_avg < first_avg * 0.95:
+            return "declining"
+        return "stable"
+    
+    @staticmethod
+    def score_percentiles(
+        scores: Sequence[float],
+        percentiles: Sequence[int] = SUMMARY_PERCENTILES
+    ) -> Dict[str, float]:
+        """Score percentiles (linear interpolation), e.g. {"p50": 72.5, ...}"""
+        if len(scores) == 0:
+            return {f"p{p}": 0 for p in percentiles}
+        
+        if NUMPY_AVAILABLE:
+            values = np.percentile(np.asarray(scores, dtype=np.float64), percentiles)
+            return {f"p{p}": round(float(v), 2) for p, v in zip(percentiles, values)}
+        
+        ordered = sorted(scores)
+        last = len(ordered) - 1
+        result = {}
+        for p in percentiles:
+            rank = last * p / 100
+            low = int(rank)
+            high = min(low + 1, last)
+            value = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+            result[f"p{p}"] = round(value, 2)
+        return result
+    
     @staticmethod
     def get_department_analysis(
         results: List[Dict[str, Any]],
         devices: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """Analyze performance by department"""
-        # Group results by department
-        dept_results = defaultdict(list)
+        device_map = _index_devices(devices)
         
+        # Single pass over results, keeping running totals per department
+        groups = defaultdict(_group_stats)
         for result in results:
-            device_id = result.get("device_id")
-            # Find device department
-            for device in devices:
-                if device.get("id") == device_id:
-                    dept = device.get("department", "Unknown")
-                    dept_results[dept].append(result)
-                    break
-        
-        # Calculate stats per department
-        analysis = []
-        for dept, dept_results_list in dept_results.items():
-            if not dept_results_list:
+            device = device_map.get(result.get("device_id"))
+            if device is None:
                 continue
-                
-            scores = [r.get("overall_score", 0) for r in dept_results_list if r.get("overall_score")]
-            avg_score = sum(scores) / len(scores) if scores else 0
-            
-            passed = sum(1 for r in dept_results_list if r.get("is_standard_met"))
-            
+            _add_to_group(groups[device.get("department", "Unknown")], result)
+        
+        analysis = []
+        for dept, group in groups.items():
             analysis.append({
                 "department": dept,
-                "total_tests": len(dept_results_list),
-                "average_score": round(avg_score, 2),
-                "passed_count": passed,
-                "compliance_rate": round(passed / len(dept_results_list) * 100, 2) if dept_results_list else 0
+                "total_tests": group["total"],
+                "average_score": round(_group_average(group), 2),
+                "passed_count": group["passed"],
+                "compliance_rate": round(group["passed"] / group["total"] * 100, 2)
             })
         
         return sorted(analysis, key=lambda x: x["average_score"], reverse=True)
@@ -106,45 +176,27 @@ class AnalyticsService:
         standards: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """Analyze compliance by position"""
-        # Group by position
-        position_results = defaultdict(list)
+        device_map = _index_devices(devices)
+        standard_map: Dict[Any, Dict[str, Any]] = {}
+        for standard in standards:
+            standard_map.setdefault(standard.get("position_code"), standard)
         
+        groups = defaultdict(_group_stats)
         for result in results:
-            device_id = result.get("device_id")
-            for device in devices:
-                if device.get("id") == device_id:
-                    position = device.get("position", "Unknown")
-                    position_results[position].append(result)
-                    break
+            device = device_map.get(result.get("device_id"))
+            if device is None:
+                continue
+            _add_to_group(groups[device.get("position", "Unknown")], result)
         
         analysis = []
-        for position, pos_results in position_results.items():
-            if not pos_results:
-                continue
-            
-            scores = [r.get("overall_score", 0) for r in pos_results if r.get("overall_score")]
-            avg_score = sum(scores) / len(scores) if scores else 0
-            
-            # Find matching standard
-            matching_standard = None
-            for standard in standards:
-                if standard.get("position_code") == position:
-                    matching_standard = standard
-                    break
-            
-            # Calculate compliance
-            compliant = 0
-            for r in pos_results:
-                if r.get("is_standard_met"):
-                    compliant += 1
-            
+        for position, group in groups.items():
             analysis.append({
                 "position": position,
-                "total_devices": len(pos_results),
-                "average_score": round(avg_score, 2),
-                "compliant_devices": compliant,
-                "compliance_rate": round(compliant / len(pos_results) * 100, 2),
-                "standard_requirements": matching_standard
+                "total_devices": group["total"],
+                "average_score": round(_group_average(group), 2),
+                "compliant_devices": group["passed"],
+                "compliance_rate": round(group["passed"] / group["total"] * 100, 2),
+                "standard_requirements": standard_map.get(position)
             })
         
         return sorted(analysis, key=lambda x: x["compliance_rate"], reverse=True)
@@ -220,30 +272,23 @@ class AnalyticsService:
             if device_id and score:
                 device_scores[device_id].append(score)
         
+        device_map = _index_devices(devices)
+        
         # Calculate average scores
         rankings = []
         for device_id, scores in device_scores.items():
-            avg_score = sum(scores) / len(scores)
-            
-            # Find device info
-            device_info = None
-            for d in devices:
-                if d.get("id") == device_id:
-                    device_info = d
-                    break
-            
+            device_info = device_map.get(device_id)
             if device_info:
                 rankings.append({
                     "device_id": device_id,
                     "device_name": device_info.get("device_name", "Unknown"),
                     "department": device_info.get("department", ""),
-                    "average_score": round(avg_score, 2),
+                    "average_score": round(sum(scores) / len(scores), 2),
                     "test_count": len(scores)
                 })
         
-        # Sort by score
-        rankings.sort(key=lambda x: x["average_score"], reverse=True)
-        return rankings[:limit]
+        # Only the top entries are needed
+        return heapq.nlargest(limit, rankings, key=lambda x: x["average_score"])
     
     @staticmethod
     def generate_report(
@@ -273,6 +318,214 @@ class AnalyticsService:
             "top_devices": rankings
         }
 
+    
+    @staticmethod
+    def generate_report_from_db(
+        db: Session,
+        days: Optional[int] = 30,
+        limit: int = 10
+    ) -> Dict[str, Any]:
+        """
+        Generate the same report as generate_report, aggregated in the database
+
+        test_results is read three times regardless of fleet size, each from a
+        covering index (see TestResult.__table_args__):
+        one GROUP BY device_id (rolled up to departments, positions and the
+        ranking through a device lookup map), one GROUP BY day/bottleneck
+        (summary, time series, bottleneck distribution) and one read of the
+        overall_score column in time order for the NumPy percentile/trend stats.
+        
+        Args:
+            db: Database session
+            days: Only include results started in the last N days (None for all)
+            limit: Number of top devices to include
+        """
+        filters = []
+        if days:
+            filters.append(TestResult.start_time >= datetime.utcnow() - timedelta(days=days))
+        
+        def nonzero(column):
+            # The list-based methods skip missing and zero scores
+            return func.nullif(column, 0)
+        
+        score = nonzero(TestResult.overall_score)
+        passed = func.sum(case((TestResult.is_standard_met == True, 1), else_=0))
+        
+        # Per-device aggregates, rolled up through the device lookup map
+        device_map = {
+            row.id: row
+            for row in db.execute(
+                select(Device.id, Device.device_name, Device.department, Device.position)
+            )
+        }
+        departments = defaultdict(_group_stats)
+        positions = defaultdict(_group_stats)
+        rankings = []
+        for row in db.execute(
+            select(
+                TestResult.device_id,
+                func.count().label("total"),
+                func.sum(score).label("score_sum"),
+                func.count(score).label("score_count"),
+                passed.label("passed"),
+            )
+            .where(*filters)
+            .group_by(TestResult.device_id)
+        ):
+            device = device_map.get(row.device_id)
+            if device is None:
+                continue
+            for group in (departments[device.department], positions[device.position]):
+                group["total"] += row.total
+                group["score_sum"] += float(row.score_sum or 0)
+                group["score_count"] += row.score_count
+                group["passed"] += row.passed or 0
+            if row.score_count:
+                rankings.append({
+                    "device_id": row.device_id,
+                    "device_name": device.device_name,
+                    "department": device.department,
+                    "average_score": round(float(row.score_sum) / row.score_count, 2),
+                    "test_count": row.score_count
+                })
+        
+        dept_analysis = sorted(
+            (
+                {
+                    "department": dept,
+                    "total_tests": group["total"],
+                    "average_score": round(_group_average(group), 2),
+                    "passed_count": group["passed"],
+                    "compliance_rate": round(group["passed"] / group["total"] * 100, 2)
+                }
+                for dept, group in departments.items()
+            ),
+            key=lambda x: x["average_score"],
+            reverse=True
+        )
+        
+        standards = {}
+        for standard in db.execute(select(PositionStandard)).scalars():
+            standards.setdefault(standard.position_code, {
+                c.name: getattr(standard, c.name) for c in PositionStandard.__table__.columns
+            })
+        position_analysis = sorted(
+            (
+                {
+                    "position": position,
+                    "total_devices": group["total"],
+                    "average_score": round(_group_average(group), 2),
+                    "compliant_devices": group["passed"],
+                    "compliance_rate": round(group["passed"] / group["total"] * 100, 2),
+                    "standard_requirements": standards.get(position)
+                }
+                for position, group in positions.items()
+            ),
+            key=lambda x: x["compliance_rate"],
+            reverse=True
+        )
+        
+        top_devices = heapq.nlargest(limit, rankings, key=lambda x: x["average_score"])
+        
+        # Per-day/bottleneck aggregates (SQLite stores timestamps as text)
+        if db.get_bind().dialect.name == "sqlite":
+            day = func.date(TestResult.start_time)
+        else:
+            day = cast(TestResult.start_time, Date)
+        day = day.label("day")
+        
+        score_columns = {
+            "overall": TestResult.overall_score,
+            "cpu": TestResult.cpu_score,
+            "gpu": TestResult.gpu_score,
+            "memory": TestResult.memory_score,
+            "disk": TestResult.disk_score,
+        }
+        aggregates = [day, TestResult.bottleneck_type, func.count().label("total")]
+        for name, column in score_columns.items():
+            aggregates.append(func.sum(nonzero(column)).label(f"{name}_sum"))
+            aggregates.append(func.count(nonzero(column)).label(f"{name}_count"))
+        aggregates.append(func.max(score).label("max_score"))
+        aggregates.append(func.min(score).label("min_score"))
+        
+        totals = defaultdict(float)
+        max_score = None
+        min_score = None
+        bottlenecks = defaultdict(int)
+        daily = defaultdict(lambda: {"score_sum": 0.0, "score_count": 0, "total": 0})
+        for row in db.execute(
+            select(*aggregates).where(*filters).group_by(day, TestResult.bottleneck_type)
+        ).mappings():
+            bottlenecks[row["bottleneck_type"]] += row["total"]
+            totals["total"] += row["total"]
+            for name in score_columns:
+                totals[f"{name}_sum"] += float(row[f"{name}_sum"] or 0)
+                totals[f"{name}_count"] += row[f"{name}_count"]
+            if row["max_score"] is not None:
+                max_score = max(max_score or row["max_score"], row["max_score"])
+                min_score = min(min_score or row["min_score"], row["min_score"])
+            
+            key = row["day"] if isinstance(row["day"], str) else row["day"].isoformat()
+            daily[key]["total"] += row["total"]
+            daily[key]["score_sum"] += float(row["overall_sum"] or 0)
+            daily[key]["score_count"] += row["overall_count"]
+        
+        time_series = [
+            {
+                "date": key,
+                "average_score": round(_group_average(daily[key]), 2),
+                "test_count": daily[key]["total"]
+            }
+            for key in sorted(daily)
+        ][-(days or 30):]
+        
+        # Score column only, in time order, for percentiles and trend
+        score_rows = db.execute(
+            select(TestResult.overall_score)
+            .where(*filters)
+            .where(TestResult.overall_score.isnot(None))
+            .where(TestResult.overall_score != 0)
+            .order_by(TestResult.start_time)
+        ).scalars()
+        if NUMPY_AVAILABLE:
+            scores = np.fromiter(score_rows, dtype=np.float64)
+        else:
+            scores = list(score_rows)
+        
+        def average(name):
+            count = totals[f"{name}_count"]
+            return round(totals[f"{name}_sum"] / count, 2) if count else 0
+        
+        total = int(totals["total"])
+        if total:
+            summary = {
+                "total_tests": total,
+                "average_score": average("overall"),
+                "average_cpu_score": average("cpu"),
+                "average_gpu_score": average("gpu"),
+                "average_memory_score": average("memory"),
+                "average_disk_score": average("disk"),
+                "trend": AnalyticsService.calculate_trend(scores),
+                "max_score": max_score or 0,
+                "min_score": min_score or 0,
+                "percentiles": AnalyticsService.score_percentiles(scores)
+            }
+        else:
+            summary = {"total_tests": 0, "average_score": 0, "trend": "stable"}
+        
+        return {
+            "generated_at": datetime.utcnow().isoformat(),
+            "period": {
+                "days": days,
+                "total_results": total
+            },
+            "summary": summary,
+            "department_analysis": dept_analysis,
+            "position_analysis": position_analysis,
+            "bottleneck_distribution": dict(bottlenecks),
+            "time_series": time_series,
+            "top_devices": top_devices
+        }
 
 class ReportGenerator:
     """Generate various reports"""
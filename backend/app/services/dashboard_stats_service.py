@@ -0,0 +1,191 @@
+"""
+仪表盘统计服务
+每张表一次 GROUP BY status 聚合得到全部计数, 结果短时间缓存;
+设备/任务/测试结果的状态发生写入并提交后自动失效 (通过 Session 事件监听)。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.sqlite import Device, TestResult, TestTask
+
+logger = logging.getLogger(__name__)
+
+# 模型 -> 影响统计结果的字段 (None 表示只关心新增/删除)
+WATCHED_FIELDS = {
+    Device: ("status",),
+    TestTask: ("task_status",),
+    TestResult: ("test_status", "overall_score"),
+}
+
+# Session.info 中的标记: 本事务写入了影响统计的数据, 提交后使缓存失效
+_DIRTY_KEY = "dashboard_stats_dirty"
+
+
+class DashboardStatsService:
+    """仪表盘统计 (带 TTL 的缓存, 写入时失效)"""
+
+    def __init__(self, ttl_seconds: int = settings.dashboard_stats_ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._stats: Optional[Dict[str, Any]] = None
+        self._computed_at: Optional[datetime] = None
+        self._computed_mono = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    def invalidate(self):
+        """使缓存失效, 下次读取时重新计算"""
+        self._version += 1
+        self._stats = None
+        self.invalidations += 1
+
+    def get(self, db: Session) -> Tuple[Dict[str, Any], float]:
+        """
+        获取统计结果
+
+        Returns:
+            (统计字典, 缓存年龄秒数)
+        """
+        stats = self._stats
+        if stats is not None and time.monotonic() - self._computed_mono < self.ttl_seconds:
+            self.hits += 1
+            return stats, round(time.monotonic() - self._computed_mono, 3)
+
+        # 同一时间只有一个请求重新计算, 其余请求等待并复用结果
+        with self._lock:
+            stats = self._stats
+            if stats is None or time.monotonic() - self._computed_mono >= self.ttl_seconds:
+                version = self._version
+                stats = self._compute(db)
+                self.refreshes += 1
+                # 计算期间发生写入时不缓存这份可能过期的结果
+                if version == self._version:
+                    self._stats = stats
+                    self._computed_mono = time.monotonic()
+                    self._computed_at = datetime.utcnow()
+                else:
+                    return stats, 0.0
+            return stats, round(time.monotonic() - self._computed_mono, 3)
+
+    def _compute(self, db: Session) -> Dict[str, Any]:
+        """三条分组聚合查询得到全部计数"""
+        devices = dict(
+            db.execute(
+                select(Device.status, func.count()).group_by(Device.status)
+            ).all()
+        )
+        tasks = dict(
+            db.execute(
+                select(TestTask.task_status, func.count()).group_by(TestTask.task_status)
+            ).all()
+        )
+
+        results: Dict[Any, int] = {}
+        score_sum = 0.0
+        score_count = 0
+        for test_status, count, total, scored in db.execute(
+            select(
+                TestResult.test_status,
+                func.count(),
+                func.sum(TestResult.overall_score),
+                func.count(TestResult.overall_score),
+            ).group_by(TestResult.test_status)
+        ):
+            results[test_status] = count
+            score_sum += float(total or 0)
+            score_count += scored or 0
+
+        return {
+            "devices": {
+                "total": sum(devices.values()),
+                "online": devices.get("online", 0),
+                "offline": devices.get("offline", 0),
+                "testing": devices.get("testing", 0),
+                "error": devices.get("error", 0),
+            },
+            "tasks": {
+                "total": sum(tasks.values()),
+                "pending": tasks.get("pending", 0),
+                "running": tasks.get("running", 0),
+                "completed": tasks.get("completed", 0),
+            },
+            "results": {
+                "total": sum(results.values()),
+                "passed": results.get("passed", 0),
+                "failed": results.get("failed", 0),
+                "average_score": score_sum / score_count if score_count else 0.0,
+            },
+        }
+
+    @property
+    def computed_at(self) -> Optional[datetime]:
+        return self._computed_at
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "cached": self._stats is not None,
+            "computed_at": self._computed_at,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+        }
+
+
+# 全局服务实例
+dashboard_stats_service = DashboardStatsService()
+
+
+def _affects_stats(obj, is_new_or_deleted: bool) -> bool:
+    fields = WATCHED_FIELDS.get(type(obj))
+    if fields is None:
+        return False
+    if is_new_or_deleted:
+        return True
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_on_flush(session, flush_context):
+    """ORM 写入设备状态/任务状态/测试结果"""
+    if any(_affects_stats(obj, True) for obj in session.new) or any(
+        _affects_stats(obj, True) for obj in session.deleted
+    ) or any(_affects_stats(obj, False) for obj in session.dirty):
+        session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_on_bulk_write(orm_execute_state):
+    """ORM 批量 update()/delete()/insert() 语句"""
+    if not (
+        orm_execute_state.is_update
+        or orm_execute_state.is_delete
+        or orm_execute_state.is_insert
+    ):
+        return
+    if any(m.class_ in WATCHED_FIELDS for m in orm_execute_state.all_mappers):
+        orm_execute_state.session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    """提交后才失效: 提交前并发读取会重新缓存旧数据"""
+    if session.info.pop(_DIRTY_KEY, False):
+        dashboard_stats_service.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_DIRTY_KEY, None)
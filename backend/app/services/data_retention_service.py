@@ -1,19 +1,112 @@
 """
 数据保留策略服务
 自动清理过期的性能指标、测试结果和审计日志
+
+清理按批进行: 每批按时间索引 (无索引时按主键顺序) 取出一批 id 后删除并提交,
+批间休眠以免长时间占用写锁; 每批的进度与删除在同一事务中写入
+retention_job_state, 进程中断后下次执行从记录的截止时间和主键位置继续。
 """
 
 import logging
+import threading
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
-from sqlalchemy import text
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import text, select, delete, update, insert, func
 
 from app.core.config import settings
-from app.core.database import sync_engine
+from app.core.database import background_engine, Base
+from app.models.sqlite import RetentionJobState
+from app.services.metrics_partition_service import metrics_partitions
+from app.services.metrics_compact_service import metrics_compact
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class RetentionJob:
+    """一张表的清理规则"""
+
+    table: str
+    time_column: str
+    retention_attr: Optional[str] = None  # DataRetentionService 上的保留天数属性
+    retention_days: int = 30
+    statuses: Tuple[str, ...] = ()  # 仅删除这些状态的行
+    orphan_of: Optional[Tuple[str, str]] = None  # (外键列, 父表): 父行不存在即为孤立数据
+    where: Tuple[Tuple[str, Any], ...] = ()  # 固定过滤条件 (列, 值)
+    name: str = ""  # 进度记录名, 同一张表有多个规则时区分 (默认为表名)
+
+    def __post_init__(self):
+        if not self.name:
+            self.name = self.table
+
+
+# 需要清理的表 (按执行顺序)
+RETENTION_JOBS: List[RetentionJob] = [
+    RetentionJob(
+        "performance_metrics",
+        "timestamp",
+        retention_attr="metrics_retention_days",
+        orphan_of=("device_id", "devices"),
+    ),
+    RetentionJob(
+        "performance_metric_details",
+        "timestamp",
+        retention_attr="metrics_retention_days",
+        orphan_of=("device_id", "devices"),
+    ),
+    RetentionJob("test_results", "created_at", retention_attr="results_retention_days"),
+    RetentionJob("audit_logs", "created_at", retention_attr="audit_logs_retention_days"),
+    RetentionJob(
+        "software_metrics", "timestamp", retention_attr="metrics_retention_days"
+    ),
+    RetentionJob(
+        "control_commands",
+        "created_at",
+        retention_days=30,
+        statuses=("completed", "failed"),
+    ),
+    # 指标汇总按粒度分别保留: 1m 很快过期, 1h / 1d 保留更久
+    *[
+        RetentionJob(
+            "performance_metric_rollups",
+            "bucket_start",
+            retention_attr=f"rollup_{resolution}_retention_days",
+            where=(("resolution", resolution),),
+            name=f"performance_metric_rollups_{resolution}",
+        )
+        for resolution in ("1m", "1h", "1d")
+    ],
+]
+
+_JOBS_BY_NAME = {job.name: job for job in RETENTION_JOBS}
+_state = RetentionJobState.__table__
+
+
+def _iso(value) -> Optional[str]:
+    """datetime 或数据库返回的时间字符串 (SQLite) 统一转为字符串"""
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _primary_key(table):
+    """单列主键 (明细表主键为 metric_id, 紧凑表为整数 id)"""
+    return list(table.primary_key.columns)[0]
+
+
+def _time_indexed(table, job: RetentionJob) -> bool:
+    """
+    时间列是否为某个索引的首列 (决定按时间还是按主键分批)
+    有固定过滤条件时, 索引以这些列开头、其后为时间列也可以
+    """
+    prefix = [column_name for column_name, _ in job.where]
+    columns = [*prefix, job.time_column]
+    return any(
+        index.columns.keys()[: len(columns)] == columns for index in table.indexes
+    )
+
+
 class DataRetentionService:
     """数据保留服务"""
 
@@ -21,12 +114,23 @@ class DataRetentionService:
         self.metrics_retention_days = settings.metrics_retention_days
         self.results_retention_days = settings.results_retention_days
         self.audit_logs_retention_days = settings.audit_logs_retention_days
+        self.rollup_1m_retention_days = settings.metrics_rollup_1m_retention_days
+        self.rollup_1h_retention_days = settings.metrics_rollup_1h_retention_days
+        self.rollup_1d_retention_days = settings.metrics_rollup_1d_retention_days
+        self.batch_size = max(1, settings.retention_batch_size)
+        self.batch_sleep = max(0, settings.retention_batch_sleep_ms) / 1000.0
+
+        # 同一时间只允许一个清理过程 (定时任务、API、后台线程共用)
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current: Optional[str] = None
 
     def get_retention_stats(self) -> Dict[str, Any]:
         """获取数据保留统计"""
         stats = {}
 
-        with sync_engine.connect() as conn:
+        with background_engine.connect() as conn:
             # 性能指标统计
             result = conn.execute(
                 text("SELECT COUNT(*) as count FROM performance_metrics")
@@ -35,14 +139,14 @@ class DataRetentionService:
 
             result = conn.execute(
                 text("""
-                SELECT MIN(timestamp) as oldest, MAX(timestamp) as newest 
+                SELECT MIN(timestamp) as oldest, MAX(timestamp) as newest
                 FROM performance_metrics
             """)
             )
             row = result.fetchone()
             stats["metrics_date_range"] = {
-                "oldest": row[0].isoformat() if row[0] else None,
-                "newest": row[1].isoformat() if row[1] else None,
+                "oldest": _iso(row[0]),
+                "newest": _iso(row[1]),
             }
 
             # 测试结果统计
@@ -90,9 +194,10 @@ class DataRetentionService:
             "alarms",
             "control_commands",
             "ai_analysis_reports",
+            "performance_metric_rollups",
         ]
 
-        with sync_engine.connect() as conn:
+        with background_engine.connect() as conn:
             for table in tables:
                 try:
                     result = conn.execute(text(f"SELECT COUNT(*) FROM {table}"))
@@ -102,210 +207,245 @@ class DataRetentionService:
 
         return sizes
 
-    def cleanup_performance_metrics(self, dry_run: bool = False) -> Dict[str, Any]:
-        """清理过期的性能指标数据"""
-        cutoff_date = datetime.now() - timedelta(days=self.metrics_retention_days)
-
-        with sync_engine.connect() as conn:
-            # 先统计要删除的数据量
-            result = conn.execute(
-                text("""
-                SELECT COUNT(*) FROM performance_metrics 
-                WHERE timestamp < :cutoff
-            """),
-                {"cutoff": cutoff_date},
-            )
-            count_to_delete = result.fetchone()[0]
-
-            if dry_run:
-                return {
-                    "table": "performance_metrics",
-                    "will_delete": count_to_delete,
-                    "cutoff_date": cutoff_date.isoformat(),
-                    "retention_days": self.metrics_retention_days,
-                }
-
-            if count_to_delete > 0:
-                # 执行删除
-                conn.execute(
-                    text("""
-                    DELETE FROM performance_metrics 
-                    WHERE timestamp < :cutoff
-                """),
-                    {"cutoff": cutoff_date},
-                )
-                conn.commit()
-
-                # 清理孤立数据
-                conn.execute(
-                    text("""
-                    DELETE FROM performance_metrics 
-                    WHERE device_id NOT IN (SELECT id FROM devices)
-                """)
+    # ------------------------------------------------
+    # 分批清理
+    # ------------------------------------------------
+
+    def _retention_days(self, job: RetentionJob) -> int:
+        if job.retention_attr:
+            return getattr(self, job.retention_attr)
+        return job.retention_days
+
+    def _table(self, job: RetentionJob):
+        """清理作用的表 (紧凑布局下直接删除紧凑表中的行)"""
+        table = metrics_compact.storage_table(job.table)
+        return table if table is not None else Base.metadata.tables[job.table]
+
+    def _expired_condition(self, job: RetentionJob, table, cutoff: datetime):
+        conditions = [table.c[job.time_column] < cutoff]
+        conditions.extend(table.c[column] == value for column, value in job.where)
+        if job.statuses:
+            conditions.append(table.c.status.in_(job.statuses))
+        return conditions
+
+    def _load_state(self, conn, name: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute(select(_state).where(_state.c.name == name)).first()
+        return dict(row._mapping) if row else None
+
+    def _save_state(self, conn, name: str, **values) -> None:
+        values["updated_at"] = datetime.utcnow()
+        result = conn.execute(
+            update(_state).where(_state.c.name == name).values(**values)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(_state).values(name=name, **values))
+
+    def _begin(self, job: RetentionJob, cutoff: datetime) -> Dict[str, Any]:
+        """开始或继续一张表的清理, 返回本次使用的进度"""
+        with background_engine.begin() as conn:
+            state = self._load_state(conn, job.name)
+            if state and state["status"] in ("running", "failed") and state["cutoff"]:
+                # 上次未完成: 沿用原截止时间和主键位置
+                self._save_state(conn, job.name, status="running", error=None)
+                state.update(status="running", resumed=True)
+                logger.info(
+                    f"Resuming retention cleanup of {job.name} "
+                    f"({state['phase']}, {state['deleted_rows']} rows done)"
                 )
-                conn.commit()
-
-            return {
-                "table": "performance_metrics",
-                "deleted": count_to_delete,
-                "cutoff_date": cutoff_date.isoformat(),
-                "retention_days": self.metrics_retention_days,
+                return state
+
+            fresh = {
+                "status": "running",
+                "phase": "expired",
+                "cutoff": cutoff,
+                "last_id": None,
+                "deleted_rows": 0,
+                "orphan_rows": 0,
+                "chunks": 0,
+                "error": None,
+                "started_at": datetime.utcnow(),
+                "finished_at": None,
             }
-
-    def cleanup_test_results(self, dry_run: bool = False) -> Dict[str, Any]:
-        """清理过期的测试结果"""
-        cutoff_date = datetime.now() - timedelta(days=self.results_retention_days)
-
-        with sync_engine.connect() as conn:
-            # 统计要删除的数据量
-            result = conn.execute(
-                text("""
-                SELECT COUNT(*) FROM test_results 
-                WHERE created_at < :cutoff
-            """),
-                {"cutoff": cutoff_date},
-            )
-            count_to_delete = result.fetchone()[0]
-
-            if dry_run:
-                return {
-                    "table": "test_results",
-                    "will_delete": count_to_delete,
-                    "cutoff_date": cutoff_date.isoformat(),
-                    "retention_days": self.results_retention_days,
-                }
-
-            if count_to_delete > 0:
-                conn.execute(
-                    text("""
-                    DELETE FROM test_results 
-                    WHERE created_at < :cutoff
-                """),
-                    {"cutoff": cutoff_date},
-                )
-                conn.commit()
-
+            self._save_state(conn, job.name, **fresh)
+            return {**fresh, "resumed": False}
+
+    def _delete_in_chunks(
+        self, job: RetentionJob, state: Dict[str, Any], phase: str
+    ) -> bool:
+        """
+        分批删除一个阶段的数据, 每批与进度一起提交
+
+        Returns:
+            阶段是否完成 (收到停止信号时返回 False, 进度保留)
+        """
+        table = self._table(job)
+        pk = _primary_key(table)
+        cutoff = state["cutoff"]
+        counter = "deleted_rows" if phase == "expired" else "orphan_rows"
+
+        while True:
+            if self._stop.is_set():
+                return False
+
+            with background_engine.begin() as conn:
+                if phase == "expired":
+                    query = select(pk).where(
+                        *self._expired_condition(job, table, cutoff)
+                    )
+                    by_time = _time_indexed(table, job)
+                    if by_time:
+                        # 已删除的行不再出现, 每批从最旧的剩余行开始
+                        query = query.order_by(table.c[job.time_column])
+                else:
+                    fk_column, parent_name = job.orphan_of
+                    parent = Base.metadata.tables[parent_name]
+                    # 反连接: 父表中不存在的外键 (替代 NOT IN 子查询)
+                    query = (
+                        select(pk)
+                        .select_from(
+                            table.outerjoin(parent, table.c[fk_column] == parent.c.id)
+                        )
+                        .where(parent.c.id.is_(None))
+                    )
+                    by_time = False
+
+                if not by_time:
+                    # 按主键顺序推进, 中断后从 last_id 之后继续
+                    if state["last_id"] is not None:
+                        last_id = state["last_id"]
+                        if pk.type.python_type is int:
+                            last_id = int(last_id)
+                        query = query.where(pk > last_id)
+                    query = query.order_by(pk)
+
+                ids = conn.execute(query.limit(self.batch_size)).scalars().all()
+                progress = {}
+                if ids:
+                    conn.execute(delete(table).where(pk.in_(ids)))
+                    progress = {
+                        "phase": phase,
+                        "last_id": state["last_id"] if by_time else str(ids[-1]),
+                        counter: state[counter] + len(ids),
+                        "chunks": state["chunks"] + 1,
+                    }
+                    self._save_state(conn, job.name, **progress)
+            # 事务提交后才计入进度
+            state.update(progress)
+
+            if len(ids) < self.batch_size:
+                return True
+            if self.batch_sleep:
+                self._stop.wait(self.batch_sleep)
+
+    def _run_job(self, job: RetentionJob, dry_run: bool) -> Dict[str, Any]:
+        """清理一张表 (dry_run 时只统计)"""
+        retention_days = self._retention_days(job)
+        cutoff_date = datetime.now() - timedelta(days=retention_days)
+        summary = {"table": job.name, "retention_days": retention_days}
+
+        if job.table == "performance_metrics" and metrics_partitions.partitioned:
+            # 分区存储时删除完全过期的分区 (不逐行删除, 孤立数据随分区过期一并删除)
             return {
-                "table": "test_results",
-                "deleted": count_to_delete,
+                **summary,
+                **metrics_partitions.drop_expired(cutoff_date, dry_run),
+                "mode": metrics_partitions.mode,
                 "cutoff_date": cutoff_date.isoformat(),
-                "retention_days": self.results_retention_days,
             }
 
-    def cleanup_audit_logs(self, dry_run: bool = False) -> Dict[str, Any]:
-        """清理过期的审计日志"""
-        cutoff_date = datetime.now() - timedelta(days=self.audit_logs_retention_days)
-
-        with sync_engine.connect() as conn:
-            result = conn.execute(
-                text("""
-                SELECT COUNT(*) FROM audit_logs 
-                WHERE created_at < :cutoff
-            """),
-                {"cutoff": cutoff_date},
-            )
-            count_to_delete = result.fetchone()[0]
-
-            if dry_run:
-                return {
-                    "table": "audit_logs",
-                    "will_delete": count_to_delete,
-                    "cutoff_date": cutoff_date.isoformat(),
-                    "retention_days": self.audit_logs_retention_days,
-                }
-
-            if count_to_delete > 0:
-                conn.execute(
-                    text("""
-                    DELETE FROM audit_logs 
-                    WHERE created_at < :cutoff
-                """),
-                    {"cutoff": cutoff_date},
-                )
-                conn.commit()
-
+        if dry_run:
+            table = self._table(job)
+            with background_engine.connect() as conn:
+                count = conn.execute(
+                    select(func.count())
+                    .select_from(table)
+                    .where(*self._expired_condition(job, table, cutoff_date))
+                ).scalar()
             return {
-                "table": "audit_logs",
-                "deleted": count_to_delete,
+                **summary,
+                "will_delete": count,
                 "cutoff_date": cutoff_date.isoformat(),
-                "retention_days": self.audit_logs_retention_days,
             }
 
-    def cleanup_software_metrics(self, dry_run: bool = False) -> Dict[str, Any]:
-        """清理过期的软件运行指标"""
-        cutoff_date = datetime.now() - timedelta(days=self.metrics_retention_days)
-
-        with sync_engine.connect() as conn:
-            result = conn.execute(
-                text("""
-                SELECT COUNT(*) FROM software_metrics 
-                WHERE timestamp < :cutoff
-            """),
-                {"cutoff": cutoff_date},
-            )
-            count_to_delete = result.fetchone()[0]
+        if not self._lock.acquire(blocking=False):
+            return {**summary, "skipped": True, "reason": "cleanup already running"}
 
-            if dry_run:
+        try:
+            self._current = job.name
+            state = self._begin(job, cutoff_date)
+            try:
+                finished = True
+                if state["phase"] == "expired":
+                    finished = self._delete_in_chunks(job, state, "expired")
+                    # 紧凑布局下指标行只有 device_key, 不做孤立数据清理
+                    orphans = job.orphan_of and job.orphan_of[0] in self._table(job).c
+                    if finished and orphans and state["deleted_rows"] > 0:
+                        state.update(phase="orphans", last_id=None)
+                        with background_engine.begin() as conn:
+                            self._save_state(
+                                conn, job.name, phase="orphans", last_id=None
+                            )
+                if finished and state["phase"] == "orphans":
+                    finished = self._delete_in_chunks(job, state, "orphans")
+            except Exception as e:
+                logger.error(f"Retention cleanup of {job.name} failed: {e}")
+                with background_engine.begin() as conn:
+                    self._save_state(conn, job.name, status="failed", error=str(e))
                 return {
-                    "table": "software_metrics",
-                    "will_delete": count_to_delete,
-                    "cutoff_date": cutoff_date.isoformat(),
-                    "retention_days": self.metrics_retention_days,
+                    **summary,
+                    "deleted": state["deleted_rows"],
+                    "cutoff_date": _iso(state["cutoff"]),
+                    "error": str(e),
                 }
 
-            if count_to_delete > 0:
-                conn.execute(
-                    text("""
-                    DELETE FROM software_metrics 
-                    WHERE timestamp < :cutoff
-                """),
-                    {"cutoff": cutoff_date},
-                )
-                conn.commit()
+            if finished:
+                with background_engine.begin() as conn:
+                    self._save_state(
+                        conn,
+                        job.name,
+                        status="completed",
+                        finished_at=datetime.utcnow(),
+                    )
 
             return {
-                "table": "software_metrics",
-                "deleted": count_to_delete,
-                "cutoff_date": cutoff_date.isoformat(),
-                "retention_days": self.metrics_retention_days,
+                **summary,
+                "deleted": state["deleted_rows"],
+                "orphans_deleted": state["orphan_rows"],
+                "chunks": state["chunks"],
+                "resumed": state["resumed"],
+                "interrupted": not finished,
+                "cutoff_date": _iso(state["cutoff"]),
             }
+        finally:
+            self._current = None
+            self._lock.release()
 
-    def cleanup_old_commands(self, dry_run: bool = False) -> Dict[str, Any]:
-        """清理过期的控制命令"""
-        cutoff_date = datetime.now() - timedelta(days=30)
+    def cleanup_performance_metrics(self, dry_run: bool = False) -> Dict[str, Any]:
+        """清理过期的性能指标数据 (之后分批清理已删除设备的孤立数据)"""
+        return self._run_job(_JOBS_BY_NAME["performance_metrics"], dry_run)
 
-        with sync_engine.connect() as conn:
-            result = conn.execute(
-                text("""
-                SELECT COUNT(*) FROM control_commands 
-                WHERE created_at < :cutoff AND status IN ('completed', 'failed')
-            """),
-                {"cutoff": cutoff_date},
-            )
-            count_to_delete = result.fetchone()[0]
+    def cleanup_test_results(self, dry_run: bool = False) -> Dict[str, Any]:
+        """清理过期的测试结果"""
+        return self._run_job(_JOBS_BY_NAME["test_results"], dry_run)
 
-            if dry_run:
-                return {
-                    "table": "control_commands",
-                    "will_delete": count_to_delete,
-                    "cutoff_date": cutoff_date.isoformat(),
-                }
+    def cleanup_audit_logs(self, dry_run: bool = False) -> Dict[str, Any]:
+        """清理过期的审计日志"""
+        return self._run_job(_JOBS_BY_NAME["audit_logs"], dry_run)
 
-            if count_to_delete > 0:
-                conn.execute(
-                    text("""
-                    DELETE FROM control_commands 
-                    WHERE created_at < :cutoff AND status IN ('completed', 'failed')
-                """),
-                    {"cutoff": cutoff_date},
-                )
-                conn.commit()
+    def cleanup_software_metrics(self, dry_run: bool = False) -> Dict[str, Any]:
+        """清理过期的软件运行指标"""
+        return self._run_job(_JOBS_BY_NAME["software_metrics"], dry_run)
 
-            return {
-                "table": "control_commands",
-                "deleted": count_to_delete,
-                "cutoff_date": cutoff_date.isoformat(),
-            }
+    def cleanup_old_commands(self, dry_run: bool = False) -> Dict[str, Any]:
+        """清理过期的控制命令 (仅已完成/失败的命令)"""
+        return self._run_job(_JOBS_BY_NAME["control_commands"], dry_run)
+
+    def cleanup_metric_rollups(self, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """清理过期的性能指标汇总 (1m / 1h / 1d 各自的保留天数)"""
+        return [
+            self._run_job(job, dry_run)
+            for job in RETENTION_JOBS
+            if job.table == "performance_metric_rollups"
+        ]
 
     def run_cleanup(self, dry_run: bool = False) -> Dict[str, Any]:
         """执行所有清理任务"""
@@ -315,12 +455,21 @@ class DataRetentionService:
             "tasks": [],
         }
 
-        # 清理各项数据
-        results["tasks"].append(self.cleanup_performance_metrics(dry_run))
-        results["tasks"].append(self.cleanup_test_results(dry_run))
-        results["tasks"].append(self.cleanup_audit_logs(dry_run))
-        results["tasks"].append(self.cleanup_software_metrics(dry_run))
-        results["tasks"].append(self.cleanup_old_commands(dry_run))
+        if not dry_run and not self._lock.acquire(blocking=False):
+            results["skipped"] = True
+            results["reason"] = "cleanup already running"
+            results["total_deleted"] = 0
+            return results
+
+        try:
+            # 清理各项数据
+            for job in RETENTION_JOBS:
+                if self._stop.is_set():
+                    break
+                results["tasks"].append(self._run_job(job, dry_run))
+        finally:
+            if not dry_run:
+                self._lock.release()
 
         # 统计删除总数
         results["total_deleted"] = sum(
@@ -329,10 +478,92 @@ class DataRetentionService:
 
         return results
 
+    # ------------------------------------------------
+    # 后台执行与进度
+    # ------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start_cleanup(self) -> bool:
+        """在后台线程执行清理, 已有清理在进行时返回 False"""
+        if self.running or self._current is not None:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run_background, name="data-retention", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _run_background(self) -> None:
+        try:
+            result = self.run_cleanup(dry_run=False)
+            logger.info(f"Retention cleanup finished: {result['total_deleted']} rows")
+        except Exception as e:
+            logger.error(f"Retention cleanup failed: {e}")
+
+    def resume_interrupted(self) -> bool:
+        """启动时继续上次中断的清理"""
+        with background_engine.connect() as conn:
+            pending = conn.execute(
+                select(func.count())
+                .select_from(_state)
+                .where(_state.c.status.in_(("running", "failed")))
+            ).scalar()
+        if not pending:
+            return False
+        logger.info(f"Resuming {pending} interrupted retention job(s)")
+        return self.start_cleanup()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """停止后台清理 (当前批提交后退出, 进度保留以便继续)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def get_progress(self) -> Dict[str, Any]:
+        """获取清理进度 (各表状态来自 retention_job_state)"""
+        with background_engine.connect() as conn:
+            rows = conn.execute(select(_state).order_by(_state.c.name)).all()
+        states = {row.name: row for row in rows}
+
+        tables = []
+        for job in RETENTION_JOBS:
+            row = states.get(job.name)
+            if row is None:
+                tables.append({"table": job.name, "status": "pending"})
+                continue
+            tables.append(
+                {
+                    "table": job.name,
+                    "status": row.status,
+                    "phase": row.phase,
+                    "cutoff_date": _iso(row.cutoff),
+                    "deleted": row.deleted_rows or 0,
+                    "orphans_deleted": row.orphan_rows or 0,
+                    "chunks": row.chunks or 0,
+                    "error": row.error,
+                    "started_at": _iso(row.started_at),
+                    "finished_at": _iso(row.finished_at),
+                    "updated_at": _iso(row.updated_at),
+                }
+            )
+
+        return {
+            "running": self._current is not None,
+            "current_table": self._current,
+            "batch_size": self.batch_size,
+            "batch_sleep_ms": int(self.batch_sleep * 1000),
+            "tables": tables,
+        }
+
     def vacuum_database(self) -> Dict[str, Any]:
         """VACUUM 数据库以回收空间"""
         try:
-            with sync_engine.connect() as conn:
+            with background_engine.connect() as conn:
                 conn.execute(text("VACUUM"))
                 conn.commit()
             return {"success": True, "message": "数据库 VACUUM 完成"}
@@ -0,0 +1,461 @@
+"""
+设备在线状态 (presence) 服务
+心跳只更新内存中的在线状态表 (按 MAC 和 device_id 索引) 并立即返回,
+后台线程定时把 last_seen_at / status 的变化合并为批量 UPDATE 写入数据库;
+硬件信息只有在与已知值不同时才写入。超过 offline_after 秒未收到心跳的设备
+会被标记为 offline。
+
+状态表位于进程内存中, 与 write-behind 队列一样假设单个 API 进程。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import ReadSessionLocal
+from app.core.telemetry import metrics_registry
+from app.models.sqlite import Device
+from app.services.dashboard_stats_service import dashboard_stats_service
+from app.services.sqlite_writer_service import sqlite_writer
+
+logger = logging.getLogger(__name__)
+
+DEVICE_TABLE = Device.__table__
+
+# 心跳 system_info 中可更新的硬件字段
+HARDWARE_FIELDS = (
+    "cpu_model",
+    "cpu_cores",
+    "cpu_threads",
+    "gpu_model",
+    "gpu_vram_mb",
+    "ram_total_gb",
+    "disk_model",
+    "disk_type",
+)
+
+_STATUS_UPDATE = (
+    update(DEVICE_TABLE)
+    .where(DEVICE_TABLE.c.id == bindparam("_id"))
+    .values(status=bindparam("_status"), last_seen_at=bindparam("_last_seen_at"))
+)
+
+
+class PresenceEntry:
+    """单个设备的在线状态"""
+
+    __slots__ = (
+        "device_id",
+        "mac_address",
+        "status",
+        "last_seen_at",
+        "stored_status",
+        "hardware",
+        "pending_hardware",
+        "dirty",
+    )
+
+    def __init__(self, device_id: str, mac_address: str, status: str,
+                 last_seen_at: Optional[datetime], hardware: Tuple[Any, ...]):
+        self.device_id = device_id
+        self.mac_address = mac_address
+        self.status = status
+        self.last_seen_at = last_seen_at
+        # 数据库中当前的状态, 用于判断仪表盘统计是否需要失效
+        self.stored_status = status
+        # 已知的硬件字段值 (与 HARDWARE_FIELDS 顺序一致)
+        self.hardware = hardware
+        # 待写入的硬件字段变化
+        self.pending_hardware: Optional[Dict[str, Any]] = None
+        self.dirty = False
+
+
+def _entry_from_row(row) -> PresenceEntry:
+    return PresenceEntry(
+        device_id=row.id,
+        mac_address=row.mac_address,
+        status=row.status,
+        last_seen_at=row.last_seen_at,
+        hardware=tuple(getattr(row, name) for name in HARDWARE_FIELDS),
+    )
+
+
+_ENTRY_COLUMNS = [
+    DEVICE_TABLE.c.id,
+    DEVICE_TABLE.c.mac_address,
+    DEVICE_TABLE.c.status,
+    DEVICE_TABLE.c.last_seen_at,
+    *(DEVICE_TABLE.c[name] for name in HARDWARE_FIELDS),
+]
+
+
+class DevicePresenceService:
+    """内存在线状态表 + 定时批量刷写"""
+
+    def __init__(
+        self,
+        flush_interval_seconds: int = settings.presence_flush_interval_seconds,
+        offline_after_seconds: int = settings.presence_offline_after_seconds,
+    ):
+        self.flush_interval = flush_interval_seconds
+        self.offline_after = offline_after_seconds
+
+        self._by_mac: Dict[str, PresenceEntry] = {}
+        self._by_id: Dict[str, PresenceEntry] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        # 统计信息
+        self.heartbeats = 0
+        self.loads = 0
+        self.registrations = 0
+        self.flushed_rows = 0
+        self.hardware_updates = 0
+        self.marked_offline = 0
+        self.failed_flushes = 0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.last_flush_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """启动后台刷写线程"""
+        if self._running:
+            return
+        self._running = True
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="device-presence", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Device presence started (flush_interval={self.flush_interval}s, "
+            f"offline_after={self.offline_after}s)"
+        )
+
+    def stop(self, timeout: float = 30.0):
+        """停止后台线程并写入剩余的状态变化"""
+        if not self._running:
+            return
+        self._running = False
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        logger.info("Device presence stopped")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.sweep()
+                self.flush()
+            except Exception as e:
+                logger.error(f"Device presence flush failed: {e}")
+
+    def warm(self, db: Session) -> int:
+        """
+        启动时加载所有非 offline 设备, 使重启前在线的设备也能按超时转为 offline
+
+        Returns:
+            加载的设备数
+        """
+        rows = db.execute(
+            select(*_ENTRY_COLUMNS).where(DEVICE_TABLE.c.status != "offline")
+        ).all()
+        with self._lock:
+            for row in rows:
+                self._add(_entry_from_row(row))
+        logger.info(f"Device presence warmed with {len(rows)} devices")
+        return len(rows)
+
+    def _add(self, entry: PresenceEntry):
+        """加入状态表 (需持有锁)"""
+        self._by_mac[entry.mac_address] = entry
+        self._by_id[entry.device_id] = entry
+
+    def _load(self, db: Session, mac_address: str) -> Optional[PresenceEntry]:
+        """从数据库加载设备到状态表"""
+        row = db.execute(
+            select(*_ENTRY_COLUMNS).where(DEVICE_TABLE.c.mac_address == mac_address)
+        ).first()
+        if row is None:
+            return None
+        self.loads += 1
+        entry = _entry_from_row(row)
+        with self._lock:
+            # 并发心跳可能已经加载过
+            existing = self._by_mac.get(mac_address)
+            if existing is not None:
+                return existing
+            self._add(entry)
+        return entry
+
+    def heartbeat(
+        self,
+        db: Session,
+        mac_address: str,
+        status: str,
+        system_info: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        处理一次心跳
+
+        设备已在状态表中时不访问数据库; 首次出现的 MAC 从数据库加载,
+        数据库中也不存在时自动注册 (立即提交)。
+        """
+        self.heartbeats += 1
+        entry = self._by_mac.get(mac_address) or self._load(db, mac_address)
+        if entry is None:
+            return self._register(db, mac_address, status)
+
+        now = datetime.utcnow()
+        with self._lock:
+            entry.status = status
+            entry.last_seen_at = now
+            entry.dirty = True
+
+            if system_info:
+                changes = {}
+                for index, name in enumerate(HARDWARE_FIELDS):
+                    if name in system_info:
+                        value = system_info.get(name)
+                        if value != entry.hardware[index]:
+                            changes[name] = value
+                if changes:
+                    entry.hardware = tuple(
+                        changes.get(name, entry.hardware[i])
+                        for i, name in enumerate(HARDWARE_FIELDS)
+                    )
+                    entry.pending_hardware = {**(entry.pending_hardware or {}), **changes}
+
+        if not self._running:
+            # 未启用后台刷写时在请求内写入
+            self.flush()
+        return {"status": "ok"}
+
+    def _register(self, db: Session, mac_address: str, status: str) -> Dict[str, Any]:
+        """自动注册未知设备"""
+        logger.info(f"Device not found, auto-registering: {mac_address}")
+        device = Device(
+            device_name=mac_address[:8],
+            mac_address=mac_address,
+            ip_address="",
+            hostname="",
+            status=status,
+            last_seen_at=datetime.utcnow(),
+        )
+        db.add(device)
+        db.commit()
+        db.refresh(device)
+        self.registrations += 1
+
+        with self._lock:
+            self._add(
+                PresenceEntry(
+                    device_id=device.id,
+                    mac_address=mac_address,
+                    status=device.status,
+                    last_seen_at=device.last_seen_at,
+                    hardware=tuple(getattr(device, name) for name in HARDWARE_FIELDS),
+                )
+            )
+        return {"status": "registered", "device_id": str(device.id)}
+
+    def sweep(self) -> int:
+        """将超时未心跳的设备标记为 offline"""
+        if not self.offline_after:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.offline_after)
+        count = 0
+        with self._lock:
+            for entry in self._by_id.values():
+                if (
+                    entry.status != "offline"
+                    and entry.last_seen_at is not None
+                    and entry.last_seen_at.replace(tzinfo=None) < cutoff
+                ):
+                    entry.status = "offline"
+                    entry.dirty = True
+                    count += 1
+        self.marked_offline += count
+        return count
+
+    def _take_dirty(self) -> List[Tuple[PresenceEntry, str, datetime, Optional[Dict[str, Any]]]]:
+        """取出待写入的变化快照并清除标记 (需持有锁)"""
+        batch = []
+        for entry in self._by_id.values():
+            if entry.dirty:
+                batch.append(
+                    (entry, entry.status, entry.last_seen_at, entry.pending_hardware)
+                )
+                entry.dirty = False
+                entry.pending_hardware = None
+        return batch
+
+    def flush(self) -> int:
+        """
+        把状态变化写入数据库: 一条 executemany UPDATE 更新全部设备的
+        status/last_seen_at, 硬件变化逐设备更新
+
+        Returns:
+            写入的设备数
+        """
+        with self._lock:
+            batch = self._take_dirty()
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            rowcount = sqlite_writer.run(lambda conn: self._write(conn, batch))
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.error(f"Failed to flush presence for {len(batch)} devices: {e}")
+            self._requeue(batch)
+            return 0
+
+        # 行数不一致说明有设备已被删除, 从状态表移除以便下次心跳重新注册
+        if rowcount is not None and 0 <= rowcount < len(batch):
+            self._drop_missing([e.device_id for e, _, _, _ in batch])
+
+        status_changed = False
+        for entry, status, _, _ in batch:
+            if entry.stored_status != status:
+                entry.stored_status = status
+                status_changed = True
+        if status_changed:
+            # Core UPDATE 不经过 ORM 事件, 需要手动使统计缓存失效
+            dashboard_stats_service.invalidate()
+
+        self.flushed_rows += len(batch)
+        self.last_flush_rows = len(batch)
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+        self.last_flush_at = time.time()
+        return len(batch)
+
+    def _requeue(self, batch):
+        """写入失败时恢复待写入标记, 下次刷写重试"""
+        with self._lock:
+            for entry, _, _, hardware in batch:
+                entry.dirty = True
+                if hardware:
+                    entry.pending_hardware = {**hardware, **(entry.pending_hardware or {})}
+
+    def _write(self, conn: Connection, batch) -> Optional[int]:
+        """在一个事务中写入一批状态变化, 返回 UPDATE 命中的行数"""
+        result = conn.execute(
+            _STATUS_UPDATE,
+            [
+                {"_id": e.device_id, "_status": s, "_last_seen_at": t}
+                for e, s, t, _ in batch
+            ],
+        )
+        for entry, _, _, hardware in batch:
+            if hardware:
+                conn.execute(
+                    update(DEVICE_TABLE)
+                    .where(DEVICE_TABLE.c.id == entry.device_id)
+                    .values(**hardware)
+                )
+                self.hardware_updates += 1
+        return result.rowcount
+
+    def _drop_missing(self, device_ids: List[str]):
+        with ReadSessionLocal() as db:
+            existing = set(
+                db.execute(
+                    select(DEVICE_TABLE.c.id).where(DEVICE_TABLE.c.id.in_(device_ids))
+                ).scalars()
+            )
+        for device_id in device_ids:
+            if device_id not in existing:
+                self.forget(device_id=device_id)
+
+    def forget(self, device_id: Optional[str] = None, mac_address: Optional[str] = None):
+        """
+        从状态表移除设备 (设备被删除或其信息被直接修改时调用),
+        下次心跳会从数据库重新加载
+        """
+        with self._lock:
+            entry = self._by_id.get(device_id) if device_id else None
+            if entry is None and mac_address:
+                entry = self._by_mac.get(mac_address)
+            if entry is None:
+                return
+            self._by_id.pop(entry.device_id, None)
+            if self._by_mac.get(entry.mac_address) is entry:
+                self._by_mac.pop(entry.mac_address, None)
+
+    def get(self, device_id: str) -> Optional[Tuple[str, Optional[datetime]]]:
+        """返回内存中的 (status, last_seen_at), 设备不在状态表中时返回 None"""
+        entry = self._by_id.get(device_id)
+        if entry is None:
+            return None
+        return entry.status, entry.last_seen_at
+
+    def status_changes(self) -> Dict[str, Tuple[str, str]]:
+        """
+        尚未写入数据库的状态变化: device_id -> (数据库中的状态, 内存中的状态)
+
+        按状态筛选设备时据此修正数据库条件, 使结果与显示的状态一致
+        """
+        with self._lock:
+            return {
+                e.device_id: (e.stored_status, e.status)
+                for e in self._by_id.values()
+                if e.status != e.stored_status
+            }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取状态表统计"""
+        with self._lock:
+            pending = sum(1 for e in self._by_id.values() if e.dirty)
+            online = sum(1 for e in self._by_id.values() if e.status != "offline")
+        return {
+            "running": self._running,
+            "devices": len(self._by_id),
+            "online": online,
+            "pending_updates": pending,
+            "flush_interval_seconds": self.flush_interval,
+            "offline_after_seconds": self.offline_after,
+            "heartbeats": self.heartbeats,
+            "loads": self.loads,
+            "registrations": self.registrations,
+            "flushed_rows": self.flushed_rows,
+            "hardware_updates": self.hardware_updates,
+            "marked_offline": self.marked_offline,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": self.last_flush_ms,
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+# 全局服务实例
+device_presence = DevicePresenceService()
+
+metrics_registry.gauge(
+    "presence_devices", "Devices tracked in the heartbeat presence table",
+    fn=lambda: len(device_presence._by_id),
+)
+metrics_registry.counter(
+    "presence_heartbeats_total", "Heartbeats received",
+    fn=lambda: device_presence.heartbeats,
+)
+metrics_registry.counter(
+    "presence_flushed_rows_total", "Device status rows written by presence flushes",
+    fn=lambda: device_presence.flushed_rows,
+)
@@ -0,0 +1,209 @@
+"""
+键集 (游标) 分页
+列表按 (时间列, id) 倒序排列, 游标记录翻页边界行的这两个值:
+下一页取 (时间, id) 小于游标的行, 上一页取大于游标的行再反转,
+无论翻到多深都只走索引范围扫描, 不再使用 OFFSET。
+
+游标对客户端不透明 (base64url 编码的 JSON); 传空字符串表示从第一页开始。
+总数可选, 来自近似计数器: 无过滤条件时读取数据库统计信息 (PostgreSQL / MySQL),
+否则执行一次 COUNT, 结果按查询条件缓存一段时间。
+"""
+
+import base64
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NEXT = "next"
+PREV = "prev"
+
+
+@dataclass
+class Cursor:
+    """解码后的游标"""
+
+    direction: str  # NEXT: 向更旧的数据翻页; PREV: 向更新的数据翻页
+    sort_value: Any
+    row_id: Any
+
+
+@dataclass
+class KeysetPage:
+    """一页结果及前后页游标 (没有更多数据时为 None)"""
+
+    items: List[Any]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(direction: str, sort_value: Any, row_id: Any) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"t": sort_value.isoformat()}
+    payload = json.dumps([direction, sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """
+    解码游标
+
+    Returns:
+        Cursor; 空字符串返回 None (第一页)
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, sort_value, row_id = json.loads(raw)
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["t"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+    if direction not in (NEXT, PREV):
+        raise ValueError(f"Invalid cursor: {token}")
+    return Cursor(direction, sort_value, row_id)
+
+
+def keyset_query(query, sort_column, id_column, cursor: Optional[Cursor], limit: int):
+    """
+    为查询加上游标条件、排序和 LIMIT (多取一行用于判断是否还有数据)
+
+    调用方执行查询后把结果交给 keyset_page
+    """
+    if cursor is None or cursor.direction == NEXT:
+        if cursor is not None:
+            query = query.where(
+                or_(
+                    sort_column < cursor.sort_value,
+                    and_(sort_column == cursor.sort_value, id_column < cursor.row_id),
+                )
+            )
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.where(
+            or_(
+                sort_column > cursor.sort_value,
+                and_(sort_column == cursor.sort_value, id_column > cursor.row_id),
+            )
+        ).order_by(sort_column.asc(), id_column.asc())
+    return query.limit(limit + 1)
+
+
+def keyset_page(
+    rows: List[Any],
+    cursor: Optional[Cursor],
+    limit: int,
+    key: Callable[[Any], Tuple[Any, Any]],
+) -> KeysetPage:
+    """
+    将 keyset_query 的结果整理为一页 (统一为倒序) 并生成前后页游标
+
+    Args:
+        rows: 查询结果
+        cursor: 本次请求的游标
+        limit: 每页行数
+        key: 行 -> (时间列值, id)
+    """
+    has_more = len(rows) > limit
+    items = list(rows[:limit])
+    backwards = cursor is not None and cursor.direction == PREV
+    if backwards:
+        items.reverse()
+    if not items:
+        return KeysetPage(items, None, None)
+
+    # 多取的一行在翻页方向一侧; 另一侧是来时的页, 必然还有数据
+    if backwards:
+        more_older, more_newer = True, has_more
+    else:
+        more_older, more_newer = has_more, cursor is not None
+    return KeysetPage(
+        items,
+        encode_cursor(NEXT, *key(items[-1])) if more_older else None,
+        encode_cursor(PREV, *key(items[0])) if more_newer else None,
+    )
+
+
+class ApproximateCounter:
+    """列表总数的近似值 (按查询条件缓存)"""
+
+    def __init__(self, ttl_seconds: int = settings.pagination_count_ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._cache: Dict[Hashable, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(
+        self,
+        db: Session,
+        key: Hashable,
+        query,
+        table_name: Optional[str] = None,
+    ) -> int:
+        """
+        Args:
+            db: 同步 Session (异步接口中通过 AsyncSession.run_sync 调用)
+            key: 缓存键, 通常为 (表名, 过滤条件...)
+            query: 未分页的 SELECT, 缓存未命中且无法估算时对其 COUNT
+            table_name: 查询没有过滤条件时传入表名, 优先使用数据库统计信息估算
+        """
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None and now - cached[1] < self.ttl_seconds:
+            self.hits += 1
+            return cached[0]
+
+        self.misses += 1
+        total = self._estimate(db, table_name) if table_name else None
+        if total is None:
+            total = db.execute(
+                select(func.count()).select_from(query.order_by(None).subquery())
+            ).scalar() or 0
+
+        with self._lock:
+            if len(self._cache) > 1000:
+                self._cache.clear()
+            self._cache[key] = (total, now)
+        return total
+
+    def _estimate(self, db: Session, table_name: str) -> Optional[int]:
+        """从数据库统计信息读取表行数 (SQLite 没有统计信息, 返回 None)"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = :name"
+        elif dialect == "mysql":
+            sql = (
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"
+            )
+        else:
+            return None
+        try:
+            value = db.execute(text(sql), {"name": table_name}).scalar()
+        except Exception as e:
+            logger.debug(f"Row estimate for {table_name} unavailable: {e}")
+            return None
+        # reltuples 为 -1 表示从未 ANALYZE
+        return int(value) if value is not None and value >= 0 else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+# 全局计数器实例
+approximate_counts = ApproximateCounter()
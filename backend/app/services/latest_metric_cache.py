@@ -0,0 +1,203 @@
+"""
+设备最新性能指标缓存
+在指标写入时更新 (create_metric / create_metrics_batch), 供最新指标查询、
+设备状态、监控大屏和 WebSocket 推送共用; 未命中时回退到数据库查询。
+
+缓存位于进程内存中, 与 write-behind 队列一样假设单个 API 进程。
+写入时的行字典自带明细字段; 从数据库加载的行只有数值列, 明细在首次读取时补齐。
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.sqlite import PerformanceMetric
+from app.services.metrics_ingest_service import JSON_COLUMNS, METRIC_COLUMNS
+from app.services.metric_detail_store import DETAIL_COLUMNS, metric_details
+
+logger = logging.getLogger(__name__)
+
+# 大屏概览默认返回的字段 (不含进程列表等大字段)
+OVERVIEW_COLUMNS = [
+    name
+    for name in METRIC_COLUMNS
+    if name not in JSON_COLUMNS and name not in ("id", "raw_data", "created_at")
+]
+
+
+def _sort_key(value: Any) -> datetime:
+    """时间戳比较键 (统一为 naive UTC, 兼容带时区的值)"""
+    if not isinstance(value, datetime):
+        return datetime.min
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _decode(row: Dict[str, Any]) -> Dict[str, Any]:
+    """复制行并解析 JSON 字段"""
+    data = dict(row)
+    for name in JSON_COLUMNS:
+        value = data.get(name)
+        if value and isinstance(value, str):
+            try:
+                data[name] = json.loads(value)
+            except ValueError:
+                data[name] = None
+    return data
+
+
+class LatestMetricCache:
+    """device_id -> 最新一条指标 (行字典, JSON 字段保持序列化状态以节省内存)"""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._received_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, rows: Iterable[Dict[str, Any]]):
+        """用新写入的行更新缓存 (只保留每个设备时间戳最新的一条)"""
+        newest: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            current = newest.get(row["device_id"])
+            if current is None or _sort_key(row["timestamp"]) >= _sort_key(
+                current["timestamp"]
+            ):
+                newest[row["device_id"]] = row
+
+        now = time.time()
+        with self._lock:
+            for device_id, row in newest.items():
+                cached = self._entries.get(device_id)
+                if cached is None or _sort_key(row["timestamp"]) >= _sort_key(
+                    cached["timestamp"]
+                ):
+                    self._entries[device_id] = row
+                    self._received_at[device_id] = now
+
+    def invalidate(self, device_id: str):
+        """移除设备缓存 (如设备被删除)"""
+        with self._lock:
+            self._entries.pop(device_id, None)
+            self._received_at.pop(device_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._received_at.clear()
+
+    def get(self, db: Session, device_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取设备最新指标 (JSON 字段已解析)
+
+        未命中时查询数据库并写入缓存; 设备没有任何指标时返回 None
+        """
+        row = self._entries.get(device_id)
+        if row is not None:
+            self.hits += 1
+            if DETAIL_COLUMNS[0] not in row:
+                row = self._attach_details(db, row)
+            return _decode(row)
+
+        self.misses += 1
+        metric = db.execute(
+            select(PerformanceMetric.__table__)
+            .where(PerformanceMetric.device_id == device_id)
+            .order_by(PerformanceMetric.timestamp.desc())
+            .limit(1)
+        ).mappings().first()
+        if metric is None:
+            return None
+        row = dict(metric)
+        row.update(metric_details.get(db, row["id"]))
+        self.update([row])
+        return _decode(row)
+
+    def _attach_details(self, db: Session, row: Dict[str, Any]) -> Dict[str, Any]:
+        """为启动预热加载的行补齐明细 (只在该设备首次被查看时读取一次)"""
+        row = {**row, **metric_details.get(db, row["id"])}
+        with self._lock:
+            cached = self._entries.get(row["device_id"])
+            if cached is not None and cached["id"] == row["id"]:
+                self._entries[row["device_id"]] = row
+        return row
+
+    def warm(self, db: Session, hours: int = 24) -> int:
+        """
+        启动时用一条分组查询加载最近有数据的设备的最新指标
+
+        Returns:
+            加载的设备数
+        """
+        since = datetime.utcnow() - timedelta(hours=hours)
+        latest = (
+            select(
+                PerformanceMetric.device_id,
+                func.max(PerformanceMetric.timestamp).label("timestamp"),
+            )
+            .where(PerformanceMetric.timestamp >= since)
+            .group_by(PerformanceMetric.device_id)
+            .subquery()
+        )
+        table = PerformanceMetric.__table__
+        rows = db.execute(
+            select(table).join(
+                latest,
+                (table.c.device_id == latest.c.device_id)
+                & (table.c.timestamp == latest.c.timestamp),
+            )
+        ).mappings()
+        loaded = [dict(row) for row in rows]
+        self.update(loaded)
+        logger.info(f"Latest metric cache warmed with {len(self._entries)} devices")
+        return len(self._entries)
+
+    def snapshot(
+        self,
+        device_ids: Optional[Iterable[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        一次性读取整个缓存 (不访问数据库)
+
+        Args:
+            device_ids: 只返回这些设备, 为空返回全部
+            columns: 返回的字段, 默认 OVERVIEW_COLUMNS
+        """
+        columns = columns or OVERVIEW_COLUMNS
+        now = time.time()
+        with self._lock:
+            if device_ids is None:
+                items = list(self._entries.items())
+            else:
+                items = [
+                    (d, self._entries[d]) for d in device_ids if d in self._entries
+                ]
+            received = dict(self._received_at)
+
+        result = []
+        for device_id, row in items:
+            item = {name: row.get(name) for name in columns}
+            item["device_id"] = device_id
+            item["age_seconds"] = round(now - received.get(device_id, now), 1)
+            result.append(item)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "devices": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# 全局缓存实例
+latest_metric_cache = LatestMetricCache()
@@ -0,0 +1,290 @@
+"""
+事件循环监控
+  - 延迟采样: 协程按固定间隔休眠, 记录实际唤醒比预期晚了多少 (直方图)
+  - 阻塞定位: 看门狗线程发现事件循环超过阈值没有唤醒时, 抓取事件循环线程的
+    调用栈以及当前正在执行的请求 (路由和处理函数), 恢复后记录阻塞时长
+  - 线程池饱和度: 采样同步接口 (def 路由) 使用的 anyio 线程池占用和排队数
+
+请求与 asyncio 任务的对应关系由 LoopMonitorMiddleware 维护 (纯 ASGI 中间件,
+与路由处理函数运行在同一个任务中)。结果通过 /admin/diagnostics/event-loop 查看。
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import anyio.to_thread
+
+from app.core.config import settings
+from app.core.telemetry import Histogram, metrics_registry, route_template
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界 (毫秒)
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+UTILIZATION_BUCKETS = (0.25, 0.5, 0.75, 0.9, 1.0)
+QUEUE_BUCKETS = (0, 1, 5, 10, 25, 50, 100)
+
+
+def _endpoint_name(scope: Dict[str, Any]) -> Optional[str]:
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return None
+    return f"{endpoint.__module__}.{getattr(endpoint, '__qualname__', endpoint.__name__)}"
+
+
+def _route_path(scope: Dict[str, Any]) -> str:
+    return route_template(scope) or scope.get("path", "")
+
+
+class LoopMonitorService:
+    """事件循环延迟 / 阻塞 / 线程池饱和度监控"""
+
+    def __init__(self):
+        self.interval = max(10, settings.loop_monitor_interval_ms) / 1000.0
+        self.block_threshold = max(10, settings.loop_monitor_block_threshold_ms) / 1000.0
+        self.stack_depth = settings.loop_monitor_stack_depth
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        # asyncio 任务 -> 请求 scope (由中间件维护)
+        self._inflight: Dict[asyncio.Task, Dict[str, Any]] = {}
+        self._beat = time.monotonic()
+        # 看门狗在当前阻塞期间抓取的信息, 恢复后由采样协程补上时长并归档
+        self._pending: Optional[Dict[str, Any]] = None
+        self._pool_now: Dict[str, int] = {}
+        self.reset()
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self.started_at = datetime.utcnow()
+            self.lag_ms = Histogram(LAG_BUCKETS_MS)
+            self.block_ms = Histogram(LAG_BUCKETS_MS)
+            self.pool_utilization = Histogram(UTILIZATION_BUCKETS)
+            self.pool_waiting = Histogram(QUEUE_BUCKETS)
+            self.pool_saturated_samples = 0
+            self.events: deque = deque(maxlen=settings.loop_monitor_max_events)
+            self.by_endpoint: Dict[str, Dict[str, Any]] = {}
+
+    # ------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------
+
+    def start(self):
+        """在事件循环中启动 (startup_event 调用)"""
+        if not settings.loop_monitor_enabled or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat = time.monotonic()
+        self._task = self._loop.create_task(self._sample())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        logger.info(
+            f"Event loop monitor started (interval {self.interval * 1000:.0f}ms, "
+            f"block threshold {self.block_threshold * 1000:.0f}ms)"
+        )
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=2)
+            self._watchdog = None
+
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # ------------------------------------------------
+    # 请求跟踪 (中间件调用)
+    # ------------------------------------------------
+
+    def enter_request(self, scope: Dict[str, Any]) -> Optional[asyncio.Task]:
+        task = asyncio.current_task()
+        if task is not None:
+            self._inflight[task] = scope
+        return task
+
+    def exit_request(self, task: Optional[asyncio.Task]):
+        if task is not None:
+            self._inflight.pop(task, None)
+
+    # ------------------------------------------------
+    # 采样
+    # ------------------------------------------------
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop.is_set():
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._beat = time.monotonic()
+            try:
+                self._record_lag(lag)
+                self._sample_pool()
+            except Exception as e:
+                logger.debug(f"Loop monitor sample failed: {e}")
+
+    def _record_lag(self, lag: float):
+        lag_ms = lag * 1000
+        self.lag_ms.observe(lag_ms)
+        with self._lock:
+            event, self._pending = self._pending, None
+        if lag < self.block_threshold:
+            return
+
+        if event is None:
+            # 阻塞时间短于看门狗检查周期, 没有调用栈
+            event = {"at": datetime.utcnow().isoformat(), "route": None, "endpoint": None, "stack": None}
+        event["duration_ms"] = round(lag_ms, 1)
+        self.block_ms.observe(lag_ms)
+        self.events.append(event)
+
+        key = event["endpoint"] or event["route"] or "(unknown)"
+        stats = self.by_endpoint.setdefault(
+            key, {"route": event["route"], "count": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+        stats["count"] += 1
+        stats["total_ms"] = round(stats["total_ms"] + lag_ms, 1)
+        stats["max_ms"] = max(stats["max_ms"], round(lag_ms, 1))
+        if lag_ms >= settings.loop_monitor_log_threshold_ms:
+            logger.warning(
+                f"Event loop blocked for {lag_ms:.0f}ms by {key}"
+                + (f"\n{''.join(event['stack'])}" if event["stack"] else "")
+            )
+
+    def _sample_pool(self):
+        """同步接口线程池 (anyio 默认 limiter) 的占用情况"""
+        stats = anyio.to_thread.current_default_thread_limiter().statistics()
+        utilization = stats.borrowed_tokens / max(1, stats.total_tokens)
+        self.pool_utilization.observe(utilization)
+        self.pool_waiting.observe(stats.tasks_waiting)
+        if stats.borrowed_tokens >= stats.total_tokens:
+            self.pool_saturated_samples += 1
+        self._pool_now = {
+            "busy": stats.borrowed_tokens,
+            "size": stats.total_tokens,
+            "waiting": stats.tasks_waiting,
+        }
+
+    # ------------------------------------------------
+    # 看门狗线程
+    # ------------------------------------------------
+
+    def _watch(self):
+        check = max(0.005, self.block_threshold / 4)
+        captured_beat = None
+        while not self._stop.wait(check):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.block_threshold or captured_beat == beat:
+                continue
+            captured_beat = beat
+            event = self._capture()
+            with self._lock:
+                self._pending = event
+
+    def _capture(self) -> Dict[str, Any]:
+        """抓取事件循环线程当前的调用栈和正在执行的请求"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame)[-self.stack_depth:] if frame else None
+
+        route = endpoint = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        scope = self._inflight.get(task) if task is not None else None
+        if scope is not None:
+            route = f"{scope.get('method', 'WS')} {_route_path(scope)}"
+            endpoint = _endpoint_name(scope)
+        return {
+            "at": datetime.utcnow().isoformat(),
+            "route": route,
+            "endpoint": endpoint,
+            "stack": stack,
+        }
+
+    # ------------------------------------------------
+    # 查询
+    # ------------------------------------------------
+
+    def get_stats(self, include_stacks: bool = True) -> Dict[str, Any]:
+        events = list(self.events)
+        if not include_stacks:
+            events = [{k: v for k, v in e.items() if k != "stack"} for e in events]
+        return {
+            "enabled": settings.loop_monitor_enabled,
+            "running": self.running(),
+            "since": self.started_at.isoformat(),
+            "interval_ms": round(self.interval * 1000),
+            "block_threshold_ms": round(self.block_threshold * 1000),
+            "lag_ms": self.lag_ms.to_dict(),
+            "blocked_ms": self.block_ms.to_dict(),
+            "blocked_by": dict(
+                sorted(self.by_endpoint.items(), key=lambda kv: -kv[1]["total_ms"])
+            ),
+            "recent_blocks": events[::-1],
+            "threadpool": {
+                "current": self._pool_now,
+                "saturated_samples": self.pool_saturated_samples,
+                "utilization": self.pool_utilization.to_dict(),
+                "waiting": self.pool_waiting.to_dict(),
+            },
+            "inflight_requests": len(self._inflight),
+        }
+
+
+class LoopMonitorMiddleware:
+    """记录每个 HTTP / WebSocket 请求所在的 asyncio 任务, 用于阻塞归因"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        task = loop_monitor.enter_request(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            loop_monitor.exit_request(task)
+
+
+# 全局监控实例
+loop_monitor = LoopMonitorService()
+
+metrics_registry.histogram(
+    "event_loop_lag_seconds", "Event loop wake-up delay",
+    fn=lambda: {(): loop_monitor.lag_ms}, scale=0.001,
+)
+metrics_registry.histogram(
+    "event_loop_blocked_seconds", "Event loop stalls above the block threshold",
+    fn=lambda: {(): loop_monitor.block_ms}, scale=0.001,
+)
+metrics_registry.gauge(
+    "threadpool_busy_workers", "Busy workers in the sync endpoint thread pool",
+    fn=lambda: loop_monitor._pool_now.get("busy", 0),
+)
+metrics_registry.gauge(
+    "threadpool_waiting_tasks", "Calls waiting for a sync endpoint worker",
+    fn=lambda: loop_monitor._pool_now.get("waiting", 0),
+)
@@ -0,0 +1,314 @@
+"""
+性能指标明细存储
+top_processes / disk_io_details / raw_data 体积大且只在查看单个样本时使用,
+从 performance_metrics 拆出后按指标 id 压缩存放在 performance_metric_details,
+图表查询只读取窄的数值表; 明细按 id 批量读取并解压。
+
+升级前写入的数据明细仍在 performance_metrics 的旧列中, 读取时回退到旧列,
+随数据保留策略逐步过期。
+"""
+
+import json
+import logging
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, column, insert, inspect, or_, select, table
+from sqlalchemy.engine import Connection
+
+from app.models.sqlite import PerformanceMetricDetail
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DETAIL_TABLE = PerformanceMetricDetail.__table__
+
+# 明细字段; top_processes / disk_io_details 在行字典中为 JSON 字符串
+DETAIL_COLUMNS = ("top_processes", "disk_io_details", "raw_data")
+JSON_DETAIL_COLUMNS = ("top_processes", "disk_io_details")
+
+# 按 id 查询时每条语句的 id 数 (SQLite 绑定参数上限 999)
+FETCH_CHUNK = 500
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def json_text(value: Any) -> Optional[str]:
+    """
+    明细字段 -> 合法的 JSON 文本 (空值为 None)
+
+    字符串视为已序列化的 JSON; 不是合法 JSON 的字符串按普通字符串序列化
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            json.loads(value)
+            return value
+        except ValueError:
+            return json.dumps(value)
+    return json.dumps(value)
+
+
+class MetricDetailStore:
+    """performance_metric_details 读写"""
+
+    def __init__(self):
+        self.encoding = "zstd" if ZSTD_AVAILABLE else "zlib"
+        self._zstd_compressor = None
+        self._zstd_decompressor = None
+        if ZSTD_AVAILABLE:
+            self._zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+            self._zstd_decompressor = zstandard.ZstdDecompressor()
+        # performance_metrics 中仍存在的旧明细列 (升级前的数据)
+        self._legacy_columns: Tuple[str, ...] = ()
+        self.rows_written = 0
+        self.decode_errors = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def detect_legacy_columns(self, conn: Connection) -> Tuple[str, ...]:
+        """启动时检查 performance_metrics 是否保留了旧的明细列"""
+        try:
+            existing = {
+                c["name"] for c in inspect(conn).get_columns("performance_metrics")
+            }
+        except Exception as e:
+            logger.warning(f"Could not inspect performance_metrics columns: {e}")
+            existing = set()
+        self._legacy_columns = tuple(c for c in DETAIL_COLUMNS if c in existing)
+        if self._legacy_columns:
+            logger.info(
+                "performance_metrics still has legacy detail columns "
+                f"{', '.join(self._legacy_columns)}; reads fall back to them"
+            )
+        return self._legacy_columns
+
+    # ------------------------------------------------
+    # 编码
+    # ------------------------------------------------
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return self._zstd_compressor.compress(data)
+        return zlib.compress(data, ZLIB_LEVEL)
+
+    def _decompress(self, encoding: str, data: bytes) -> bytes:
+        if encoding == "zstd":
+            if not ZSTD_AVAILABLE:
+                raise ValueError("zstd metric detail needs the zstandard package")
+            return self._zstd_decompressor.decompress(data)
+        return zlib.decompress(data)
+
+    def encode(self, row: Dict[str, Any]) -> Optional[bytes]:
+        """
+        行字典中的明细字段 -> 压缩后的 JSON 对象, 没有明细时返回 None
+
+        JSON 字段已由 json_text 规范化为合法的 JSON 文本 (build_metric_row),
+        直接拼接不再重新序列化; 其余类型 (list / dict 等) 在此序列化
+        """
+        parts = []
+        for name in JSON_DETAIL_COLUMNS:
+            value = row.get(name)
+            if value:
+                if not isinstance(value, str):
+                    value = json.dumps(value)
+                parts.append(f'"{name}":{value}')
+        raw = row.get("raw_data")
+        if raw:
+            parts.append(f'"raw_data":{json.dumps(raw)}')
+        if not parts:
+            return None
+
+        data = ("{" + ",".join(parts) + "}").encode()
+        payload = self._compress(data)
+        self.raw_bytes += len(data)
+        self.stored_bytes += len(payload)
+        return payload
+
+    def decode(self, encoding: str, payload: bytes) -> Dict[str, Any]:
+        return json.loads(self._decompress(encoding, payload))
+
+    # ------------------------------------------------
+    # 读写
+    # ------------------------------------------------
+
+    def build_rows(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """指标行 -> 明细行 (仅明细非空的样本)"""
+        detail_rows = []
+        for row in rows:
+            payload = self.encode(row)
+            if payload is not None:
+                detail_rows.append(
+                    {
+                        "metric_id": row["id"],
+                        "device_id": row["device_id"],
+                        "timestamp": row["timestamp"],
+                        "encoding": self.encoding,
+                        "payload": payload,
+                    }
+                )
+        return detail_rows
+
+    def write(self, conn: Connection, rows: List[Dict[str, Any]]) -> int:
+        """写入一批指标行的明细 (与指标在同一事务中, 不提交)"""
+        detail_rows = self.build_rows(rows)
+        if detail_rows:
+            conn.execute(insert(DETAIL_TABLE), detail_rows)
+            self.rows_written += len(detail_rows)
+        return len(detail_rows)
+
+    def fetch(
+        self,
+        conn: Connection,
+        metric_ids: List[str],
+        fields: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        按指标 id 批量读取明细
+
+        Args:
+            conn: 数据库连接 (Session 也可)
+            metric_ids: 指标 id 列表
+            fields: 只返回这些明细字段, 默认全部
+
+        Returns:
+            metric_id -> {字段: 值}; 没有明细的 id 不出现在结果中
+        """
+        fields = tuple(fields or DETAIL_COLUMNS)
+        result: Dict[str, Dict[str, Any]] = {}
+
+        for start in range(0, len(metric_ids), FETCH_CHUNK):
+            chunk = metric_ids[start : start + FETCH_CHUNK]
+            rows = conn.execute(
+                select(
+                    DETAIL_TABLE.c.metric_id,
+                    DETAIL_TABLE.c.encoding,
+                    DETAIL_TABLE.c.payload,
+                ).where(DETAIL_TABLE.c.metric_id.in_(chunk))
+            )
+            for metric_id, encoding, payload in rows:
+                try:
+                    detail = self.decode(encoding, payload)
+                except Exception as e:
+                    self.decode_errors += 1
+                    logger.error(
+                        f"Undecodable {encoding} detail payload for metric {metric_id} "
+                        f"({len(payload or b'')} bytes): {e}"
+                    )
+                    continue
+                result[metric_id] = {name: detail.get(name) for name in fields}
+
+        legacy = [c for c in fields if c in self._legacy_columns]
+        missing = [m for m in metric_ids if m not in result]
+        if legacy and missing:
+            result.update(self._fetch_legacy(conn, missing, legacy, fields))
+        return result
+
+    def _fetch_legacy(
+        self, conn: Connection, metric_ids: List[str], legacy: List[str], fields
+    ) -> Dict[str, Dict[str, Any]]:
+        """从 performance_metrics 旧列读取升级前写入的明细"""
+        legacy_table = table(
+            "performance_metrics", column("id"), *(column(c) for c in legacy)
+        )
+        result = {}
+        for start in range(0, len(metric_ids), FETCH_CHUNK):
+            chunk = metric_ids[start : start + FETCH_CHUNK]
+            rows = conn.execute(
+                select(legacy_table).where(legacy_table.c.id.in_(chunk))
+            ).mappings()
+            for row in rows:
+                detail = {}
+                for name in fields:
+                    value = row.get(name)
+                    if value and name in JSON_DETAIL_COLUMNS and isinstance(value, str):
+                        try:
+                            value = json.loads(value)
+                        except ValueError:
+                            value = None
+                    detail[name] = value or None
+                if any(v is not None for v in detail.values()):
+                    result[row["id"]] = detail
+        return result
+
+    def move_legacy(self, conn: Connection, table_name: str) -> int:
+        """
+        把 table_name 旧明细列中的数据移入明细表 (存储布局转换前调用,
+        转换后旧列不再能通过 performance_metrics 读取); 已有明细的样本跳过
+        """
+        existing = {c["name"] for c in inspect(conn).get_columns(table_name)}
+        inline = [c for c in DETAIL_COLUMNS if c in existing]
+        if not inline:
+            return 0
+
+        source = table(
+            table_name,
+            column("id"),
+            column("device_id"),
+            column("timestamp", DateTime),
+            *(column(c) for c in inline),
+        )
+        moved = 0
+        last_id = None
+        while True:
+            query = select(source).where(or_(*(source.c[c].is_not(None) for c in inline)))
+            if last_id is not None:
+                query = query.where(source.c.id > last_id)
+            rows = conn.execute(query.order_by(source.c.id).limit(FETCH_CHUNK)).mappings().all()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+
+            stored = set(
+                conn.execute(
+                    select(DETAIL_TABLE.c.metric_id).where(
+                        DETAIL_TABLE.c.metric_id.in_([row["id"] for row in rows])
+                    )
+                ).scalars()
+            )
+            detail_rows = self.build_rows(
+                {
+                    **row,
+                    **{c: json_text(row[c]) for c in inline if c in JSON_DETAIL_COLUMNS},
+                }
+                for row in rows
+                if row["id"] not in stored
+            )
+            if detail_rows:
+                conn.execute(insert(DETAIL_TABLE), detail_rows)
+                moved += len(detail_rows)
+
+        if moved:
+            logger.info(f"Moved inline detail of {moved} samples from {table_name}")
+        return moved
+
+    def get(self, conn: Connection, metric_id: str) -> Dict[str, Any]:
+        """读取单个样本的明细 (没有时各字段为 None)"""
+        detail = self.fetch(conn, [metric_id]).get(metric_id)
+        return detail or {name: None for name in DETAIL_COLUMNS}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "encoding": self.encoding,
+            "legacy_columns": list(self._legacy_columns),
+            "rows_written": self.rows_written,
+            "decode_errors": self.decode_errors,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compression_ratio": round(self.raw_bytes / self.stored_bytes, 2)
+            if self.stored_bytes
+            else None,
+        }
+
+
+# 全局明细存储实例
+metric_details = MetricDetailStore()
@@ -0,0 +1,270 @@
+"""
+性能指标紧凑列式传输格式 (Agent -> /performance/metrics/batch)
+
+与逐样本 JSON 相比:
+  - 按列存储, 每个字段名每批次只出现一次
+  - 时间戳以首个样本的毫秒时间为基准做差分编码
+  - top_processes / disk_io_details 共享字段表, 每行只保留值
+  - 整体再经 gzip 或 zstd 压缩 (Content-Encoding)
+
+Content-Type: application/vnd.rolefit.metrics-columnar+json
+解码结果直接生成批量写入所需的样本字典, 不经过 Pydantic 逐样本校验。
+"""
+
+import gzip
+import json
+import math
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+COLUMNAR_CONTENT_TYPE = "application/vnd.rolefit.metrics-columnar+json"
+COLUMNAR_FORMAT_VERSION = 1
+
+# 解压后负载大小上限, 防止压缩炸弹
+MAX_DECODED_BYTES = 64 * 1024 * 1024
+
+# 单批次样本数上限
+MAX_BATCH_SAMPLES = 100000
+
+# 数值列 (与 PerformanceMetric 一致)
+FLOAT_COLUMNS = (
+    "cpu_percent",
+    "cpu_temperature",
+    "cpu_power_watts",
+    "cpu_frequency_mhz",
+    "gpu_percent",
+    "gpu_temperature",
+    "gpu_power_watts",
+    "gpu_frequency_mhz",
+    "gpu_memory_used_mb",
+    "gpu_memory_total_mb",
+    "memory_percent",
+    "memory_used_mb",
+    "memory_available_mb",
+    "disk_read_mbps",
+    "disk_write_mbps",
+    "disk_io_percent",
+    "network_sent_mbps",
+    "network_recv_mbps",
+)
+INT_COLUMNS = ("process_count",)
+TABLE_COLUMNS = ("top_processes", "disk_io_details")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class MetricsCodecError(ValueError):
+    """紧凑格式解码失败"""
+
+
+class UnsupportedEncodingError(MetricsCodecError):
+    """不支持的 Content-Encoding"""
+
+
+def _to_epoch_ms(value: Any) -> Optional[int]:
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return int((value - _EPOCH).total_seconds() * 1000)
+
+
+def _encode_table(rows_per_sample: List[Any]) -> Dict[str, Any]:
+    """[[{k: v}, ...], ...] -> {"fields": [...], "rows": [[[v, ...], ...], ...]}"""
+    fields: List[str] = []
+    index: Dict[str, int] = {}
+    for items in rows_per_sample:
+        for item in items or []:
+            for key in item:
+                if key not in index:
+                    index[key] = len(fields)
+                    fields.append(key)
+    rows = [
+        [[item.get(key) for key in fields] for item in items] if items else None
+        for items in rows_per_sample
+    ]
+    return {"fields": fields, "rows": rows}
+
+
+def _decode_table(table: Dict[str, Any], count: int) -> List[Optional[List[dict]]]:
+    fields = table.get("fields") or []
+    rows = table.get("rows") or [None] * count
+    if len(rows) != count:
+        raise MetricsCodecError("table row count does not match sample count")
+    return [
+        [
+            {k: v for k, v in zip(fields, values) if v is not None}
+            for values in items
+        ]
+        if items
+        else None
+        for items in rows
+    ]
+
+
+def encode_metrics_batch(device_id: str, samples: List[Dict[str, Any]]) -> bytes:
+    """将样本列表编码为列式 JSON (未压缩)"""
+    stamps = [_to_epoch_ms(s.get("timestamp")) for s in samples]
+    base = next((t for t in stamps if t is not None), None)
+    deltas: List[Optional[int]] = []
+    previous = base
+    for t in stamps:
+        if t is None:
+            deltas.append(None)
+            continue
+        deltas.append(t - previous)
+        previous = t
+
+    columns = {}
+    for name in FLOAT_COLUMNS + INT_COLUMNS:
+        values = [s.get(name) for s in samples]
+        if any(v is not None for v in values):
+            columns[name] = values
+
+    payload = {
+        "v": COLUMNAR_FORMAT_VERSION,
+        "device_id": device_id,
+        "count": len(samples),
+        "ts_base": base,
+        "ts_delta": deltas,
+        "columns": columns,
+    }
+    for name in TABLE_COLUMNS:
+        values = [s.get(name) for s in samples]
+        if any(values):
+            payload[name] = _encode_table(values)
+
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """按 Content-Encoding 压缩"""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if encoding == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise UnsupportedEncodingError("zstd is not available")
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if encoding in ("", "identity"):
+        return data
+    raise UnsupportedEncodingError(f"unsupported content encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: Optional[str]) -> bytes:
+    """按 Content-Encoding 解压"""
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("", "identity"):
+        return data
+    if encoding == "gzip":
+        try:
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            decoded = inflater.decompress(data, MAX_DECODED_BYTES + 1)
+        except zlib.error as e:
+            raise MetricsCodecError(f"corrupt gzip body: {e}")
+    elif encoding == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise UnsupportedEncodingError("zstd is not available on this server")
+        try:
+            reader = zstandard.ZstdDecompressor().stream_reader(data)
+            decoded = reader.read(MAX_DECODED_BYTES + 1)
+        except zstandard.ZstdError as e:
+            raise MetricsCodecError(f"corrupt zstd body: {e}")
+    else:
+        raise UnsupportedEncodingError(f"unsupported content encoding: {encoding}")
+    if len(decoded) > MAX_DECODED_BYTES:
+        raise MetricsCodecError("decoded payload too large")
+    return decoded
+
+
+def _number(value: Any, cast) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise MetricsCodecError(f"non-numeric value: {value!r}")
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return cast(value)
+
+
+def decode_metrics_batch(data: bytes) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    解码列式负载
+
+    Returns:
+        (device_id, 样本字典列表), 样本可直接交给 MetricsBulkWriter.build_rows
+    """
+    try:
+        return _decode_payload(data)
+    except (TypeError, AttributeError, OverflowError) as e:
+        raise MetricsCodecError(f"malformed payload: {e}")
+
+
+def _decode_payload(data: bytes) -> Tuple[str, List[Dict[str, Any]]]:
+    try:
+        payload = json.loads(data)
+    except ValueError as e:
+        raise MetricsCodecError(f"invalid JSON: {e}")
+    if not isinstance(payload, dict):
+        raise MetricsCodecError("payload must be an object")
+    if payload.get("v") != COLUMNAR_FORMAT_VERSION:
+        raise MetricsCodecError(f"unsupported format version: {payload.get('v')}")
+
+    device_id = payload.get("device_id")
+    count = payload.get("count")
+    if not isinstance(device_id, str) or not device_id:
+        raise MetricsCodecError("device_id is required")
+    if not isinstance(count, int) or not 0 <= count <= MAX_BATCH_SAMPLES:
+        raise MetricsCodecError(
+            f"count must be an integer between 0 and {MAX_BATCH_SAMPLES}"
+        )
+
+    samples: List[Dict[str, Any]] = [{} for _ in range(count)]
+
+    deltas = payload.get("ts_delta") or [None] * count
+    if len(deltas) != count:
+        raise MetricsCodecError("ts_delta length does not match count")
+    if any(d is not None and (isinstance(d, bool) or not isinstance(d, int)) for d in deltas):
+        raise MetricsCodecError("ts_delta must contain integers")
+    current = payload.get("ts_base")
+    if current is not None and (isinstance(current, bool) or not isinstance(current, int)):
+        raise MetricsCodecError("ts_base must be an integer")
+    for sample, delta in zip(samples, deltas):
+        if delta is None or current is None:
+            continue
+        current += delta
+        sample["timestamp"] = _EPOCH + timedelta(milliseconds=current)
+
+    for name, values in (payload.get("columns") or {}).items():
+        if name in FLOAT_COLUMNS:
+            cast = float
+        elif name in INT_COLUMNS:
+            cast = int
+        else:
+            # 未知列直接忽略, 便于 Agent 先于服务端升级
+            continue
+        if not isinstance(values, list) or len(values) != count:
+            raise MetricsCodecError(f"column {name} length does not match count")
+        for sample, value in zip(samples, values):
+            sample[name] = _number(value, cast)
+
+    for name in TABLE_COLUMNS:
+        table = payload.get(name)
+        if table:
+            for sample, value in zip(samples, _decode_table(table, count)):
+                sample[name] = value
+
+    return device_id, samples
@@ -0,0 +1,767 @@
+"""
+紧凑指标存储服务
+performance_metrics / software_metrics 数据量最大, 原布局每行带 36 字符 UUID 主键
+(另有一份主键索引) 并重复存储 36 字符的 device_id。紧凑布局:
+  - BIGINT 自增主键 (SQLite 为 rowid 别名, 不再单独建主键索引)
+  - device_keys 表把 devices.id 映射为整数代理键, 指标行只存 device_key
+  - 数值列使用 REAL, process_count 使用 SMALLINT
+
+原表名保留为兼容视图 (id 转为字符串, device_id 通过 device_keys 还原), 查询代码不变;
+视图上的 INSTEAD OF 触发器转发 ORM 写入和删除, 批量写入直接写紧凑表。
+
+迁移在线进行: 按 (created_at, id) 顺序分批复制旧数据, 每批与进度一起提交 (可中断续传),
+复制追上写入后在写锁内补齐剩余行、把原表改名为 <表名>_legacy 并创建视图。
+指标明细 (performance_metric_details) 随复制改用新 id。
+仅支持 SQLite 和 PostgreSQL; 与分区存储互斥; 切换后不自动回退。
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import (
+    REAL,
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    SmallInteger,
+    String,
+    Table,
+    and_,
+    bindparam,
+    event,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+from app.core.database import background_engine
+from app.models.sqlite import PerformanceMetric, SoftwareMetrics
+from app.services.metric_detail_store import (
+    DETAIL_COLUMNS,
+    DETAIL_TABLE,
+    FETCH_CHUNK,
+    JSON_DETAIL_COLUMNS,
+    json_text,
+    metric_details,
+)
+from app.services.metrics_partition_service import metrics_partitions
+
+logger = logging.getLogger(__name__)
+
+# Connection.info 中本事务新建、尚未提交的 device_key
+_PENDING_KEYS = "compact_pending_device_keys"
+
+# 复制阶段只处理早于此时间的数据, 避免与 write-behind 队列中尚未落库的批次交错
+COPY_LAG = timedelta(minutes=5)
+
+# SMALLINT 上限 (process_count 超出时截断)
+SMALLINT_MAX = 32767
+SMALLINT_COLUMNS = ("process_count",)
+
+_metadata = MetaData()
+
+device_keys = Table(
+    "device_keys",
+    _metadata,
+    Column("device_key", Integer, primary_key=True, autoincrement=True),
+    Column("device_id", String(36), nullable=False, unique=True),
+)
+
+compact_state = Table(
+    "metrics_compact_state",
+    _metadata,
+    Column("name", String(50), primary_key=True),
+    Column("status", String(20), nullable=False),  # copying / completed
+    Column("watermark", DateTime(timezone=True), nullable=True),
+    Column("watermark_id", String(36), nullable=True),
+    Column("copied_rows", BigInteger, nullable=False, default=0),
+    Column("started_at", DateTime(timezone=True), nullable=True),
+    Column("finished_at", DateTime(timezone=True), nullable=True),
+    Column("updated_at", DateTime(timezone=True), nullable=True),
+)
+
+# SQLite 的 INTEGER PRIMARY KEY 才是 rowid 别名
+_ID_TYPE = BigInteger().with_variant(Integer(), "sqlite")
+
+
+def _compact_columns(source: Table, skip: Iterable[str]) -> List[Column]:
+    """按原表列生成紧凑列 (Float -> REAL, 指定列 -> SMALLINT)"""
+    columns = []
+    for c in source.columns:
+        if c.name in skip:
+            continue
+        if c.name in SMALLINT_COLUMNS:
+            type_ = SmallInteger()
+        elif isinstance(c.type, Float):
+            type_ = REAL()
+        else:
+            type_ = c.type
+        columns.append(Column(c.name, type_, nullable=c.nullable))
+    return columns
+
+
+performance_metrics_compact = Table(
+    "performance_metrics_compact",
+    _metadata,
+    Column("id", _ID_TYPE, primary_key=True, autoincrement=True),
+    Column("device_key", Integer, nullable=False),
+    *_compact_columns(PerformanceMetric.__table__, ("id", "device_id")),
+    Index("ix_performance_metrics_compact_device_time", "device_key", "timestamp"),
+    Index("ix_performance_metrics_compact_timestamp", "timestamp"),
+    Index("ix_performance_metrics_compact_created_at", "created_at"),
+)
+
+software_metrics_compact = Table(
+    "software_metrics_compact",
+    _metadata,
+    Column("id", _ID_TYPE, primary_key=True, autoincrement=True),
+    *_compact_columns(SoftwareMetrics.__table__, ("id",)),
+    Index("ix_software_metrics_compact_execution_time", "execution_id", "timestamp"),
+    Index("ix_software_metrics_compact_timestamp", "timestamp"),
+)
+
+
+@dataclass
+class CompactLayout:
+    """一张指标表的紧凑布局"""
+
+    name: str  # 原表名, 切换后为兼容视图
+    table: Table  # 紧凑表
+    device_key: bool  # device_id 是否映射为 device_key
+
+    @property
+    def legacy_name(self) -> str:
+        return f"{self.name}_legacy"
+
+    @property
+    def value_columns(self) -> List[str]:
+        """视图与紧凑表同名透传的列"""
+        return [c.name for c in self.table.columns if c.name not in ("id", "device_key")]
+
+
+LAYOUTS: List[CompactLayout] = [
+    CompactLayout("performance_metrics", performance_metrics_compact, device_key=True),
+    CompactLayout("software_metrics", software_metrics_compact, device_key=False),
+]
+
+_LAYOUTS_BY_NAME = {layout.name: layout for layout in LAYOUTS}
+
+
+class MetricsCompactService:
+    """紧凑指标存储: 启动检测、在线迁移、写入和容量报告"""
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        enabled: bool = settings.metrics_compact_storage_enabled,
+    ):
+        self.engine = engine or background_engine
+        self.enabled = enabled
+        self.batch_size = max(1, settings.metrics_compact_batch_size)
+        self.batch_sleep = max(0, settings.metrics_compact_batch_sleep_ms) / 1000.0
+
+        # 已切换到紧凑布局的表名
+        self.active: Set[str] = set()
+        # devices.id -> device_key
+        self._keys: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_active(self, name: str) -> bool:
+        return name in self.active
+
+    def storage_table(self, name: str) -> Optional[Table]:
+        """已切换时返回紧凑表 (清理等按行操作直接作用于紧凑表)"""
+        if name in self.active:
+            return _LAYOUTS_BY_NAME[name].table
+        return None
+
+    # ==================== 初始化 ====================
+
+    def ensure_schema(self):
+        """启动时检测已切换的表, 按配置创建紧凑表并开始迁移"""
+        try:
+            with self.engine.begin() as conn:
+                self._detect(conn)
+                if self.active:
+                    self._load_keys(conn)
+                pending = self._pending_layouts()
+                if not self.enabled or not pending:
+                    return
+                if not self._supported():
+                    return
+                _metadata.create_all(conn)
+                empty = all(
+                    conn.execute(
+                        text(f"SELECT 1 FROM {layout.name} LIMIT 1")
+                    ).first()
+                    is None
+                    for layout in pending
+                )
+        except Exception as e:
+            logger.error(f"Failed to set up compact metric storage: {e}")
+            return
+
+        if empty:
+            # 没有旧数据, 直接切换
+            self.migrate()
+        else:
+            self.start()
+
+    def _detect(self, conn: Connection):
+        insp = inspect(conn)
+        views = set(insp.get_view_names())
+        tables = set(insp.get_table_names())
+        self.active = {
+            layout.name
+            for layout in LAYOUTS
+            if layout.name in views and layout.table.name in tables
+        }
+
+    def _pending_layouts(self) -> List[CompactLayout]:
+        return [layout for layout in LAYOUTS if layout.name not in self.active]
+
+    def _supported(self) -> bool:
+        dialect = self.engine.dialect.name
+        if dialect not in ("sqlite", "postgresql"):
+            logger.warning(
+                f"Compact metric storage is not supported on {dialect}, keeping the row layout"
+            )
+            return False
+        if metrics_partitions.partitioned:
+            logger.warning(
+                "Compact metric storage cannot be combined with partitioned "
+                f"performance_metrics ({metrics_partitions.mode}), keeping the row layout"
+            )
+            return False
+        return True
+
+    # ==================== 设备代理键 ====================
+
+    def _load_keys(self, conn: Connection):
+        rows = conn.execute(select(device_keys.c.device_id, device_keys.c.device_key))
+        with self._lock:
+            self._keys = dict(rows.all())
+
+    def device_keys_for(self, conn: Connection, device_ids: Iterable[str]) -> Dict[str, int]:
+        """
+        devices.id -> device_key, 不存在的映射即时创建
+
+        新建的映射在所在事务提交后才放入缓存: 事务回滚后 SQLite 会把同一个
+        device_key 分配给下一台设备 (INTEGER PRIMARY KEY 无 AUTOINCREMENT)
+        """
+        wanted = set(device_ids)
+        with self._lock:
+            result = {d: self._keys[d] for d in wanted if d in self._keys}
+        missing = [d for d in wanted if d not in result]
+        if not missing:
+            return result
+
+        for start in range(0, len(missing), FETCH_CHUNK):
+            chunk = missing[start : start + FETCH_CHUNK]
+            found = dict(
+                conn.execute(
+                    select(device_keys.c.device_id, device_keys.c.device_key).where(
+                        device_keys.c.device_id.in_(chunk)
+                    )
+                ).all()
+            )
+            new = [d for d in chunk if d not in found]
+            if new:
+                conn.execute(insert(device_keys), [{"device_id": d} for d in new])
+                created = dict(
+                    conn.execute(
+                        select(device_keys.c.device_id, device_keys.c.device_key).where(
+                            device_keys.c.device_id.in_(new)
+                        )
+                    ).all()
+                )
+                conn.info.setdefault(_PENDING_KEYS, {}).update(created)
+                found.update(created)
+            result.update(found)
+
+        # 本事务中新建 (尚未提交) 的映射不进入缓存
+        pending = conn.info.get(_PENDING_KEYS, {})
+        with self._lock:
+            self._keys.update((d, k) for d, k in result.items() if d not in pending)
+        return result
+
+    def _publish_keys(self, keys: Dict[str, int]):
+        """事务提交后缓存新建的映射"""
+        with self._lock:
+            self._keys.update(keys)
+
+    # ==================== 写入 ====================
+
+    def _compact_params(
+        self, layout: CompactLayout, rows: List[Dict[str, Any]], keys: Dict[str, int]
+    ) -> List[Dict[str, Any]]:
+        columns = layout.value_columns
+        params = []
+        for row in rows:
+            item = {name: row.get(name) for name in columns}
+            for name in SMALLINT_COLUMNS:
+                value = item.get(name)
+                if value is not None and name in item:
+                    item[name] = min(int(value), SMALLINT_MAX)
+            if layout.device_key:
+                item["device_key"] = keys[row["device_id"]]
+            params.append(item)
+        return params
+
+    def _insert(
+        self, conn: Connection, layout: CompactLayout, rows: List[Dict[str, Any]]
+    ) -> List[int]:
+        """写入紧凑表, 返回按行顺序排列的新 id"""
+        keys = (
+            self.device_keys_for(conn, (row["device_id"] for row in rows))
+            if layout.device_key
+            else {}
+        )
+        table = layout.table
+        return conn.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            self._compact_params(layout, rows, keys),
+        ).scalars().all()
+
+    def write(self, conn: Connection, rows: List[Dict[str, Any]]) -> int:
+        """
+        批量写入性能指标 (MetricsBulkWriter 在紧凑布局下调用, 不提交)
+
+        行字典的 id 改为数据库生成的 id (字符串), 明细和缓存随之使用新 id
+        """
+        ids = self._insert(conn, _LAYOUTS_BY_NAME["performance_metrics"], rows)
+        for row, new_id in zip(rows, ids):
+            row["id"] = str(new_id)
+        return len(rows)
+
+    # ==================== 在线迁移 ====================
+
+    def _legacy_table(self, conn: Connection, layout: CompactLayout) -> Table:
+        """反射旧表 (包含升级前的明细列等模型中已不存在的列)"""
+        return Table(layout.name, MetaData(), autoload_with=conn)
+
+    def _load_state(self, conn: Connection, name: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute(select(compact_state).where(compact_state.c.name == name)).first()
+        return dict(row._mapping) if row else None
+
+    def _save_state(self, conn: Connection, name: str, **values):
+        values["updated_at"] = datetime.utcnow()
+        result = conn.execute(
+            update(compact_state).where(compact_state.c.name == name).values(**values)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(compact_state).values(name=name, **values))
+
+    def _copy_chunk(
+        self,
+        conn: Connection,
+        layout: CompactLayout,
+        legacy: Table,
+        state: Dict[str, Any],
+        until: Optional[datetime],
+    ) -> int:
+        """复制一批旧数据并推进水位 (在调用方的事务中)"""
+        created_at, row_id = legacy.c.created_at, legacy.c.id
+        conditions = [created_at.isnot(None)]
+        if state["watermark"] is not None:
+            conditions.append(
+                or_(
+                    created_at > state["watermark"],
+                    and_(created_at == state["watermark"], row_id > state["watermark_id"]),
+                )
+            )
+        if until is not None:
+            conditions.append(created_at < until)
+
+        rows = conn.execute(
+            select(legacy)
+            .where(*conditions)
+            .order_by(created_at, row_id)
+            .limit(self.batch_size)
+        ).mappings().all()
+        if not rows:
+            return 0
+
+        new_ids = self._insert(conn, layout, rows)
+        if layout.name == "performance_metrics":
+            self._rekey_details(conn, legacy, rows, new_ids)
+
+        state["watermark"] = rows[-1]["created_at"]
+        state["watermark_id"] = rows[-1]["id"]
+        state["copied_rows"] += len(rows)
+        self._save_state(
+            conn,
+            layout.name,
+            watermark=state["watermark"],
+            watermark_id=state["watermark_id"],
+            copied_rows=state["copied_rows"],
+        )
+        return len(rows)
+
+    def _rekey_details(
+        self, conn: Connection, legacy: Table, rows, new_ids: List[int]
+    ):
+        """明细改用新 id; 升级前仍存放在旧列中的明细一并移入明细表"""
+        mapping = {row["id"]: str(new_id) for row, new_id in zip(rows, new_ids)}
+        old_ids = list(mapping)
+        existing = set()
+        for start in range(0, len(old_ids), FETCH_CHUNK):
+            existing.update(
+                conn.execute(
+                    select(DETAIL_TABLE.c.metric_id).where(
+                        DETAIL_TABLE.c.metric_id.in_(old_ids[start : start + FETCH_CHUNK])
+                    )
+                ).scalars()
+            )
+        if existing:
+            conn.execute(
+                update(DETAIL_TABLE)
+                .where(DETAIL_TABLE.c.metric_id == bindparam("old_id"))
+                .values(metric_id=bindparam("new_id")),
+                [{"old_id": old, "new_id": mapping[old]} for old in existing],
+            )
+
+        inline = [c for c in DETAIL_COLUMNS if c in legacy.c]
+        if inline:
+            moved = [
+                {
+                    "id": mapping[row["id"]],
+                    "device_id": row["device_id"],
+                    "timestamp": row["timestamp"],
+                    **{
+                        c: json_text(row[c]) if c in JSON_DETAIL_COLUMNS else row[c]
+                        for c in inline
+                    },
+                }
+                for row in rows
+                if row["id"] not in existing and any(row[c] for c in inline)
+            ]
+            detail_rows = metric_details.build_rows(moved)
+            if detail_rows:
+                conn.execute(insert(DETAIL_TABLE), detail_rows)
+
+    def _begin_copy(self, layout: CompactLayout) -> Dict[str, Any]:
+        with self.engine.begin() as conn:
+            state = self._load_state(conn, layout.name)
+            if state is not None:
+                return state
+            # created_at 为空的旧行用采集时间补齐, 以便按 created_at 分批
+            conn.execute(
+                text(
+                    f"UPDATE {layout.name} SET created_at = timestamp "
+                    "WHERE created_at IS NULL"
+                )
+            )
+            state = {
+                "status": "copying",
+                "watermark": None,
+                "watermark_id": None,
+                "copied_rows": 0,
+                "started_at": datetime.utcnow(),
+            }
+            self._save_state(conn, layout.name, **state)
+            return state
+
+    def _swap(self, layout: CompactLayout, state: Dict[str, Any]):
+        """写锁内补齐剩余行, 原表改名并创建兼容视图"""
+        dialect = self.engine.dialect.name
+        with self.engine.begin() as conn:
+            if dialect == "postgresql":
+                conn.execute(text(f"LOCK TABLE {layout.name} IN SHARE ROW EXCLUSIVE MODE"))
+            else:
+                # 第一条语句即写入, 取得 SQLite 写锁后再读取剩余行
+                self._save_state(conn, layout.name, status="swapping")
+
+            legacy = self._legacy_table(conn, layout)
+            while self._copy_chunk(conn, layout, legacy, state, None) == self.batch_size:
+                pass
+
+            conn.execute(text(f"ALTER TABLE {layout.name} RENAME TO {layout.legacy_name}"))
+            self._create_view(conn, layout)
+            self._save_state(
+                conn, layout.name, status="completed", finished_at=datetime.utcnow()
+            )
+        self.active.add(layout.name)
+        if layout.name == "performance_metrics":
+            # 旧明细已随复制移入明细表, 视图中不再有旧列
+            with self.engine.connect() as conn:
+                metric_details.detect_legacy_columns(conn)
+        logger.info(
+            f"{layout.name} switched to compact storage "
+            f"({state['copied_rows']} rows copied, old table kept as {layout.legacy_name})"
+        )
+
+    def migrate(self) -> Dict[str, Any]:
+        """
+        在线迁移所有尚未切换的表 (可中断, 下次从记录的水位继续)
+
+        Returns:
+            {表名: 已复制行数}
+        """
+        if not self._supported():
+            return {}
+        with self.engine.begin() as conn:
+            _metadata.create_all(conn)
+            self._detect(conn)
+
+        result = {}
+        for layout in self._pending_layouts():
+            state = self._begin_copy(layout)
+            with self.engine.connect() as conn:
+                legacy = self._legacy_table(conn, layout)
+            while not self._stop.is_set():
+                with self.engine.begin() as conn:
+                    copied = self._copy_chunk(
+                        conn, layout, legacy, state, datetime.utcnow() - COPY_LAG
+                    )
+                if copied < self.batch_size:
+                    break
+                if self.batch_sleep:
+                    self._stop.wait(self.batch_sleep)
+            if self._stop.is_set():
+                break
+            self._swap(layout, state)
+            result[layout.name] = state["copied_rows"]
+        return result
+
+    def drop_legacy(self) -> List[str]:
+        """删除迁移后保留的旧表 (确认数据无误后手动执行)"""
+        dropped = []
+        with self.engine.begin() as conn:
+            tables = set(inspect(conn).get_table_names())
+            for layout in LAYOUTS:
+                if layout.name in self.active and layout.legacy_name in tables:
+                    conn.execute(text(f"DROP TABLE {layout.legacy_name}"))
+                    dropped.append(layout.legacy_name)
+        return dropped
+
+    # ==================== 兼容视图 ====================
+
+    def _create_view(self, conn: Connection, layout: CompactLayout):
+        name, table = layout.name, layout.table.name
+        values = layout.value_columns
+        select_list = ", ".join(
+            ["CAST(m.id AS VARCHAR(36)) AS id"]
+            + (["k.device_id AS device_id"] if layout.device_key else [])
+            + [f"m.{c} AS {c}" for c in values]
+        )
+        source = f"{table} m"
+        if layout.device_key:
+            source += " JOIN device_keys k ON k.device_key = m.device_key"
+        conn.execute(text(f"CREATE VIEW {name} AS SELECT {select_list} FROM {source}"))
+
+        column_list = ", ".join((["device_key"] if layout.device_key else []) + values)
+        new_values = ", ".join(
+            (["k.device_key"] if layout.device_key else [])
+            + [
+                "COALESCE(NEW.created_at, CURRENT_TIMESTAMP)"
+                if c == "created_at"
+                else f"NEW.{c}"
+                for c in values
+            ]
+        )
+        key_source = " FROM device_keys k WHERE k.device_id = NEW.device_id"
+
+        if self.engine.dialect.name == "postgresql":
+            register = (
+                "INSERT INTO device_keys (device_id) VALUES (NEW.device_id) "
+                "ON CONFLICT (device_id) DO NOTHING;"
+                if layout.device_key
+                else ""
+            )
+            insert_sql = (
+                f"INSERT INTO {table} ({column_list}) SELECT {new_values}"
+                + (key_source if layout.device_key else "")
+                + ";"
+            )
+            conn.execute(
+                text(
+                    f"CREATE OR REPLACE FUNCTION {name}_compact_insert() RETURNS trigger AS $$ "
+                    f"BEGIN {register} {insert_sql} RETURN NEW; END $$ LANGUAGE plpgsql"
+                )
+            )
+            conn.execute(
+                text(
+                    f"CREATE OR REPLACE FUNCTION {name}_compact_delete() RETURNS trigger AS $$ "
+                    f"BEGIN DELETE FROM {table} WHERE id = CAST(OLD.id AS BIGINT); "
+                    f"RETURN OLD; END $$ LANGUAGE plpgsql"
+                )
+            )
+            for action in ("insert", "delete"):
+                conn.execute(
+                    text(
+                        f"CREATE TRIGGER {name}_{action} INSTEAD OF {action.upper()} "
+                        f"ON {name} FOR EACH ROW EXECUTE FUNCTION {name}_compact_{action}()"
+                    )
+                )
+            return
+
+        register = (
+            "INSERT OR IGNORE INTO device_keys (device_id) VALUES (NEW.device_id);"
+            if layout.device_key
+            else ""
+        )
+        insert_sql = (
+            f"INSERT INTO {table} ({column_list}) SELECT {new_values}"
+            + (key_source if layout.device_key else "")
+            + ";"
+        )
+        conn.execute(
+            text(
+                f"CREATE TRIGGER {name}_insert INSTEAD OF INSERT ON {name} "
+                f"BEGIN {register} {insert_sql} END"
+            )
+        )
+        conn.execute(
+            text(
+                f"CREATE TRIGGER {name}_delete INSTEAD OF DELETE ON {name} "
+                f"BEGIN DELETE FROM {table} WHERE id = CAST(OLD.id AS INTEGER); END"
+            )
+        )
+
+    # ==================== 后台迁移 ====================
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """在后台线程执行在线迁移"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-compact-migration", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        try:
+            result = self.migrate()
+            if result:
+                logger.info(f"Compact metric storage migration finished: {result}")
+        except Exception as e:
+            logger.error(f"Compact metric storage migration failed: {e}")
+
+    def stop(self, timeout: float = 10.0):
+        """停止后台迁移 (当前批提交后退出, 下次启动继续)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    # ==================== 统计 ====================
+
+    def size_report(self) -> Dict[str, Any]:
+        """
+        各指标表 (含索引) 占用空间, 单位字节
+
+        SQLite 使用 dbstat 虚拟表 (需编译支持), PostgreSQL 使用 pg_total_relation_size
+        """
+        names = ["device_keys"]
+        for layout in LAYOUTS:
+            names += [layout.name, layout.legacy_name, layout.table.name]
+
+        sizes: Dict[str, Optional[int]] = {}
+        with self.engine.connect() as conn:
+            insp = inspect(conn)
+            tables = set(insp.get_table_names())
+            existing = [n for n in names if n in tables]
+            if self.engine.dialect.name == "sqlite":
+                try:
+                    rows = conn.execute(
+                        text(
+                            "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s "
+                            "JOIN sqlite_master m ON m.name = s.name "
+                            "GROUP BY m.tbl_name"
+                        )
+                    ).all()
+                except Exception:
+                    return {"supported": False, "tables": {}}
+                by_table = dict(rows)
+                sizes = {n: by_table.get(n, 0) for n in existing}
+            elif self.engine.dialect.name == "postgresql":
+                sizes = {
+                    n: conn.execute(
+                        text("SELECT pg_total_relation_size(CAST(:name AS regclass))"),
+                        {"name": n},
+                    ).scalar()
+                    for n in existing
+                }
+            else:
+                return {"supported": False, "tables": {}}
+            rows = {
+                n: conn.execute(select(func.count()).select_from(text(n))).scalar()
+                for n in existing
+            }
+
+        return {
+            "supported": True,
+            "tables": {n: {"bytes": sizes.get(n), "rows": rows[n]} for n in existing},
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """迁移状态 (各表水位、已复制行数)"""
+        states = {}
+        try:
+            with self.engine.connect() as conn:
+                if inspect(conn).has_table(compact_state.name):
+                    states = {
+                        row.name: {
+                            "status": row.status,
+                            "copied_rows": row.copied_rows,
+                            "watermark": row.watermark.isoformat()
+                            if hasattr(row.watermark, "isoformat")
+                            else row.watermark,
+                            "finished_at": row.finished_at.isoformat()
+                            if hasattr(row.finished_at, "isoformat")
+                            else row.finished_at,
+                        }
+                        for row in conn.execute(select(compact_state))
+                    }
+        except Exception as e:
+            logger.warning(f"Failed to read compact storage state: {e}")
+        return {
+            "enabled": self.enabled,
+            "active": sorted(self.active),
+            "migrating": self.running,
+            "device_keys": len(self._keys),
+            "tables": states,
+        }
+
+
+# 全局紧凑存储实例
+metrics_compact = MetricsCompactService()
+
+
+@event.listens_for(Engine, "commit")
+def _publish_keys_on_commit(conn):
+    keys = conn.info.pop(_PENDING_KEYS, None)
+    if keys:
+        metrics_compact._publish_keys(keys)
+
+
+@event.listens_for(Engine, "rollback")
+def _discard_keys_on_rollback(conn):
+    conn.info.pop(_PENDING_KEYS, None)
+
+
+@event.listens_for(Engine, "rollback_savepoint")
+def _discard_keys_on_savepoint_rollback(conn, name, context):
+    # 保存点之前新建的映射仍在外层事务中, 不缓存即可 (下次按需查询)
+    conn.info.pop(_PENDING_KEYS, None)
@@ -0,0 +1,256 @@
+"""
+性能指标批量写入服务
+绕过 ORM unit-of-work，按数据库方言选择最快的批量写入方式:
+  - PostgreSQL (psycopg2): COPY FROM STDIN
+  - MySQL: executemany (pymysql 改写为多行 VALUES)
+  - SQLite: 分块的多行 INSERT ... VALUES
+进程列表、磁盘明细和原始数据压缩后写入明细表 (见 metric_detail_store)
+"""
+
+import csv
+import io
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Connection
+
+from app.core.telemetry import metrics_registry
+from app.models.sqlite import PerformanceMetric
+from app.services.metrics_partition_service import metrics_partitions
+from app.services.metrics_compact_service import metrics_compact
+from app.services.metric_detail_store import (
+    JSON_DETAIL_COLUMNS,
+    json_text,
+    metric_details,
+)
+
+logger = logging.getLogger(__name__)
+
+# 预先计算的列映射, 避免每个样本重复遍历 __table__.columns
+METRIC_TABLE = PerformanceMetric.__table__
+METRIC_COLUMNS: List[str] = [c.name for c in METRIC_TABLE.columns]
+
+# 行字典中以 JSON 字符串形式保存的明细字段 (不属于 performance_metrics 列)
+JSON_COLUMNS = JSON_DETAIL_COLUMNS
+
+# SQLite 单条语句绑定参数上限 (旧版本为 999)
+SQLITE_MAX_VARIABLES = 999
+
+# 批次大小直方图桶上界 (样本数)
+BATCH_ROWS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# /metrics: mode 为 queued (write-behind) 或 direct (请求内写入)
+INGESTED_SAMPLES = metrics_registry.counter(
+    "ingested_samples_total", "Metric samples accepted from agents", ("mode",)
+)
+INGEST_BATCH_SAMPLES = metrics_registry.histogram(
+    "ingest_batch_samples", "Samples per agent upload request", buckets=BATCH_ROWS_BUCKETS
+)
+
+
+def parse_metric_timestamp(value: Any, default: datetime) -> datetime:
+    """解析指标时间戳 (datetime / ISO 字符串)，失败时返回默认值"""
+    if not value:
+        return default
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return default
+
+
+def build_metric_row(
+    device_id: str, sample: Dict[str, Any], now: datetime
+) -> Dict[str, Any]:
+    """
+    将单个指标样本转换为 performance_metrics 行字典
+
+    Args:
+        device_id: 设备ID
+        sample: 指标数据 (MetricDataCreate.model_dump() 或等价字典)
+        now: 批次接收时间, 用作缺省 timestamp 和 created_at
+
+    Returns:
+        包含全部列及明细字段 (top_processes / disk_io_details / raw_data) 的行字典
+    """
+    row = {name: sample.get(name) for name in METRIC_COLUMNS}
+    row["id"] = str(uuid.uuid4())
+    row["device_id"] = device_id
+    # 统一为 naive UTC: 带时区的值与库中和缓存中的 naive 时间戳可直接比较
+    timestamp = parse_metric_timestamp(sample.get("timestamp"), now)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    row["timestamp"] = timestamp
+    row["created_at"] = now
+
+    for name in JSON_COLUMNS:
+        row[name] = json_text(sample.get(name))
+
+    raw_data = sample.get("raw_data")
+    if raw_data and not isinstance(raw_data, str):
+        raw_data = json.dumps(raw_data)
+    row["raw_data"] = raw_data or None
+
+    return row
+
+
+class MetricsBulkWriter:
+    """performance_metrics 批量写入器"""
+
+    def __init__(self, sqlite_chunk_rows: Optional[int] = None):
+        # SQLite 多行 VALUES 每块行数, 受绑定参数上限约束
+        self.sqlite_chunk_rows = sqlite_chunk_rows or max(
+            1, SQLITE_MAX_VARIABLES // len(METRIC_COLUMNS)
+        )
+        # 方言名 -> 每列的 bind processor (预先计算, 绕过 ORM 类型处理开销)
+        self._processors: Dict[str, List[Optional[Callable]]] = {}
+        # (方言名, 表名, 行数) -> 预编译的 INSERT 语句
+        self._statements: Dict[Tuple[str, str, int], str] = {}
+
+    def build_rows(
+        self, device_id: str, samples: Iterable[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """批量构建行字典, 整个批次共用一个接收时间"""
+        now = datetime.utcnow()
+        return [build_metric_row(device_id, sample, now) for sample in samples]
+
+    def write(self, conn: Connection, rows: List[Dict[str, Any]]) -> int:
+        """
+        按方言写入行数据 (不提交事务, 由调用方负责)
+
+        Args:
+            conn: SQLAlchemy 连接 (可通过 Session.connection() 获取)
+            rows: build_rows 生成的行字典列表
+
+        Returns:
+            写入行数
+        """
+        if not rows:
+            return 0
+
+        written = self._write_metrics(conn, rows)
+        metric_details.write(conn, rows)
+        return written
+
+    def _write_metrics(self, conn: Connection, rows: List[Dict[str, Any]]) -> int:
+        """按方言写入数值列"""
+        if metrics_compact.is_active(METRIC_TABLE.name):
+            # 紧凑布局: 写入紧凑表, 行字典 id 改为数据库生成的 id
+            return metrics_compact.write(conn, rows)
+        dialect = conn.dialect
+        if dialect.name == "postgresql" and dialect.driver == "psycopg2":
+            return self._write_copy(conn, rows)
+        if dialect.name == "sqlite":
+            if metrics_partitions.mode == "sqlite":
+                # 分区模式下 performance_metrics 是视图, 直接写入各分区表
+                return sum(
+                    self._write_multi_values(conn, part_rows, table_name)
+                    for table_name, part_rows in metrics_partitions.route(conn, rows).items()
+                )
+            return self._write_multi_values(conn, rows)
+        if dialect.name == "mysql":
+            return self._write_executemany(conn, rows)
+        conn.execute(
+            insert(METRIC_TABLE),
+            [{name: row[name] for name in METRIC_COLUMNS} for row in rows],
+        )
+        return len(rows)
+
+    def _to_params(self, dialect, rows: List[Dict[str, Any]]) -> List[tuple]:
+        """行字典 -> 按列顺序排列且已做类型转换的参数元组"""
+        processors = self._processors.get(dialect.name)
+        if processors is None:
+            processors = [
+                METRIC_TABLE.c[name].type._cached_bind_processor(dialect)
+                for name in METRIC_COLUMNS
+            ]
+            self._processors[dialect.name] = processors
+
+        pairs = list(zip(METRIC_COLUMNS, processors))
+        return [
+            tuple(
+                proc(row[name]) if proc and row[name] is not None else row[name]
+                for name, proc in pairs
+            )
+            for row in rows
+        ]
+
+    def _insert_sql(
+        self, dialect, row_count: int, table_name: str = METRIC_TABLE.name
+    ) -> str:
+        """生成 (并缓存) 指定行数的多行 INSERT 语句"""
+        key = (dialect.name, table_name, row_count)
+        sql = self._statements.get(key)
+        if sql is None:
+            mark = "?" if dialect.paramstyle == "qmark" else "%s"
+            group = "(" + ", ".join([mark] * len(METRIC_COLUMNS)) + ")"
+            sql = (
+                f"INSERT INTO {table_name} ({', '.join(METRIC_COLUMNS)}) "
+                f"VALUES {', '.join([group] * row_count)}"
+            )
+            self._statements[key] = sql
+        return sql
+
+    def _write_executemany(self, conn: Connection, rows: List[Dict[str, Any]]) -> int:
+        """executemany: pymysql/aiomysql 会将其改写为多行 VALUES"""
+        params = self._to_params(conn.dialect, rows)
+        conn.exec_driver_sql(self._insert_sql(conn.dialect, 1), params)
+        return len(rows)
+
+    def _write_multi_values(
+        self,
+        conn: Connection,
+        rows: List[Dict[str, Any]],
+        table_name: str = METRIC_TABLE.name,
+    ) -> int:
+        """多行 INSERT ... VALUES (...), (...), 按绑定参数上限分块"""
+        params = self._to_params(conn.dialect, rows)
+        chunk = self.sqlite_chunk_rows
+        for start in range(0, len(params), chunk):
+            block = params[start : start + chunk]
+            flat = tuple(value for row in block for value in row)
+            conn.exec_driver_sql(
+                self._insert_sql(conn.dialect, len(block), table_name), flat
+            )
+        return len(rows)
+
+    def _write_copy(self, conn: Connection, rows: List[Dict[str, Any]]) -> int:
+        """PostgreSQL COPY FROM STDIN (CSV)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(
+                [
+                    "\\N" if row[name] is None else _copy_value(row[name])
+                    for name in METRIC_COLUMNS
+                ]
+            )
+        buffer.seek(0)
+
+        columns = ", ".join(METRIC_COLUMNS)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {METRIC_TABLE.name} ({columns}) "
+                "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+        finally:
+            cursor.close()
+        return len(rows)
+
+
+def _copy_value(value: Any) -> Any:
+    """COPY CSV 字段值转换"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# 全局写入器实例
+metrics_bulk_writer = MetricsBulkWriter()
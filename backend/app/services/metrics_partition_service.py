@@ -0,0 +1,643 @@
+"""
+性能指标按时间分区服务
+performance_metrics 按天/周分区, 过期数据通过删除整个分区清理 (仅修改元数据):
+  - MySQL: 原生 RANGE 分区 (TO_DAYS(timestamp)), 查询由 MySQL 自动裁剪分区;
+    转换时主键改为 (id, timestamp) 并移除外键 (分区表的限制)
+  - SQLite: 每个周期一张表 performance_metrics_pYYYYMMDD_YYYYMMDD,
+    performance_metrics 变为 UNION ALL 视图 (INSTEAD OF 触发器转发写入/删除);
+    批量写入直接按时间戳路由到分区表, 查询通过 source() 只联合时间范围内的分区
+  - PostgreSQL + TimescaleDB: 超表本身已分块, 过期清理使用 drop_chunks()
+
+转换只在 metrics_partitioning_enabled 开启后于启动时执行一次, 不可自动回退。
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    event,
+    Index,
+    MetaData,
+    Table,
+    inspect,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.core.database import background_engine
+from app.models.sqlite import PerformanceMetric
+from app.services.metric_detail_store import metric_details
+
+logger = logging.getLogger(__name__)
+
+METRIC_TABLE = PerformanceMetric.__table__
+TABLE_NAME = METRIC_TABLE.name
+
+PARTITION_INTERVALS = {"day": 1, "week": 7}
+
+# SQLite 分区表名: performance_metrics_p<起始日期>_<结束日期>
+_SQLITE_PARTITION_RE = re.compile(rf"^{TABLE_NAME}_p(\d{{8}})_(\d{{8}})$")
+
+# SQLite 分区列表缓存时间 (秒), 过期后从 sqlite_master 重新读取
+_REGISTRY_TTL = 60
+
+# conn.info 标记: 当前事务新建了分区, 提交前不写入共享的分区列表缓存
+_PENDING_PARTITIONS = "metric_partitions_pending"
+
+# MySQL TO_DAYS(d) 与 Python date.toordinal() 的差值
+_MYSQL_DAYS_OFFSET = 365
+
+
+def _naive(value: datetime) -> datetime:
+    """统一为 naive UTC (与写入数据库的时间戳一致)"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _sql_timestamp(value: date) -> str:
+    """SQLite DateTime 列的存储格式 (字符串比较与时间顺序一致)"""
+    return datetime(value.year, value.month, value.day).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+class Partition:
+    """一个分区的时间范围 [start, end), start/end 为 None 表示无下界/上界"""
+
+    __slots__ = ("name", "start", "end")
+
+    def __init__(self, name: str, start: Optional[date], end: Optional[date]):
+        self.name = name
+        self.start = start
+        self.end = end
+
+    def overlaps(self, start: Optional[datetime], end: Optional[datetime]) -> bool:
+        if start is not None and self.end is not None and _naive(start).date() >= self.end:
+            return False
+        if end is not None and self.start is not None and _naive(end).date() < self.start:
+            return False
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+        }
+
+
+class MetricsPartitionService:
+    """performance_metrics 分区管理"""
+
+    def __init__(
+        self,
+        enabled: bool = settings.metrics_partitioning_enabled,
+        interval: str = settings.metrics_partition_interval,
+        premake: int = settings.metrics_partition_premake,
+    ):
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f"metrics_partition_interval must be one of {list(PARTITION_INTERVALS)}")
+        self.enabled = enabled
+        self.interval = interval
+        self.premake = premake
+
+        # SQLite 分区列表 (按起始日期排序) 及加载时间
+        self._partitions: Optional[List[Partition]] = None
+        self._loaded_at = 0.0
+        self._tables: Dict[str, Table] = {}
+        self._lock = threading.RLock()
+
+        # 当前数据库的分区方式: None / "sqlite" / "mysql" / "timescaledb"
+        self.mode: Optional[str] = None
+
+    # ==================== 周期计算 ====================
+
+    def period_start(self, value: date) -> date:
+        """所在周期的起始日期 (周分区从周一开始)"""
+        if isinstance(value, datetime):
+            value = _naive(value).date()
+        if self.interval == "week":
+            return value - timedelta(days=value.weekday())
+        return value
+
+    def period_end(self, start: date) -> date:
+        return self.period_start(start) + timedelta(days=PARTITION_INTERVALS[self.interval])
+
+    def _next_ranges(self, start: date, until: date) -> List[Tuple[date, date]]:
+        """从 start 开始连续生成周期范围, 直到 until (不含)"""
+        ranges = []
+        while start < until:
+            end = self.period_end(start)
+            ranges.append((start, end))
+            start = end
+        return ranges
+
+    @property
+    def partitioned(self) -> bool:
+        return self.mode is not None
+
+    # ==================== 初始化 / 维护 ====================
+
+    def ensure_schema(self):
+        """启动时检测并 (按配置) 转换分区表, 预建未来分区"""
+        dialect = background_engine.dialect.name
+        try:
+            with background_engine.begin() as conn:
+                if dialect == "postgresql":
+                    if self._is_hypertable(conn):
+                        self.mode = "timescaledb"
+                    return
+                if not self.enabled:
+                    return
+                if dialect == "sqlite":
+                    self._sqlite_convert(conn)
+                    self.mode = "sqlite"
+                elif dialect == "mysql":
+                    self._mysql_convert(conn)
+                    self.mode = "mysql"
+        except Exception as e:
+            logger.error(f"Failed to set up metric partitions: {e}")
+            return
+        self.maintain()
+
+    def maintain(self) -> List[str]:
+        """预建未来 premake 个周期的分区 (定时任务)"""
+        if self.mode not in ("sqlite", "mysql"):
+            return []
+        # 覆盖当前周期及之后 premake 个周期
+        until = self.period_start(datetime.utcnow().date())
+        for _ in range(self.premake + 1):
+            until = self.period_end(until)
+        with background_engine.begin() as conn:
+            if self.mode == "sqlite":
+                created = self._sqlite_premake(conn, until)
+            else:
+                created = self._mysql_premake(conn, until)
+        if created:
+            logger.info(f"Created metric partitions: {', '.join(created)}")
+        return created
+
+    def list_partitions(self) -> List[Dict[str, Any]]:
+        """分区列表及行数 (MySQL 为统计估计值)"""
+        if self.mode == "sqlite":
+            with background_engine.connect() as conn:
+                partitions = self._sqlite_partitions(conn, refresh=True)
+                return [
+                    {
+                        **p.to_dict(),
+                        "rows": conn.execute(text(f'SELECT COUNT(*) FROM "{p.name}"')).scalar(),
+                    }
+                    for p in partitions
+                ]
+        if self.mode == "mysql":
+            with background_engine.connect() as conn:
+                return [
+                    {**p.to_dict(), "rows": rows}
+                    for p, rows in self._mysql_partitions(conn)
+                ]
+        return []
+
+    def drop_expired(self, cutoff: datetime, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        删除完全早于 cutoff 的分区
+
+        Returns:
+            {"partitions": [...], "deleted"/"will_delete": 行数}
+        """
+        cutoff_day = _naive(cutoff).date()
+        key = "will_delete" if dry_run else "deleted"
+
+        if self.mode == "timescaledb":
+            with background_engine.begin() as conn:
+                rows = conn.execute(
+                    text(f"SELECT COUNT(*) FROM {TABLE_NAME} WHERE timestamp < :cutoff"),
+                    {"cutoff": cutoff},
+                ).scalar()
+                if dry_run:
+                    chunks = conn.execute(
+                        text(
+                            "SELECT chunk_name FROM timescaledb_information.chunks "
+                            "WHERE hypertable_name = :table AND range_end <= :cutoff"
+                        ),
+                        {"table": TABLE_NAME, "cutoff": cutoff},
+                    ).scalars().all()
+                else:
+                    chunks = conn.execute(
+                        text("SELECT drop_chunks(:table, older_than => CAST(:cutoff AS timestamptz))"),
+                        {"table": TABLE_NAME, "cutoff": cutoff},
+                    ).scalars().all()
+            return {"partitions": [str(c) for c in chunks], key: rows or 0}
+
+        if self.mode == "sqlite":
+            with self._lock, background_engine.begin() as conn:
+                partitions = self._sqlite_partitions(conn, refresh=True)
+                expired = [p for p in partitions if p.end is not None and p.end <= cutoff_day]
+                # 至少保留一个分区, 视图不能为空
+                if len(expired) == len(partitions):
+                    expired = expired[:-1]
+                rows = sum(
+                    conn.execute(text(f'SELECT COUNT(*) FROM "{p.name}"')).scalar()
+                    for p in expired
+                )
+                if expired and not dry_run:
+                    for p in expired:
+                        conn.execute(text(f'DROP TABLE "{p.name}"'))
+                    self._sqlite_rebuild_view(conn)
+            return {"partitions": [p.name for p in expired], key: rows}
+
+        if self.mode == "mysql":
+            with background_engine.begin() as conn:
+                partitions = self._mysql_partitions(conn)
+                expired = [
+                    (p, rows) for p, rows in partitions
+                    if p.end is not None and p.end <= cutoff_day
+                ]
+                if len(expired) == len(partitions):
+                    expired = expired[:-1]
+                if expired and not dry_run:
+                    names = ", ".join(p.name for p, _ in expired)
+                    conn.execute(text(f"ALTER TABLE {TABLE_NAME} DROP PARTITION {names}"))
+            return {
+                "partitions": [p.name for p, _ in expired],
+                key: sum(rows for _, rows in expired),
+            }
+
+        return {"partitions": [], key: 0}
+
+    # ==================== 查询裁剪 ====================
+
+    def source(
+        self,
+        db: Session,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        device_id: Optional[str] = None,
+    ):
+        """
+        返回只覆盖 [start, end] 的 performance_metrics 数据源
+
+        SQLite 分区模式下是相关分区表的 UNION ALL 子查询 (时间和设备条件
+        下推到每个分区以使用索引); 其他情况返回原表 (MySQL 自动裁剪分区)。
+        调用方仍需在外层添加相同的过滤条件。
+        """
+        if self.mode != "sqlite":
+            return METRIC_TABLE
+
+        partitions = [
+            p for p in self._sqlite_partitions(db.connection()) if p.overlaps(start, end)
+        ]
+        if not partitions:
+            # 没有数据的范围: 任意一个分区加上不成立的条件
+            partitions = self._sqlite_partitions(db.connection())[:1]
+            start = end = datetime.max
+        selects = []
+        for partition in partitions:
+            table = self._partition_table(partition.name)
+            conditions = []
+            if start is not None:
+                conditions.append(table.c.timestamp >= start)
+            if end is not None:
+                conditions.append(table.c.timestamp <= end)
+            if device_id is not None:
+                conditions.append(table.c.device_id == device_id)
+            selects.append(select(table).where(*conditions))
+        if len(selects) == 1:
+            return selects[0].subquery(TABLE_NAME)
+        return union_all(*selects).subquery(TABLE_NAME)
+
+    def entity(
+        self,
+        db: Session,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        device_id: Optional[str] = None,
+    ):
+        """与 source() 相同, 返回可用于 ORM 查询的 PerformanceMetric 实体"""
+        source = self.source(db, start, end, device_id)
+        if source is METRIC_TABLE:
+            return PerformanceMetric
+        return aliased(PerformanceMetric, source, adapt_on_names=True)
+
+    # ==================== SQLite 写入路由 ====================
+
+    def route(self, conn: Connection, rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        将行按时间戳分配到分区表 (SQLite), 缺少的分区在当前连接上创建
+
+        Returns:
+            分区表名 -> 行列表
+        """
+        partitions = self._sqlite_partitions(conn)
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        missing: List[Dict[str, Any]] = []
+        for row in rows:
+            partition = self._find(partitions, _naive(row["timestamp"]).date())
+            if partition is None:
+                missing.append(row)
+            else:
+                groups.setdefault(partition.name, []).append(row)
+
+        if missing:
+            with self._lock:
+                for row in missing:
+                    day = _naive(row["timestamp"]).date()
+                    partitions = self._sqlite_partitions(conn)
+                    partition = self._find(partitions, day) or self._sqlite_create_for(
+                        conn, partitions, day
+                    )
+                    groups.setdefault(partition.name, []).append(row)
+        return groups
+
+    @staticmethod
+    def _find(partitions: List[Partition], day: date) -> Optional[Partition]:
+        starts = [p.start or date.min for p in partitions]
+        index = bisect.bisect_right(starts, day) - 1
+        if index >= 0:
+            partition = partitions[index]
+            if partition.end is None or day < partition.end:
+                return partition
+        return None
+
+    # ==================== SQLite 实现 ====================
+
+    def _sqlite_partitions(self, conn: Connection, refresh: bool = False) -> List[Partition]:
+        """
+        分区列表 (按起始日期排序, 带短时缓存)
+
+        当前事务新建过分区时直接读取本连接可见的分区且不更新缓存,
+        事务提交后缓存失效, 回滚则不留下不存在的分区
+        """
+        pending = conn.info.get(_PENDING_PARTITIONS, False)
+        if (
+            not refresh
+            and not pending
+            and self._partitions is not None
+            and time.monotonic() - self._loaded_at < _REGISTRY_TTL
+        ):
+            return self._partitions
+        names = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :prefix"),
+            {"prefix": f"{TABLE_NAME}_p%"},
+        ).scalars()
+        partitions = []
+        for name in names:
+            match = _SQLITE_PARTITION_RE.match(name)
+            if match:
+                start, end = (datetime.strptime(g, "%Y%m%d").date() for g in match.groups())
+                partitions.append(Partition(name, start, end))
+        partitions.sort(key=lambda p: p.start)
+        if not pending:
+            self._partitions = partitions
+            self._loaded_at = time.monotonic()
+        return partitions
+
+    def _partition_table(self, name: str) -> Table:
+        """分区表的 Table 对象 (列与 performance_metrics 相同, 不含外键)"""
+        table = self._tables.get(name)
+        if table is None:
+            table = Table(
+                name,
+                MetaData(),
+                *(
+                    Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+                    for c in METRIC_TABLE.columns
+                ),
+            )
+            for index in METRIC_TABLE.indexes:
+                Index(f"ix_{name}_{'_'.join(c.name for c in index.columns)}",
+                      *(table.c[c.name] for c in index.columns))
+            self._tables[name] = table
+        return table
+
+    def _sqlite_create(self, conn: Connection, start: date, end: date) -> Partition:
+        name = f"{TABLE_NAME}_p{start:%Y%m%d}_{end:%Y%m%d}"
+        conn.info[_PENDING_PARTITIONS] = True
+        self._partition_table(name).create(conn, checkfirst=True)
+        return Partition(name, start, end)
+
+    def _sqlite_create_for(self, conn: Connection, partitions: List[Partition], day: date) -> Partition:
+        """为不在任何分区内的日期创建分区 (裁剪到相邻分区之间, 避免范围重叠)"""
+        start = self.period_start(day)
+        end = self.period_end(start)
+        for p in partitions:
+            if p.end is not None and p.end <= day:
+                start = max(start, p.end)
+            if p.start is not None and p.start > day:
+                end = min(end, p.start)
+        partition = self._sqlite_create(conn, start, end)
+        self._sqlite_rebuild_view(conn)
+        logger.info(f"Created metric partition {partition.name} for out-of-range data")
+        return partition
+
+    def _sqlite_premake(self, conn: Connection, until: date) -> List[str]:
+        with self._lock:
+            partitions = self._sqlite_partitions(conn, refresh=True)
+            last_end = partitions[-1].end if partitions else self.period_start(datetime.utcnow().date())
+            created = [
+                self._sqlite_create(conn, start, end).name
+                for start, end in self._next_ranges(last_end, until)
+            ]
+            if created:
+                self._sqlite_rebuild_view(conn)
+            return created
+
+    def _sqlite_rebuild_view(self, conn: Connection):
+        """按当前分区重建 UNION ALL 视图及 INSTEAD OF 触发器"""
+        partitions = self._sqlite_partitions(conn, refresh=True)
+        columns = [c.name for c in METRIC_TABLE.columns]
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"NEW.{c}" for c in columns)
+
+        conn.execute(text(f"DROP VIEW IF EXISTS {TABLE_NAME}"))
+        union = " UNION ALL ".join(
+            f'SELECT {column_list} FROM "{p.name}"' for p in partitions
+        )
+        conn.execute(text(f"CREATE VIEW {TABLE_NAME} AS {union}"))
+
+        # 写入转发到时间范围匹配的分区, 没有匹配的分区时报错
+        inserts = []
+        ranges = []
+        for p in partitions:
+            condition = (
+                f"NEW.timestamp >= '{_sql_timestamp(p.start)}' "
+                f"AND NEW.timestamp < '{_sql_timestamp(p.end)}'"
+            )
+            ranges.append(f"({condition})")
+            inserts.append(
+                f'INSERT INTO "{p.name}" ({column_list}) SELECT {new_values} WHERE {condition};'
+            )
+        conn.execute(
+            text(
+                f"CREATE TRIGGER {TABLE_NAME}_insert INSTEAD OF INSERT ON {TABLE_NAME} "
+                f"BEGIN SELECT RAISE(ABORT, 'no metric partition for timestamp') "
+                f"WHERE NOT ({' OR '.join(ranges)}); {' '.join(inserts)} END"
+            )
+        )
+        deletes = " ".join(f'DELETE FROM "{p.name}" WHERE id = OLD.id;' for p in partitions)
+        conn.execute(
+            text(
+                f"CREATE TRIGGER {TABLE_NAME}_delete INSTEAD OF DELETE ON {TABLE_NAME} "
+                f"BEGIN {deletes} END"
+            )
+        )
+
+    def _sqlite_convert(self, conn: Connection):
+        """
+        将现有 performance_metrics 表转为分区视图
+
+        原表整体重命名为一个分区 (覆盖到最新数据所在周期结束), 不复制数据;
+        视图只包含当前列, 升级前仍在旧列中的明细先移入明细表
+        """
+        kind = conn.execute(
+            text("SELECT type FROM sqlite_master WHERE name = :name"), {"name": TABLE_NAME}
+        ).scalar()
+        if kind != "table":
+            return
+
+        oldest, newest = conn.execute(
+            text(f"SELECT MIN(timestamp), MAX(timestamp) FROM {TABLE_NAME}")
+        ).one()
+        today = self.period_start(datetime.utcnow().date())
+        if oldest is None:
+            conn.execute(text(f"DROP TABLE {TABLE_NAME}"))
+            self._sqlite_create(conn, today, self.period_end(today))
+        else:
+            start = datetime.fromisoformat(str(oldest)).date()
+            end = self.period_end(max(datetime.fromisoformat(str(newest)).date(), today))
+            name = f"{TABLE_NAME}_p{start:%Y%m%d}_{end:%Y%m%d}"
+            metric_details.move_legacy(conn, TABLE_NAME)
+            conn.execute(text(f'ALTER TABLE {TABLE_NAME} RENAME TO "{name}"'))
+            logger.info(f"Converted {TABLE_NAME} to partition {name}")
+        self._sqlite_rebuild_view(conn)
+
+    # ==================== MySQL 实现 ====================
+
+    def _mysql_partitions(self, conn: Connection) -> List[Tuple[Partition, int]]:
+        rows = conn.execute(
+            text(
+                "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS "
+                "FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+            ),
+            {"table": TABLE_NAME},
+        ).all()
+        partitions = []
+        previous_end: Optional[date] = None
+        for name, description, table_rows in rows:
+            end = (
+                None
+                if description == "MAXVALUE"
+                else date.fromordinal(int(description) - _MYSQL_DAYS_OFFSET)
+            )
+            partitions.append((Partition(name, previous_end, end), table_rows or 0))
+            previous_end = end
+        return partitions
+
+    @staticmethod
+    def _mysql_partition_sql(start: date, end: date) -> str:
+        days = end.toordinal() + _MYSQL_DAYS_OFFSET
+        return f"PARTITION p{start:%Y%m%d} VALUES LESS THAN ({days})"
+
+    def _mysql_convert(self, conn: Connection):
+        """将 performance_metrics 转为按 TO_DAYS(timestamp) 的 RANGE 分区表"""
+        if self._mysql_partitions(conn):
+            return
+
+        # 分区表不支持外键, 且分区键必须包含在主键中
+        for fk in inspect(conn).get_foreign_keys(TABLE_NAME):
+            conn.execute(text(f"ALTER TABLE {TABLE_NAME} DROP FOREIGN KEY {fk['name']}"))
+        conn.execute(
+            text(f"ALTER TABLE {TABLE_NAME} DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)")
+        )
+
+        oldest = conn.execute(text(f"SELECT MIN(timestamp) FROM {TABLE_NAME}")).scalar()
+        today = self.period_start(datetime.utcnow().date())
+        first = self.period_start(oldest.date()) if oldest else today
+        first = max(first, today - timedelta(days=settings.metrics_retention_days))
+        definitions = [f"PARTITION pold VALUES LESS THAN ({first.toordinal() + _MYSQL_DAYS_OFFSET})"]
+        definitions += [
+            self._mysql_partition_sql(start, end)
+            for start, end in self._next_ranges(first, self.period_end(today))
+        ]
+        definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        logger.info(f"Partitioning {TABLE_NAME} into {len(definitions)} partitions")
+        conn.execute(
+            text(
+                f"ALTER TABLE {TABLE_NAME} PARTITION BY RANGE (TO_DAYS(timestamp)) "
+                f"({', '.join(definitions)})"
+            )
+        )
+
+    def _mysql_premake(self, conn: Connection, until: date) -> List[str]:
+        partitions = self._mysql_partitions(conn)
+        bounded = [p for p, _ in partitions if p.end is not None]
+        if not bounded:
+            return []
+        ranges = self._next_ranges(bounded[-1].end, until)
+        if not ranges:
+            return []
+        definitions = [self._mysql_partition_sql(start, end) for start, end in ranges]
+        definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        # pmax 通常为空, 拆分只修改元数据
+        conn.execute(
+            text(
+                f"ALTER TABLE {TABLE_NAME} REORGANIZE PARTITION pmax INTO "
+                f"({', '.join(definitions)})"
+            )
+        )
+        return [f"p{start:%Y%m%d}" for start, _ in ranges]
+
+    # ==================== TimescaleDB ====================
+
+    @staticmethod
+    def _is_hypertable(conn: Connection) -> bool:
+        installed = conn.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")
+        ).first()
+        if installed is None:
+            return False
+        return (
+            conn.execute(
+                text(
+                    "SELECT 1 FROM timescaledb_information.hypertables "
+                    "WHERE hypertable_name = :table"
+                ),
+                {"table": TABLE_NAME},
+            ).first()
+            is not None
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "interval": self.interval,
+            "premake": self.premake,
+            "partitions": self.list_partitions(),
+        }
+
+
+# 全局服务实例
+metrics_partitions = MetricsPartitionService()
+
+
+@event.listens_for(Engine, "commit")
+def _publish_partitions_on_commit(conn):
+    if conn.info.pop(_PENDING_PARTITIONS, False):
+        metrics_partitions._partitions = None
+
+
+@event.listens_for(Engine, "rollback")
+def _discard_partitions_on_rollback(conn):
+    # 回滚的分区从未进入共享缓存, 清除标记即可
+    conn.info.pop(_PENDING_PARTITIONS, None)
@@ -0,0 +1,187 @@
+"""
+性能指标降采样查询服务
+按时间桶在数据库端聚合 (min/avg/max), 图表查询的返回点数与时间范围无关:
+  - PostgreSQL + TimescaleDB: time_bucket()
+  - PostgreSQL (无 TimescaleDB): floor(extract(epoch) / n) * n
+  - MySQL: FLOOR(TIMESTAMPDIFF(SECOND, '1970-01-01', ts) / n) * n
+  - SQLite: CAST(strftime('%s', ts) AS INTEGER) / n * n (整数除法)
+"""
+
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Float, Integer, func, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from app.models.sqlite import PerformanceMetric
+from app.services.metrics_partition_service import metrics_partitions
+
+logger = logging.getLogger(__name__)
+
+METRIC_TABLE = PerformanceMetric.__table__
+
+# 参与聚合的数值列
+NUMERIC_COLUMNS: List[str] = [
+    c.name
+    for c in METRIC_TABLE.columns
+    if isinstance(c.type, (Float, Integer)) and not c.primary_key
+]
+
+# 降采样返回点数上限
+MAX_POINTS_LIMIT = 5000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def resolve_bucket_seconds(
+    start: datetime,
+    end: datetime,
+    bucket: Optional[int] = None,
+    max_points: Optional[int] = None,
+) -> int:
+    """
+    计算时间桶宽度 (秒)
+
+    显式指定 bucket 时直接使用, 但仍受 MAX_POINTS_LIMIT 约束;
+    否则按 max_points 将时间范围均分
+    """
+    window = max((end - start).total_seconds(), 1)
+    points = min(max_points or MAX_POINTS_LIMIT, MAX_POINTS_LIMIT)
+    minimum = math.ceil(window / points)
+    return max(bucket or 0, minimum, 1)
+
+
+class MetricsQueryService:
+    """按时间桶聚合 performance_metrics"""
+
+    def __init__(self):
+        # 引擎 URL -> 是否安装了 TimescaleDB
+        self._timescale: Dict[str, bool] = {}
+
+    def has_timescaledb(self, db: Session) -> bool:
+        """检测当前 PostgreSQL 是否安装了 TimescaleDB 扩展 (按引擎缓存)"""
+        bind = db.get_bind()
+        if bind.dialect.name != "postgresql":
+            return False
+        key = str(bind.url)
+        if key not in self._timescale:
+            try:
+                found = db.execute(
+                    text("SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'")
+                ).first()
+                self._timescale[key] = found is not None
+            except Exception as e:
+                logger.warning(f"TimescaleDB detection failed: {e}")
+                self._timescale[key] = False
+        return self._timescale[key]
+
+    def bucket_expression(self, db: Session, bucket_seconds: int, column=None):
+        """返回时间桶起点 (epoch 秒, 整数) 的 SQL 表达式"""
+        ts = column if column is not None else PerformanceMetric.timestamp
+        # 以字面量内联, 避免 GROUP BY 与 SELECT 中绑定参数不同导致 PostgreSQL 报错
+        seconds_text = str(int(bucket_seconds))
+        n = literal_column(seconds_text)
+        dialect = db.get_bind().dialect.name
+
+        if dialect == "postgresql":
+            if self.has_timescaledb(db):
+                bucket = func.time_bucket(literal_column(f"INTERVAL '{seconds_text} seconds'"), ts)
+                return func.floor(func.extract("epoch", bucket))
+            return func.floor(func.extract("epoch", ts) / n) * n
+        if dialect == "mysql":
+            seconds = func.timestampdiff(
+                literal_column("SECOND"), literal_column("'1970-01-01'"), ts
+            )
+            return func.floor(seconds / n) * n
+        # SQLite: 时间戳以文本存储, 先转为 epoch 秒
+        seconds = func.cast(func.strftime("%s", ts), Integer)
+        return seconds // n * n
+
+    def get_bucketed_metrics(
+        self,
+        db: Session,
+        device_id: str,
+        start: datetime,
+        end: datetime,
+        bucket_seconds: int,
+        columns: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        查询时间范围内每个时间桶的 min/avg/max
+
+        Returns:
+            按时间升序的点列表, 每个点包含 timestamp、count 以及
+            <列名> (平均值)、<列名>_min、<列名>_max
+        """
+        columns = [c for c in (columns or NUMERIC_COLUMNS) if c in NUMERIC_COLUMNS]
+        # 分区存储时只读取时间范围内的分区
+        source = metrics_partitions.source(db, start, end, device_id)
+        bucket = self.bucket_expression(db, bucket_seconds, source.c.timestamp).label(
+            "bucket"
+        )
+
+        selected = [bucket, func.count().label("count")]
+        for name in columns:
+            col = source.c[name]
+            selected.extend(
+                [
+                    func.avg(col).label(name),
+                    func.min(col).label(f"{name}_min"),
+                    func.max(col).label(f"{name}_max"),
+                ]
+            )
+
+        stmt = (
+            select(*selected)
+            .where(source.c.device_id == device_id)
+            .where(source.c.timestamp >= start)
+            .where(source.c.timestamp <= end)
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+
+        points = []
+        for row in db.execute(stmt).mappings():
+            point = {
+                "timestamp": _EPOCH + timedelta(seconds=int(row["bucket"])),
+                "count": row["count"],
+            }
+            for name in columns:
+                avg = row[name]
+                point[name] = round(float(avg), 2) if avg is not None else None
+                point[f"{name}_min"] = row[f"{name}_min"]
+                point[f"{name}_max"] = row[f"{name}_max"]
+            points.append(point)
+        return points
+
+    def get_window_averages(
+        self, db: Session, device_id: str, start: datetime, end: datetime
+    ) -> Optional[Dict[str, float]]:
+        """整个时间范围的平均值 (空值按 0 计, 与原始查询一致)"""
+        source = metrics_partitions.source(db, start, end, device_id)
+        row = db.execute(
+            select(
+                func.count().label("count"),
+                func.avg(func.coalesce(source.c.cpu_percent, 0)).label("cpu_percent"),
+                func.avg(func.coalesce(source.c.gpu_percent, 0)).label("gpu_percent"),
+                func.avg(func.coalesce(source.c.memory_percent, 0)).label(
+                    "memory_percent"
+                ),
+            )
+            .where(source.c.device_id == device_id)
+            .where(source.c.timestamp >= start)
+            .where(source.c.timestamp <= end)
+        ).one()
+        if not row.count:
+            return None
+        return {
+            "cpu_percent": round(float(row.cpu_percent), 2),
+            "gpu_percent": round(float(row.gpu_percent), 2),
+            "memory_percent": round(float(row.memory_percent), 2),
+        }
+
+
+# 全局服务实例
+metrics_query_service = MetricsQueryService()
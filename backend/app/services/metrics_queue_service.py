@@ -0,0 +1,225 @@
+"""
+性能指标 write-behind 写入队列
+请求线程只负责校验和入队并立即返回, 后台线程将所有设备的样本合并成
+大批次定时写入数据库, 使 Agent 上报延迟与数据库提交延迟解耦
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.telemetry import metrics_registry
+from app.services.metrics_ingest_service import BATCH_ROWS_BUCKETS, metrics_bulk_writer
+from app.services.metrics_rollup_service import metrics_rollup_service
+from app.services.sqlite_writer_service import sqlite_writer
+
+logger = logging.getLogger(__name__)
+
+FLUSH_ROWS = metrics_registry.histogram(
+    "metrics_queue_flush_rows", "Rows written per write-behind flush", buckets=BATCH_ROWS_BUCKETS
+)
+FLUSH_SECONDS = metrics_registry.histogram(
+    "metrics_queue_flush_duration_seconds", "Write-behind flush duration"
+)
+
+
+class MetricsWriteBehindQueue:
+    """有界的性能指标写入队列 (跨设备合并, 定时批量刷写)"""
+
+    def __init__(
+        self,
+        max_rows: int = settings.metrics_queue_max_rows,
+        flush_interval_ms: int = settings.metrics_flush_interval_ms,
+        flush_max_rows: int = settings.metrics_flush_max_rows,
+        retry_after_seconds: int = settings.metrics_queue_retry_after_seconds,
+    ):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_max_rows = flush_max_rows
+        self.retry_after_seconds = retry_after_seconds
+
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+        # 统计信息
+        self.accepted_rows = 0
+        self.rejected_rows = 0
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.failed_flushes = 0
+        self.last_flush_rows = 0
+        self.last_flush_ms = 0.0
+        self.last_flush_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """启动后台刷写线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-write-behind", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Metrics write-behind queue started "
+            f"(max_rows={self.max_rows}, flush_interval={self.flush_interval}s)"
+        )
+
+    def stop(self, timeout: float = 30.0):
+        """停止队列: 拒绝新数据并把剩余样本全部写入数据库"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logger.error(
+                    f"Metrics queue did not drain within {timeout}s, "
+                    f"{len(self._buffer)} rows lost"
+                )
+            self._thread = None
+        logger.info("Metrics write-behind queue stopped")
+
+    def submit(self, rows: List[Dict[str, Any]]) -> bool:
+        """
+        入队一批已构建好的行数据
+
+        Returns:
+            True 表示已接受; False 表示队列已满或未运行, 调用方应返回 429
+        """
+        with self._cond:
+            if not self._running or len(self._buffer) + len(rows) > self.max_rows:
+                self.rejected_rows += len(rows)
+                return False
+            self._buffer.extend(rows)
+            self.accepted_rows += len(rows)
+            if len(self._buffer) >= self.flush_max_rows:
+                self._cond.notify()
+        return True
+
+    def _take(self) -> List[Dict[str, Any]]:
+        """取出不超过 flush_max_rows 的一批数据 (需持有锁)"""
+        count = min(len(self._buffer), self.flush_max_rows)
+        return [self._buffer.popleft() for _ in range(count)]
+
+    def _run(self):
+        """后台刷写循环"""
+        while True:
+            with self._cond:
+                if self._running and len(self._buffer) < self.flush_max_rows:
+                    self._cond.wait(self.flush_interval)
+                batch = self._take()
+                draining = not self._running
+
+            if batch:
+                self._flush(batch, requeue=not draining)
+            elif draining:
+                break
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        """在独立事务中写入一批样本 (SQLite 生产模式下与其他写入合并提交)"""
+        sqlite_writer.run(lambda conn: metrics_bulk_writer.write(conn, rows))
+        # 积压后才提交的样本可能已落后于汇总水位
+        metrics_rollup_service.mark_written(rows)
+
+    def _flush(self, rows: List[Dict[str, Any]], requeue: bool = True):
+        """将一批样本写入数据库"""
+        start = time.perf_counter()
+        try:
+            self._write(rows)
+            written = len(rows)
+        except Exception as e:
+            self.failed_flushes += 1
+            logger.error(f"Failed to flush {len(rows)} metrics: {e}")
+            written = self._flush_by_device(rows, requeue)
+
+        elapsed = time.perf_counter() - start
+        FLUSH_ROWS.observe(written)
+        FLUSH_SECONDS.observe(elapsed)
+        self.flushed_rows += written
+        self.last_flush_rows = written
+        self.last_flush_ms = round(elapsed * 1000, 2)
+        self.last_flush_at = time.time()
+
+    def _flush_by_device(self, rows: List[Dict[str, Any]], requeue: bool) -> int:
+        """
+        合并批次写入失败后按设备拆分重试
+
+        单个设备的坏数据 (如设备已被删除) 只丢弃该设备的样本;
+        若全部分组都失败, 视为数据库不可用, 将数据放回队首等待下次刷写
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(row["device_id"], []).append(row)
+
+        written = 0
+        failed: List[Dict[str, Any]] = []
+        for device_id, device_rows in groups.items():
+            try:
+                self._write(device_rows)
+                written += len(device_rows)
+            except Exception as e:
+                logger.error(f"Dropping metrics for device {device_id}: {e}")
+                failed.extend(device_rows)
+
+        if written or not requeue:
+            self.dropped_rows += len(failed)
+            return written
+
+        with self._cond:
+            room = max(self.max_rows - len(self._buffer), 0)
+            if room < len(failed):
+                self.dropped_rows += len(failed) - room
+                failed = failed[:room]
+            self._buffer.extendleft(reversed(failed))
+        # 数据库不可用时避免空转
+        time.sleep(self.flush_interval)
+        return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列状态"""
+        return {
+            "running": self._running,
+            "pending_rows": len(self._buffer),
+            "max_rows": self.max_rows,
+            "flush_interval_ms": int(self.flush_interval * 1000),
+            "flush_max_rows": self.flush_max_rows,
+            "accepted_rows": self.accepted_rows,
+            "rejected_rows": self.rejected_rows,
+            "flushed_rows": self.flushed_rows,
+            "dropped_rows": self.dropped_rows,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_rows": self.last_flush_rows,
+            "last_flush_ms": self.last_flush_ms,
+            "last_flush_at": self.last_flush_at,
+        }
+
+
+# 全局队列实例
+metrics_queue = MetricsWriteBehindQueue()
+
+metrics_registry.gauge(
+    "metrics_queue_pending_rows", "Rows waiting in the write-behind queue",
+    fn=lambda: len(metrics_queue._buffer),
+)
+metrics_registry.counter(
+    "metrics_queue_rows_total", "Write-behind queue rows by outcome", ("outcome",),
+    fn=lambda: {
+        ("accepted",): metrics_queue.accepted_rows,
+        ("rejected",): metrics_queue.rejected_rows,
+        ("flushed",): metrics_queue.flushed_rows,
+        ("dropped",): metrics_queue.dropped_rows,
+    },
+)
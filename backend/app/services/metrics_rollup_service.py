@@ -0,0 +1,717 @@
+"""
+性能指标汇总服务
+按设备维护 1分钟 / 1小时 / 1天 汇总 (count/min/max/avg/p95):
+  - SQLite / MySQL / PostgreSQL: 定时任务按 created_at 水位增量汇总,
+    1m 由原始数据计算, 1h 由 1m 汇总, 1d 由 1h 汇总;
+    write-behind 队列积压后才提交、created_at 已落后于水位的样本,
+    刷写后登记其时间桶, 由下一次汇总重新计算
+  - PostgreSQL + TimescaleDB: 使用连续聚合 (continuous aggregates)
+
+长时间范围的查询自动路由到合适粒度的汇总数据, 不再扫描原始表。
+"""
+
+import logging
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, column, delete, func, insert, select, table, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import BackgroundSessionLocal
+from app.models.sqlite import (
+    MetricRollupState,
+    PerformanceMetric,
+    PerformanceMetricRollup,
+)
+from app.services.metrics_query_service import metrics_query_service
+
+logger = logging.getLogger(__name__)
+
+# 汇总粒度 -> 时间桶秒数 (由粗到细)
+RESOLUTIONS: Dict[str, int] = {"1d": 86400, "1h": 3600, "1m": 60}
+
+# 上一级汇总的数据来源
+PARENT_RESOLUTION = {"1h": "1m", "1d": "1h"}
+
+# 参与汇总的指标
+ROLLUP_METRICS = (
+    "cpu_percent",
+    "cpu_temperature",
+    "cpu_frequency_mhz",
+    "gpu_percent",
+    "gpu_temperature",
+    "gpu_memory_used_mb",
+    "memory_percent",
+    "memory_used_mb",
+    "disk_read_mbps",
+    "disk_write_mbps",
+    "network_sent_mbps",
+    "network_recv_mbps",
+)
+AGGREGATES = ("min", "max", "avg", "p95")
+
+ROLLUP_TABLE = PerformanceMetricRollup.__table__
+METRIC_TABLE = PerformanceMetric.__table__
+
+# 水位记录名
+RAW_WATERMARK = "performance_metrics"
+
+# 单次执行最多追赶的原始数据时间跨度, 避免首次回填时长时间占用数据库
+MAX_CATCHUP_WINDOW = timedelta(hours=6)
+
+# 同一设备的时间桶间隔超过该值时分段读取
+RANGE_GAP_SECONDS = 3600
+
+# DELETE ... IN (...) 每批时间桶数量 (SQLite 绑定参数上限)
+DELETE_CHUNK = 500
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch_seconds(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - _EPOCH).total_seconds())
+
+
+def _from_epoch(seconds: int) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """最近秩 (nearest-rank) 百分位"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(q * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def weighted_percentile(pairs: List[Tuple[float, int]], q: float) -> Optional[float]:
+    """
+    按样本数加权的百分位 (用于由下级 p95 近似上级 p95)
+
+    Args:
+        pairs: [(下级 p95, 下级样本数), ...]
+    """
+    pairs = [(v, w) for v, w in pairs if v is not None and w]
+    if not pairs:
+        return None
+    pairs.sort(key=lambda p: p[0])
+    threshold = q * sum(w for _, w in pairs)
+    running = 0
+    for value, weight in pairs:
+        running += weight
+        if running >= threshold:
+            return value
+    return pairs[-1][0]
+
+
+def _split_ranges(buckets: Iterable[int], width: int) -> List[Tuple[int, int]]:
+    """将时间桶起点集合拆分为若干连续区间 [start, end)"""
+    ranges: List[Tuple[int, int]] = []
+    for bucket in sorted(buckets):
+        if ranges and bucket - ranges[-1][1] <= RANGE_GAP_SECONDS:
+            ranges[-1] = (ranges[-1][0], bucket + width)
+        else:
+            ranges.append((bucket, bucket + width))
+    return ranges
+
+
+class MetricsRollupService:
+    """性能指标汇总: 增量维护与查询路由"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._continuous: Optional[bool] = None
+        # 迟到样本涉及的 (设备, 1m 时间桶)
+        self._late: Set[Tuple[str, int]] = set()
+        self._late_lock = threading.Lock()
+
+        # 统计信息
+        self.runs = 0
+        self.last_run_at: Optional[float] = None
+        self.last_run_ms = 0.0
+        self.last_watermark: Optional[datetime] = None
+        self.last_buckets: Dict[str, int] = {}
+        self.last_error: Optional[str] = None
+        self.late_rows = 0
+
+    # ==================== 结构 ====================
+
+    def uses_continuous_aggregates(self, db: Session) -> bool:
+        """PostgreSQL + TimescaleDB 时由连续聚合维护汇总"""
+        if self._continuous is None:
+            self._continuous = (
+                settings.database_type == "postgresql"
+                and metrics_query_service.has_timescaledb(db)
+            )
+        return self._continuous
+
+    def ensure_schema(self):
+        """创建 TimescaleDB 连续聚合 (如可用)"""
+        with BackgroundSessionLocal() as db:
+            if self.uses_continuous_aggregates(db):
+                self._create_continuous_aggregates(db)
+            db.commit()
+
+    def _create_continuous_aggregates(self, db: Session):
+        """创建 performance_metrics_1m / _1h / _1d 连续聚合及刷新策略"""
+        policies = {
+            # 粒度: (时间桶, start_offset, end_offset, schedule_interval)
+            "1m": ("1 minute", "1 day", "1 minute", "1 minute"),
+            "1h": ("1 hour", "7 days", "1 hour", "30 minutes"),
+            "1d": ("1 day", "90 days", "1 day", "1 hour"),
+        }
+        aggregates = []
+        for name in ROLLUP_METRICS:
+            aggregates.extend(
+                [
+                    f"min({name}) AS {name}_min",
+                    f"max({name}) AS {name}_max",
+                    f"avg({name}) AS {name}_avg",
+                    f"percentile_cont(0.95) WITHIN GROUP (ORDER BY {name}) AS {name}_p95",
+                ]
+            )
+        columns = ",\n                ".join(aggregates)
+
+        for resolution, (bucket, start, end, schedule) in policies.items():
+            view = f"performance_metrics_{resolution}"
+            db.execute(
+                text(
+                    f"""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+            WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+            SELECT
+                device_id,
+                time_bucket(INTERVAL '{bucket}', timestamp) AS bucket_start,
+                count(*) AS sample_count,
+                {columns}
+            FROM performance_metrics
+            GROUP BY device_id, time_bucket(INTERVAL '{bucket}', timestamp)
+            WITH NO DATA
+            """
+                )
+            )
+            db.execute(
+                text(
+                    f"""
+            SELECT add_continuous_aggregate_policy(
+                '{view}',
+                start_offset => INTERVAL '{start}',
+                end_offset => INTERVAL '{end}',
+                schedule_interval => INTERVAL '{schedule}',
+                if_not_exists => TRUE
+            )
+            """
+                )
+            )
+        logger.info("TimescaleDB continuous aggregates for metrics are in place")
+
+    # ==================== 增量汇总 ====================
+
+    def run(self) -> Dict[str, Any]:
+        """
+        执行一次增量汇总 (由调度器定时调用)
+
+        找出水位之后新写入的原始数据所在的 1m 时间桶, 从原始数据重新计算,
+        再逐级刷新受影响的 1h / 1d 时间桶。迟到的数据同样按 created_at 被发现。
+        """
+        if not self._lock.acquire(blocking=False):
+            return {"status": "busy"}
+        start = time.perf_counter()
+        try:
+            with BackgroundSessionLocal() as db:
+                if self.uses_continuous_aggregates(db):
+                    return {"status": "continuous_aggregates"}
+                result = self._run(db)
+            self.last_error = None
+            return result
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Metrics rollup failed: {e}")
+            return {"status": "error", "message": str(e)}
+        finally:
+            self.runs += 1
+            self.last_run_at = time.time()
+            self.last_run_ms = round((time.perf_counter() - start) * 1000, 2)
+            self._lock.release()
+
+    # ==================== 迟到数据 ====================
+
+    def mark_written(self, rows: Iterable[Dict[str, Any]]):
+        """
+        登记已提交但可能落后于水位的样本 (write-behind 刷写提交后调用)
+
+        水位最多推进到 now - settle_seconds; created_at 早于该时间才提交的行
+        可能已落在水位之前, 按水位扫描不会再被发现, 因此登记其 1m 时间桶
+        """
+        if not settings.metrics_rollup_enabled or self._continuous:
+            return
+        horizon = datetime.utcnow() - timedelta(
+            seconds=settings.metrics_rollup_settle_seconds
+        )
+        late = {
+            (row["device_id"], _epoch_seconds(row["timestamp"]) // 60 * 60)
+            for row in rows
+            if row["created_at"] <= horizon
+        }
+        if late:
+            with self._late_lock:
+                self._late.update(late)
+            self.late_rows += len(late)
+
+    def _take_late(self) -> Dict[str, Set[int]]:
+        with self._late_lock:
+            late, self._late = self._late, set()
+        affected: Dict[str, Set[int]] = {}
+        for device_id, minute in late:
+            affected.setdefault(device_id, set()).add(minute)
+        return affected
+
+    def _restore_late(self, affected: Dict[str, Set[int]]):
+        """汇总失败时放回, 下次重试"""
+        with self._late_lock:
+            self._late.update(
+                (device_id, minute)
+                for device_id, minutes in affected.items()
+                for minute in minutes
+            )
+
+    def _run(self, db: Session) -> Dict[str, Any]:
+        late = self._take_late()
+        try:
+            return self._run_window(db, late)
+        except Exception:
+            self._restore_late(late)
+            raise
+
+    def _run_window(self, db: Session, late: Dict[str, Set[int]]) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        state = db.get(MetricRollupState, RAW_WATERMARK)
+        if state is None:
+            state = MetricRollupState(
+                name=RAW_WATERMARK,
+                watermark=now - timedelta(days=settings.metrics_rollup_backfill_days),
+            )
+            db.add(state)
+
+        since = state.watermark
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        limit = now - timedelta(seconds=settings.metrics_rollup_settle_seconds)
+
+        affected: Dict[str, Set[int]] = {}
+        until = since
+        if limit > since:
+            # 跳过没有新数据的时间段
+            first = db.scalar(
+                select(func.min(PerformanceMetric.created_at))
+                .where(PerformanceMetric.created_at > since)
+                .where(PerformanceMetric.created_at <= limit)
+            )
+            if first is None:
+                until = limit
+            else:
+                if first.tzinfo is not None:
+                    first = first.astimezone(timezone.utc).replace(tzinfo=None)
+                until = min(limit, first + MAX_CATCHUP_WINDOW)
+                affected = self._affected_minutes(db, since, until)
+
+        for device_id, minutes in late.items():
+            affected.setdefault(device_id, set()).update(minutes)
+        if not affected:
+            if until > since:
+                state.watermark = until
+                state.updated_at = now
+                db.commit()
+                self.last_watermark = until
+            return {"status": "idle"}
+
+        counts = {resolution: 0 for resolution in RESOLUTIONS}
+        for device_id, minutes in affected.items():
+            counts["1m"] += self._rollup_raw(db, device_id, minutes)
+            hours = {m // 3600 * 3600 for m in minutes}
+            counts["1h"] += self._rollup_children(db, device_id, "1h", hours)
+            days = {h // 86400 * 86400 for h in hours}
+            counts["1d"] += self._rollup_children(db, device_id, "1d", days)
+
+        state.watermark = until
+        state.updated_at = now
+        db.commit()
+
+        self.last_watermark = until
+        self.last_buckets = counts
+        return {
+            "status": "ok",
+            "devices": len(affected),
+            "late_devices": len(late),
+            "buckets": counts,
+        }
+
+    def _affected_minutes(
+        self, db: Session, since: datetime, until: datetime
+    ) -> Dict[str, Set[int]]:
+        """水位区间内新写入数据涉及的 (设备, 1m 时间桶)"""
+        bucket = metrics_query_service.bucket_expression(db, 60)
+        rows = db.execute(
+            select(PerformanceMetric.device_id, bucket)
+            .where(PerformanceMetric.created_at > since)
+            .where(PerformanceMetric.created_at <= until)
+            .distinct()
+        )
+        affected: Dict[str, Set[int]] = {}
+        for device_id, minute in rows:
+            if minute is not None:
+                affected.setdefault(device_id, set()).add(int(minute))
+        return affected
+
+    def _rollup_raw(self, db: Session, device_id: str, minutes: Set[int]) -> int:
+        """由原始数据重新计算指定 1m 时间桶"""
+        metric_columns = [METRIC_TABLE.c[name] for name in ROLLUP_METRICS]
+        groups: Dict[int, List[tuple]] = {}
+        for start, end in _split_ranges(minutes, 60):
+            rows = db.execute(
+                select(PerformanceMetric.timestamp, *metric_columns)
+                .where(PerformanceMetric.device_id == device_id)
+                .where(PerformanceMetric.timestamp >= _from_epoch(start))
+                .where(PerformanceMetric.timestamp < _from_epoch(end))
+            )
+            for row in rows:
+                minute = _epoch_seconds(row[0]) // 60 * 60
+                if minute in minutes:
+                    groups.setdefault(minute, []).append(row[1:])
+
+        records = []
+        for minute, samples in groups.items():
+            record = self._new_record(device_id, "1m", minute, len(samples))
+            for i, name in enumerate(ROLLUP_METRICS):
+                values = [s[i] for s in samples if s[i] is not None]
+                if values:
+                    record[f"{name}_min"] = min(values)
+                    record[f"{name}_max"] = max(values)
+                    record[f"{name}_avg"] = sum(values) / len(values)
+                    record[f"{name}_p95"] = percentile(values, 0.95)
+            records.append(record)
+
+        # 原始数据已被删除的时间桶同样清除
+        self._replace(db, device_id, "1m", minutes, records)
+        return len(records)
+
+    def _rollup_children(
+        self, db: Session, device_id: str, resolution: str, buckets: Set[int]
+    ) -> int:
+        """由下一级汇总重新计算指定时间桶 (p95 为按样本数加权的近似值)"""
+        width = RESOLUTIONS[resolution]
+        child = PARENT_RESOLUTION[resolution]
+        groups: Dict[int, List[Any]] = {}
+        for start, end in _split_ranges(buckets, width):
+            rows = db.execute(
+                select(ROLLUP_TABLE)
+                .where(ROLLUP_TABLE.c.device_id == device_id)
+                .where(ROLLUP_TABLE.c.resolution == child)
+                .where(ROLLUP_TABLE.c.bucket_start >= _from_epoch(start))
+                .where(ROLLUP_TABLE.c.bucket_start < _from_epoch(end))
+            ).mappings()
+            for row in rows:
+                bucket = _epoch_seconds(row["bucket_start"]) // width * width
+                if bucket in buckets:
+                    groups.setdefault(bucket, []).append(row)
+
+        records = []
+        for bucket, children in groups.items():
+            record = self._new_record(
+                device_id, resolution, bucket, sum(c["sample_count"] for c in children)
+            )
+            for name in ROLLUP_METRICS:
+                present = [c for c in children if c[f"{name}_avg"] is not None]
+                if not present:
+                    continue
+                weight = sum(c["sample_count"] for c in present)
+                record[f"{name}_min"] = min(c[f"{name}_min"] for c in present)
+                record[f"{name}_max"] = max(c[f"{name}_max"] for c in present)
+                record[f"{name}_avg"] = (
+                    sum(c[f"{name}_avg"] * c["sample_count"] for c in present) / weight
+                )
+                record[f"{name}_p95"] = weighted_percentile(
+                    [(c[f"{name}_p95"], c["sample_count"]) for c in present], 0.95
+                )
+            records.append(record)
+
+        self._replace(db, device_id, resolution, buckets, records)
+        return len(records)
+
+    @staticmethod
+    def _new_record(
+        device_id: str, resolution: str, bucket: int, count: int
+    ) -> Dict[str, Any]:
+        record = {c.name: None for c in ROLLUP_TABLE.columns}
+        record.update(
+            {
+                "id": str(uuid.uuid4()),
+                "device_id": device_id,
+                "resolution": resolution,
+                "bucket_start": _from_epoch(bucket),
+                "sample_count": count,
+                "updated_at": datetime.utcnow(),
+            }
+        )
+        return record
+
+    def _replace(
+        self,
+        db: Session,
+        device_id: str,
+        resolution: str,
+        buckets: Set[int],
+        records: List[Dict[str, Any]],
+    ):
+        """删除旧的时间桶并写入重新计算的结果"""
+        ordered = sorted(buckets)
+        for i in range(0, len(ordered), DELETE_CHUNK):
+            db.execute(
+                delete(ROLLUP_TABLE)
+                .where(ROLLUP_TABLE.c.device_id == device_id)
+                .where(ROLLUP_TABLE.c.resolution == resolution)
+                .where(
+                    ROLLUP_TABLE.c.bucket_start.in_(
+                        [_from_epoch(b) for b in ordered[i : i + DELETE_CHUNK]]
+                    )
+                )
+            )
+        if records:
+            db.execute(insert(ROLLUP_TABLE), records)
+
+    # ==================== 查询路由 ====================
+
+    def plan(
+        self, start: datetime, end: datetime, bucket_seconds: int
+    ) -> Tuple[Optional[str], int]:
+        """
+        为时间范围和时间桶宽度选择数据来源
+
+        Returns:
+            (汇总粒度 或 None 表示查原始表, 对齐到该粒度整数倍的时间桶宽度)
+        """
+        if not settings.metrics_rollup_enabled:
+            return None, bucket_seconds
+        if end - start < timedelta(hours=settings.metrics_rollup_route_min_hours):
+            return None, bucket_seconds
+        for resolution, width in RESOLUTIONS.items():
+            if bucket_seconds >= width:
+                return resolution, math.ceil(bucket_seconds / width) * width
+        return None, bucket_seconds
+
+    def _source(self, db: Session, resolution: str):
+        """返回 (可查询对象, 过滤条件列表)"""
+        if self.uses_continuous_aggregates(db):
+            view = table(
+                f"performance_metrics_{resolution}",
+                column("device_id"),
+                column("bucket_start"),
+                column("sample_count"),
+                *[
+                    column(f"{name}_{agg}")
+                    for name in ROLLUP_METRICS
+                    for agg in AGGREGATES
+                ],
+            )
+            return view, []
+        return ROLLUP_TABLE, [ROLLUP_TABLE.c.resolution == resolution]
+
+    @staticmethod
+    def _range_filters(source, resolution: str, start: datetime, end: datetime):
+        """与 [start, end] 有重叠的汇总时间桶 (包含起点所在的不完整时间桶)"""
+        return [
+            source.c.bucket_start > start - timedelta(seconds=RESOLUTIONS[resolution]),
+            source.c.bucket_start <= end,
+        ]
+
+    def get_bucketed_metrics(
+        self,
+        db: Session,
+        device_id: str,
+        start: datetime,
+        end: datetime,
+        bucket_seconds: int,
+        resolution: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        与 MetricsQueryService.get_bucketed_metrics 返回相同结构的降采样数据
+
+        resolution 为空时查询原始表; 否则由该粒度的汇总数据在数据库端再聚合
+        """
+        if resolution is None:
+            return metrics_query_service.get_bucketed_metrics(
+                db, device_id, start, end, bucket_seconds
+            )
+
+        source, filters = self._source(db, resolution)
+        count = source.c.sample_count
+        bucket = metrics_query_service.bucket_expression(
+            db, bucket_seconds, column=source.c.bucket_start
+        ).label("bucket")
+
+        selected = [bucket, func.sum(count).label("count")]
+        for name in ROLLUP_METRICS:
+            avg = source.c[f"{name}_avg"]
+            selected.extend(
+                [
+                    (
+                        func.sum(avg * count)
+                        / func.sum(case((avg.is_not(None), count)))
+                    ).label(name),
+                    func.min(source.c[f"{name}_min"]).label(f"{name}_min"),
+                    func.max(source.c[f"{name}_max"]).label(f"{name}_max"),
+                ]
+            )
+
+        stmt = (
+            select(*selected)
+            .where(source.c.device_id == device_id)
+            .where(*self._range_filters(source, resolution, start, end))
+            .where(*filters)
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+
+        points = []
+        for row in db.execute(stmt).mappings():
+            point = {
+                "timestamp": _from_epoch(int(row["bucket"])),
+                "count": int(row["count"] or 0),
+            }
+            for name in ROLLUP_METRICS:
+                avg = row[name]
+                point[name] = round(float(avg), 2) if avg is not None else None
+                point[f"{name}_min"] = row[f"{name}_min"]
+                point[f"{name}_max"] = row[f"{name}_max"]
+            points.append(point)
+        return points
+
+    def get_window_averages(
+        self,
+        db: Session,
+        device_id: str,
+        start: datetime,
+        end: datetime,
+        resolution: Optional[str] = None,
+    ) -> Optional[Dict[str, float]]:
+        """整个时间范围的平均值, 长时间范围由汇总数据计算"""
+        if resolution is None:
+            return metrics_query_service.get_window_averages(
+                db, device_id, start, end
+            )
+
+        source, filters = self._source(db, resolution)
+        count = source.c.sample_count
+        names = ("cpu_percent", "gpu_percent", "memory_percent")
+        row = db.execute(
+            select(
+                func.sum(count).label("count"),
+                *[
+                    func.sum(func.coalesce(source.c[f"{name}_avg"], 0) * count).label(
+                        name
+                    )
+                    for name in names
+                ],
+            )
+            .where(source.c.device_id == device_id)
+            .where(*self._range_filters(source, resolution, start, end))
+            .where(*filters)
+        ).one()
+        if not row.count:
+            return None
+        return {
+            name: round(float(getattr(row, name)) / float(row.count), 2)
+            for name in names
+        }
+
+    def get_metric_history(
+        self,
+        db: Session,
+        device_id: str,
+        start: datetime,
+        end: datetime,
+        bucket_seconds: int = 3600,
+    ) -> List[Dict[str, Any]]:
+        """
+        趋势分析用的历史数据 (cpu/gpu/memory 平均值)
+
+        长时间范围返回按 bucket_seconds 汇总的点, 短时间范围返回原始样本
+        """
+        resolution, bucket_seconds = self.plan(start, end, bucket_seconds)
+        if resolution is not None:
+            points = self.get_bucketed_metrics(
+                db, device_id, start, end, bucket_seconds, resolution
+            )
+        else:
+            points = [
+                dict(row)
+                for row in db.execute(
+                    select(
+                        PerformanceMetric.timestamp,
+                        PerformanceMetric.cpu_percent,
+                        PerformanceMetric.gpu_percent,
+                        PerformanceMetric.memory_percent,
+                    )
+                    .where(PerformanceMetric.device_id == device_id)
+                    .where(PerformanceMetric.timestamp >= start)
+                    .where(PerformanceMetric.timestamp <= end)
+                    .order_by(PerformanceMetric.timestamp.asc())
+                ).mappings()
+            ]
+
+        return [
+            {
+                "timestamp": p["timestamp"].isoformat() if p["timestamp"] else None,
+                "cpu_percent": p["cpu_percent"],
+                "gpu_percent": p["gpu_percent"],
+                "memory_percent": p["memory_percent"],
+            }
+            for p in points
+        ]
+
+    def get_rollups(
+        self,
+        db: Session,
+        device_id: str,
+        resolution: str,
+        start: datetime,
+        end: datetime,
+    ) -> List[Dict[str, Any]]:
+        """读取指定粒度的汇总行 (按时间升序)"""
+        source, filters = self._source(db, resolution)
+        rows = db.execute(
+            select(source)
+            .where(source.c.device_id == device_id)
+            .where(source.c.bucket_start >= start)
+            .where(source.c.bucket_start <= end)
+            .where(*filters)
+            .order_by(source.c.bucket_start.asc())
+        ).mappings()
+        return [dict(row) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取汇总任务状态"""
+        return {
+            "enabled": settings.metrics_rollup_enabled,
+            "continuous_aggregates": bool(self._continuous),
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_run_ms": self.last_run_ms,
+            "watermark": self.last_watermark,
+            "last_buckets": self.last_buckets,
+            "late_rows": self.late_rows,
+            "pending_late_buckets": len(self._late),
+            "last_error": self.last_error,
+        }
+
+
+# 全局服务实例
+metrics_rollup_service = MetricsRollupService()
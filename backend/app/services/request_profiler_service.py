@@ -0,0 +1,363 @@
+"""
+单请求采样分析 (仅管理员)
+请求带 X-Profile: 1 头或 ?__profile=1 参数并携带管理员令牌时, 只对这一个请求
+按固定间隔采样调用栈:
+  - 事件循环线程: 仅在该请求的 asyncio 任务正在运行时采样 (参数校验、序列化等)
+  - 线程池线程: 只采样正在为该请求执行同步代码的线程 (同步路由、同步依赖、响应校验)。
+    通过包装 anyio.to_thread.run_sync 记录线程, 未分析时每次调用只多一次 ContextVar 读取
+
+每个样本按最内层可识别的栈帧归类 (SQL 执行 / ORM 对象构建 / SQL 构建 / Pydantic 校验 /
+JSON 序列化 / 应用代码 / 其他), 未被采样的时间即等待 (I/O、线程池排队)。
+结果保存在内存中, 可下载折叠栈格式 (flamegraph.pl、speedscope 可直接导入)。
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import anyio.to_thread
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+from app.core.telemetry import route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_FLAG = "__profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+MAX_STACK_DEPTH = 128
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))).replace(os.sep, "/") + "/"
+
+# 样本分类: 从最内层栈帧向外, 第一个文件路径匹配的分类生效 (按此顺序检查)
+CATEGORIES = (
+    (
+        "orm_hydration",
+        (
+            "/sqlalchemy/orm/loading.py",
+            "/sqlalchemy/orm/strategies.py",
+            "/sqlalchemy/orm/state.py",
+            "/sqlalchemy/orm/attributes.py",
+            "/sqlalchemy/orm/instrumentation.py",
+            "/sqlalchemy/orm/identity.py",
+            "/sqlalchemy/engine/result.py",
+            "/sqlalchemy/engine/row.py",
+        ),
+    ),
+    (
+        "sql_execution",
+        (
+            "/sqlalchemy/engine/",
+            "/sqlalchemy/pool/",
+            "/sqlalchemy/dialects/",
+            "/sqlite3/",
+            "/aiosqlite/",
+            "/pymysql/",
+            "/aiomysql/",
+            "/psycopg",
+            "/asyncpg/",
+        ),
+    ),
+    ("sql_build", ("/sqlalchemy/",)),
+    ("pydantic_validation", ("/pydantic/", "/pydantic_core/", "/fastapi/_compat", "/fastapi/dependencies/")),
+    ("json_serialization", ("/fastapi/encoders.py", "/json/", "/orjson", "/starlette/responses.py")),
+    ("app_code", (APP_DIR,)),
+)
+OTHER = "other"
+
+# 当前请求的分析记录 (随 contextvars 复制到线程池)
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "request_profile", default=None
+)
+
+
+def _classify(filenames: Sequence[str]) -> str:
+    """filenames: 从最内层到最外层"""
+    for filename in filenames:
+        for category, patterns in CATEGORIES:
+            if any(p in filename for p in patterns):
+                return category
+    return OTHER
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename.replace(os.sep, "/")
+    if filename.startswith(APP_DIR):
+        filename = "app/" + filename[len(APP_DIR):]
+    else:
+        # 第三方库和标准库只保留包内路径
+        idx = filename.rfind("/site-packages/")
+        if idx >= 0:
+            filename = filename[idx + len("/site-packages/"):]
+        else:
+            idx = filename.rfind("/lib/python")
+            if idx >= 0:
+                filename = filename[idx + 1:].split("/", 1)[-1]
+    return f"{code.co_name} ({filename})"
+
+
+class RequestProfile:
+    """一次请求的采样结果"""
+
+    def __init__(self, scope: Dict[str, Any], user: Dict[str, Any], interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = scope.get("method")
+        self.path = scope.get("path")
+        self.route: Optional[str] = None
+        self.user = user.get("username") or user.get("sub")
+        self.started_at = datetime.utcnow()
+        self.interval = interval
+        self.status_code: Optional[int] = None
+        self.wall_ms = 0.0
+
+        self.task: Optional[asyncio.Task] = None
+        self.threads: Set[int] = set()
+        self.samples = 0
+        self.category_seconds: Counter = Counter()
+        self.stacks: Counter = Counter()
+        self.leaf_seconds: Counter = Counter()
+
+        self._start = time.perf_counter()
+        self._done = threading.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        sampled = sum(self.category_seconds.values())
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "user": self.user,
+            "started_at": self.started_at.isoformat(),
+            "wall_ms": round(self.wall_ms, 2),
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": self.samples,
+            "breakdown": {
+                category: {
+                    "ms": round(seconds * 1000, 2),
+                    "percent": round(seconds * 100 / sampled, 1) if sampled else 0.0,
+                }
+                for category, seconds in self.category_seconds.most_common()
+            },
+            # 没有线程在为该请求执行代码的时间 (等待 I/O、线程池排队等)
+            "waiting_ms": round(max(0.0, self.wall_ms - sampled * 1000), 2),
+            "hot_functions": [
+                {"function": label, "ms": round(seconds * 1000, 2)}
+                for label, seconds in self.leaf_seconds.most_common(15)
+            ],
+        }
+
+    def folded(self) -> str:
+        """折叠栈格式: 每行 "根;...;叶 样本数" """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """按需单请求采样分析器"""
+
+    def __init__(self):
+        self.enabled = settings.request_profiler_enabled
+        self.interval = max(0.5, settings.request_profiler_interval_ms) / 1000.0
+        self.max_profiles = max(1, settings.request_profiler_max_profiles)
+        self.max_concurrent = max(1, settings.request_profiler_max_concurrent)
+
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self.skipped_busy = 0
+
+    # ------------------------------------------------
+    # 线程池线程跟踪
+    # ------------------------------------------------
+
+    def install(self):
+        """包装 anyio.to_thread.run_sync (startup_event 调用, 重复调用无副作用)"""
+        if not self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        original = anyio.to_thread.run_sync
+        if getattr(original, "_request_profiler", False):
+            return
+
+        async def run_sync(func, *args, **kwargs):
+            profile = _current_profile.get()
+            if profile is None:
+                return await original(func, *args, **kwargs)
+
+            def tracked(*call_args):
+                thread_id = threading.get_ident()
+                profile.threads.add(thread_id)
+                try:
+                    return func(*call_args)
+                finally:
+                    profile.threads.discard(thread_id)
+
+            return await original(tracked, *args, **kwargs)
+
+        run_sync._request_profiler = True
+        anyio.to_thread.run_sync = run_sync
+
+    # ------------------------------------------------
+    # 采样
+    # ------------------------------------------------
+
+    def begin(self, scope: Dict[str, Any], user: Dict[str, Any]) -> Optional[RequestProfile]:
+        """开始分析当前请求; 同时分析的请求过多时返回 None"""
+        with self._lock:
+            if self._active >= self.max_concurrent:
+                self.skipped_busy += 1
+                return None
+            self._active += 1
+        profile = RequestProfile(scope, user, self.interval)
+        profile.task = asyncio.current_task()
+        threading.Thread(
+            target=self._sample, args=(profile,), name=f"profiler-{profile.id}", daemon=True
+        ).start()
+        return profile
+
+    def finish(self, profile: RequestProfile, scope: Dict[str, Any]):
+        profile.wall_ms = (time.perf_counter() - profile._start) * 1000
+        profile._done.set()
+        profile.route = route_template(scope)
+        with self._lock:
+            self._active -= 1
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        logger.info(
+            f"Profiled {profile.method} {profile.path}: {profile.wall_ms:.1f}ms, "
+            f"{profile.samples} samples (profile {profile.id})"
+        )
+
+    def _sample(self, profile: RequestProfile):
+        last = time.perf_counter()
+        while not profile._done.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            thread_ids = list(profile.threads)
+            if self._loop_thread_id is not None and self._loop is not None:
+                try:
+                    if asyncio.current_task(self._loop) is profile.task:
+                        thread_ids.append(self._loop_thread_id)
+                except RuntimeError:
+                    pass
+            if not thread_ids:
+                continue
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._record(profile, frame, weight, thread_id == self._loop_thread_id)
+
+    def _record(self, profile: RequestProfile, frame, weight: float, on_loop: bool):
+        codes = []
+        while frame is not None and len(codes) < MAX_STACK_DEPTH:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        # codes: 最内层在前
+        category = _classify([c.co_filename.replace(os.sep, "/") for c in codes])
+        labels = [_frame_label(c) for c in reversed(codes)]
+        root = "event_loop" if on_loop else "threadpool"
+        profile.samples += 1
+        profile.category_seconds[category] += weight
+        profile.stacks[";".join([root] + labels)] += 1
+        if labels:
+            profile.leaf_seconds[labels[-1]] += weight
+
+    # ------------------------------------------------
+    # 查询
+    # ------------------------------------------------
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [
+            {k: v for k, v in p.to_dict().items() if k not in ("breakdown", "hot_functions")}
+            for p in reversed(profiles)
+        ]
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        return self._profiles.get(profile_id)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+def _requested(scope: Dict[str, Any]) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER.encode() and value.strip() in (b"1", b"true"):
+            return True
+    query = scope.get("query_string", b"").decode("latin-1")
+    return any(
+        part in (PROFILE_QUERY_FLAG, f"{PROFILE_QUERY_FLAG}=1", f"{PROFILE_QUERY_FLAG}=true")
+        for part in query.split("&")
+    )
+
+
+def _authorized_user(scope: Dict[str, Any], roles: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """请求令牌属于 roles 中的角色时返回其 payload, 否则返回 None (不分析, 也不报错)"""
+    from fastapi import HTTPException
+
+    from app.core.security import decode_token
+
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                payload = decode_token(token)
+            except HTTPException:
+                return None
+            if payload.get("type") == "access" and payload.get("role") in roles:
+                return payload
+            return None
+    return None
+
+
+class RequestProfilerMiddleware:
+    """对带分析标记的管理员请求进行采样, 响应头 X-Profile-Id 返回分析记录 ID"""
+
+    def __init__(self, app, roles: Sequence[str]):
+        self.app = app
+        self.roles = tuple(roles)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not request_profiler.enabled or not _requested(scope):
+            return await self.app(scope, receive, send)
+        user = _authorized_user(scope, self.roles)
+        profile = request_profiler.begin(scope, user) if user is not None else None
+        if profile is None:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile.id)
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            request_profiler.finish(profile, scope)
+
+
+# 全局分析器实例
+request_profiler = RequestProfiler()
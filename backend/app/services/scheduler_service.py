@@ -4,6 +4,7 @@
 """
 
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import json
@@ -12,15 +13,26 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
-from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
+from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_SUBMITTED
 
 from sqlalchemy import select, and_
 
-from app.core.database import SyncSessionLocal
+from app.core.database import BackgroundSessionLocal
+from app.core.telemetry import metrics_registry
 from app.models.sqlite import TestTask, ControlCommand, Device
 
 logger = logging.getLogger(__name__)
 
+JOB_SECONDS = metrics_registry.histogram(
+    "scheduler_job_duration_seconds", "Scheduler job run time", ("job", "status"),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600),
+)
+
+
+def _job_label(job_id: str) -> str:
+    """定时测试任务的 job_id 按任务区分, 统一归为 scheduled_task 以免标签无限增长"""
+    return "scheduled_task" if job_id.startswith("task_") else job_id
+
 
 class TaskScheduler:
     """任务调度器"""
@@ -43,12 +55,26 @@ class TaskScheduler:
     def _setup_event_listeners(self):
         """设置事件监听器"""
 
+        # job_id -> 提交执行的时间 (用于统计运行耗时)
+        submitted: Dict[str, float] = {}
+
+        def job_submitted(event):
+            submitted[event.job_id] = time.perf_counter()
+
         def job_executed(event):
+            start = submitted.pop(event.job_id, None)
+            if start is not None:
+                JOB_SECONDS.observe(
+                    time.perf_counter() - start,
+                    _job_label(event.job_id),
+                    "error" if event.exception else "success",
+                )
             if event.exception:
                 logger.error(f"Job {event.job_id} failed: {event.exception}")
             else:
                 logger.info(f"Job {event.job_id} executed successfully")
 
+        self._scheduler.add_listener(job_submitted, EVENT_JOB_SUBMITTED)
         self._scheduler.add_listener(job_executed, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
 
     async def start(self):
@@ -68,7 +94,7 @@ class TaskScheduler:
 
     async def load_pending_tasks(self):
         """加载并调度所有待执行的定时任务"""
-        with SyncSessionLocal() as db:
+        with BackgroundSessionLocal() as db:
             # 获取所有 pending 状态且有调度时间的任务
             result = db.execute(
                 select(TestTask).where(
@@ -188,7 +214,7 @@ class TaskScheduler:
         """
         logger.info(f"Executing scheduled task: {task_id}")
 
-        with SyncSessionLocal() as db:
+        with BackgroundSessionLocal() as db:
             # 获取任务
             result = db.execute(select(TestTask).where(TestTask.id == task_id))
             task = result.scalar_one_or_none()
@@ -320,6 +346,39 @@ async def init_scheduler():
     )
     logger.info("Added daily data cleanup job at 3:00 AM")
 
+    # 预建性能指标分区 (SQLite / MySQL 分区存储)
+    from app.services.metrics_partition_service import metrics_partitions
+
+    if metrics_partitions.mode in ("sqlite", "mysql"):
+        scheduler._scheduler.add_job(
+            metrics_partitions.maintain,
+            trigger=IntervalTrigger(hours=1),
+            id="metrics_partition_maintenance",
+            name="性能指标分区维护",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        logger.info("Added hourly metrics partition maintenance job")
+
+    # 性能指标增量汇总 (1m/1h/1d)
+    from app.core.config import settings
+    from app.services.metrics_rollup_service import metrics_rollup_service
+
+    if settings.metrics_rollup_enabled:
+        scheduler._scheduler.add_job(
+            metrics_rollup_service.run,
+            trigger=IntervalTrigger(seconds=settings.metrics_rollup_interval_seconds),
+            id="metrics_rollup",
+            name="性能指标汇总",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        logger.info(
+            f"Added metrics rollup job every {settings.metrics_rollup_interval_seconds}s"
+        )
+
 
 async def stop_scheduler():
     """停止调度器"""
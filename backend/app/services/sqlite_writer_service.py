@@ -0,0 +1,199 @@
+"""
+SQLite 单写线程 (SQLite 生产模式)
+SQLite 同一时刻只允许一个写事务, 多个线程各自提交时会互相等待写锁,
+等待超过 busy_timeout 即报 "database is locked"。这里由一个专用线程持有
+唯一的写连接, 把队列中的写入任务合并到同一个事务中提交 (每个任务一个
+SAVEPOINT, 单个任务失败只回滚它自己), 一次 fsync 完成一批写入。
+
+未启用生产模式时 run() 直接在调用线程中用 ingest 连接池执行, 调用方无需区分。
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.core.database import ingest_engine, sqlite_production
+from app.core.telemetry import Histogram, metrics_registry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 200, 500)
+COMMIT_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+WriteJob = Callable[[Connection], Any]
+
+
+class SQLiteWriter:
+    """单一写连接 + 批量事务"""
+
+    def __init__(
+        self,
+        enabled: bool = sqlite_production,
+        batch_max: int = settings.sqlite_writer_batch_max,
+        queue_max: int = settings.sqlite_writer_queue_max,
+    ):
+        self.enabled = enabled
+        self.batch_max = max(1, batch_max)
+        self._queue: "queue.Queue[Optional[Tuple[WriteJob, Future]]]" = queue.Queue(
+            maxsize=max(1, queue_max)
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.commit_ms = Histogram(COMMIT_MS_BUCKETS)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动写线程 (仅 SQLite 生产模式)"""
+        if not self.enabled or self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"SQLite writer thread started (batch_max={self.batch_max})")
+
+    def stop(self, timeout: float = 30.0):
+        """执行完队列中剩余的写入后停止"""
+        if not self.running:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"SQLite writer did not drain within {timeout}s")
+        self._thread = None
+        logger.info("SQLite writer thread stopped")
+
+    def run(self, job: WriteJob, timeout: Optional[float] = None) -> Any:
+        """
+        执行一个写入任务并等待其所在事务提交
+        (写线程未运行时直接在 ingest 连接池的事务中执行)
+
+        Args:
+            job: 接收 Connection 的函数, 在事务 (SAVEPOINT) 中执行, 不要自行提交
+            timeout: 等待秒数, 默认一直等待
+
+        Returns:
+            job 的返回值
+
+        Raises:
+            job 抛出的异常, 或事务提交失败的异常
+        """
+        if not self.running:
+            with ingest_engine.begin() as conn:
+                return job(conn)
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("SQLiteWriter.run() called from the writer thread")
+        future: Future = Future()
+        self._queue.put((job, future))
+        return future.result(timeout)
+
+    def _run(self):
+        """写线程主循环: 取出当前排队的全部任务 (不超过 batch_max) 合并提交"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_max:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._execute(batch)
+
+        # 停止信号之后仍可能有任务入队
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._execute([item])
+
+    def _execute(self, batch: List[Tuple[WriteJob, Future]]):
+        start = time.perf_counter()
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        try:
+            with ingest_engine.connect() as conn:
+                with conn.begin():
+                    for job, future in batch:
+                        try:
+                            with conn.begin_nested():
+                                outcomes.append((future, True, job(conn)))
+                        except Exception as e:
+                            outcomes.append((future, False, e))
+        except Exception as e:
+            # 提交失败: 整批都没有写入
+            logger.error(f"SQLite writer batch of {len(batch)} failed: {e}")
+            with self._lock:
+                self.failed_batches += 1
+                self.failed_jobs += len(batch)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.batches += 1
+            self.jobs += len(batch)
+            self.failed_jobs += sum(1 for _, ok, _ in outcomes if not ok)
+            self.batch_size.observe(len(batch))
+            self.commit_ms.observe(elapsed_ms)
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写线程状态"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "running": self.running,
+                "pending_jobs": self._queue.qsize(),
+                "batch_max": self.batch_max,
+                "jobs": self.jobs,
+                "failed_jobs": self.failed_jobs,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "batch_size": self.batch_size.to_dict(),
+                "batch_ms": self.commit_ms.to_dict(),
+            }
+
+
+# 全局写线程实例
+sqlite_writer = SQLiteWriter()
+
+if sqlite_writer.enabled:
+    metrics_registry.histogram(
+        "sqlite_writer_batch_jobs", "Write jobs merged into one SQLite writer transaction",
+        fn=lambda: {(): sqlite_writer.batch_size},
+    )
+    metrics_registry.histogram(
+        "sqlite_writer_batch_duration_seconds", "SQLite writer transaction duration",
+        fn=lambda: {(): sqlite_writer.commit_ms}, scale=0.001,
+    )
+    metrics_registry.gauge(
+        "sqlite_writer_pending_jobs", "Write jobs waiting for the SQLite writer",
+        fn=lambda: sqlite_writer._queue.qsize(),
+    )
@@ -0,0 +1,186 @@
+"""
+任务分配表维护
+任务创建时把目标设备、目标部门、目标岗位展开为 task_assignments 中每台设备
+一行 (未指定任何目标的任务写入一行 device_id="*", 对所有设备可见), Agent 轮询
+只需按 (device_id, status) 索引查找, 不再扫描全部 pending 任务并逐个解析 JSON。
+
+分配行的 status 与任务状态保持一致; 任务的创建、状态变化、目标变化和删除
+通过 Session 事件监听自动同步, 同步和异步 Session 都适用。
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Iterable, List, Optional
+
+from sqlalchemy import delete, event, exists, inspect, insert, or_, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.sqlite import Device, TaskAssignment, TestTask
+from app.services.agent_push_service import ALL_DEVICES, notify_after_commit
+
+logger = logging.getLogger(__name__)
+
+ASSIGNMENT_TABLE = TaskAssignment.__table__
+
+# 影响分配结果的任务字段
+TARGET_FIELDS = ("target_device_ids", "target_departments", "target_positions")
+
+
+def _load_list(value: Any) -> List[str]:
+    """解析 JSON 字符串形式的目标列表 (兼容直接赋值的 list)"""
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return [str(v) for v in parsed] if isinstance(parsed, list) else []
+
+
+class TaskAssignmentService:
+    """任务 -> 设备分配的展开、同步与查询"""
+
+    def expand_targets(self, conn: Connection, task: TestTask) -> List[str]:
+        """
+        展开任务目标为设备 ID 列表
+
+        Returns:
+            设备 ID 列表; 未指定任何目标时为 ["*"]
+        """
+        device_ids = _load_list(task.target_device_ids)
+        departments = _load_list(task.target_departments)
+        positions = _load_list(task.target_positions)
+
+        if not (device_ids or departments or positions):
+            return [ALL_DEVICES]
+
+        targets = dict.fromkeys(device_ids)
+        if departments or positions:
+            conditions = []
+            if departments:
+                conditions.append(Device.department.in_(departments))
+            if positions:
+                conditions.append(Device.position.in_(positions))
+            for (device_id,) in conn.execute(select(Device.id).where(or_(*conditions))):
+                targets.setdefault(device_id)
+        return list(targets)
+
+    def assign(self, conn: Connection, task: TestTask, replace: bool = False) -> List[str]:
+        """写入任务的分配行, replace=True 时先删除已有分配; 返回分配的设备 ID"""
+        if replace:
+            conn.execute(delete(ASSIGNMENT_TABLE).where(ASSIGNMENT_TABLE.c.task_id == task.id))
+        device_ids = self.expand_targets(conn, task)
+        if not device_ids:
+            logger.warning(f"Task {task.id} matches no devices")
+            return []
+        now = datetime.utcnow()
+        conn.execute(
+            insert(ASSIGNMENT_TABLE),
+            [
+                {
+                    "task_id": task.id,
+                    "device_id": device_id,
+                    "status": task.task_status or "pending",
+                    "created_at": now,
+                }
+                for device_id in device_ids
+            ],
+        )
+        return device_ids
+
+    def set_status(self, conn: Connection, task_id: str, status: str):
+        conn.execute(
+            update(ASSIGNMENT_TABLE)
+            .where(ASSIGNMENT_TABLE.c.task_id == task_id)
+            .values(status=status)
+        )
+
+    def device_ids(self, conn: Connection, task_id: str) -> List[str]:
+        return list(
+            conn.execute(
+                select(ASSIGNMENT_TABLE.c.device_id).where(ASSIGNMENT_TABLE.c.task_id == task_id)
+            ).scalars()
+        )
+
+    def remove(self, conn: Connection, task_ids: Iterable[str]):
+        conn.execute(delete(ASSIGNMENT_TABLE).where(ASSIGNMENT_TABLE.c.task_id.in_(list(task_ids))))
+
+    def pending_tasks_query(self, device_id: str, limit: Optional[int] = None):
+        """设备待执行任务查询 (按创建时间排序), 一次索引查找"""
+        query = (
+            select(TestTask)
+            .join(TaskAssignment, TaskAssignment.task_id == TestTask.id)
+            .where(
+                TaskAssignment.device_id.in_((device_id, ALL_DEVICES)),
+                TaskAssignment.status == "pending",
+            )
+            .order_by(TestTask.created_at.asc())
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    def backfill(self, db: Session) -> int:
+        """为分配表创建之前已存在的 pending 任务补建分配 (启动时调用)"""
+        tasks = db.execute(
+            select(TestTask).where(
+                TestTask.task_status == "pending",
+                ~exists().where(TaskAssignment.task_id == TestTask.id),
+            )
+        ).scalars().all()
+        if not tasks:
+            return 0
+        conn = db.connection()
+        for task in tasks:
+            self.assign(conn, task)
+        db.commit()
+        logger.info(f"Backfilled task assignments for {len(tasks)} pending tasks")
+        return len(tasks)
+
+
+# 全局服务实例
+task_assignments = TaskAssignmentService()
+
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+@event.listens_for(Session, "before_flush")
+def _remove_on_delete(session, flush_context, instances):
+    """删除任务前先删除其分配行 (外键)"""
+    task_ids = [obj.id for obj in session.deleted if isinstance(obj, TestTask)]
+    if task_ids:
+        task_assignments.remove(session.connection(), task_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_on_flush(session, flush_context):
+    """
+    新建任务时展开分配; 目标变化时重新展开; 状态变化时同步状态
+    有新的 pending 分配时, 提交后通过推送通道唤醒对应设备
+    """
+    for obj in session.new:
+        if isinstance(obj, TestTask):
+            device_ids = task_assignments.assign(session.connection(), obj)
+            if (obj.task_status or "pending") == "pending":
+                notify_after_commit(session, device_ids)
+    for obj in session.dirty:
+        if not isinstance(obj, TestTask) or obj in session.deleted:
+            continue
+        if _changed(obj, TARGET_FIELDS):
+            device_ids = task_assignments.assign(session.connection(), obj, replace=True)
+        elif _changed(obj, ("task_status",)):
+            task_assignments.set_status(session.connection(), obj.id, obj.task_status)
+            device_ids = None
+        else:
+            continue
+        if obj.task_status == "pending":
+            if device_ids is None:
+                device_ids = task_assignments.device_ids(session.connection(), obj.id)
+            notify_after_commit(session, device_ids)
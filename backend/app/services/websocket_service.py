@@ -5,11 +5,33 @@ WebSocket Service - 实时指标推送服务
 import asyncio
 import json
 import logging
+import time
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from app.core.telemetry import metrics_registry
+
 logger = logging.getLogger(__name__)
 
+WS_SEND_SECONDS = metrics_registry.histogram(
+    "websocket_send_duration_seconds", "WebSocket message send latency", ("type",)
+)
+WS_SEND_ERRORS = metrics_registry.counter(
+    "websocket_send_errors_total", "WebSocket sends that failed", ("type",)
+)
+
+
+async def send_json_timed(websocket, message: dict):
+    """发送一条 JSON 消息并按消息类型记录耗时 (/metrics), 发送失败时异常照常抛出"""
+    kind = message.get("type", "unknown")
+    start = time.perf_counter()
+    try:
+        await websocket.send_json(message)
+    except Exception:
+        WS_SEND_ERRORS.inc(kind)
+        raise
+    WS_SEND_SECONDS.observe(time.perf_counter() - start, kind)
+
 
 class MetricsWebSocketManager:
     """实时指标 WebSocket 管理器"""
@@ -46,6 +68,13 @@ class MetricsWebSocketManager:
         if websocket in self.global_subscribers:
             self.global_subscribers.remove(websocket)
 
+    def subscriber_counts(self) -> Dict[tuple, int]:
+        """当前订阅连接数 (按设备订阅 / 全局订阅)"""
+        return {
+            ("metrics_device",): sum(len(c) for c in list(self.device_subscriptions.values())),
+            ("metrics_global",): len(self.global_subscribers),
+        }
+
     async def send_metrics(self, device_id: str, metrics: dict):
         """发送指标数据给订阅者"""
         message = {
@@ -59,14 +88,14 @@ class MetricsWebSocketManager:
         if device_id in self.device_subscriptions:
             for ws in self.device_subscriptions[device_id]:
                 try:
-                    await ws.send_json(message)
+                    await send_json_timed(ws, message)
                 except Exception as e:
                     logger.error(f"Error sending to device subscriber: {e}")
 
         # 发送给全局订阅者
         for ws in self.global_subscribers:
             try:
-                await ws.send_json(message)
+                await send_json_timed(ws, message)
             except Exception as e:
                 logger.error(f"Error sending to global subscriber: {e}")
 
@@ -81,7 +110,7 @@ class MetricsWebSocketManager:
         # 发送给全局订阅者
         for ws in self.global_subscribers:
             try:
-                await ws.send_json(message)
+                await send_json_timed(ws, message)
             except Exception as e:
                 logger.error(f"Error sending alert: {e}")
 
@@ -97,7 +126,7 @@ class MetricsWebSocketManager:
         # 发送给全局订阅者
         for ws in self.global_subscribers:
             try:
-                await ws.send_json(message)
+                await send_json_timed(ws, message)
             except Exception as e:
                 logger.error(f"Error sending benchmark update: {e}")
 
@@ -105,6 +134,11 @@ class MetricsWebSocketManager:
 # 全局实例
 metrics_ws_manager = MetricsWebSocketManager()
 
+metrics_registry.gauge(
+    "websocket_subscribers", "Open metric WebSocket subscriptions", ("scope",),
+    fn=metrics_ws_manager.subscriber_counts,
+)
+
 
 # 辅助函数：在接收到指标时调用
 async def push_metrics(device_id: str, metrics: dict):
@@ -0,0 +1,674 @@
+"""
+Agent 集群负载模拟与写入基准
+
+启动 N 个虚拟 Agent, 通过真实 HTTP 请求一个本地运行的服务端, 流量与
+HardwareBenchmarkAgent / PerformanceMonitor / TaskExecutor 一致:
+  - 注册 (POST /api/devices/agent/register, 与 Agent 相同的硬件信息)
+  - 主循环: 心跳 + 轮询控制命令 (默认每 10 秒), 收到命令后确认并完成
+  - 任务轮询 (默认每 5 秒), 收到任务后 execute -> 提交结果 -> complete
+  - 性能监控: 每秒采集一个样本, 攒够一批上报; 429 时按 Retry-After 退避,
+    失败时保留缓冲区下次重试 (--compact 使用 Agent 的列式压缩格式)
+
+场景:
+  steady     稳定运行
+  reconnect  运行一半时重启服务端 (需 --spawn-server), 停机期间 Agent 请求失败并
+             继续积压指标, 恢复后集中重连; 未使用 --spawn-server 时改为所有 Agent
+             同时重启 (重新注册), 模拟批量升级后的重连风暴
+  campaign   运行三分之一时为 --campaign-size 台设备各创建一个 benchmark 任务,
+             并向 --command-ratio 比例的设备下发控制命令, 统计任务被领取的延迟
+
+输出每个阶段、每个接口的请求数、错误率、p50/p99 延迟, 以及数据库增长
+(SQLite 文件大小和主要表行数, 需要 --spawn-server 或 --db)。
+
+Agent 间共享一个连接池 (--connections), 延迟包含在客户端等待连接的时间,
+大规模压测时应相应调大连接数和 ulimit -n。
+
+用法 (在 backend 目录下执行):
+    python benchmarks/agent_fleet.py --spawn-server --agents 500 --duration 60
+    python benchmarks/agent_fleet.py --spawn-server --scenario reconnect --downtime 10
+    python benchmarks/agent_fleet.py --spawn-server --scenario campaign --campaign-size 200
+    python benchmarks/agent_fleet.py --server http://127.0.0.1:8000 --db ./hardware_benchmark.db
+    python benchmarks/agent_fleet.py --spawn-server --server-env SQLITE_PRODUCTION_MODE=true \\
+        --agents 5000 --loop-interval 10 --metrics-batch 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENT_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "agent")
+sys.path.insert(0, AGENT_DIR)
+
+import httpx
+
+AGENT_VERSION = "1.0.0"
+# 数据库增长统计的表
+GROWTH_TABLES = (
+    "devices",
+    "performance_metrics",
+    "performance_metric_details",
+    "test_tasks",
+    "test_results",
+    "control_commands",
+)
+# 指标缓冲区上限 (停机期间积压)
+MAX_BUFFERED_SAMPLES = 600
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# ================================================
+# 统计
+# ================================================
+
+
+class Recorder:
+    """按 (阶段, 接口) 记录延迟和错误"""
+
+    def __init__(self):
+        self.phase = "ramp"
+        self.phases = ["ramp"]
+        # 各阶段累计秒数, 用于计算每秒请求数
+        self.phase_seconds = defaultdict(float)
+        self._phase_started = time.perf_counter()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.throttled = defaultdict(int)
+        self.samples = 0
+
+    def set_phase(self, phase):
+        now = time.perf_counter()
+        self.phase_seconds[self.phase] += now - self._phase_started
+        self._phase_started = now
+        self.phase = phase
+        if phase not in self.phases:
+            self.phases.append(phase)
+        print(f"[{time.strftime('%H:%M:%S')}] phase -> {phase}", flush=True)
+
+    def record(self, endpoint, elapsed_ms, ok, throttled=False):
+        key = (self.phase, endpoint)
+        self.latencies[key].append(elapsed_ms)
+        if throttled:
+            self.throttled[key] += 1
+        elif not ok:
+            self.errors[key] += 1
+
+
+class Fleet:
+    """共享的 HTTP 客户端与统计"""
+
+    def __init__(self, client, recorder, args):
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.stop = asyncio.Event()
+        self.agents = []
+        # 每台设备的任务下发时间 (campaign), 用于计算领取延迟
+        self.task_created_at = {}
+        self.task_pickup_ms = []
+
+    def shutdown(self):
+        self.stop.set()
+        for agent in self.agents:
+            agent.wake.set()
+
+    async def call(self, endpoint, method, path, ok_status=(200, 201, 202), **kwargs):
+        start = time.perf_counter()
+        try:
+            r = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, (time.perf_counter() - start) * 1000, False)
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        throttled = r.status_code == 429
+        self.recorder.record(endpoint, elapsed, r.status_code in ok_status, throttled)
+        return r
+
+
+# ================================================
+# 虚拟 Agent
+# ================================================
+
+
+def make_hardware():
+    """与 Node.js systeminformation 采集结果格式一致的硬件信息"""
+    gpu_vram = random.choice([8192, 12288, 16384, 24576])
+    return {
+        "cpu_model": random.choice(["Intel Core i9-13900K", "AMD Ryzen 9 7950X", "Intel Core i7-12700"]),
+        "cpu_cores": random.choice([8, 12, 16, 24]),
+        "cpu_threads": random.choice([16, 24, 32]),
+        "cpu_base_clock": random.choice([3.0, 3.4, 4.5]),
+        "gpu_model": random.choice(["NVIDIA GeForce RTX 4090", "NVIDIA GeForce RTX 3080", "NVIDIA RTX A4000"]),
+        "gpu_vram_mb": gpu_vram,
+        "gpu_driver_version": "551.86",
+        "ram_total_gb": random.choice([32, 64, 128]),
+        "ram_frequency": random.choice([3200, 4800, 6000]),
+        "all_gpus": [{"model": "NVIDIA GeForce RTX 4090", "vram_mb": gpu_vram}],
+        "all_memory": [{"size_gb": 32, "frequency": 4800}] * 2,
+        "disk_model": "Samsung SSD 990 PRO 2TB",
+        "disk_capacity_tb": 2.0,
+        "disk_type": "NVMe",
+        "all_disks": [{"model": "Samsung SSD 990 PRO 2TB", "size_tb": 2.0, "type": "NVMe"}],
+        "os_info": {"os_name": "Windows 11 Pro", "os_version": "10.0.22631", "os_build": "22631"},
+    }
+
+
+def make_sample(device_id, busy=False):
+    """与 PerformanceMonitor.collect_metrics() 输出格式一致的样本"""
+    low, high = (70, 100) if busy else (2, 40)
+    used = random.uniform(8000, 30000)
+    return {
+        "device_id": device_id,
+        "timestamp": datetime.utcnow().isoformat(),
+        "cpu_percent": round(random.uniform(low, high), 1),
+        "cpu_temperature": round(random.uniform(40, 90), 1),
+        "cpu_power_watts": round(random.uniform(20, 250), 1),
+        "cpu_frequency_mhz": round(random.uniform(2000, 5500)),
+        "gpu_percent": round(random.uniform(low, high), 1),
+        "gpu_temperature": round(random.uniform(35, 85), 1),
+        "gpu_power_watts": round(random.uniform(15, 450), 1),
+        "gpu_frequency_mhz": round(random.uniform(500, 2600)),
+        "gpu_memory_used_mb": round(random.uniform(500, 20000)),
+        "gpu_memory_total_mb": 24576,
+        "memory_percent": round(used / 65536 * 100, 1),
+        "memory_used_mb": round(used),
+        "memory_available_mb": round(65536 - used),
+        "disk_read_mbps": round(random.uniform(0, 500), 2),
+        "disk_write_mbps": round(random.uniform(0, 300), 2),
+        "disk_io_percent": round(random.uniform(0, 100), 1),
+        "network_sent_mbps": round(random.uniform(0, 50), 2),
+        "network_recv_mbps": round(random.uniform(0, 50), 2),
+        "process_count": random.randint(150, 400),
+        "top_processes": [
+            {"name": name, "pid": random.randint(100, 60000),
+             "cpu_percent": round(random.uniform(0, 30), 1),
+             "memory_mb": round(random.uniform(50, 4000), 1)}
+            for name in ("maya.exe", "chrome.exe", "explorer.exe")
+        ],
+        "disk_io_details": [
+            {"name": "0 C:", "read_mbps": round(random.uniform(0, 200), 2),
+             "write_mbps": round(random.uniform(0, 200), 2), "queue_length": random.randint(0, 3)}
+        ],
+    }
+
+
+class VirtualAgent:
+    """单个虚拟 Agent (注册 / 主循环 / 任务执行 / 性能监控)"""
+
+    def __init__(self, fleet, index):
+        self.fleet = fleet
+        self.args = fleet.args
+        self.index = index
+        self.mac = (
+            f"5C:A6:{(index >> 16) & 255:02X}:{(index >> 8) & 255:02X}:{index & 255:02X}:"
+            f"{random.randint(0, 255):02X}"
+        )
+        self.hostname = f"FLEET-{index:06d}"
+        self.hardware = make_hardware()
+        self.device_id = None
+        self.current_task_id = None
+        self.buffer = []
+        self.retry_after_until = 0.0
+        # 停止或重启时唤醒所有 sleep
+        self.wake = asyncio.Event()
+        self.restarting = False
+
+    async def sleep(self, seconds):
+        """可被停止 / 重启打断的 sleep"""
+        try:
+            await asyncio.wait_for(self.wake.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def restart(self):
+        """模拟 Agent 进程重启: 结束各循环后立即重新注册"""
+        self.restarting = True
+        self.wake.set()
+
+    async def register(self):
+        payload = {
+            "device_name": self.hostname,
+            "hostname": self.hostname,
+            "mac_address": self.mac,
+            "ip_address": f"10.{(self.index >> 16) & 255}.{(self.index >> 8) & 255}.{self.index & 255}",
+            "agent_version": AGENT_VERSION,
+            **self.hardware,
+        }
+        while not self.fleet.stop.is_set():
+            r = await self.fleet.call("register", "POST", "/api/devices/agent/register", json=payload)
+            if r is not None and r.status_code in (200, 201):
+                self.device_id = r.json().get("id")
+                if self.device_id:
+                    return True
+            # 与 Agent 一致: 注册失败后稍后重试
+            await self.sleep(self.args.loop_interval)
+        return False
+
+    async def run(self, delay):
+        await self.sleep(delay)
+        while not self.fleet.stop.is_set():
+            if not await self.register():
+                return
+            await self.heartbeat()
+            loops = [self.main_loop(), self.task_loop(), self.monitor_loop()]
+            await asyncio.gather(*loops)
+            if not self.restarting or self.fleet.stop.is_set():
+                return
+            self.restarting = False
+            self.wake.clear()
+            self.current_task_id = None
+
+    def running(self):
+        return not self.fleet.stop.is_set() and not self.restarting
+
+    # ---------------- 主循环 ----------------
+
+    async def heartbeat(self, status="online"):
+        payload = {"mac_address": self.mac, "status": status}
+        if self.current_task_id:
+            payload["current_task_id"] = self.current_task_id
+        await self.fleet.call("heartbeat", "POST", "/api/devices/agent/heartbeat", json=payload)
+
+    async def main_loop(self):
+        while True:
+            await self.sleep(self.args.loop_interval * random.uniform(0.95, 1.05))
+            if not self.running():
+                return
+            await self.heartbeat()
+            if self.current_task_id:
+                continue
+            r = await self.fleet.call(
+                "commands", "GET", "/api/performance/commands/pending",
+                params={"device_id": self.device_id},
+            )
+            if r is None or r.status_code != 200:
+                continue
+            items = r.json().get("items") or []
+            if items:
+                await self.execute_command(items[0])
+
+    async def execute_command(self, command):
+        command_id = command["id"]
+        await self.fleet.call(
+            "command_ack", "POST", f"/api/performance/commands/{command_id}/acknowledge", json={}
+        )
+        await self.sleep(random.uniform(0.1, 1.0))
+        await self.fleet.call(
+            "command_complete", "POST", f"/api/performance/commands/{command_id}/complete",
+            json={"result": "ok"},
+        )
+
+    # ---------------- 任务执行 ----------------
+
+    async def task_loop(self):
+        while True:
+            await self.sleep(self.args.task_poll_interval * random.uniform(0.95, 1.05))
+            if not self.running():
+                return
+            r = await self.fleet.call(
+                "tasks", "GET", "/api/tasks/pending", params={"device_id": self.device_id}
+            )
+            if r is None or r.status_code != 200:
+                continue
+            items = r.json().get("items") or []
+            if items:
+                await self.execute_task(items[0])
+
+    async def execute_task(self, task):
+        task_id = task["id"]
+        targets = task.get("target_device_ids") or [self.device_id]
+        r = await self.fleet.call(
+            "task_execute", "POST", f"/api/tasks/{task_id}/execute",
+            json={"device_ids": targets},
+        )
+        if r is None or r.status_code != 200:
+            # 其他 Agent 已领取 (或任务状态已变化)
+            return
+        created = self.fleet.task_created_at.pop(task_id, None)
+        if created is not None:
+            self.fleet.task_pickup_ms.append((time.perf_counter() - created) * 1000)
+
+        self.current_task_id = task_id
+        start = datetime.utcnow()
+        await self.sleep(self.args.task_seconds)
+        end = datetime.utcnow()
+        await self.fleet.call("task_result", "POST", "/api/results", json={
+            "task_id": task_id,
+            "device_id": self.device_id,
+            "test_type": task.get("task_type", "benchmark"),
+            "test_status": "passed",
+            "start_time": start.isoformat(),
+            "end_time": end.isoformat(),
+            "duration_seconds": int((end - start).total_seconds()),
+            "overall_score": round(random.uniform(50, 100), 1),
+            "cpu_score": round(random.uniform(50, 100), 1),
+            "gpu_score": round(random.uniform(50, 100), 1),
+            "memory_score": round(random.uniform(50, 100), 1),
+            "disk_score": round(random.uniform(50, 100), 1),
+        })
+        await self.fleet.call(
+            "task_complete", "POST", f"/api/tasks/{task_id}/complete",
+            json={"task_status": "completed"},
+        )
+        self.current_task_id = None
+
+    # ---------------- 性能监控 ----------------
+
+    async def monitor_loop(self):
+        while True:
+            await self.sleep(self.args.metrics_interval)
+            if not self.running():
+                break
+            self.buffer.append(make_sample(self.device_id, busy=self.current_task_id is not None))
+            del self.buffer[:-MAX_BUFFERED_SAMPLES]
+            if len(self.buffer) >= self.args.metrics_batch and time.time() >= self.retry_after_until:
+                if await self.send_metrics(self.buffer):
+                    self.buffer = []
+        if self.buffer and self.fleet.stop.is_set():
+            await self.send_metrics(self.buffer)
+
+    async def send_metrics(self, samples):
+        if self.args.compact:
+            from metrics_codec import build_compact_request
+
+            body, headers = build_compact_request(self.device_id, samples)
+            r = await self.fleet.call(
+                "metrics", "POST", "/api/performance/metrics/batch", content=body, headers=headers
+            )
+        else:
+            r = await self.fleet.call(
+                "metrics", "POST", "/api/performance/metrics/batch",
+                json={"device_id": self.device_id, "metrics": samples},
+            )
+        if r is None:
+            return False
+        if r.status_code == 429:
+            try:
+                self.retry_after_until = time.time() + float(r.headers.get("Retry-After", "5"))
+            except ValueError:
+                self.retry_after_until = time.time() + 5
+            return False
+        if r.status_code in (200, 201, 202):
+            self.fleet.recorder.samples += len(samples)
+            return True
+        return False
+
+
+# ================================================
+# 服务端 / 数据库
+# ================================================
+
+
+class ServerProcess:
+    """在临时目录中启动 uvicorn (SQLite 数据库随之位于该目录)"""
+
+    def __init__(self, port, extra_env):
+        self.port = port
+        self.workdir = tempfile.mkdtemp(prefix="agent-fleet-")
+        self.db_path = os.path.join(self.workdir, "hardware_benchmark.db")
+        self.env = {
+            **os.environ,
+            "DEBUG": "false",
+            "PYTHONPATH": BACKEND_DIR,
+            **extra_env,
+        }
+        self.proc = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning", "--no-access-log"],
+            cwd=self.workdir, env=self.env,
+        )
+
+    def stop(self):
+        if self.proc is None:
+            return
+        self.proc.terminate()
+        try:
+            self.proc.wait(30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+
+async def wait_healthy(client, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            r = await client.get("/health")
+            if r.status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    return False
+
+
+def db_snapshot(path):
+    """SQLite 文件大小 (含 WAL) 和各表行数"""
+    if not path or not os.path.exists(path):
+        return None
+    size = sum(
+        os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)
+    )
+    rows = {}
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+        try:
+            for table in GROWTH_TABLES:
+                try:
+                    rows[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+    return {"bytes": size, "rows": rows}
+
+
+# ================================================
+# 场景
+# ================================================
+
+
+async def start_campaign(fleet, agents, args):
+    """为部分设备各创建一个 benchmark 任务, 并向部分设备下发控制命令"""
+    registered = [a for a in agents if a.device_id]
+    targets = random.sample(registered, min(args.campaign_size, len(registered)))
+    for agent in targets:
+        r = await fleet.call("create_task", "POST", "/api/tasks", json={
+            "task_name": f"fleet-campaign-{agent.hostname}",
+            "task_type": "benchmark",
+            "target_device_ids": [agent.device_id],
+            "test_duration_seconds": int(args.task_seconds),
+        })
+        if r is not None and r.status_code == 201:
+            fleet.task_created_at[r.json()["id"]] = time.perf_counter()
+    commanded = random.sample(registered, int(len(registered) * args.command_ratio))
+    for agent in commanded:
+        await fleet.call("create_command", "POST", "/api/performance/commands", json={
+            "device_id": agent.device_id,
+            "command_type": "collect_logs",
+            "priority": 5,
+            "source": "agent_fleet",
+        })
+    print(f"campaign: {len(fleet.task_created_at)} tasks, {len(commanded)} commands", flush=True)
+
+
+async def run_fleet(args, server):
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(
+        base_url=args.server, limits=limits, timeout=args.timeout
+    ) as client:
+        if not await wait_healthy(client):
+            raise SystemExit(f"server {args.server} is not healthy")
+        before = db_snapshot(args.db)
+        recorder = Recorder()
+        fleet = Fleet(client, recorder, args)
+        agents = fleet.agents = [VirtualAgent(fleet, i) for i in range(args.agents)]
+        # 在 ramp 时间内错开启动
+        runners = [
+            asyncio.create_task(a.run(random.random() * args.ramp)) for a in agents
+        ]
+
+        started = time.perf_counter()
+        await asyncio.sleep(args.ramp)
+        recorder.set_phase("steady")
+
+        if args.scenario == "reconnect":
+            await asyncio.sleep(args.duration / 2)
+            if server is not None:
+                recorder.set_phase("down")
+                server.stop()
+                await asyncio.sleep(args.downtime)
+                server.start()
+                await wait_healthy(client)
+            else:
+                # 没有可重启的服务端: 所有 Agent 同时重启并重新注册
+                for agent in agents:
+                    agent.restart()
+            recorder.set_phase("reconnect")
+            await asyncio.sleep(args.duration / 2)
+        elif args.scenario == "campaign":
+            await asyncio.sleep(args.duration / 3)
+            recorder.set_phase("campaign")
+            await start_campaign(fleet, agents, args)
+            await asyncio.sleep(args.duration * 2 / 3)
+        else:
+            await asyncio.sleep(args.duration)
+
+        fleet.shutdown()
+        await asyncio.gather(*runners)
+        elapsed = time.perf_counter() - started
+        recorder.set_phase("done")
+        # 等待 write-behind 队列落盘
+        await asyncio.sleep(args.settle)
+        after = db_snapshot(args.db)
+
+    return recorder, fleet, elapsed, before, after
+
+
+def report(args, recorder, fleet, elapsed, before, after):
+    print()
+    print(f"scenario={args.scenario} agents={args.agents} elapsed={elapsed:.1f}s "
+          f"samples accepted={recorder.samples} ({recorder.samples / elapsed:.1f}/s)")
+    print()
+    print(f"{'phase':<10}{'endpoint':<18}{'requests':>9}{'req/s':>9}{'errors':>8}"
+          f"{'err %':>8}{'429':>7}{'p50 ms':>9}{'p99 ms':>9}")
+    endpoints = sorted({endpoint for _, endpoint in recorder.latencies})
+    for phase in recorder.phases:
+        seconds = max(recorder.phase_seconds[phase], 0.001)
+        phase_total, phase_errors = 0, 0
+        for endpoint in endpoints:
+            key = (phase, endpoint)
+            latencies = recorder.latencies.get(key)
+            if not latencies:
+                continue
+            errors = recorder.errors[key]
+            phase_total += len(latencies)
+            phase_errors += errors
+            print(f"{phase:<10}{endpoint:<18}{len(latencies):>9}"
+                  f"{len(latencies) / seconds:>9.1f}{errors:>8}"
+                  f"{errors / len(latencies) * 100:>8.2f}{recorder.throttled[key]:>7}"
+                  f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 99):>9.1f}")
+        if phase_total:
+            all_latencies = [
+                v for (p, _), values in recorder.latencies.items() if p == phase for v in values
+            ]
+            print(f"{phase:<10}{'(all)':<18}{phase_total:>9}{phase_total / seconds:>9.1f}{phase_errors:>8}"
+                  f"{phase_errors / phase_total * 100:>8.2f}{'':>7}"
+                  f"{percentile(all_latencies, 50):>9.1f}{percentile(all_latencies, 99):>9.1f}")
+
+    if args.scenario == "campaign":
+        picked = fleet.task_pickup_ms
+        print()
+        print(f"campaign tasks picked up: {len(picked)}, never picked up: {len(fleet.task_created_at)}")
+        if picked:
+            print(f"task pickup latency p50 {percentile(picked, 50) / 1000:.1f}s, "
+                  f"p99 {percentile(picked, 99) / 1000:.1f}s")
+
+    print()
+    if before is None or after is None:
+        print("database growth: unknown (use --spawn-server or --db)")
+        return
+    grown = after["bytes"] - before["bytes"]
+    print(f"database size: {before['bytes'] / 1048576:.1f} MB -> {after['bytes'] / 1048576:.1f} MB "
+          f"(+{grown / 1048576:.1f} MB, {grown / max(1, args.agents) / 1024:.1f} KB/agent, "
+          f"{grown / elapsed / 1024:.1f} KB/s)")
+    for table in GROWTH_TABLES:
+        if table in after["rows"]:
+            old = before["rows"].get(table, 0)
+            print(f"  {table:<28}{old:>10} -> {after['rows'][table]:>10} "
+                  f"(+{after['rows'][table] - old})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent 集群负载模拟")
+    parser.add_argument("--scenario", choices=["steady", "reconnect", "campaign"], default="steady")
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=60, help="ramp 之后的压测秒数")
+    parser.add_argument("--ramp", type=float, default=10, help="Agent 错开启动的秒数")
+    parser.add_argument("--server", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn-server", action="store_true", help="在临时目录中启动 uvicorn")
+    parser.add_argument("--port", type=int, default=8765, help="--spawn-server 使用的端口")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="传给 --spawn-server 服务端的环境变量, 可重复")
+    parser.add_argument("--db", help="SQLite 数据库文件, 用于统计数据库增长")
+    parser.add_argument("--connections", type=int, default=500, help="HTTP 连接池大小")
+    parser.add_argument("--timeout", type=float, default=30, help="单个请求超时 (秒)")
+    # Agent 行为 (默认值与 Agent 一致)
+    parser.add_argument("--loop-interval", type=float, default=10, help="心跳 + 命令轮询间隔")
+    parser.add_argument("--task-poll-interval", type=float, default=5)
+    parser.add_argument("--metrics-interval", type=float, default=1, help="采样间隔")
+    parser.add_argument("--metrics-batch", type=int, default=1, help="每次上报的样本数")
+    parser.add_argument("--compact", action="store_true", help="使用列式压缩上报格式")
+    # 场景参数
+    parser.add_argument("--downtime", type=float, default=10, help="reconnect: 服务端停机秒数")
+    parser.add_argument("--campaign-size", type=int, default=100, help="campaign: 创建的任务数")
+    parser.add_argument("--command-ratio", type=float, default=0.05,
+                        help="campaign: 下发控制命令的设备比例")
+    parser.add_argument("--task-seconds", type=float, default=20, help="campaign: 单个任务耗时")
+    parser.add_argument("--settle", type=float, default=3, help="结束后等待落盘的秒数")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn_server:
+        extra_env = dict(item.split("=", 1) for item in args.server_env)
+        server = ServerProcess(args.port, extra_env)
+        args.server = server.url
+        args.db = args.db or server.db_path
+        server.start()
+    elif args.scenario == "reconnect":
+        print("no --spawn-server: reconnect scenario restarts all agents instead of the server")
+
+    try:
+        result = asyncio.run(run_fleet(args, server))
+    finally:
+        if server is not None:
+            server.stop()
+    report(args, *result)
+
+
+if __name__ == "__main__":
+    main()
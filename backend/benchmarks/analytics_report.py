@@ -0,0 +1,149 @@
+"""
+分析报表生成基准测试
+
+生成指定规模的设备与测试结果, 分别计时:
+  - AnalyticsService.generate_report (内存字典, 设备查找表单次遍历)
+  - AnalyticsService.generate_report_from_db (SQL GROUP BY + NumPy 百分位/趋势)
+  - 可选: 改造前逐结果遍历设备列表的实现 (O(结果数 × 设备数), 仅适合小规模)
+并检查两种新实现的部门统计结果一致。
+
+用法 (在 backend 目录下执行):
+    python benchmarks/analytics_report.py
+    python benchmarks/analytics_report.py --devices 50000 --results 2000000
+    python benchmarks/analytics_report.py --devices 2000 --results 50000 --legacy
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models.sqlite import Device, TestResult
+from app.services.analytics_service import AnalyticsService
+
+
+def legacy_department_analysis(results, devices):
+    """改造前: 每条结果线性查找所属设备"""
+    dept_results = defaultdict(list)
+    for result in results:
+        for device in devices:
+            if device.get("id") == result.get("device_id"):
+                dept_results[device.get("department", "Unknown")].append(result)
+                break
+    return dept_results
+
+
+def populate(session_factory, device_count: int, result_count: int, days: int):
+    devices = [
+        {
+            "id": str(uuid.uuid4()),
+            "device_name": f"bench-{i}",
+            "mac_address": f"BE:{(i >> 24) & 255:02X}:{(i >> 16) & 255:02X}:{(i >> 8) & 255:02X}:{i & 255:02X}:00",
+            "department": f"dept-{i % 50:02d}",
+            "position": f"pos-{i % 200:03d}",
+            "status": "online",
+        }
+        for i in range(device_count)
+    ]
+    now = datetime.utcnow()
+    results = []
+    for _ in range(result_count):
+        start = now - timedelta(seconds=random.randint(0, days * 86400))
+        results.append({
+            "id": str(uuid.uuid4()),
+            "device_id": random.choice(devices)["id"],
+            "test_type": "full",
+            "test_status": random.choice(["passed", "failed"]),
+            "start_time": start,
+            "end_time": start + timedelta(minutes=5),
+            "duration_seconds": 300,
+            "overall_score": random.uniform(30, 100),
+            "cpu_score": random.uniform(30, 100),
+            "gpu_score": random.uniform(30, 100),
+            "memory_score": random.uniform(30, 100),
+            "disk_score": random.uniform(30, 100),
+            "is_standard_met": random.random() > 0.3,
+            "bottleneck_type": random.choice(["CPU", "GPU", "MEMORY", "DISK", None]),
+        })
+
+    with session_factory() as db:
+        db.execute(insert(Device), devices)
+        for i in range(0, len(results), 10000):
+            db.execute(insert(TestResult), results[i:i + 10000])
+        db.commit()
+    return devices, results
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    value = fn()
+    print(f"  {label:<34} {time.perf_counter() - start:>8.2f} s")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析报表生成基准")
+    parser.add_argument("--url", help="数据库 URL (默认使用临时 SQLite 文件)")
+    parser.add_argument("--devices", type=int, default=10000)
+    parser.add_argument("--results", type=int, default=300000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--legacy", action="store_true", help="同时运行改造前的部门统计")
+    args = parser.parse_args()
+
+    tmp_path = None
+    url = args.url
+    if not url:
+        fd, tmp_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{tmp_path}"
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    try:
+        print(f"{engine.dialect.name}: {args.devices} devices, {args.results} results")
+        devices, results = timed(
+            "populate", lambda: populate(session_factory, args.devices, args.results, args.days)
+        )
+
+        if args.legacy:
+            timed("legacy department loop", lambda: legacy_department_analysis(results, devices))
+
+        report = timed(
+            "generate_report (in memory)",
+            lambda: AnalyticsService.generate_report(results, devices, []),
+        )
+        with session_factory() as db:
+            db_report = timed(
+                "generate_report_from_db (SQL)",
+                lambda: AnalyticsService.generate_report_from_db(db, days=args.days + 1),
+            )
+
+        expected = {d["department"]: d for d in report["department_analysis"]}
+        for dept in db_report["department_analysis"]:
+            memory = expected[dept["department"]]
+            assert dept["total_tests"] == memory["total_tests"], dept
+            assert dept["passed_count"] == memory["passed_count"], dept
+            assert abs(dept["average_score"] - memory["average_score"]) <= 0.01, dept
+        print(f"  summary percentiles: {db_report['summary']['percentiles']}")
+        print("OK: department analysis matches between in-memory and SQL paths")
+    finally:
+        engine.dispose()
+        if tmp_path:
+            os.remove(tmp_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+紧凑指标存储容量与查询基准测试
+
+在临时 SQLite 数据库 (或 --url 指定的 PostgreSQL) 中按原布局写入指标,
+记录占用空间和典型查询耗时; 然后用 MetricsCompactService 在线迁移并删除旧表,
+再次测量, 输出前后对比。查询均通过 performance_metrics (迁移后为兼容视图) 执行。
+
+用法 (在 backend 目录下执行):
+    python benchmarks/compact_metrics.py
+    python benchmarks/compact_metrics.py --devices 500 --samples 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)) + "/..")
+
+from sqlalchemy import create_engine, insert, text
+
+from app.core.database import Base
+from app.models.sqlite import Device
+from app.services.metrics_compact_service import MetricsCompactService
+from app.services.metrics_ingest_service import MetricsBulkWriter
+
+QUERIES = {
+    "device_hour": (
+        "SELECT * FROM performance_metrics WHERE device_id = :device_id "
+        "AND timestamp >= :since ORDER BY timestamp"
+    ),
+    "fleet_avg": (
+        "SELECT device_id, AVG(cpu_percent), MAX(memory_percent) "
+        "FROM performance_metrics WHERE timestamp >= :since GROUP BY device_id"
+    ),
+    "latest_window": (
+        "SELECT COUNT(*), AVG(gpu_percent) FROM performance_metrics "
+        "WHERE timestamp >= :recent"
+    ),
+}
+
+
+def make_sample(ts: datetime) -> dict:
+    return dict(
+        timestamp=ts.isoformat(),
+        cpu_percent=random.uniform(0, 100),
+        cpu_temperature=random.uniform(35, 95),
+        cpu_frequency_mhz=random.uniform(800, 5000),
+        gpu_percent=random.uniform(0, 100),
+        gpu_temperature=random.uniform(30, 85),
+        gpu_memory_used_mb=random.uniform(500, 8000),
+        gpu_memory_total_mb=8192,
+        memory_percent=random.uniform(20, 90),
+        memory_used_mb=random.uniform(4000, 30000),
+        memory_available_mb=random.uniform(1000, 20000),
+        disk_read_mbps=random.uniform(0, 500),
+        disk_write_mbps=random.uniform(0, 500),
+        disk_io_percent=random.uniform(0, 100),
+        network_sent_mbps=random.uniform(0, 100),
+        network_recv_mbps=random.uniform(0, 100),
+        process_count=random.randint(150, 400),
+    )
+
+
+def populate(engine, devices: int, samples: int) -> list:
+    device_ids = []
+    with engine.begin() as conn:
+        for i in range(devices):
+            device_id = f"{i:08x}-0000-4000-8000-{random.getrandbits(48):012x}"
+            conn.execute(
+                insert(Device.__table__).values(
+                    id=device_id,
+                    device_name=f"bench-{i}",
+                    mac_address=f"BE:NC:{(i >> 16) & 255:02X}:{(i >> 8) & 255:02X}:{i & 255:02X}:00",
+                )
+            )
+            device_ids.append(device_id)
+
+    writer = MetricsBulkWriter()
+    start = datetime.utcnow() - timedelta(seconds=samples * 5)
+    for device_id in device_ids:
+        rows = writer.build_rows(
+            device_id,
+            (make_sample(start + timedelta(seconds=s * 5)) for s in range(samples)),
+        )
+        # 模拟历史数据: created_at 与采集时间一致
+        for row in rows:
+            row["created_at"] = row["timestamp"]
+        with engine.begin() as conn:
+            writer.write(conn, rows)
+    return device_ids
+
+
+def time_queries(engine, device_ids, repeats: int) -> dict:
+    now = datetime.utcnow()
+    params = {
+        "device_hour": lambda: {
+            "device_id": random.choice(device_ids),
+            "since": now - timedelta(hours=1),
+        },
+        "fleet_avg": lambda: {"since": now - timedelta(hours=6)},
+        "latest_window": lambda: {"recent": now - timedelta(minutes=10)},
+    }
+    timings = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            conn.execute(text(sql), params[name]()).all()  # 预热
+            start = time.perf_counter()
+            for _ in range(repeats):
+                conn.execute(text(sql), params[name]()).all()
+            timings[name] = (time.perf_counter() - start) / repeats * 1000
+    return timings
+
+
+def metric_bytes(report: dict, names) -> int:
+    return sum((report["tables"].get(n) or {}).get("bytes") or 0 for n in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="紧凑指标存储容量与查询基准")
+    parser.add_argument("--url", help="数据库 URL (默认使用临时 SQLite 文件)")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=1000, help="每台设备的样本数")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp_path = None
+    url = args.url
+    if not url:
+        fd, tmp_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{tmp_path}"
+    engine = create_engine(url)
+    sqlite = engine.dialect.name == "sqlite"
+
+    try:
+        Base.metadata.create_all(engine)
+        print(f"{engine.dialect.name}: {args.devices} devices x {args.samples} samples")
+
+        start = time.perf_counter()
+        device_ids = populate(engine, args.devices, args.samples)
+        print(f"  populate       {time.perf_counter() - start:>8.2f}s")
+        if sqlite:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+
+        service = MetricsCompactService(engine=engine, enabled=True)
+        service.batch_sleep = 0
+        service.batch_size = 20000
+        before = service.size_report()
+        before_times = time_queries(engine, device_ids, args.repeats)
+
+        start = time.perf_counter()
+        copied = service.migrate()
+        print(f"  migrate        {time.perf_counter() - start:>8.2f}s  {copied}")
+        service.drop_legacy()
+        if sqlite:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("VACUUM")
+
+        after = service.size_report()
+        after_times = time_queries(engine, device_ids, args.repeats)
+
+        if before.get("supported"):
+            old = metric_bytes(before, ["performance_metrics"])
+            new = metric_bytes(after, ["performance_metrics_compact", "device_keys"])
+            print("\n  size (table + indexes)")
+            print(f"  row layout     {old:>14,} bytes")
+            print(f"  compact        {new:>14,} bytes  ({new / old:.0%} of row layout)")
+
+        print("\n  query            row layout     compact")
+        for name in QUERIES:
+            print(
+                f"  {name:<14} {before_times[name]:>9.2f}ms {after_times[name]:>9.2f}ms"
+            )
+    finally:
+        engine.dispose()
+        if tmp_path:
+            os.remove(tmp_path)
+
+
+if __name__ == "__main__":
+    main()
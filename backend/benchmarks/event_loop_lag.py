@@ -0,0 +1,198 @@
+"""
+事件循环延迟基准测试
+
+在进程内 (httpx ASGITransport, 与应用共用一个事件循环) 模拟一批 Agent 并发轮询
+任务、上报执行记录和软件指标, 同时运行一个每 10ms 唤醒一次的探针协程,
+记录实际唤醒时间比预期晚了多少。接口在事件循环上执行阻塞调用时探针延迟会明显升高。
+
+--mode legacy 额外挂载与旧实现相同的接口 (async def 中使用同步 Session
+及同步 bcrypt), 用于对比。
+
+数据库使用当前配置; SQLite 默认配置时在临时目录中创建新库。
+
+用法 (在 backend 目录下执行):
+    python benchmarks/event_loop_lag.py
+    python benchmarks/event_loop_lag.py --agents 200 --duration 20
+    python benchmarks/event_loop_lag.py --mode legacy
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# SQLite 默认使用相对路径 ./hardware_benchmark.db, 切换到临时目录避免写入开发库
+os.chdir(tempfile.mkdtemp(prefix="loop-lag-"))
+os.environ.setdefault("DEBUG", "false")
+os.environ.setdefault("METRICS_WRITE_BEHIND_ENABLED", "false")
+
+import httpx
+from fastapi import Depends, Query
+from sqlalchemy import select
+
+from app.core.database import SyncSessionLocal, get_db_sync
+from app.core.security import verify_password
+from app.main import app, shutdown_event, startup_event
+from app.models.sqlite import Device, JobScript, TestTask, User
+
+PROBE_INTERVAL = 0.01
+
+
+def mount_legacy_routes():
+    """旧实现: async def 中直接调用同步 Session, 数据库等待阻塞事件循环"""
+
+    @app.get("/bench/legacy/tasks/pending")
+    async def legacy_pending(device_id: str = Query(...), db=Depends(get_db_sync)):
+        tasks = db.execute(
+            select(TestTask).where(TestTask.task_status == "pending")
+        ).scalars().all()
+        return [{"task_id": t.id} for t in tasks]
+
+    @app.post("/bench/legacy/login")
+    async def legacy_login(payload: dict, db=Depends(get_db_sync)):
+        user = db.execute(
+            select(User).where(User.username == payload["username"])
+        ).scalar_one_or_none()
+        return {"ok": bool(user and verify_password(payload["password"], user.password_hash))}
+
+
+def seed(agents: int):
+    """准备设备、脚本和待执行任务"""
+    with SyncSessionLocal() as db:
+        devices = [
+            Device(
+                id=str(uuid.uuid4()),
+                device_name=f"lag-{i}",
+                mac_address=f"1A:6B:{(i >> 16) & 255:02X}:{(i >> 8) & 255:02X}:{i & 255:02X}:00",
+            )
+            for i in range(agents)
+        ]
+        db.add_all(devices)
+        script = JobScript(
+            script_name="lag-bench",
+            script_code=f"lag-{uuid.uuid4().hex[:8]}",
+            script_content="{}",
+        )
+        db.add(script)
+        for i in range(20):
+            db.add(TestTask(task_name=f"lag-task-{i}", task_type="benchmark", task_status="pending"))
+        db.commit()
+        return [d.id for d in devices], script.id
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    """定时唤醒, 记录超出预期的延迟 (毫秒)"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def agent(client, device_id, script_id, legacy, stop, latencies, errors):
+    """单个 Agent: 轮询任务、开始执行、上报指标、完成执行, 偶尔登录"""
+    pending = "/bench/legacy/tasks/pending" if legacy else "/api/agent/tasks/pending"
+    login = "/bench/legacy/login" if legacy else "/api/auth/login"
+    await asyncio.sleep(random.random())
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            r = await client.get(pending, params={"device_id": device_id})
+            r.raise_for_status()
+            r = await client.post(
+                "/api/agent/executions/start",
+                params={"script_id": script_id, "device_id": device_id},
+            )
+            r.raise_for_status()
+            execution_id = r.json()["execution_id"]
+            sample = {"cpu_percent": random.uniform(0, 100), "memory_mb": 512.0}
+            r = await client.post(
+                f"/api/agent/executions/{execution_id}/metrics", json=[sample] * 5
+            )
+            r.raise_for_status()
+            r = await client.put(
+                f"/api/agent/executions/{execution_id}/complete", json={"exit_code": 0}
+            )
+            r.raise_for_status()
+            if random.random() < 0.05:
+                r = await client.post(
+                    login, json={"username": "lagbench", "password": "lagbench-pass"}
+                )
+                r.raise_for_status()
+        except Exception:
+            errors.append(1)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(random.uniform(0.05, 0.2))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(args):
+    if args.mode == "legacy":
+        mount_legacy_routes()
+    await startup_event()
+    try:
+        device_ids, script_id = seed(args.agents)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await client.post(
+                "/api/auth/register",
+                json={"username": "lagbench", "password": "lagbench-pass"},
+            )
+
+            stop = asyncio.Event()
+            idle_lags, lags, latencies, errors = [], [], [], []
+
+            # 空载基线
+            probe_task = asyncio.create_task(probe(stop, idle_lags))
+            await asyncio.sleep(1)
+            stop.set()
+            await probe_task
+
+            stop = asyncio.Event()
+            tasks = [asyncio.create_task(probe(stop, lags))] + [
+                asyncio.create_task(
+                    agent(client, d, script_id, args.mode == "legacy", stop, latencies, errors)
+                )
+                for d in device_ids
+            ]
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+    finally:
+        await shutdown_event()
+
+    print(f"mode={args.mode} agents={args.agents} duration={args.duration}s")
+    print(f"  agent cycles   {len(latencies):>8}  ({len(latencies) / args.duration:.1f}/s, errors {len(errors)})")
+    print(f"  cycle p50/p99  {percentile(latencies, 50):>8.1f} / {percentile(latencies, 99):.1f} ms")
+    print("  event loop lag (ms)      p50      p99      max     mean")
+    for name, values in (("idle", idle_lags), ("under load", lags)):
+        print(
+            f"  {name:<18} {percentile(values, 50):>8.2f} {percentile(values, 99):>8.2f} "
+            f"{max(values or [0]):>8.2f} {statistics.fmean(values or [0]):>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件循环延迟基准")
+    parser.add_argument("--agents", type=int, default=50, help="并发 Agent 数")
+    parser.add_argument("--duration", type=float, default=10, help="压测秒数")
+    parser.add_argument("--mode", choices=["async", "legacy"], default="async")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+SQLite 并发写入基准测试: 默认配置 vs SQLite 生产模式
+
+在进程内 (httpx ASGITransport) 模拟 N 个 Agent, 每个 Agent 按固定间隔:
+心跳、上报一批性能指标 (默认关闭 write-behind, 每次上报在请求内提交)、
+开始并完成一次脚本执行; 另有少量仪表盘查询。统计吞吐量、延迟、错误数,
+以及其中 "database is locked" 的次数。
+
+每个 (模式, Agent 数) 组合在独立子进程和临时目录中运行, 设置在导入应用前通过
+环境变量生效 (SQLITE_PRODUCTION_MODE)。
+
+用法 (在 backend 目录下执行):
+    python benchmarks/sqlite_concurrency.py
+    python benchmarks/sqlite_concurrency.py --agents 1000 5000 10000 --duration 30
+    python benchmarks/sqlite_concurrency.py --modes production --write-behind
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SAMPLES_PER_BATCH = 5
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# ================================================
+# 子进程: 运行一个组合
+# ================================================
+
+
+async def run_one(args):
+    import httpx
+    from sqlalchemy import func, select
+
+    from app.core.database import SyncSessionLocal
+    from app.main import app, shutdown_event, startup_event
+    from app.models.sqlite import JobScript, PerformanceMetric
+
+    await startup_event()
+    try:
+        with SyncSessionLocal() as db:
+            script = JobScript(
+                script_name="sqlite-bench",
+                script_code="sqlite-bench",
+                script_content="{}",
+            )
+            db.add(script)
+            db.commit()
+            script_id = script.id
+
+        limits = httpx.Limits(max_connections=None)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", limits=limits, timeout=None
+        ) as client:
+            stats = {"latencies": [], "errors": 0, "locked": 0, "requests": 0}
+            stop = asyncio.Event()
+
+            async def call(method, url, **kwargs):
+                start = time.perf_counter()
+                try:
+                    r = await client.request(method, url, **kwargs)
+                    r.raise_for_status()
+                    return r
+                except Exception as e:
+                    stats["errors"] += 1
+                    if "database is locked" in str(e):
+                        stats["locked"] += 1
+                    return None
+                finally:
+                    stats["requests"] += 1
+                    stats["latencies"].append((time.perf_counter() - start) * 1000)
+
+            async def agent(i):
+                mac = f"5C:00:{(i >> 16) & 255:02X}:{(i >> 8) & 255:02X}:{i & 255:02X}:01"
+                # 错开启动, 避免所有 Agent 在同一时刻注册
+                await asyncio.sleep(random.random() * args.interval)
+                r = await call(
+                    "POST", "/api/devices/agent/heartbeat",
+                    json={"mac_address": mac, "status": "online"},
+                )
+                if r is None:
+                    return
+                device_id = r.json()["device_id"]
+                while not stop.is_set():
+                    cycle_start = time.perf_counter()
+                    await call(
+                        "POST", "/api/devices/agent/heartbeat",
+                        json={"mac_address": mac, "status": "online"},
+                    )
+                    sample = {"device_id": device_id, "cpu_percent": random.uniform(0, 100)}
+                    await call(
+                        "POST", "/api/performance/metrics/batch",
+                        json={"device_id": device_id, "metrics": [sample] * SAMPLES_PER_BATCH},
+                    )
+                    r = await call(
+                        "POST", "/api/agent/executions/start",
+                        params={"script_id": script_id, "device_id": device_id},
+                    )
+                    if r is not None:
+                        await call(
+                            "PUT", f"/api/agent/executions/{r.json()['execution_id']}/complete",
+                            json={"exit_code": 0},
+                        )
+                    if random.random() < 0.02:
+                        await call("GET", "/api/stats/dashboard")
+                    elapsed = time.perf_counter() - cycle_start
+                    await asyncio.sleep(max(0.0, args.interval - elapsed))
+
+            tasks = [asyncio.create_task(agent(i)) for i in range(args.agents)]
+            started = time.perf_counter()
+            await asyncio.sleep(args.duration)
+            stop.set()
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+    finally:
+        await shutdown_event()
+
+    with SyncSessionLocal() as db:
+        samples = db.execute(select(func.count()).select_from(PerformanceMetric)).scalar()
+
+    latencies = stats["latencies"]
+    return {
+        "requests_per_s": round(stats["requests"] / elapsed, 1),
+        "samples_per_s": round(samples / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "errors": stats["errors"],
+        "locked": stats["locked"],
+    }
+
+
+def child(args):
+    os.chdir(tempfile.mkdtemp(prefix="sqlite-bench-"))
+    result = asyncio.run(run_one(args))
+    print("RESULT " + json.dumps(result))
+
+
+# ================================================
+# 父进程: 依次运行各组合并汇总
+# ================================================
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 并发写入基准")
+    parser.add_argument("--agents", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--modes", nargs="+", choices=["default", "production"],
+                        default=["default", "production"])
+    parser.add_argument("--duration", type=float, default=20, help="每个组合的压测秒数")
+    parser.add_argument("--interval", type=float, default=5, help="Agent 上报间隔 (秒)")
+    parser.add_argument("--write-behind", action="store_true", help="启用指标 write-behind 队列")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.agents = args.agents[0]
+        child(args)
+        return
+
+    rows = []
+    for agents in args.agents:
+        for mode in args.modes:
+            env = {
+                **os.environ,
+                "DEBUG": "false",
+                "SQLITE_PRODUCTION_MODE": "true" if mode == "production" else "false",
+                "METRICS_WRITE_BEHIND_ENABLED": "true" if args.write_behind else "false",
+                "LOOP_MONITOR_ENABLED": "false",
+                "PYTHONPATH": BACKEND_DIR,
+            }
+            cmd = [
+                sys.executable, os.path.abspath(__file__), "--child",
+                "--agents", str(agents), "--duration", str(args.duration),
+                "--interval", str(args.interval),
+            ]
+            print(f"running mode={mode} agents={agents} ...", flush=True)
+            out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+            line = next((l for l in out.stdout.splitlines() if l.startswith("RESULT ")), None)
+            if line is None:
+                print(out.stderr[-2000:])
+                continue
+            rows.append((mode, agents, json.loads(line[len("RESULT "):])))
+
+    print()
+    print(f"{'mode':<11}{'agents':>7}{'req/s':>9}{'samples/s':>11}{'p50 ms':>9}"
+          f"{'p99 ms':>9}{'errors':>8}{'locked':>8}")
+    for mode, agents, r in rows:
+        print(f"{mode:<11}{agents:>7}{r['requests_per_s']:>9}{r['samples_per_s']:>11}"
+              f"{r['p50_ms']:>9}{r['p99_ms']:>9}{r['errors']:>8}{r['locked']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+紧凑指标存储迁移工具
+
+将 performance_metrics / software_metrics 在线转换为紧凑布局 (见
+app/services/metrics_compact_service.py)。API 服务可以保持运行: 复制分批进行,
+切换时短暂持有写锁; 中断后重新执行会从记录的水位继续。
+
+用法 (在 backend 目录下执行, 使用 .env 中的数据库配置):
+    python migrate_compact_metrics.py              # 迁移并切换
+    python migrate_compact_metrics.py --status     # 查看进度及各表占用空间
+    python migrate_compact_metrics.py --drop-legacy  # 确认无误后删除旧表
+
+切换后 API 服务中的批量写入经由视图触发器写入紧凑表, 重启后直接写紧凑表。
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import sync_engine, Base
+import app.models.sqlite  # noqa: F401  注册模型
+from app.services.metrics_compact_service import MetricsCompactService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="紧凑指标存储迁移")
+    parser.add_argument("--status", action="store_true", help="只显示状态和占用空间")
+    parser.add_argument("--drop-legacy", action="store_true", help="删除迁移后保留的旧表")
+    parser.add_argument("--batch-size", type=int, help="每批复制行数")
+    args = parser.parse_args()
+
+    service = MetricsCompactService(enabled=True)
+    if args.batch_size:
+        service.batch_size = args.batch_size
+
+    with sync_engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        service._detect(conn)
+
+    if args.status:
+        print(json.dumps(
+            {**service.get_stats(), "sizes": service.size_report()},
+            indent=2, ensure_ascii=False, default=str,
+        ))
+        return
+
+    if args.drop_legacy:
+        dropped = service.drop_legacy()
+        print(f"已删除: {', '.join(dropped) or '无'}")
+        return
+
+    before = service.size_report()
+    result = service.migrate()
+    if not result:
+        print("没有需要迁移的表 (已切换, 或当前数据库/分区配置不支持)")
+        return
+    after = service.size_report()
+
+    for name, rows in result.items():
+        print(f"✓ {name}: 复制 {rows} 行, 旧表保留为 {name}_legacy")
+    if before.get("supported"):
+        print("\n占用空间 (字节, 含索引):")
+        for name, info in after["tables"].items():
+            print(f"  {name:<32} {info['bytes'] or 0:>14,}  {info['rows']:>12,} 行")
+    print("\n确认数据无误后执行 --drop-legacy 删除旧表")
+
+
+if __name__ == "__main__":
+    main()
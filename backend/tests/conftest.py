@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试从 backend/ 导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
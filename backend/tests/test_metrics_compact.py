@@ -0,0 +1,63 @@
+"""紧凑指标存储: device_key 映射缓存"""
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from app.services.metrics_compact_service import device_keys, metrics_compact
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    device_keys.create(engine)
+    metrics_compact._keys = {}
+    yield engine
+    metrics_compact._keys = {}
+    engine.dispose()
+
+
+def _stored_keys(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(device_keys.c.device_id, device_keys.c.device_key)).all())
+
+
+def test_new_key_cached_after_commit(engine):
+    with engine.begin() as conn:
+        keys = metrics_compact.device_keys_for(conn, ["dev-A"])
+        assert "dev-A" not in metrics_compact._keys
+    assert metrics_compact._keys == keys == _stored_keys(engine)
+
+
+def test_rolled_back_key_not_reused_from_cache(engine):
+    with engine.connect() as conn:
+        with conn.begin() as trans:
+            metrics_compact.device_keys_for(conn, ["dev-A"])
+            trans.rollback()
+
+    # SQLite 把回滚释放的 device_key 分配给下一台设备
+    with engine.begin() as conn:
+        key_b = metrics_compact.device_keys_for(conn, ["dev-B"])["dev-B"]
+    with engine.begin() as conn:
+        key_a = metrics_compact.device_keys_for(conn, ["dev-A"])["dev-A"]
+
+    assert key_a != key_b
+    assert _stored_keys(engine) == {"dev-A": key_a, "dev-B": key_b}
+    assert metrics_compact._keys == {"dev-A": key_a, "dev-B": key_b}
+
+
+def test_savepoint_rollback_discards_pending_keys(engine):
+    """SQLite 写线程: 单个任务失败时只回滚其保存点"""
+    with engine.connect() as conn:
+        with conn.begin():
+            with pytest.raises(RuntimeError):
+                with conn.begin_nested():
+                    metrics_compact.device_keys_for(conn, ["dev-A"])
+                    raise RuntimeError("job failed")
+            key_b = metrics_compact.device_keys_for(conn, ["dev-B"])["dev-B"]
+
+    assert "dev-A" not in metrics_compact._keys
+    assert metrics_compact._keys == {"dev-B": key_b} == _stored_keys(engine)
+    with engine.begin() as conn:
+        key_a = metrics_compact.device_keys_for(conn, ["dev-A"])["dev-A"]
+    assert key_a != key_b
@@ -0,0 +1,20 @@
+"""指标写入: 行字典构建"""
+
+from datetime import datetime
+
+from app.services.metrics_ingest_service import build_metric_row
+
+NOW = datetime(2026, 3, 2, 5, 0)
+
+
+def test_timestamp_normalized_to_naive_utc():
+    row = build_metric_row("dev-A", {"timestamp": "2026-03-02T12:00:00+08:00"}, NOW)
+    assert row["timestamp"] == datetime(2026, 3, 2, 4, 0)
+
+    row = build_metric_row("dev-A", {"timestamp": "2026-03-02T04:00:00Z"}, NOW)
+    assert row["timestamp"] == datetime(2026, 3, 2, 4, 0)
+
+
+def test_missing_timestamp_defaults_to_receive_time():
+    row = build_metric_row("dev-A", {}, NOW)
+    assert row["timestamp"] == row["created_at"] == NOW
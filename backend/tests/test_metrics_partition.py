@@ -0,0 +1,50 @@
+"""SQLite 指标分区: 写入路由与分区列表缓存"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.services.metrics_partition_service import metrics_partitions
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    metrics_partitions._partitions = None
+    yield engine
+    metrics_partitions._partitions = None
+    engine.dispose()
+
+
+def _rows(*days):
+    return [{"id": f"m-{day}", "timestamp": datetime(2026, 3, day, 12)} for day in days]
+
+
+def _cached_names():
+    return [p.name for p in metrics_partitions._partitions or []]
+
+
+def test_created_partition_cached_after_commit(engine):
+    with engine.begin() as conn:
+        groups = metrics_partitions.route(conn, _rows(2))
+        assert _cached_names() == []
+    (name,) = groups
+
+    with engine.connect() as conn:
+        assert [p.name for p in metrics_partitions._sqlite_partitions(conn)] == [name]
+    assert _cached_names() == [name]
+
+
+def test_rolled_back_partition_not_cached(engine):
+    with engine.connect() as conn:
+        with conn.begin() as trans:
+            metrics_partitions.route(conn, _rows(2))
+            trans.rollback()
+
+    assert _cached_names() == []
+    with engine.begin() as conn:
+        groups = metrics_partitions.route(conn, _rows(2))
+        (name,) = groups
+        conn.execute(text(f'SELECT COUNT(*) FROM "{name}"')).scalar_one()